@@ -0,0 +1,539 @@
+# aliran_chunk.py
+"""Mode streaming: Data Mentah diproses per chunk berukuran tetap.
+
+Mode batch memegang beberapa salinan penuh sekaligus: frame mentah hasil
+parse, frame hasil merge, frame hasil BP21, dan workbook openpyxl lengkap di
+BytesIO. Untuk file mentah yang sangat besar baris mentah sekarang mengalir
+per chunk melalui resolve header -> normalisasi -> join ke master (indeks NIP
+di memori) -> pembangun kolom BP21 -> penulis XLSX write-only, sehingga
+memori puncak sebanding ukuran chunk + master, bukan ukuran file.
+
+Hasilnya identik dengan mode batch. Keputusan yang di batch bergantung pada
+seluruh kolom diambil dulu di pass profil (tanpa menyimpan baris):
+  - dtype kolom mentah (pd.read_excel menyimpulkan dtype dari seluruh kolom)
+  - baris saksi: nilai pertama yang tidak kosong di tiap kolom hasil join.
+    Baris ini ditaruh di depan setiap chunk lalu dibuang lagi, jadi inferensi
+    format tanggal dan aturan 'kosong_jika_semua_na' sama dengan satu pass.
+  - kolom BP21 yang transformasinya gagal di salah satu chunk dipaksa jadi
+    teks asli di semua chunk (sama dengan fallback jalankan() di batch)
+  - NIP duplikat (hash 64-bit per baris; per bulan jika kolom periode
+    diberikan, karena file rapel boleh berisi NIP yang sama di bulan lain)
+    dan NIP yang tidak ada di master
+Hasil per chunk ditampung sementara sebagai pickle di direktori temp. Dtype
+kolom hasil disatukan dan lebar kolom dihitung sebelum workbook ditulis,
+karena openpyxl write-only menetapkan lebar kolom sebelum baris pertama.
+"""
+import io
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+from pembaca_excel import KOLOM_IDENTITAS, _isi_file, pilih_kolom
+from spesifikasi_bp21 import jalankan, kompilasi
+
+# ===== KONFIGURASI =====
+UKURAN_CHUNK = 5000          # baris mentah per chunk
+AMBANG_BARIS = 50_000        # estimasi baris preflight di atas ini: streaming disarankan
+MAKS_CONTOH = 50             # baris contoh/data baru yang disimpan untuk tampilan
+LEBAR_MAKS = 50              # lebar kolom maksimum (sama dengan export batch)
+_NUMERIK = {'int64', 'float64', 'Int64', 'Float64'}
+
+
+def perlu_streaming(estimasi_baris):
+    """True jika estimasi jumlah baris preflight melewati AMBANG_BARIS"""
+    return estimasi_baris is not None and estimasi_baris > AMBANG_BARIS
+
+
+# ===== BACA EXCEL PER BARIS =====
+def _baris_xlsx(data, sheet_name):
+    """Baris sheet .xlsx dengan konversi sel yang sama seperti pd.read_excel"""
+    from openpyxl import load_workbook
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+    wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb[sheet_name] if isinstance(sheet_name, str) else wb.worksheets[sheet_name]
+        ws.reset_dimensions()
+        kosong = 0
+        for row in ws.rows:
+            baris = []
+            for cell in row:
+                nilai = cell.value
+                if nilai is None:
+                    nilai = ""
+                elif cell.data_type == TYPE_ERROR:
+                    nilai = np.nan
+                elif cell.data_type == TYPE_NUMERIC:
+                    bulat = int(nilai)
+                    nilai = bulat if bulat == nilai else float(nilai)
+                baris.append(nilai)
+            while baris and baris[-1] == "":
+                baris.pop()
+            # Baris kosong di akhir sheet dibuang (seperti pd.read_excel)
+            if not baris:
+                kosong += 1
+                continue
+            for _ in range(kosong):
+                yield []
+            kosong = 0
+            yield baris
+    finally:
+        wb.close()
+
+
+def _baris_xls(data, sheet_name):
+    """Baris sheet .xls dengan konversi sel yang sama seperti pd.read_excel"""
+    import datetime
+    import math
+
+    import xlrd
+    from xlrd import xldate
+
+    book = xlrd.open_workbook(file_contents=data, on_demand=True)
+    try:
+        sh = book.sheet_by_name(sheet_name) if isinstance(sheet_name, str) else book.sheet_by_index(sheet_name)
+        epoch1904 = book.datemode
+        for i in range(sh.nrows):
+            baris = []
+            for nilai, tipe in zip(sh.row_values(i), sh.row_types(i)):
+                if tipe == xlrd.XL_CELL_DATE:
+                    try:
+                        nilai = xldate.xldate_as_datetime(nilai, epoch1904)
+                    except OverflowError:
+                        baris.append(nilai)
+                        continue
+                    tanggal = nilai.timetuple()[0:3]
+                    if (not epoch1904 and tanggal == (1899, 12, 31)) or (epoch1904 and tanggal == (1904, 1, 1)):
+                        nilai = datetime.time(nilai.hour, nilai.minute, nilai.second, nilai.microsecond)
+                elif tipe == xlrd.XL_CELL_ERROR:
+                    nilai = np.nan
+                elif tipe == xlrd.XL_CELL_BOOLEAN:
+                    nilai = bool(nilai)
+                elif tipe == xlrd.XL_CELL_NUMBER and math.isfinite(nilai):
+                    bulat = int(nilai)
+                    if bulat == nilai:
+                        nilai = bulat
+                baris.append(nilai)
+            yield baris
+    finally:
+        book.release_resources()
+
+
+def _dtype_akhir(jenis, ada_kosong):
+    """Dtype satu kolom untuk seluruh file dari dtype per chunk.
+
+    jenis: dtype chunk yang kolomnya tidak kosong semua; ada_kosong: ada
+    chunk dengan nilai kosong. Return None jika tidak perlu disatukan.
+    """
+    if not jenis:
+        return None
+    if len(jenis) == 1:
+        tunggal = next(iter(jenis))
+        if ada_kosong and tunggal in ('int64', 'Int64'):
+            # Sama dengan batch: kolom angka bulat yang ada kosongnya jadi float (NaN, bukan <NA>)
+            return 'float64'
+        if ada_kosong and tunggal == 'bool':
+            return 'object'
+        return tunggal
+    if jenis <= _NUMERIK:
+        return 'float64'
+    return 'object'
+
+
+def _samakan_dtype(df, dtype_kolom):
+    """Cast kolom chunk ke dtype seluruh file (hanya yang berbeda)"""
+    for col, dtype in dtype_kolom.items():
+        if dtype is not None and col in df.columns and str(df[col].dtype) != dtype:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def gabung_seragam(bagian):
+    """pd.concat beberapa frame berkolom sama dengan dtype disatukan dulu.
+
+    concat langsung Int64 + float64 menghasilkan Float64 berisi <NA> yang
+    tidak bisa ditulis openpyxl; di sini aturannya sama dengan TampunganChunk.
+    """
+    kolom = list(bagian[0].columns)
+    dtype = {}
+    for col in kolom:
+        jenis = {str(df[col].dtype) for df in bagian if col in df.columns and not df[col].isna().all()}
+        ada_kosong = any(col in df.columns and df[col].isna().any() for df in bagian)
+        dtype[col] = _dtype_akhir(jenis, ada_kosong)
+    return pd.concat([_samakan_dtype(df.copy(), dtype) for df in bagian], ignore_index=True)
+
+
+class SumberExcel:
+    """Data Mentah yang dibaca per chunk; kolom terproyeksi seperti baca_excel_proyeksi"""
+
+    def __init__(self, file, kolom=(), kata_kunci=(), kolom_teks=KOLOM_IDENTITAS,
+                 normalisasi=str.strip, sheet_name=0, dtype=None, ukuran=UKURAN_CHUNK):
+        self.data = _isi_file(file)
+        self.sheet_name = sheet_name
+        self.ukuran = ukuran
+        # dtype seluruh file per kolom, diisi profil_mentah() sebelum pass proses
+        self.dtype_akhir = {}
+
+        baris = self._baris()
+        header = next(baris, [])
+        baris.close()
+        self.header = list(TextParser([header], header=0).read().columns) if header else []
+        self.kolom = pilih_kolom(self.header, kolom, kata_kunci, normalisasi)
+        self.posisi = [self.header.index(c) for c in self.kolom]
+
+        teks = {normalisasi(str(k)).lower() for k in kolom_teks}
+        dtype_tambahan = {normalisasi(str(k)): v for k, v in (dtype or {}).items()}
+        self.dtype_kolom = {}
+        for col in self.kolom:
+            nama = normalisasi(str(col))
+            if nama in dtype_tambahan:
+                self.dtype_kolom[col] = dtype_tambahan[nama]
+            elif nama.lower() in teks:
+                self.dtype_kolom[col] = str
+
+    def _baris(self):
+        if self.data[:4] == b'\xd0\xcf\x11\xe0':
+            return _baris_xls(self.data, self.sheet_name)
+        return _baris_xlsx(self.data, self.sheet_name)
+
+    def blok(self):
+        """Generator (mulai, baris terproyeksi) per chunk, tanpa header"""
+        baris = self._baris()
+        next(baris, None)
+        terkumpul = []
+        mulai = 0
+        lebar = len(self.posisi)
+        for isi in baris:
+            n = len(isi)
+            terkumpul.append([isi[p] if p < n else "" for p in self.posisi] if lebar else [])
+            if len(terkumpul) >= self.ukuran:
+                yield mulai, terkumpul
+                mulai += len(terkumpul)
+                terkumpul = []
+        if terkumpul:
+            yield mulai, terkumpul
+
+    def parse(self, baris, mulai=0):
+        """Baris terproyeksi -> DataFrame dengan dtype seluruh file (jika sudah diprofil)"""
+        dtype = dict(self.dtype_kolom)
+        dtype.update({c: object for c, d in self.dtype_akhir.items() if d == 'object' and c not in dtype})
+        df = TextParser(baris, names=self.kolom, header=None, dtype=dtype or None,
+                        skip_blank_lines=False).read()
+        df.index = pd.RangeIndex(mulai, mulai + len(df))
+        df.attrs['kolom_file'] = list(self.header)
+        return _samakan_dtype(df, self.dtype_akhir)
+
+    def chunk(self):
+        """Generator (df, baris) per chunk"""
+        for mulai, baris in self.blok():
+            yield self.parse(baris, mulai), baris
+
+
+# ===== JOIN KE MASTER =====
+class IndeksNip:
+    """Indeks NIP master di memori; gabung() per chunk = pd.merge inner seluruh file.
+
+    df_master harus sudah dinormalisasi (kolom kunci berupa teks yang di-strip).
+    Urutan hasil mengikuti baris kiri, kecocokan ganda mengikuti urutan master.
+    """
+
+    def __init__(self, df_master, kolom_kiri='nip', kolom_kanan='NIP', suffixes=('_x', '_y')):
+        self.master = df_master.reset_index(drop=True)
+        self.kolom_kiri = kolom_kiri
+        self.kolom_kanan = kolom_kanan
+        self.suffixes = suffixes
+        self.indeks = pd.Index(self.master[kolom_kanan])
+        self.unik = self.indeks.is_unique
+        self.jumlah = None if self.unik else self.indeks.value_counts()
+
+    def posisi(self, nip):
+        """(posisi kiri, posisi master) untuk setiap pasangan yang cocok"""
+        nip = pd.Index(nip)
+        if self.unik:
+            kanan = self.indeks.get_indexer(nip)
+            kiri = np.flatnonzero(kanan >= 0)
+            return kiri, kanan[kiri]
+        kanan, _ = self.indeks.get_indexer_non_unique(nip)
+        ulang = np.maximum(self.jumlah.reindex(nip).fillna(0).to_numpy(dtype=np.int64), 1)
+        kiri = np.repeat(np.arange(len(nip)), ulang)
+        ada = kanan >= 0
+        kiri, kanan = kiri[ada], kanan[ada]
+        # Dalam satu NIP kiri, kecocokan master diurutkan sesuai urutan master
+        urut = np.lexsort((kanan, kiri))
+        return kiri[urut], kanan[urut]
+
+    def susun(self, kiri_df, kanan_df):
+        """Gabungkan kolom kiri dan master dengan aturan nama kolom pd.merge"""
+        kiri_df = kiri_df.reset_index(drop=True)
+        kanan_df = kanan_df.reset_index(drop=True)
+        if self.kolom_kiri == self.kolom_kanan:
+            kanan_df = kanan_df.drop(columns=[self.kolom_kanan])
+        bentrok = set(kiri_df.columns) & set(kanan_df.columns)
+        if bentrok:
+            kiri_df = kiri_df.rename(columns={c: f"{c}{self.suffixes[0]}" for c in bentrok})
+            kanan_df = kanan_df.rename(columns={c: f"{c}{self.suffixes[1]}" for c in bentrok})
+        return pd.concat([kiri_df, kanan_df], axis=1)
+
+    def gabung(self, df):
+        """Inner join satu chunk -> (df_gabung, posisi kiri, posisi master)"""
+        kiri, kanan = self.posisi(df[self.kolom_kiri])
+        return self.susun(df.iloc[kiri], self.master.iloc[kanan]), kiri, kanan
+
+
+# ===== PASS 1: PROFIL =====
+def _pertama_terisi(df, saksi):
+    """Posisi kolom -> baris pertama yang terisi, untuk kolom yang belum punya saksi"""
+    hasil = {}
+    for j in range(df.shape[1]):
+        if j in saksi:
+            continue
+        terisi = np.flatnonzero(df.iloc[:, j].notna().to_numpy())
+        if len(terisi):
+            hasil[j] = int(terisi[0])
+    return hasil
+
+
+def _hash_kunci(df, kolom_nip, kolom_periode):
+    """Hash 64-bit per baris atas NIP (+ kolom periode sebagai angka)"""
+    kunci = pd.DataFrame({kolom_nip: df[kolom_nip].to_numpy(dtype=object)})
+    for col in kolom_periode:
+        kunci[col] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)
+    return pd.util.hash_pandas_object(kunci, index=False).to_numpy()
+
+
+def profil_mentah(sumber, indeks, siapkan, spesifikasi, kolom_periode=()):
+    """Pass ringan atas seluruh Data Mentah sebelum diproses.
+
+    siapkan(df) -> df : normalisasi chunk mentah (nama kolom, NIP) seperti batch;
+                        urutan dan jumlah kolom tidak boleh berubah
+    kolom_periode     : kolom (mis. bln, thn) yang ikut menentukan duplikat;
+                        kosong -> NIP sama di mana pun dianggap duplikat
+    Return dict: jumlah_baris, contoh (MAKS_CONTOH baris awal), nip_unik,
+    jumlah_duplikat, duplikat_contoh (array bool: baris contoh yang duplikat),
+    jumlah_baru, baris_baru (maks MAKS_CONTOH), master_cocok, jumlah_cocok,
+    saksi (1 baris hasil join atau None), dtype_akhir, paksa_teks, rencana,
+    laporan_kolom. Profil bisa disimpan di sesi dan dipakai ulang untuk
+    SumberExcel baru dari file yang sama.
+    """
+    hash_nip = []
+    hash_duplikat = []
+    contoh = []
+    baris_baru = []
+    jumlah_baru = 0
+    jumlah_cocok = 0
+    master_terpakai = np.zeros(len(indeks.master), dtype=bool)
+    jenis = {c: set() for c in sumber.kolom}
+    ada_kosong = {c: False for c in sumber.kolom}
+    saksi_kiri = {}     # posisi kolom mentah -> nilai sel (belum diparse)
+    saksi_kanan = {}    # posisi kolom master -> posisi baris master
+    paksa_teks = set()
+    jumlah_baris = 0
+
+    for df, baris in sumber.chunk():
+        jumlah_baris += len(df)
+        for col in sumber.kolom:
+            kosong = df[col].isna()
+            if kosong.any():
+                ada_kosong[col] = True
+            if not kosong.all():
+                jenis[col].add(str(df[col].dtype))
+
+        df = siapkan(df)
+        nip = df[indeks.kolom_kiri]
+        hash_nip.append(pd.util.hash_array(nip.to_numpy(dtype=object)))
+        if kolom_periode:
+            hash_duplikat.append(_hash_kunci(df, indeks.kolom_kiri, kolom_periode))
+        if sum(len(c) for c in contoh) < MAKS_CONTOH:
+            contoh.append(df.head(MAKS_CONTOH - sum(len(c) for c in contoh)))
+
+        df_gabung, kiri, kanan = indeks.gabung(df)
+        baru = ~nip.isin(indeks.indeks)
+        jumlah_baru += int(baru.sum())
+        if baru.any() and sum(len(b) for b in baris_baru) < MAKS_CONTOH:
+            baris_baru.append(df[baru].head(MAKS_CONTOH - sum(len(b) for b in baris_baru)))
+        jumlah_cocok += len(df_gabung)
+        master_terpakai[kanan] = True
+
+        if len(df_gabung):
+            # Kolom mentah dicatat per posisi (siapkan() boleh mengganti nama kolom)
+            for j, pos in _pertama_terisi(df.iloc[kiri], saksi_kiri).items():
+                saksi_kiri[j] = baris[kiri[pos]][j]
+            for j, pos in _pertama_terisi(indeks.master.iloc[kanan], saksi_kanan).items():
+                saksi_kanan[j] = int(kanan[pos])
+            # Kolom yang transformasinya gagal di chunk ini -> teks di seluruh file
+            rencana_chunk, _ = kompilasi(spesifikasi, df_gabung)
+            jalankan(rencana_chunk, df_gabung, gagal=paksa_teks)
+
+    sumber.dtype_akhir = {c: _dtype_akhir(jenis[c], ada_kosong[c]) for c in sumber.kolom
+                          if c not in sumber.dtype_kolom}
+
+    semua_hash = np.concatenate(hash_nip) if hash_nip else np.array([], dtype=np.uint64)
+    unik = np.unique(semua_hash)
+    if kolom_periode:
+        semua_hash = np.concatenate(hash_duplikat) if hash_duplikat else np.array([], dtype=np.uint64)
+    kunci_unik, hitung = np.unique(semua_hash, return_counts=True)
+    hash_ganda = kunci_unik[hitung > 1]
+    df_contoh = pd.concat(contoh) if contoh else pd.DataFrame(columns=sumber.kolom)
+    if indeks.kolom_kiri in df_contoh.columns and len(df_contoh):
+        hash_contoh = (_hash_kunci(df_contoh, indeks.kolom_kiri, kolom_periode) if kolom_periode
+                       else pd.util.hash_array(df_contoh[indeks.kolom_kiri].to_numpy(dtype=object)))
+        ganda_contoh = np.isin(hash_contoh, hash_ganda)
+    else:
+        ganda_contoh = np.zeros(len(df_contoh), dtype=bool)
+
+    saksi = _baris_saksi(sumber, indeks, siapkan, saksi_kiri, saksi_kanan) if jumlah_cocok else None
+    rencana, laporan_kolom = kompilasi(spesifikasi, saksi if saksi is not None else
+                                       indeks.susun(siapkan(sumber.parse([])), indeks.master.iloc[[]]))
+    return {
+        'jumlah_baris': jumlah_baris,
+        'contoh': df_contoh,
+        'nip_unik': len(unik),
+        'jumlah_duplikat': int(np.isin(semua_hash, hash_ganda).sum()),
+        'duplikat_contoh': ganda_contoh,
+        'jumlah_baru': jumlah_baru,
+        'baris_baru': pd.concat(baris_baru) if baris_baru else df_contoh.iloc[0:0],
+        'master_cocok': int(master_terpakai.sum()),
+        'jumlah_cocok': jumlah_cocok,
+        'saksi': saksi,
+        'dtype_akhir': dict(sumber.dtype_akhir),
+        'paksa_teks': paksa_teks,
+        'rencana': rencana,
+        'laporan_kolom': laporan_kolom,
+    }
+
+
+def _baris_saksi(sumber, indeks, siapkan, saksi_kiri, saksi_kanan):
+    """Satu baris hasil join berisi nilai pertama yang terisi di setiap kolom"""
+    kiri_df = siapkan(sumber.parse([[saksi_kiri.get(j, "") for j in range(len(sumber.kolom))]]))
+    master = indeks.master
+    kanan_df = master.iloc[[0]].reset_index(drop=True)
+    for j in range(master.shape[1]):
+        kanan_df.iloc[0, j] = master.iloc[saksi_kanan[j], j] if j in saksi_kanan else None
+    return indeks.susun(kiri_df, kanan_df)
+
+
+# ===== PASS 2: PROSES =====
+def proses_bp21(sumber, indeks, siapkan, profil, amati=None):
+    """Bangun BP21 per chunk dan tampung di disk.
+
+    amati(df_hasil, df_gabung) dipanggil per chunk (statistik halaman).
+    Return TampunganChunk berisi hasil seluruh file.
+    """
+    sumber.dtype_akhir = profil['dtype_akhir']
+    tampungan = TampunganChunk()
+    saksi = profil['saksi']
+    for df, _ in sumber.chunk():
+        df_gabung, _, _ = indeks.gabung(siapkan(df))
+        if not len(df_gabung):
+            continue
+        # Baris saksi di depan chunk, dibuang lagi setelah kolom dibangun
+        hasil = jalankan(profil['rencana'], pd.concat([saksi, df_gabung], ignore_index=True),
+                         paksa_teks=profil['paksa_teks']).iloc[1:].reset_index(drop=True)
+        if amati is not None:
+            amati(hasil, df_gabung)
+        tampungan.simpan(hasil)
+    if not tampungan.jumlah:
+        kosong = indeks.susun(siapkan(sumber.parse([])), indeks.master.iloc[[]])
+        tampungan.simpan(jalankan(profil['rencana'], kosong, paksa_teks=profil['paksa_teks']))
+    return tampungan
+
+
+class TampunganChunk:
+    """Hasil per chunk di direktori temp; dtype kolom disatukan saat dibaca ulang"""
+
+    def __init__(self):
+        self._dir = tempfile.TemporaryDirectory(prefix="fusiontax_aliran_")
+        self.file = []
+        self.kolom = None
+        self.jenis = {}
+        self.ada_kosong = {}
+        self.jumlah = 0
+
+    def simpan(self, df):
+        if self.kolom is None:
+            self.kolom = list(df.columns)
+            self.jenis = {c: set() for c in self.kolom}
+            self.ada_kosong = {c: False for c in self.kolom}
+        for col in self.kolom:
+            kosong = df[col].isna()
+            if kosong.any():
+                self.ada_kosong[col] = True
+            if not kosong.all():
+                self.jenis[col].add(str(df[col].dtype))
+        path = os.path.join(self._dir.name, f"{len(self.file):06d}.pkl")
+        df.to_pickle(path)
+        self.file.append(path)
+        self.jumlah += len(df)
+
+    def dtype_akhir(self):
+        return {c: _dtype_akhir(self.jenis[c], self.ada_kosong[c]) for c in self.kolom}
+
+    def chunk(self):
+        """Generator DataFrame per chunk dengan dtype kolom seluruh hasil"""
+        dtype = self.dtype_akhir()
+        for path in self.file:
+            yield _samakan_dtype(pd.read_pickle(path), dtype)
+
+    def head(self, n=10):
+        hasil = []
+        for df in self.chunk():
+            hasil.append(df.head(n - sum(len(h) for h in hasil)))
+            if sum(len(h) for h in hasil) >= n:
+                break
+        return pd.concat(hasil, ignore_index=True) if hasil else pd.DataFrame(columns=self.kolom)
+
+    def tutup(self):
+        self._dir.cleanup()
+
+
+# ===== PASS 3: TULIS XLSX =====
+def tulis_xlsx(tampungan, judul, gaya_header, gaya_sel):
+    """Tulis hasil ke XLSX dengan workbook write-only -> bytes.
+
+    gaya_header(kolom) -> (font, fill); gaya_sel(kolom, nilai) -> fill atau None.
+    Lebar kolom = min(panjang teks terpanjang + 2, LEBAR_MAKS) seperti export batch.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    kolom = tampungan.kolom
+    panjang = [len(str(c)) for c in kolom]
+    for df in tampungan.chunk():
+        for j, nilai in enumerate(df.values.T):
+            if len(nilai):
+                panjang[j] = max(panjang[j], max(len(str(v)) for v in nilai))
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(judul)
+    for j, p in enumerate(panjang, 1):
+        ws.column_dimensions[get_column_letter(j)].width = min(p + 2, LEBAR_MAKS)
+
+    header = []
+    for nama in kolom:
+        cell = WriteOnlyCell(ws, value=nama)
+        font, fill = gaya_header(nama)
+        if font is not None:
+            cell.font = font
+        if fill is not None:
+            cell.fill = fill
+        header.append(cell)
+    ws.append(header)
+
+    for df in tampungan.chunk():
+        for baris in df.values:
+            isi = []
+            for nama, nilai in zip(kolom, baris):
+                cell = WriteOnlyCell(ws, value=nilai)
+                fill = gaya_sel(nama, nilai)
+                if fill is not None:
+                    cell.fill = fill
+                isi.append(cell)
+            ws.append(isi)
+
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
@@ -0,0 +1,246 @@
+# alur_tahap.py
+"""Alur proses sebagai DAG tahap bernama dengan hasil dikunci isi masukan.
+
+Halaman croscheck dan upload dulu menjalankan urutan tetap (baca, rapikan
+kolom, cek duplikat, cocokkan, gabung master, ekspor) dari awal setiap kali
+satu file atau opsi berubah. Sekarang setiap langkah didaftarkan sebagai
+tahap dengan nama, daftar masukan, versi, dan opsi:
+
+  - kunci sumber = hash isi file (atau isi DataFrame), kunci tahap = hash
+    (nama alur, nama tahap, versi, opsi, kunci semua masukannya)
+  - hasil tahap disimpan per kunci (memori proses, LRU dibatasi jumlah dan
+    ukuran MB; DataFrame juga ke cache kolumnar di disk), jadi masukan yang
+    berubah hanya membatalkan tahap di hilirnya
+  - tahap dievaluasi malas: jika hasil tahap hilir sudah ada, tahap hulunya
+    tidak dijalankan sama sekali
+  - hasil gagal (simpan_jika -> False) tidak disimpan, jadi run berikutnya
+    mencoba lagi
+  - fungsi tahap tidak menulis ke layar: pesan untuk pengguna dikembalikan
+    sebagai bagian hasil dan ditampilkan pemanggil, jadi tetap muncul saat
+    hasilnya dipakai ulang
+
+Contoh: di croscheck hanya file BPMP yang diupload ulang -> tahap yang
+bergantung pada Data Mentah saja (rapikan, duplikat, siapkan baris) dan
+tahap Master Existing dipakai ulang; hanya pencocokan BPMP dan tahap
+sesudahnya yang dihitung.
+
+Naikkan versi tahap jika logikanya berubah. Hasil yang diberikan ke
+pemanggil adalah salinan (dangkal jika copy-on-write aktif), jadi pemanggil
+boleh mengubahnya tanpa merusak hasil yang tersimpan.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from cache_kolumnar import buat_kunci, hash_isi, muat, simpan
+from master_bersama import cow_aktif
+
+# ===== KONFIGURASI =====
+MAKS_HASIL = 64          # hasil tahap yang ditahan di memori proses (LRU)
+ENV_BATAS_MB = "FUSIONTAX_BATAS_ALUR_MB"   # total ukuran hasil di memori proses
+BATAS_MB_DEFAULT = 256
+
+# kunci tahap -> hasil (dibagi ke semua sesi, tidak pernah diubah)
+_HASIL = OrderedDict()
+# kunci tahap -> ukuran hasil (MB)
+_UKURAN = {}
+_LOCK = threading.Lock()
+
+
+def batas_mb():
+    """Batas total hasil tahap di memori proses (MB) dari environment atau default"""
+    try:
+        return float(os.environ.get(ENV_BATAS_MB, BATAS_MB_DEFAULT))
+    except ValueError:
+        return float(BATAS_MB_DEFAULT)
+
+
+def ukuran_mb(nilai):
+    """Perkiraan ukuran hasil (DataFrame, bytes, dan isi tuple/list/dict) dalam MB"""
+    if isinstance(nilai, pd.DataFrame):
+        return nilai.memory_usage(deep=True).sum() / (1024 * 1024)
+    if isinstance(nilai, bytes):
+        return len(nilai) / (1024 * 1024)
+    if isinstance(nilai, (tuple, list)):
+        return sum(ukuran_mb(v) for v in nilai)
+    if isinstance(nilai, dict):
+        return sum(ukuran_mb(v) for v in nilai.values())
+    return 0.0
+
+
+def identitas(nilai):
+    """Kunci isi sebuah nilai sumber: DataFrame, bytes/file upload, atau None"""
+    if nilai is None:
+        return 'kosong'
+    if isinstance(nilai, pd.DataFrame):
+        h = hashlib.sha256()
+        h.update(repr([(str(c), str(t)) for c, t in nilai.dtypes.items()]).encode('utf-8'))
+        try:
+            h.update(pd.util.hash_pandas_object(nilai, index=True).values.tobytes())
+        except TypeError:
+            # Sel yang tidak bisa di-hash (mis. list): pakai representasi CSV
+            h.update(nilai.to_csv().encode('utf-8'))
+        return h.hexdigest()
+    if isinstance(nilai, bytes):
+        return hash_isi(nilai)
+    if hasattr(nilai, 'getvalue'):
+        return hash_isi(nilai.getvalue())
+    return buat_kunci(repr(nilai))
+
+
+def _salin(nilai):
+    """Salinan hasil untuk pemanggil (DataFrame di dalam tuple/list/dict ikut disalin)"""
+    if isinstance(nilai, pd.DataFrame):
+        salinan = nilai.copy(deep=not cow_aktif())
+        salinan.attrs = dict(nilai.attrs)
+        return salinan
+    if isinstance(nilai, tuple):
+        return tuple(_salin(v) for v in nilai)
+    if isinstance(nilai, list):
+        return [_salin(v) for v in nilai]
+    if isinstance(nilai, dict):
+        return {k: _salin(v) for k, v in nilai.items()}
+    return nilai
+
+
+def _ambil(kunci, disk):
+    """(hasil, status) dari memori atau disk, atau (None, None) jika belum ada"""
+    with _LOCK:
+        if kunci in _HASIL:
+            _HASIL.move_to_end(kunci)
+            return _HASIL[kunci], 'DIPAKAI ULANG'
+    if disk:
+        df, _ = muat(kunci)
+        if df is not None:
+            _simpan_memori(kunci, df)
+            return df, 'DARI DISK'
+    return None, None
+
+
+def _simpan_memori(kunci, nilai):
+    """Simpan hasil di LRU; yang terlama dibuang sampai jumlah dan ukuran di bawah batas"""
+    ukuran = ukuran_mb(nilai)
+    batas = batas_mb()
+    with _LOCK:
+        if ukuran > batas:
+            # Lebih besar dari seluruh batas: tidak ditahan di memori (disk tetap dipakai)
+            _HASIL.pop(kunci, None)
+            _UKURAN.pop(kunci, None)
+            return
+        _HASIL[kunci] = nilai
+        _UKURAN[kunci] = ukuran
+        _HASIL.move_to_end(kunci)
+        while len(_HASIL) > MAKS_HASIL or sum(_UKURAN.values()) > batas:
+            lama, _ = _HASIL.popitem(last=False)
+            _UKURAN.pop(lama, None)
+
+
+class Alur:
+    """DAG tahap bernama. Sumber adalah nama masukan yang bukan tahap."""
+
+    def __init__(self, nama):
+        self.nama = nama
+        self._tahap = {}
+
+    def tambah(self, nama, fungsi, masukan=(), versi=1, opsi=None, disk=False, simpan_jika=None):
+        """Daftarkan tahap: hasil = fungsi(*nilai masukan, **opsi).
+
+        disk=True: hasil DataFrame juga disimpan di cache kolumnar sehingga
+        tetap terpakai setelah restart.
+        simpan_jika(hasil) -> bool: False = hasil gagal, dipakai run ini saja
+        dan tidak disimpan (None = semua hasil disimpan).
+        """
+        self._tahap[nama] = {
+            'fungsi': fungsi,
+            'masukan': tuple(masukan),
+            'versi': versi,
+            'opsi': dict(opsi or {}),
+            'disk': disk,
+            'simpan_jika': simpan_jika,
+        }
+        return self
+
+    def kunci(self, sumber, identitas_sumber=None):
+        """Kunci semua sumber dan tahap (tanpa menjalankan tahap apa pun)"""
+        identitas_sumber = identitas_sumber or {}
+        hasil = {}
+
+        def kunci_dari(nama):
+            if nama in hasil:
+                return hasil[nama]
+            tahap = self._tahap.get(nama)
+            if tahap is None:
+                k = identitas_sumber[nama] if nama in identitas_sumber else identitas(sumber.get(nama))
+            else:
+                k = buat_kunci(
+                    'alur_tahap', self.nama, nama, tahap['versi'],
+                    sorted(tahap['opsi'].items()),
+                    [kunci_dari(m) for m in tahap['masukan']],
+                )
+            hasil[nama] = k
+            return k
+
+        for nama in self._tahap:
+            kunci_dari(nama)
+        return hasil
+
+    def jalankan(self, sumber, target, identitas_sumber=None):
+        """Evaluasi tahap target beserta hulunya yang belum punya hasil.
+
+        sumber           : dict nama sumber -> nilai (None boleh untuk file opsional)
+        target           : daftar nama tahap/sumber yang diminta
+        identitas_sumber : dict nama sumber -> kunci yang sudah diketahui
+                           (mis. hash isi file upload), agar tidak di-hash ulang
+        Return (dict nama -> hasil, laporan list dict Tahap/Status/Waktu (ms)).
+        """
+        kunci = self.kunci(sumber, identitas_sumber)
+        hasil = {}
+        laporan = []
+
+        def nilai(nama):
+            if nama in hasil:
+                return hasil[nama]
+            tahap = self._tahap.get(nama)
+            if tahap is None:
+                hasil[nama] = sumber.get(nama)
+                return hasil[nama]
+
+            mulai = time.perf_counter()
+            tersimpan, status = _ambil(kunci[nama], tahap['disk'])
+            if status is None:
+                masukan = [nilai(m) for m in tahap['masukan']]
+                mulai = time.perf_counter()
+                tersimpan = tahap['fungsi'](*masukan, **tahap['opsi'])
+                status = 'DIHITUNG'
+                if tahap['simpan_jika'] is None or tahap['simpan_jika'](tersimpan):
+                    _simpan_memori(kunci[nama], tersimpan)
+                    if tahap['disk'] and isinstance(tersimpan, pd.DataFrame):
+                        simpan(kunci[nama], tersimpan, {'alur': self.nama, 'tahap': nama})
+            laporan.append({
+                'Tahap': nama,
+                'Status': status,
+                'Waktu (ms)': round((time.perf_counter() - mulai) * 1000, 1),
+                'Kunci': kunci[nama][:12],
+            })
+            hasil[nama] = _salin(tersimpan)
+            return hasil[nama]
+
+        for nama in target:
+            nilai(nama)
+        return {nama: hasil[nama] for nama in target}, laporan
+
+
+def ringkas_laporan(laporan):
+    """Teks singkat laporan tahap: berapa dihitung dan mana yang dipakai ulang"""
+    dihitung = [b['Tahap'] for b in laporan if b['Status'] == 'DIHITUNG']
+    ulang = [b['Tahap'] for b in laporan if b['Status'] != 'DIHITUNG']
+    teks = f"{len(dihitung)} tahap dihitung"
+    if dihitung:
+        teks += f" ({', '.join(dihitung)})"
+    if ulang:
+        teks += f", {len(ulang)} dipakai ulang ({', '.join(ulang)})"
+    return teks
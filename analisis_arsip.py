@@ -0,0 +1,159 @@
+import streamlit as st
+import time
+import kueri_arsip
+from kueri_arsip import OPERATOR, kolom, kueri, perubahan_master, total_per_kuartal
+from arsip_bulanan import JENIS_ARSIP
+
+NAMA_JENIS = {
+    'gaji_pns': 'BPMP Gaji PNS',
+    'gaji_pppk': 'BPMP Gaji PPPK',
+    'makan_pns': 'BP21 Makan PNS',
+    'makan_pppk': 'BP21 Makan PPPK',
+    'lembur_pns': 'BP21 Lembur PNS',
+    'master_pns': 'Data Master PNS',
+    'master_pppk': 'Data Master PPPK',
+    'validasi_pns': 'Validasi Croscheck PNS',
+    'validasi_pppk': 'Validasi Croscheck PPPK',
+}
+JUMLAH_FILTER = 3
+MAKS_TAMPIL = 1000
+
+
+def show():
+    # Tombol kembali ke dashboard asal
+    asal = st.session_state.get('asal_analisis_arsip', 'dashboard_pns')
+    if st.button("← Kembali ke Dashboard " + ("PPPK" if asal == 'dashboard_pppk' else "PNS")):
+        st.session_state.current_page = asal
+        st.session_state.selected_menu = None
+        st.rerun()
+
+    st.title("🔎 Analisis Arsip")
+    st.markdown("---")
+
+    if not kueri_arsip.tersedia():
+        st.error("❌ pyarrow tidak terpasang - analisis arsip tidak tersedia")
+        return
+
+    st.info("""
+    **ℹ️ SUMBER DATA:**
+    - Semua hasil yang pernah diproses (BPMP gaji, BP21 makan/lembur, versi Data Master,
+      hasil validasi croscheck) tersimpan sebagai Parquet per **jenis / tahun / bulan**
+    - Filter pada `tahun` / `bulan` hanya membuka partisi yang relevan; filter kolom lain
+      dan pilihan kolom dibaca langsung dari Parquet tanpa membuka file Excel
+    """)
+
+    def tampilkan_hasil(df, durasi, nama_file):
+        """Jumlah baris, waktu kueri, tabel (dibatasi), dan download CSV"""
+        st.caption(f"⏱️ {len(df):,} baris dalam {durasi * 1000:.0f} ms")
+        if len(df) > MAKS_TAMPIL:
+            st.caption(f"Menampilkan {MAKS_TAMPIL:,} baris pertama - download CSV untuk data lengkap")
+        st.dataframe(df.head(MAKS_TAMPIL), hide_index=True, use_container_width=True)
+        st.download_button(
+            label="📥 Download CSV",
+            data=df.to_csv(index=False).encode('utf-8'),
+            file_name=nama_file,
+            mime="text/csv",
+            key=f"unduh_{nama_file}"
+        )
+
+    jenis_ada = [j for j in JENIS_ARSIP if kolom(j)]
+    if not jenis_ada:
+        st.warning("⚠️ Arsip masih kosong. Proses data gaji/makan/lembur atau croscheck terlebih dahulu.")
+        return
+
+    tab1, tab2 = st.tabs(["🧮 Kueri Bebas", "❓ Pertanyaan Siap Pakai"])
+
+    # ===== TAB 1: KUERI BEBAS =====
+    with tab1:
+        jenis = st.selectbox("Jenis data", jenis_ada, format_func=lambda j: NAMA_JENIS[j], key="jenis_kueri_arsip")
+        semua_kolom = kolom(jenis)
+        dipilih = st.multiselect("Kolom (kosong = semua)", semua_kolom, key=f"kolom_kueri_arsip_{jenis}")
+
+        st.markdown("**Filter** (digabung dengan AND; untuk `in` pisahkan nilai dengan koma)")
+        filter = []
+        for i in range(JUMLAH_FILTER):
+            col1, col2, col3 = st.columns([2, 1, 2])
+            with col1:
+                nama = st.selectbox("Kolom", [''] + semua_kolom, key=f"filter_kolom_{jenis}_{i}",
+                                    label_visibility="collapsed")
+            with col2:
+                op = st.selectbox("Operator", OPERATOR, key=f"filter_op_{jenis}_{i}", label_visibility="collapsed")
+            with col3:
+                nilai = st.text_input("Nilai", key=f"filter_nilai_{jenis}_{i}", label_visibility="collapsed")
+            if nama and nilai.strip():
+                if op in ('in', 'not in'):
+                    filter.append((nama, op, [v.strip() for v in nilai.split(',') if v.strip()]))
+                else:
+                    filter.append((nama, op, nilai.strip()))
+
+        if st.button("▶️ Jalankan Kueri", type="primary", key="jalankan_kueri_arsip"):
+            try:
+                mulai = time.perf_counter()
+                df = kueri(jenis, dipilih or None, filter)
+                tampilkan_hasil(df, time.perf_counter() - mulai, f"kueri_{jenis}.csv")
+            except (ValueError, TypeError) as e:
+                st.error(f"❌ Filter tidak valid: {str(e)}")
+
+    # ===== TAB 2: PERTANYAAN SIAP PAKAI =====
+    with tab2:
+        st.subheader("🔁 Perubahan Data Master")
+        jenis_master = [j for j in jenis_ada if j.startswith('master_')]
+        if not jenis_master:
+            st.caption("Belum ada versi Data Master di arsip (tersimpan saat proses BPMP gaji).")
+        else:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                jm = st.selectbox("Master", jenis_master, format_func=lambda j: NAMA_JENIS[j], key="jenis_perubahan")
+            kolom_master = [c for c in kolom(jm) if c not in ('tahun', 'bulan')]
+            with col2:
+                kolom_ubah = st.selectbox("Kolom", kolom_master, key="kolom_perubahan",
+                                          index=kolom_master.index('KDKAWIN') if 'KDKAWIN' in kolom_master else 0)
+            with col3:
+                jumlah_bulan = st.selectbox("Rentang (bulan terakhir)", [3, 6, 12, 24], index=1, key="rentang_perubahan")
+            if st.button("▶️ Cari Perubahan", key="cari_perubahan"):
+                mulai = time.perf_counter()
+                df = perubahan_master(jm, kolom_ubah, jumlah_bulan)
+                tampilkan_hasil(df, time.perf_counter() - mulai, f"perubahan_{kolom_ubah}_{jm}.csv")
+
+        st.markdown("---")
+        st.subheader("📊 Total per Kuartal")
+        jenis_nilai = [j for j in jenis_ada if j.split('_')[0] in ('gaji', 'makan', 'lembur')]
+        if not jenis_nilai:
+            st.caption("Belum ada hasil BPMP/BP21 di arsip.")
+        else:
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                jn = st.selectbox("Jenis", jenis_nilai, format_func=lambda j: NAMA_JENIS[j], key="jenis_kuartal")
+            kolom_jn = [c for c in kolom(jn) if c not in ('tahun', 'bulan')]
+            bawaan_nilai = 'pph' if 'pph' in kolom_jn else 'pajak'
+            with col2:
+                kolom_nilai = st.selectbox("Nilai", kolom_jn, key=f"nilai_kuartal_{jn}",
+                                           index=kolom_jn.index(bawaan_nilai) if bawaan_nilai in kolom_jn else 0)
+            with col3:
+                pilihan_kelompok = ['kdsatker'] + [c for c in kolom_jn if c != 'kdsatker']
+                kolom_kelompok = st.selectbox("Kelompok", pilihan_kelompok, key=f"kelompok_kuartal_{jn}")
+            with col4:
+                tahun = st.text_input("Tahun (kosong = semua)", key="tahun_kuartal")
+            if st.button("▶️ Hitung Total", key="hitung_kuartal"):
+                try:
+                    mulai = time.perf_counter()
+                    df = total_per_kuartal(jn, kolom_nilai, kolom_kelompok,
+                                           int(tahun) if tahun.strip() else None)
+                    tampilkan_hasil(df, time.perf_counter() - mulai, f"kuartal_{kolom_nilai}_{jn}.csv")
+                except ValueError as e:
+                    st.error(f"❌ {str(e)}")
+
+    st.markdown("---")
+    with st.expander("🐍 Pemakaian dari Python"):
+        st.code("""
+from kueri_arsip import kueri, perubahan_master, total_per_kuartal
+
+# Proyeksi + filter (partisi tahun/bulan dipangkas, filter lain didorong ke Parquet)
+df = kueri('makan_pns', ['nip', 'pajak', 'bulan'], [('tahun', '=', 2025), ('bulan', '>=', 7)])
+
+# Pegawai yang KDKAWIN-nya berubah dalam 6 bulan terakhir
+perubahan_master('master_pns', 'KDKAWIN', 6)
+
+# Total pajak makan per satker per kuartal
+total_per_kuartal('makan_pns', 'pajak', 'kdsatker', 2025)
+""", language="python")
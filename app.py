@@ -1,5 +1,12 @@
 import streamlit as st
 import sys
+from tipe_ringkas import aktifkan_copy_on_write
+from pengelola_sesi import kelola as kelola_memori_sesi
+
+# Copy-on-Write pandas untuk SELURUH aplikasi (semua halaman): frame di
+# session_state dibagi tanpa salinan defensif. Chained assignment
+# (df[a][m] = x) tidak lagi mengubah df asal.
+aktifkan_copy_on_write()
 
 # Konfigurasi halaman
 st.set_page_config(
@@ -35,6 +42,18 @@ if 'current_page' not in st.session_state:
 if 'selected_menu' not in st.session_state:
     st.session_state.selected_menu = None
 
+# Pengelola memori sesi: muat frame halaman aktif, spill frame lain jika melebihi batas
+def id_sesi():
+    """session_id dari Streamlit, None jika tidak tersedia"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+    except ImportError:
+        return None
+    return ctx.session_id if ctx is not None else None
+
+kelola_memori_sesi(st.session_state, st.session_state.current_page, session_id=id_sesi())
+
 # Fungsi navigasi
 def navigate_to(page, menu=None):
     st.session_state.current_page = page
@@ -169,6 +188,27 @@ elif st.session_state.current_page == 'upload_pajak_lembur_pns':
             st.session_state.current_page = 'beranda'
             st.rerun()
 
+# ROUTING ke rekap tahunan (PNS dan PPPK)
+elif st.session_state.current_page == 'rekap_1721a1':
+    try:
+        import rekap_1721a1
+        rekap_1721a1.show()
+    except Exception as e:
+        st.error(f"Error loading annual recap: {e}")
+        if st.button("← Kembali ke Beranda Utama"):
+            st.session_state.current_page = 'beranda'
+            st.rerun()
+
+elif st.session_state.current_page == 'analisis_arsip':
+    try:
+        import analisis_arsip
+        analisis_arsip.show()
+    except Exception as e:
+        st.error(f"Error loading archive analysis: {e}")
+        if st.button("← Kembali ke Beranda Utama"):
+            st.session_state.current_page = 'beranda'
+            st.rerun()
+
 # Fallback jika halaman tidak ditemukan
 else:
     st.error("Halaman tidak ditemukan!")
@@ -0,0 +1,224 @@
+# arsip_bulanan.py
+"""Arsip hasil proses per jenis penghasilan dan per bulan (partisi Parquet).
+
+Setiap hasil bulanan (BPMP gaji, BP21 makan, BP21 lembur, hasil validasi
+croscheck, dan versi Data Master yang dipakai pada masa itu) disimpan di
+direktori data dengan tata letak partisi:
+
+    arsip/jenis=<jenis>/tahun=<thn>/bulan=<bln>/bagian.parquet
+
+Isi partisi = kolom buku (nip, nilai uang yang sudah diparse, dst - dipakai
+rekap tahunan) diikuti kolom hasil persis seperti yang didownload. Meta
+partisi menyimpan hash isi (hash_input), daftar kolom buku/hasil, nama file
+sumber, waktu simpan, dan ringkasan total dari pemanggil. Upload ulang bulan
+yang sama menggantikan partisinya; hash yang sama berarti isinya tidak
+berubah sehingga tidak ditulis ulang.
+"""
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from cache_kolumnar import baca_frame, baca_meta, buat_kunci, tulis_frame
+from penyimpanan import direktori_data
+
+# ===== KONFIGURASI =====
+JENIS_ARSIP = ('gaji_pns', 'gaji_pppk', 'makan_pns', 'makan_pppk', 'lembur_pns',
+               'master_pns', 'master_pppk', 'validasi_pns', 'validasi_pppk')
+VERSI_ARSIP = 2                   # naikkan jika isi partisi berubah
+NAMA_BAGIAN = 'bagian.parquet'
+
+
+# ===== PERIODE DAN HASH ISI =====
+def _angka_bulat(series):
+    """Series -> Int64; bukan bilangan bulat = <NA>"""
+    angka = pd.to_numeric(series.astype(str).str.strip(), errors='coerce')
+    return angka.where(angka % 1 == 0).astype('Int64')
+
+
+def pecah_periode(df, kolom_bln='bln', kolom_thn='thn'):
+    """Posisi baris per periode -> ({(tahun, bulan): array posisi}, posisi tanpa periode)
+
+    Bulan/tahun dibandingkan sebagai angka ('01' sama dengan 1). Baris yang
+    bulannya bukan 1-12 atau tahunnya tidak terbaca tidak masuk arsip.
+    """
+    bulan = _angka_bulat(df[kolom_bln])
+    tahun = _angka_bulat(df[kolom_thn])
+    valid = (bulan.between(1, 12) & tahun.gt(0)).fillna(False).to_numpy(dtype=bool)
+
+    posisi = np.flatnonzero(valid)
+    kunci = pd.DataFrame({'tahun': tahun.to_numpy()[valid], 'bulan': bulan.to_numpy()[valid]})
+    kelompok = {
+        (int(t), int(b)): posisi[idx]
+        for (t, b), idx in kunci.groupby(['tahun', 'bulan'], sort=True).indices.items()
+    }
+    return kelompok, np.flatnonzero(~valid)
+
+
+class HashInput:
+    """hash_input() yang diisi bertahap per chunk.
+
+    Hasil sama dengan hash_input() atas gabungan semua chunk (urutan sama),
+    tanpa menyimpan chunk. Kolom dan dtype diambil dari chunk pertama.
+    """
+
+    def __init__(self, kolom, *parameter):
+        self._kolom_diminta = kolom
+        self._parameter = parameter
+        self._kolom = None
+        self._dtype = []
+        self._baris = hashlib.sha256()
+        self.jumlah = 0
+
+    def tambah(self, df):
+        if self._kolom is None:
+            self._kolom = sorted({c for c in self._kolom_diminta if c is not None and c in df.columns})
+            self._dtype = [str(df[c].dtype) for c in self._kolom]
+        if self._kolom and len(df):
+            self._baris.update(pd.util.hash_pandas_object(df[self._kolom], index=False).to_numpy().tobytes())
+        self.jumlah += len(df)
+        return self
+
+    def hexdigest(self):
+        h = hashlib.sha256()
+        h.update(buat_kunci('arsip_bulanan', VERSI_ARSIP, self.jumlah, self._kolom or [], self._dtype,
+                            self._parameter).encode('utf-8'))
+        h.update(self._baris.digest())
+        return h.hexdigest()
+
+
+def hash_input(df, kolom, *parameter):
+    """SHA-256 isi kolom (nilai, dtype, urutan baris) + parameter"""
+    return HashInput(kolom, *parameter).tambah(df).hexdigest()
+
+
+def _aman_arrow(df):
+    """Kolom object campuran (mis. Tarif berisi angka dan '') -> teks agar bisa ditulis Parquet"""
+    teks = []
+    for col in df.columns:
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) in ('mixed', 'mixed-integer'):
+            teks.append(col)
+    if teks:
+        df = df.copy()
+        for col in teks:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df, teks
+
+
+# ===== PENYIMPANAN PARTISI =====
+class ArsipBulanan:
+    """Partisi per (tahun, bulan) untuk satu jenis penghasilan"""
+
+    def __init__(self, jenis):
+        if jenis not in JENIS_ARSIP:
+            raise ValueError(f"jenis harus salah satu dari {JENIS_ARSIP}")
+        self.jenis = jenis
+
+    def _folder(self):
+        return os.path.join(direktori_data("arsip"), f"jenis={self.jenis}")
+
+    def _path(self, tahun, bulan):
+        return os.path.join(self._folder(), f"tahun={int(tahun)}", f"bulan={int(bulan)}", NAMA_BAGIAN)
+
+    def meta(self, tahun, bulan):
+        """Meta partisi (hash, baris, ringkasan, ...) atau None jika belum ada"""
+        return baca_meta(self._path(tahun, bulan))
+
+    def muat_buku(self, tahun, bulan, kolom=None):
+        """Partisi lengkap (kolom buku + hasil) atau hanya kolom tertentu, None jika tidak ada"""
+        df, _ = baca_frame(self._path(tahun, bulan), kolom)
+        return df
+
+    def muat(self, tahun, bulan):
+        """Kolom hasil saja (seperti file download), atau None"""
+        df, meta = baca_frame(self._path(tahun, bulan))
+        if df is None:
+            return None
+        df = df[meta.get('kolom_hasil', list(df.columns))]
+        # Kolom object (mis. teks default '') dibaca pandas 3 sebagai str: kembalikan seperti saat disimpan
+        objek = [c for c in meta.get('kolom_object', ()) if c in df.columns and df[c].dtype != object]
+        if objek:
+            df = df.astype({c: object for c in objek})
+        return df
+
+    def simpan(self, tahun, bulan, df_buku, hash_isi, kolom_buku=(), sumber='', ringkasan=None, tambahan=None):
+        """Tulis partisi satu bulan. Return True jika tersimpan.
+
+        tambahan: entri meta lain dari pemanggil (mis. kolom yang jatuh ke teks)
+        """
+        kolom_object = [c for c in df_buku.columns if df_buku[c].dtype == object]
+        df_buku, kolom_teks = _aman_arrow(df_buku)
+        meta = {
+            'hash': hash_isi,
+            'baris': len(df_buku),
+            'kolom_buku': list(kolom_buku),
+            'kolom_hasil': [c for c in df_buku.columns if c not in kolom_buku],
+            'sumber': sumber,
+            'diperbarui': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'ringkasan': ringkasan or {},
+            'kolom_teks': kolom_teks,
+            'kolom_object': kolom_object,
+            **(tambahan or {}),
+        }
+        path = self._path(tahun, bulan)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return tulis_frame(path, df_buku, meta)
+
+    def hapus(self, tahun, bulan):
+        """Hapus partisi satu bulan (jika ada)"""
+        path = self._path(tahun, bulan)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def periode(self, tahun=None):
+        """Daftar (tahun, bulan) yang tersimpan, terurut (opsional satu tahun saja)"""
+        hasil = []
+        folder = self._folder()
+        if not os.path.isdir(folder):
+            return hasil
+        for nama_tahun in os.listdir(folder):
+            if not nama_tahun.startswith('tahun='):
+                continue
+            if tahun is not None and nama_tahun != f"tahun={int(tahun)}":
+                continue
+            for nama_bulan in os.listdir(os.path.join(folder, nama_tahun)):
+                if not nama_bulan.startswith('bulan='):
+                    continue
+                if os.path.exists(os.path.join(folder, nama_tahun, nama_bulan, NAMA_BAGIAN)):
+                    hasil.append((int(nama_tahun[6:]), int(nama_bulan[6:])))
+        return sorted(hasil)
+
+
+def arsipkan(arsip, df_buku, kolom_buku, periode, sumber='', ringkas=None):
+    """Simpan frame buku+hasil per (tahun, bulan) ke arsip.
+
+    periode : dict {(tahun, bulan): array posisi baris} (lihat pecah_periode)
+    ringkas : fungsi df_bulan -> dict ringkasan untuk meta (opsional)
+    Return list dict per bulan: Tahun, Bulan, Baris, Status (BARU / DIPERBARUI
+    / TETAP / TIDAK DISIMPAN).
+    """
+    status = []
+    for (tahun, bulan), posisi in periode.items():
+        sub = df_buku.iloc[posisi].reset_index(drop=True)
+        hash_isi = hash_input(sub, sub.columns)
+        lama = arsip.meta(tahun, bulan)
+        if lama and lama.get('hash') == hash_isi:
+            keterangan = 'TETAP'
+        elif arsip.simpan(tahun, bulan, sub, hash_isi, kolom_buku, sumber, ringkas(sub) if ringkas else None):
+            keterangan = 'DIPERBARUI' if lama else 'BARU'
+        else:
+            keterangan = 'TIDAK DISIMPAN'
+        status.append({'Tahun': tahun, 'Bulan': bulan, 'Baris': len(sub), 'Status': keterangan})
+    return status
+
+
+def arsipkan_utuh(arsip, df, daftar_periode, sumber=''):
+    """Simpan df utuh sebagai partisi setiap (tahun, bulan) di daftar_periode.
+
+    Dipakai untuk Data Master: versi master yang dipakai memproses suatu masa
+    disimpan di masa itu, jadi perubahannya bisa dilacak antar bulan.
+    """
+    semua = np.arange(len(df))
+    return arsipkan(arsip, df, (), {(int(t), int(b)): semua for t, b in daftar_periode}, sumber)
@@ -0,0 +1,121 @@
+# baca_paralel.py
+"""Parse beberapa file upload secara bersamaan di process pool kecil.
+
+Halaman croscheck membaca tiga file yang saling independen (Data Mentah,
+Data BPMP, Master Existing). Masing-masing parse openpyxl terikat CPU, jadi
+dijalankan di proses terpisah: total waktu baca mendekati file paling lambat,
+bukan jumlah ketiganya.
+
+Worker dimulai dengan spawn, bukan fork: server Streamlit multi-thread dan
+fork dari proses multi-thread bisa deadlock. Karena itu setiap tugas berupa
+pasangan (fungsi level modul, argumen) yang bisa di-pickle. Setiap tugas
+mengembalikan hasilnya sendiri; error dan durasi dicatat per label agar
+pesan di UI selalu menunjuk file yang benar. Jika pool gagal dibuat, atau
+jika pool rusak karena worker mati, tugas yang belum punya hasil dijalankan
+sekuensial dengan hasil yang sama.
+"""
+import os
+import time
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+# ===== KONFIGURASI =====
+# Jumlah worker bisa diatur lewat environment, 0/1 = mode sekuensial
+ENV_WORKERS = "FUSIONTAX_PARSE_WORKERS"
+
+# Worker spawn perlu import pandas/openpyxl sendiri (~1 detik); di bawah
+# total ukuran file ini, parse sekuensial lebih cepat
+MIN_BYTE_PARALEL = 2 * 1024 * 1024
+
+
+def jumlah_worker(jumlah_tugas, workers=None):
+    """Jumlah worker: argumen > environment > jumlah CPU, maksimal jumlah tugas"""
+    if workers is None:
+        nilai_env = os.environ.get(ENV_WORKERS, "").strip()
+        if nilai_env:
+            try:
+                workers = int(nilai_env)
+            except ValueError:
+                workers = None
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(min(int(workers), jumlah_tugas), 1)
+
+
+def _jalankan_satu(fungsi, args=()):
+    """Jalankan satu tugas, tangkap error agar tidak menggagalkan tugas lain"""
+    mulai = time.perf_counter()
+    try:
+        hasil, error, jejak = fungsi(*args), None, None
+    except Exception as e:
+        hasil, error, jejak = None, str(e), traceback.format_exc()
+    return {
+        'hasil': hasil,
+        'error': error,
+        'traceback': jejak,
+        'durasi_ms': (time.perf_counter() - mulai) * 1000,
+        'pid': os.getpid(),
+    }
+
+
+def _konteks_pool():
+    """Context spawn: fork dari server Streamlit multi-thread bisa deadlock"""
+    return multiprocessing.get_context('spawn')
+
+
+def jalankan_paralel(tugas, workers=None, saat_selesai=None, total_byte=None):
+    """Jalankan tugas {label: (fungsi, args)} secara bersamaan.
+
+    fungsi harus fungsi level modul (bisa di-pickle) karena dikirim ke
+    worker spawn; args ikut di-pickle. Jika total_byte (ukuran seluruh
+    file) diberikan dan di bawah MIN_BYTE_PARALEL, tugas dijalankan
+    sekuensial.
+
+    saat_selesai(label, hasil) dipanggil di proses utama setiap kali satu
+    tugas selesai (urutan selesai), misalnya untuk memperbarui progress.
+    Return dict label -> {'hasil', 'error', 'traceback', 'durasi_ms', 'pid'}
+    dengan urutan sama seperti tugas.
+    """
+    tugas = {label: t for label, t in tugas.items() if t is not None}
+    hasil = {}
+
+    def catat(label, hasil_tugas):
+        hasil[label] = hasil_tugas
+        if saat_selesai is not None:
+            saat_selesai(label, hasil_tugas)
+
+    n_workers = jumlah_worker(len(tugas), workers)
+    if total_byte is not None and total_byte < MIN_BYTE_PARALEL:
+        n_workers = 1
+    if n_workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=n_workers, mp_context=_konteks_pool()) as pool:
+                futures = {
+                    pool.submit(_jalankan_satu, fungsi, args): label
+                    for label, (fungsi, args) in tugas.items()
+                }
+                for future in as_completed(futures):
+                    label = futures[future]
+                    try:
+                        hasil_tugas = future.result()
+                    except BrokenProcessPool:
+                        # Satu worker mati membatalkan semua tugas yang sedang jalan;
+                        # tugas ini diulang sekuensial agar error menunjuk file yang benar
+                        continue
+                    except Exception as e:
+                        hasil_tugas = {
+                            'hasil': None, 'error': f"Proses pembaca gagal: {e}",
+                            'traceback': traceback.format_exc(), 'durasi_ms': 0.0, 'pid': None,
+                        }
+                    catat(label, hasil_tugas)
+        except (OSError, RuntimeError):
+            # Pool tidak bisa dibuat (mis. lingkungan terbatas) - sisa tugas dijalankan sekuensial
+            pass
+
+    for label, (fungsi, args) in tugas.items():
+        if label not in hasil:
+            catat(label, _jalankan_satu(fungsi, args))
+
+    return {label: hasil[label] for label in tugas}
@@ -0,0 +1,305 @@
+# buku_makan.py
+"""Buku besar uang makan multi-bulan dengan penulisan inkremental per bulan.
+
+Halaman makan PNS/PPPK dulu memproses satu file bln/thn sekali jalan. Untuk
+rapel, bulan-bulan sebelumnya harus diupload dan diproses ulang semua.
+Sekarang hasil setiap bulan disimpan sebagai partisi arsip_bulanan
+(jenis makan_pns / makan_pppk):
+
+    arsip/jenis=<makan_pns|makan_pppk>/tahun=<thn>/bulan=<bln>/bagian.parquet
+
+Satu baris per baris BP21: nip, kotor (rupiah), jmlhari, pajak (kotor x
+Tarif / 100), lalu seluruh kolom BP21. Meta partisi menyimpan hash isi input bulan itu:
+kolom Data Mentah + Data Master yang dibaca spesifikasi BP21 (setelah
+digabung, urutan baris ikut dihitung), spesifikasinya sendiri, dan kolom
+yang jatuh ke teks asli di seluruh file ('teks'), ditambah kolom yang
+transformasinya gagal di bulan itu sendiri ('gagal').
+
+proses_bulanan() memecah file per (thn, bln) dan meng-hash setiap bulan
+dulu. Spesifikasi BP21 hanya dijalankan untuk bulan yang input-nya baru
+atau berubah (mis. rapel, master berubah); BP21 bulan lain dibaca dari
+partisinya. Hasilnya tetap sama dengan tanpa buku: sumber kolom
+('kosong_jika_semua_na') di-resolve dari seluruh file, kolom yang jatuh ke
+teks = gabungan 'gagal' semua bulan, dan dtype antar bulan disatukan
+seperti batch (mis. Int64 dan float64 -> float64).
+BP21 untuk rentang bulan dirakit langsung dari partisi tanpa upload ulang;
+dtype kolom antar bulan disatukan dulu (mis. Int64 dan float64 -> float64).
+Mode streaming mencatat bulan yang sama lewat CatatanBulanan: hash dan baris
+buku dikumpulkan per chunk, lalu tiap bulan ditulis (atau dinyatakan TETAP)
+setelah chunk terakhir.
+Tanpa pyarrow buku tidak bisa ditulis (status TIDAK DISIMPAN).
+"""
+import numpy as np
+import pandas as pd
+
+from aliran_chunk import TampunganChunk, gabung_seragam
+from arsip_bulanan import ArsipBulanan, HashInput, hash_input, pecah_periode
+from cache_kolumnar import buat_kunci
+from rupiah import SATUAN_SEN, parse_rupiah
+from spesifikasi_bp21 import jalankan, kompilasi
+
+# ===== KONFIGURASI =====
+JENIS_MAKAN = ('makan_pns', 'makan_pppk')
+KOLOM_BUKU = ['nip', 'kotor', 'jmlhari', 'pajak']
+
+
+def baris_buku(hasil, df, kolom_nip, kolom_kotor, kolom_jmlhari=None):
+    """Kolom buku (nip, kotor, jmlhari, pajak) + kolom BP21 untuk satu bulan"""
+    n = len(df)
+    if kolom_kotor in df.columns:
+        nilai, _, _ = parse_rupiah(df[kolom_kotor], SATUAN_SEN)
+        kotor = nilai.to_numpy(dtype=float, na_value=np.nan) / SATUAN_SEN
+    else:
+        kotor = np.full(n, np.nan)
+    if kolom_jmlhari is not None and kolom_jmlhari in df.columns:
+        jmlhari = pd.to_numeric(df[kolom_jmlhari], errors='coerce').to_numpy(dtype=float)
+    else:
+        jmlhari = np.full(n, np.nan)
+
+    buku = pd.DataFrame({
+        'nip': df[kolom_nip].astype(str).str.strip().to_numpy(),
+        'kotor': kotor,
+        'jmlhari': jmlhari,
+        'pajak': kotor * pd.to_numeric(hasil['Tarif'], errors='coerce').to_numpy(dtype=float) / 100,
+    })
+    return pd.concat([buku, hasil.reset_index(drop=True)], axis=1)
+
+
+def kolom_input(rencana, laporan, kolom_nip, kolom_kotor, kolom_jmlhari=None):
+    """Kolom yang ikut di hash input bulan: sumber spesifikasi + kolom buku"""
+    kolom = [item['sumber'] for item in laporan] + [kolom_nip, kolom_kotor, kolom_jmlhari]
+    for entri, _, cara in rencana:
+        if cara == 'rasio':
+            kolom += list(entri['rasio'][:2])
+    return kolom
+
+
+def hash_bulan(hash_isi, teks):
+    """Hash partisi: hash input bulan + kolom BP21 yang jatuh ke teks asli"""
+    return buat_kunci(hash_isi, sorted(teks))
+
+
+def ringkas_makan(df_buku):
+    """Total per bulan untuk meta partisi"""
+    return {
+        'nip_unik': int(df_buku['nip'].nunique()),
+        'total_kotor': float(df_buku['kotor'].sum()),
+        'total_jmlhari': float(df_buku['jmlhari'].sum()),
+        'total_pajak': float(df_buku['pajak'].sum()),
+    }
+
+
+# ===== BUKU PER JENIS =====
+class BukuMakan(ArsipBulanan):
+    """Arsip bulanan makan + ringkasan dan BP21 rentang bulan"""
+
+    def __init__(self, jenis):
+        if jenis not in JENIS_MAKAN:
+            raise ValueError(f"jenis harus salah satu dari {JENIS_MAKAN}")
+        super().__init__(jenis)
+
+    def simpan(self, tahun, bulan, df_buku, hash_partisi, sumber='', teks=(), gagal=None):
+        """Tulis partisi satu bulan. Return True jika tersimpan.
+
+        teks  : kolom BP21 yang jatuh ke teks asli di seluruh file
+        gagal : kolom yang transformasinya gagal di bulan ini saja (None jika
+                tidak diketahui, mis. mode streaming)
+        """
+        tambahan = {'teks': sorted(teks)}
+        if gagal is not None:
+            tambahan['gagal'] = sorted(gagal)
+        return super().simpan(tahun, bulan, df_buku, hash_partisi, KOLOM_BUKU, sumber,
+                              ringkas_makan(df_buku), tambahan)
+
+    def daftar(self):
+        """Ringkasan semua bulan tersimpan (dibaca dari meta, tanpa memuat data)"""
+        baris = []
+        for tahun, bulan in self.periode():
+            meta = self.meta(tahun, bulan)
+            if meta is None:
+                continue
+            ringkasan = meta.get('ringkasan', {})
+            baris.append({
+                'Tahun': tahun,
+                'Bulan': bulan,
+                'Baris': meta.get('baris', 0),
+                'NIP Unik': ringkasan.get('nip_unik', 0),
+                'Total Kotor': ringkasan.get('total_kotor', 0.0),
+                'Total Hari': ringkasan.get('total_jmlhari', 0.0),
+                'Total Pajak': ringkasan.get('total_pajak', 0.0),
+                'Sumber': meta.get('sumber', ''),
+                'Diperbarui': meta.get('diperbarui', ''),
+                'Hash': meta.get('hash', '')[:12],
+            })
+        return pd.DataFrame(baris, columns=['Tahun', 'Bulan', 'Baris', 'NIP Unik', 'Total Kotor',
+                                            'Total Hari', 'Total Pajak', 'Sumber', 'Diperbarui', 'Hash'])
+
+    def bp21_rentang(self, awal, akhir):
+        """BP21 gabungan semua bulan tersimpan dari awal s.d. akhir ((tahun, bulan), inklusif)"""
+        bagian = [self.muat(t, b) for t, b in self.periode() if awal <= (t, b) <= akhir]
+        bagian = [df for df in bagian if df is not None]
+        if not bagian:
+            return pd.DataFrame()
+        return gabung_seragam(bagian)
+
+
+# ===== PROSES INKREMENTAL =====
+def proses_bulanan(buku, df, spesifikasi, kolom_nip, kolom_kotor, kolom_jmlhari=None,
+                   periode=None, kolom_bln='bln', kolom_thn='thn', sumber=''):
+    """Bangun BP21 hanya untuk bulan yang berubah; bulan lain dibaca dari buku.
+
+    Hasil sama dengan kompilasi + jalankan atas seluruh df: sumber kolom
+    di-resolve dari seluruh file, kolom yang jatuh ke teks asli di satu
+    bulan dipaksa teks di semua bulan (bulan tersimpan yang terdampak
+    dihitung ulang), dan dtype antar bulan disatukan.
+
+    df      : Data Mentah yang sudah digabung Data Master (satu atau beberapa bulan)
+    periode : (tahun, bulan) untuk semua baris (mis. masa dari form);
+              None -> dipecah per kolom_thn/kolom_bln
+    Return (df_result, status):
+      df_result - kolom BP21, urutan baris sama dengan df
+      status    - list dict per bulan: Tahun, Bulan, Baris, Status
+                  (BARU / DIHITUNG ULANG / TETAP / TIDAK DISIMPAN)
+    """
+    rencana, laporan = kompilasi(spesifikasi, df)
+    if periode is None:
+        kelompok, tanpa_periode = pecah_periode(df, kolom_bln, kolom_thn)
+    else:
+        kelompok, tanpa_periode = {(int(periode[0]), int(periode[1])): np.arange(len(df))}, np.arange(0)
+    kolom = kolom_input(rencana, laporan, kolom_nip, kolom_kotor, kolom_jmlhari)
+
+    # Tahap 1: hash setiap bulan; spesifikasi hanya dijalankan untuk bulan
+    # yang input-nya berbeda dari partisi tersimpan
+    bulan = {}
+    for (tahun, bln), posisi in kelompok.items():
+        sub = df.iloc[posisi]
+        lama = buku.meta(tahun, bln)
+        hash_isi = hash_input(sub, kolom, spesifikasi)
+        cocok = (lama is not None and 'gagal' in lama and lama.get('baris') == len(sub)
+                 and lama.get('hash') == hash_bulan(hash_isi, lama.get('teks', ())))
+        if cocok:
+            gagal, hasil = set(lama['gagal']), None
+        else:
+            gagal = set()
+            hasil = jalankan(rencana, sub, gagal=gagal)
+        bulan[(tahun, bln)] = {'posisi': posisi, 'sub': sub, 'lama': lama, 'hash_isi': hash_isi,
+                               'cocok': cocok, 'gagal': gagal, 'hasil': hasil}
+
+    gagal_semua = set().union(*(b['gagal'] for b in bulan.values()))
+    hasil_tanpa = None
+    if len(tanpa_periode):
+        gagal_tanpa = set()
+        hasil_tanpa = jalankan(rencana, df.iloc[tanpa_periode], gagal=gagal_tanpa)
+        gagal_semua |= gagal_tanpa
+        if gagal_tanpa != gagal_semua:
+            hasil_tanpa = jalankan(rencana, df.iloc[tanpa_periode], paksa_teks=gagal_semua)
+
+    # Tahap 2: bulan yang input dan kolom teksnya sama -> TETAP (dibaca dari
+    # buku); selain itu dihitung dengan kolom teks seluruh file lalu ditulis
+    status = []
+    for (tahun, bln), b in bulan.items():
+        sub, lama = b['sub'], b['lama']
+        hash_partisi = hash_bulan(b['hash_isi'], gagal_semua)
+        tetap = lama is not None and lama.get('hash') == hash_partisi and lama.get('baris') == len(sub)
+        if b['cocok'] and tetap:
+            b['hasil'] = buku.muat(tahun, bln)
+            if b['hasil'] is not None:
+                status.append({'Tahun': tahun, 'Bulan': bln, 'Baris': len(sub), 'Status': 'TETAP'})
+                continue
+            tetap = False       # partisi tidak terbaca: hitung dan tulis ulang
+        if b['hasil'] is None or b['gagal'] != gagal_semua:
+            b['hasil'] = jalankan(rencana, sub, paksa_teks=gagal_semua)
+
+        disimpan = buku.simpan(tahun, bln, baris_buku(b['hasil'], sub, kolom_nip, kolom_kotor, kolom_jmlhari),
+                               hash_partisi, sumber, gagal_semua, b['gagal'])
+        if tetap:
+            # Partisi dari mode streaming belum mencatat 'gagal': isinya sama, meta dilengkapi
+            keterangan = 'TETAP'
+        elif disimpan:
+            keterangan = 'DIHITUNG ULANG' if lama else 'BARU'
+        else:
+            keterangan = 'TIDAK DISIMPAN'
+        status.append({'Tahun': tahun, 'Bulan': bln, 'Baris': len(sub), 'Status': keterangan})
+
+    bagian = [b['hasil'] for b in bulan.values()]
+    urutan = [b['posisi'] for b in bulan.values()]
+    if hasil_tanpa is not None:
+        bagian.append(hasil_tanpa)
+        urutan.append(tanpa_periode)
+        # Bulan/tahun tidak terbaca: tetap ada di hasil, tidak masuk buku
+        status.append({'Tahun': None, 'Bulan': None, 'Baris': len(tanpa_periode), 'Status': 'TIDAK DISIMPAN'})
+    if not bagian:
+        return jalankan(rencana, df), status
+    df_result = gabung_seragam(bagian)
+    df_result.index = np.concatenate(urutan)
+    return df_result.sort_index().reset_index(drop=True), status
+
+
+class CatatanBulanan:
+    """Padanan proses_bulanan() untuk mode streaming.
+
+    tambah(hasil, df) dipanggil per chunk dengan hasil BP21 dan Data Mentah
+    tergabung chunk itu; paksa_teks = kolom yang di profil streaming jatuh ke
+    teks asli (padanan 'teks' proses_bulanan, ikut di hash). Hash input dan baris buku dikumpulkan per bulan
+    (baris buku ditampung di disk); selesai() menulis bulan yang baru atau
+    berubah dan mengembalikan status per bulan seperti proses_bulanan().
+    Memori puncak saat menulis = satu bulan baris buku, karena satu partisi
+    ditulis sebagai satu file Parquet.
+    """
+
+    def __init__(self, buku, spesifikasi, kolom, kolom_nip, kolom_kotor, kolom_jmlhari=None,
+                 kolom_bln='bln', kolom_thn='thn', sumber='', paksa_teks=()):
+        self.buku = buku
+        self.spesifikasi = spesifikasi
+        self.paksa_teks = sorted(paksa_teks)
+        self.kolom = kolom
+        self.kolom_nip = kolom_nip
+        self.kolom_kotor = kolom_kotor
+        self.kolom_jmlhari = kolom_jmlhari
+        self.kolom_bln = kolom_bln
+        self.kolom_thn = kolom_thn
+        self.sumber = sumber
+        self._hash = {}
+        self._tampungan = {}
+        self.tanpa_periode = 0
+
+    def tambah(self, hasil, df):
+        hasil = hasil.reset_index(drop=True)
+        df = df.reset_index(drop=True)
+        kelompok, tanpa_periode = pecah_periode(df, self.kolom_bln, self.kolom_thn)
+        self.tanpa_periode += len(tanpa_periode)
+        for periode, posisi in kelompok.items():
+            if periode not in self._hash:
+                self._hash[periode] = HashInput(self.kolom, self.spesifikasi)
+                self._tampungan[periode] = TampunganChunk()
+            sub = df.iloc[posisi]
+            self._hash[periode].tambah(sub)
+            self._tampungan[periode].simpan(baris_buku(hasil.iloc[posisi], sub, self.kolom_nip,
+                                                       self.kolom_kotor, self.kolom_jmlhari))
+
+    def selesai(self):
+        """Tulis bulan yang baru/berubah. Return list status per bulan."""
+        status = []
+        try:
+            for (tahun, bulan) in sorted(self._hash):
+                hash_partisi = hash_bulan(self._hash[(tahun, bulan)].hexdigest(), self.paksa_teks)
+                tampungan = self._tampungan[(tahun, bulan)]
+                lama = self.buku.meta(tahun, bulan)
+                if lama and lama.get('hash') == hash_partisi and lama.get('baris') == tampungan.jumlah:
+                    keterangan = 'TETAP'
+                elif self.buku.simpan(tahun, bulan, pd.concat(tampungan.chunk(), ignore_index=True),
+                                      hash_partisi, self.sumber, self.paksa_teks):
+                    keterangan = 'DIHITUNG ULANG' if lama else 'BARU'
+                else:
+                    keterangan = 'TIDAK DISIMPAN'
+                status.append({'Tahun': tahun, 'Bulan': bulan, 'Baris': tampungan.jumlah, 'Status': keterangan})
+        finally:
+            self.tutup()
+        if self.tanpa_periode:
+            status.append({'Tahun': None, 'Bulan': None, 'Baris': self.tanpa_periode, 'Status': 'TIDAK DISIMPAN'})
+        return status
+
+    def tutup(self):
+        for tampungan in self._tampungan.values():
+            tampungan.tutup()
+        self._tampungan = {}
@@ -0,0 +1,211 @@
+# cache_kolumnar.py
+"""Cache kolumnar (Parquet) hasil parse workbook, dikunci hash isi file.
+
+Parse .xls (xlrd) dan .xlsx (openpyxl) adalah langkah paling lambat dan dulu
+diulang di setiap rerun Streamlit. Sekarang DataFrame hasil parse disimpan
+sebagai Parquet di direktori data dengan kunci hash SHA-256 isi file +
+parameter pembacaan (sheet, kolom, dtype, versi parser). File bulan yang sama
+yang diupload lagi - di sesi lain atau setelah restart - langsung dibaca dari
+Parquet tanpa decode ulang.
+
+Nilai kosong dikembalikan dengan jenis yang sama seperti hasil parse asli
+(None atau NaN per kolom) dan df.attrs ikut disimpan. Frame yang tidak bisa
+direpresentasikan di Arrow (mis. kolom campuran angka/teks) tidak di-cache
+dan tetap dibaca langsung dari Excel.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from penyimpanan import direktori_data
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow opsional: tanpa pyarrow cache dimatikan
+    pa = None
+    pq = None
+
+# ===== KONFIGURASI =====
+ENV_CACHE_AKTIF = "FUSIONTAX_CACHE_EXCEL"   # isi "0" untuk mematikan cache
+MAKS_FILE = 300                            # batas LRU jumlah artefak
+VERSI_FORMAT = 1                           # naikkan jika logika parse berubah
+KUNCI_META = b'fusiontax'
+
+
+def cache_aktif():
+    """Cek apakah cache kolumnar diaktifkan dan pyarrow tersedia"""
+    if pa is None:
+        return False
+    return os.environ.get(ENV_CACHE_AKTIF, "1").strip() not in ("0", "false", "False", "")
+
+
+def hash_isi(isi):
+    """SHA-256 isi file (bytes)"""
+    return hashlib.sha256(isi).hexdigest()
+
+
+def buat_kunci(hash_file, *parameter):
+    """Kunci artefak dari hash isi file dan parameter pembacaan"""
+    teks = json.dumps([VERSI_FORMAT, hash_file, parameter], default=repr, sort_keys=True)
+    return hashlib.sha256(teks.encode('utf-8')).hexdigest()
+
+
+def _path(kunci):
+    return os.path.join(direktori_data("cache_excel"), f"{kunci}.parquet")
+
+
+def _jenis_kosong(series):
+    """'none' jika nilai kosong kolom object berupa None, selain itu 'nan'"""
+    if series.dtype != object:
+        return None
+    kosong = series[series.isna()]
+    if kosong.empty:
+        return None
+    return 'none' if kosong.iloc[0] is None else 'nan'
+
+
+def tabel_arrow(df, meta=None):
+    """DataFrame -> pa.Table dengan meta, attrs, dan jenis nilai kosong di metadata skema"""
+    info = {
+        'meta': meta or {},
+        'attrs': dict(df.attrs),
+        'kosong': {c: j for c in df.columns if (j := _jenis_kosong(df[c])) is not None},
+        'dibuat': time.time(),
+    }
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[KUNCI_META] = json.dumps(info, default=str).encode('utf-8')
+    return table.replace_schema_metadata(metadata)
+
+
+def frame_dari_arrow(table, **opsi):
+    """Kebalikan tabel_arrow -> (df, meta); opsi diteruskan ke table.to_pandas()"""
+    info = json.loads((table.schema.metadata or {}).get(KUNCI_META, b'{}'))
+    df = table.to_pandas(**opsi)
+    for kolom, jenis in info.get('kosong', {}).items():
+        if kolom in df.columns and df[kolom].dtype == object:
+            kosong = df[kolom].isna()
+            if kosong.any():
+                df[kolom] = df[kolom].where(~kosong, None if jenis == 'none' else np.nan)
+    df.attrs.update(info.get('attrs', {}))
+    return df, info.get('meta', {})
+
+
+def path_sementara(path):
+    """File sementara unik di samping path (aman untuk beberapa thread/proses)"""
+    fd, sementara = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                     prefix=os.path.basename(path) + '.', suffix='.tmp')
+    os.close(fd)
+    return sementara
+
+
+def tulis_frame(path, df, meta=None):
+    """Tulis DataFrame ke file Parquet (atomik). Return True jika berhasil."""
+    if pa is None or df is None:
+        return False
+    if not all(isinstance(c, str) for c in df.columns) or df.columns.duplicated().any():
+        return False
+
+    sementara = None
+    try:
+        sementara = path_sementara(path)
+        table = tabel_arrow(df, meta)
+        pq.write_table(table, sementara, compression='zstd')
+        os.replace(sementara, path)
+    except (pa.ArrowException, TypeError, ValueError, OSError):
+        if sementara and os.path.exists(sementara):
+            os.remove(sementara)
+        return False
+    return True
+
+
+def baca_frame(path, kolom=None):
+    """Baca file hasil tulis_frame -> (df, meta), atau (None, None) jika tidak ada/rusak
+
+    kolom : daftar kolom yang dibaca (proyeksi Parquet), None = semua
+    """
+    if pa is None or not os.path.exists(path):
+        return None, None
+    try:
+        # partitioning=None: file di folder kolom=nilai dibaca apa adanya
+        return frame_dari_arrow(pq.read_table(path, columns=kolom, partitioning=None))
+    except (pa.ArrowException, OSError, ValueError):
+        return None, None
+
+
+def baca_meta(path):
+    """Meta file hasil tulis_frame tanpa membaca datanya, atau None jika tidak ada/rusak"""
+    if pa is None or not os.path.exists(path):
+        return None
+    try:
+        schema = pq.read_schema(path)
+    except (pa.ArrowException, OSError, ValueError):
+        return None
+    info = json.loads((schema.metadata or {}).get(KUNCI_META, b'{}'))
+    return info.get('meta', {})
+
+
+def simpan(kunci, df, meta=None):
+    """Simpan DataFrame sebagai artefak Parquet. Return True jika tersimpan."""
+    if not cache_aktif():
+        return False
+    if not tulis_frame(_path(kunci), df, meta):
+        return False
+    _pangkas()
+    return True
+
+
+def muat(kunci):
+    """Baca artefak -> (df, meta), atau (None, None) jika belum ada/rusak"""
+    if not cache_aktif():
+        return None, None
+    path = _path(kunci)
+    df, meta = baca_frame(path)
+    if df is None:
+        return None, None
+    try:
+        # Tandai baru dipakai (dasar urutan LRU)
+        os.utime(path)
+    except OSError:
+        pass
+    return df, meta
+
+
+def ambil_atau_buat(kunci, buat, meta=None):
+    """Artefak untuk kunci; jika belum ada, df = buat() lalu disimpan.
+
+    Return (df, dari_cache).
+    """
+    df, _ = muat(kunci)
+    if df is not None:
+        return df, True
+    df = buat()
+    simpan(kunci, df, meta)
+    return df, False
+
+
+def _pangkas():
+    """Hapus artefak paling lama tidak dipakai jika melebihi MAKS_FILE"""
+    folder = direktori_data("cache_excel")
+    try:
+        artefak = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith('.parquet')]
+        if len(artefak) <= MAKS_FILE:
+            return
+        artefak.sort(key=os.path.getmtime)
+        for path in artefak[:len(artefak) - MAKS_FILE]:
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def info_cache():
+    """Jumlah dan total ukuran artefak (untuk debugging)"""
+    folder = direktori_data("cache_excel")
+    artefak = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith('.parquet')]
+    return {'jumlah': len(artefak), 'ukuran_byte': sum(os.path.getsize(p) for p in artefak)}
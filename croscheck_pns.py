@@ -8,6 +8,259 @@ from fuzzywuzzy import process
 from io import BytesIO
 import sys
 import os
+import time
+from pencocokan_fuzzy import (
+    cari_kolom_nama_nip, cocokkan_banyak, cocokkan_satu, siapkan_kandidat
+)
+from memo_identitas import memo_default
+from kanonik_nama import nama_urut
+from skema_kolom import resolve, jelaskan, petakan_nama
+from baca_paralel import jalankan_paralel
+from cache_kolumnar import buat_kunci, hash_isi, muat, simpan
+from sidecar_master import baca_sidecar, tanam_sidecar
+from tipe_ringkas import simpan_ringkas
+from pengelola_sesi import ringkasan as ringkasan_sesi
+from master_bersama import bagikan, info_master
+from rekonsiliasi import rekonsiliasi
+from rupiah import SATUAN_SEN, TOLERANSI_RUPIAH, parse_rupiah
+from arsip_bulanan import ArsipBulanan, arsipkan, pecah_periode
+from alur_tahap import Alur, ringkas_laporan
+import validasi_inkremental
+import identitas_lintas
+
+
+# ===== PERUBAHAN PENTING: FUNGSI UNTUK MEMPERTAHANKAN FORMAT ANGKA ASLI =====
+def format_nilai_asli(nilai):
+    """Mempertahankan format nilai asli tanpa .00 atau notasi ilmiah"""
+    if pd.isna(nilai):
+        return ''
+    
+    # Jika nilai sudah string, kembalikan langsung
+    if isinstance(nilai, str):
+        return nilai.strip()
+    
+    # Jika nilai float atau integer
+    if isinstance(nilai, (int, float)):
+        # Cek apakah nilai integer sebenarnya (tanpa desimal)
+        if isinstance(nilai, float) and nilai.is_integer():
+            return str(int(nilai))
+        else:
+            # Untuk float dengan desimal, tampilkan tanpa trailing zeros
+            nilai_str = str(nilai)
+            if '.' in nilai_str:
+                # Hapus trailing zeros setelah titik desimal
+                nilai_str = nilai_str.rstrip('0').rstrip('.')
+            return nilai_str
+    
+    # Untuk tipe data lainnya
+    return str(nilai)
+
+
+def format_angka_panjang(nilai):
+    """Format khusus untuk angka panjang seperti NIP, rekening, dll."""
+    if pd.isna(nilai):
+        return ''
+    
+    nilai_str = str(nilai)
+    
+    # Hapus notasi ilmiah (e+)
+    if 'e+' in nilai_str.lower():
+        try:
+            # Coba konversi ke integer tanpa notasi ilmiah
+            nilai_float = float(nilai_str)
+            # Format tanpa notasi ilmiah dan tanpa desimal jika integer
+            if nilai_float.is_integer():
+                return str(int(nilai_float))
+            else:
+                # Format dengan semua digit
+                return format(nilai_float, 'f').rstrip('0').rstrip('.')
+        except:
+            return nilai_str
+    
+    # Hapus .0, .00, .000, dll
+    if '.' in nilai_str:
+        parts = nilai_str.split('.')
+        # Jika bagian desimal hanya berisi 0, hapus bagian desimal
+        if len(parts) == 2 and all(c == '0' for c in parts[1]):
+            return parts[0]
+    
+    return nilai_str
+# ===== END PERUBAHAN =====
+
+
+def rapikan_sidecar(df):
+    """Samakan salinan tertanam dengan hasil parse sel (angka -> teks format asli)"""
+    df = df.astype(object).where(df.notna(), None)
+    for col in df.columns:
+        df[col] = df[col].map(lambda v: format_nilai_asli(v) if isinstance(v, (int, float)) else v)
+    df = df.dropna(axis=1, how='all')
+    df = df.dropna(how='all').reset_index(drop=True)
+    # Kolom angka panjang diperlakukan sama seperti hasil parse sel
+    numeric_cols_keywords = ['nip', 'npwp', 'nik', 'rekening', 'nogaji', 'id']
+    for col in df.columns:
+        col_lower = str(col).lower()
+        if any(keyword in col_lower for keyword in numeric_cols_keywords):
+            df[col] = df[col].apply(format_angka_panjang)
+    return df
+
+
+def parse_excel_flexible(isi_file, expected_headers, label):
+    """Baca Excel dengan pencarian header fleksibel dan pertahankan format asli
+
+    Tidak memanggil Streamlit: pesan dikembalikan sebagai list (level, teks)
+    agar bisa dijalankan di proses pembaca terpisah. Return (df, pesan).
+    """
+    pesan = []
+    try:
+        # Master hasil export aplikasi membawa salinan bertipe: pakai jika sheet belum diubah
+        df_sidecar, status_sidecar = baca_sidecar(isi_file)
+        if df_sidecar is not None:
+            df = rapikan_sidecar(df_sidecar)
+            pesan.append(('success', f"✅ {label} dibaca dari salinan data tertanam (tanpa parse sel), {len(df)} baris data"))
+            pesan.append(('info', f"Kolom ditemukan: {', '.join(df.columns.tolist()[:10])}{'...' if len(df.columns) > 10 else ''}"))
+            return df, pesan
+        if status_sidecar == 'diubah':
+            pesan.append(('info', f"ℹ️ {label}: sheet sudah diubah sejak diexport, data dibaca ulang dari sel"))
+        
+        wb = openpyxl.load_workbook(BytesIO(isi_file), data_only=True, read_only=True)
+        sheet = wb.active
+        
+        total_rows = sheet.max_row
+        total_columns = sheet.max_column
+        expected_set = set(h.lower().strip() for h in expected_headers)
+        
+        pesan.append(('write', f"📊 {label}: {total_rows} baris, {total_columns} kolom terdeteksi"))
+        
+        # Cari baris header
+        best_row = -1
+        max_matches = 0
+        best_row_values = []
+        
+        for row_idx in range(1, min(21, total_rows + 1)):
+            row_values = [str(cell.value).strip() if cell.value is not None else "" for cell in sheet[row_idx]]
+            row_values_lower = [v.lower() for v in row_values]
+            row_set = set(v for v in row_values_lower if v)
+            matches = len(expected_set.intersection(row_set))
+            if matches > max_matches:
+                max_matches = matches
+                best_row = row_idx
+                best_row_values = row_values
+        
+        if best_row > 0 and max_matches >= len(expected_headers) // 2:
+            # Handle kolom kosong di kiri
+            first_non_empty_col = next((i for i, val in enumerate(best_row_values) if val), 0)
+            
+            # Ekstrak data mulai dari baris setelah header
+            data = []
+            for row in sheet.iter_rows(min_row=best_row + 1, max_row=total_rows,
+                                      min_col=first_non_empty_col + 1, values_only=True):
+                # ===== PERUBAHAN: GUNAKAN FORMAT ASLI UNTUK SETIAP SEL =====
+                formatted_row = []
+                for cell in row:
+                    if isinstance(cell, (int, float)):
+                        # Pertahankan format asli angka
+                        formatted_row.append(format_nilai_asli(cell))
+                    else:
+                        formatted_row.append(cell)
+                data.append(formatted_row)
+                # ===== END PERUBAHAN =====
+            
+            # Ambil header yang valid (mulai dari kolom pertama yang tidak kosong)
+            actual_headers = best_row_values[first_non_empty_col:]
+            
+            # Handle kolom duplikat dan kosong
+            seen = {}
+            unique_headers = []
+            for i, col in enumerate(actual_headers):
+                if not col or col.strip() == "":
+                    col = f"Unnamed_{i}"
+                
+                # Handle duplikat
+                original_col = col
+                counter = 1
+                while col in seen:
+                    col = f"{original_col}_{counter}"
+                    counter += 1
+                
+                seen[col] = True
+                unique_headers.append(col)
+            
+            # Batasi jumlah kolom sesuai data
+            if len(data) > 0:
+                max_data_cols = len(data[0])
+                unique_headers = unique_headers[:max_data_cols]
+            
+            df = pd.DataFrame(data, columns=unique_headers)
+            
+            # Drop kolom yang sepenuhnya kosong
+            df = df.dropna(axis=1, how='all')
+            
+            # Drop baris yang sepenuhnya kosong
+            df = df.dropna(how='all').reset_index(drop=True)
+            
+            pesan.append(('success', f"✅ {label} berhasil dibaca! Header di baris {best_row}, {len(df)} baris data"))
+            
+        else:
+            # Fallback: baca seluruh sheet
+            data = []
+            for row in sheet.iter_rows(min_row=1, max_row=total_rows, values_only=True):
+                # ===== PERUBAHAN: GUNAKAN FORMAT ASLI UNTUK SETIAP SEL =====
+                formatted_row = []
+                for cell in row:
+                    if isinstance(cell, (int, float)):
+                        formatted_row.append(format_nilai_asli(cell))
+                    else:
+                        formatted_row.append(cell)
+                data.append(formatted_row)
+                # ===== END PERUBAHAN =====
+            
+            if len(data) < 2:
+                pesan.append(('error', f"❌ {label}: File tidak memiliki cukup data"))
+                return None, pesan
+            
+            # Handle header duplikat
+            headers = data[0]
+            seen = {}
+            unique_headers = []
+            for i, col in enumerate(headers):
+                col_str = str(col).strip() if col else f"Unnamed_{i}"
+                
+                original_col = col_str
+                counter = 1
+                while col_str in seen:
+                    col_str = f"{original_col}_{counter}"
+                    counter += 1
+                
+                seen[col_str] = True
+                unique_headers.append(col_str)
+            
+            df = pd.DataFrame(data[1:], columns=unique_headers)
+            df = df.dropna(axis=1, how='all')
+            df = df.dropna(how='all').reset_index(drop=True)
+            
+            pesan.append(('warning', f"⚠️ {label}: Header tidak sepenuhnya cocok, menggunakan baris pertama"))
+        
+        # ===== PERUBAHAN: BERSIHKAN KOLOM NUMERIK PENTING =====
+        # Daftar kolom yang perlu diformat khusus (angka panjang)
+        numeric_cols_keywords = ['nip', 'npwp', 'nik', 'rekening', 'nogaji', 'id']
+        
+        for col in df.columns:
+            col_lower = str(col).lower()
+            if any(keyword in col_lower for keyword in numeric_cols_keywords):
+                df[col] = df[col].apply(format_angka_panjang)
+        # ===== END PERUBAHAN =====
+        
+        # Tampilkan kolom yang ditemukan
+        pesan.append(('info', f"Kolom ditemukan: {', '.join(df.columns.tolist()[:10])}{'...' if len(df.columns) > 10 else ''}"))
+        
+        return df, pesan
+    
+    except Exception as e:
+        pesan.append(('error', f"❌ Error membaca {label}: {e}"))
+        import traceback
+        pesan.append(('code', traceback.format_exc()))
+        return None, pesan
+
 
 def show():
     """Fitur Sistem Master Data Pegawai dengan Tracking Bulanan"""
@@ -52,67 +305,10 @@ def show():
         "1101": "K/1", "1102": "K/2"
     }
     
-    # ===== PERUBAHAN PENTING: FUNGSI UNTUK MEMPERTAHANKAN FORMAT ANGKA ASLI =====
-    def format_nilai_asli(nilai):
-        """Mempertahankan format nilai asli tanpa .00 atau notasi ilmiah"""
-        if pd.isna(nilai):
-            return ''
-        
-        # Jika nilai sudah string, kembalikan langsung
-        if isinstance(nilai, str):
-            return nilai.strip()
-        
-        # Jika nilai float atau integer
-        if isinstance(nilai, (int, float)):
-            # Cek apakah nilai integer sebenarnya (tanpa desimal)
-            if isinstance(nilai, float) and nilai.is_integer():
-                return str(int(nilai))
-            else:
-                # Untuk float dengan desimal, tampilkan tanpa trailing zeros
-                nilai_str = str(nilai)
-                if '.' in nilai_str:
-                    # Hapus trailing zeros setelah titik desimal
-                    nilai_str = nilai_str.rstrip('0').rstrip('.')
-                return nilai_str
-        
-        # Untuk tipe data lainnya
-        return str(nilai)
-    
     def clean_numeric_series(series):
         """Membersihkan series numerik agar tidak ada .00 yang tidak perlu"""
         return series.apply(format_nilai_asli)
     
-    def format_angka_panjang(nilai):
-        """Format khusus untuk angka panjang seperti NIP, rekening, dll."""
-        if pd.isna(nilai):
-            return ''
-        
-        nilai_str = str(nilai)
-        
-        # Hapus notasi ilmiah (e+)
-        if 'e+' in nilai_str.lower():
-            try:
-                # Coba konversi ke integer tanpa notasi ilmiah
-                nilai_float = float(nilai_str)
-                # Format tanpa notasi ilmiah dan tanpa desimal jika integer
-                if nilai_float.is_integer():
-                    return str(int(nilai_float))
-                else:
-                    # Format dengan semua digit
-                    return format(nilai_float, 'f').rstrip('0').rstrip('.')
-            except:
-                return nilai_str
-        
-        # Hapus .0, .00, .000, dll
-        if '.' in nilai_str:
-            parts = nilai_str.split('.')
-            # Jika bagian desimal hanya berisi 0, hapus bagian desimal
-            if len(parts) == 2 and all(c == '0' for c in parts[1]):
-                return parts[0]
-        
-        return nilai_str
-    # ===== END PERUBAHAN =====
-    
     # ===== FUNGSI VALIDASI DUPLIKASI =====
     def check_duplicates(df, column_name, file_name):
         """Cek duplikasi di kolom tertentu dan return dataframe duplikat"""
@@ -185,244 +381,216 @@ def show():
         kdkawin = format_nilai_asli(kdkawin)
         return KDKAWIN_MAP.get(kdkawin, "-")
     
+    def tampilkan_pesan(pesan):
+        """Tampilkan pesan hasil parse dengan level Streamlit yang sesuai"""
+        for level, teks in pesan:
+            getattr(st, level)(teks)
+    
     def read_excel_flexible(uploaded_file, expected_headers, label):
-        """Baca Excel dengan pencarian header fleksibel dan pertahankan format asli"""
+        """Baca satu file upload di proses utama"""
         if uploaded_file is None:
             return None
+        df, pesan = parse_excel_flexible(uploaded_file.getvalue(), expected_headers, label)
+        tampilkan_pesan(pesan)
+        return df
+    
+    def baca_upload_paralel(daftar_file):
+        """Parse beberapa file upload bersamaan: list (label, uploaded_file, expected_headers).
         
-        try:
-            uploaded_file.seek(0)
-            wb = openpyxl.load_workbook(uploaded_file, data_only=True, read_only=True)
-            sheet = wb.active
-            
-            total_rows = sheet.max_row
-            total_columns = sheet.max_column
-            expected_set = set(h.lower().strip() for h in expected_headers)
-            
-            st.write(f"📊 {label}: {total_rows} baris, {total_columns} kolom terdeteksi")
-            
-            # Cari baris header
-            best_row = -1
-            max_matches = 0
-            best_row_values = []
-            
-            for row_idx in range(1, min(21, total_rows + 1)):
-                row_values = [str(cell.value).strip() if cell.value is not None else "" for cell in sheet[row_idx]]
-                row_values_lower = [v.lower() for v in row_values]
-                row_set = set(v for v in row_values_lower if v)
-                matches = len(expected_set.intersection(row_set))
-                if matches > max_matches:
-                    max_matches = matches
-                    best_row = row_idx
-                    best_row_values = row_values
-            
-            if best_row > 0 and max_matches >= len(expected_headers) // 2:
-                # Handle kolom kosong di kiri
-                first_non_empty_col = next((i for i, val in enumerate(best_row_values) if val), 0)
-                
-                # Ekstrak data mulai dari baris setelah header
-                data = []
-                for row in sheet.iter_rows(min_row=best_row + 1, max_row=total_rows,
-                                          min_col=first_non_empty_col + 1, values_only=True):
-                    # ===== PERUBAHAN: GUNAKAN FORMAT ASLI UNTUK SETIAP SEL =====
-                    formatted_row = []
-                    for cell in row:
-                        if isinstance(cell, (int, float)):
-                            # Pertahankan format asli angka
-                            formatted_row.append(format_nilai_asli(cell))
-                        else:
-                            formatted_row.append(cell)
-                    data.append(formatted_row)
-                    # ===== END PERUBAHAN =====
-                
-                # Ambil header yang valid (mulai dari kolom pertama yang tidak kosong)
-                actual_headers = best_row_values[first_non_empty_col:]
-                
-                # Handle kolom duplikat dan kosong
-                seen = {}
-                unique_headers = []
-                for i, col in enumerate(actual_headers):
-                    if not col or col.strip() == "":
-                        col = f"Unnamed_{i}"
-                    
-                    # Handle duplikat
-                    original_col = col
-                    counter = 1
-                    while col in seen:
-                        col = f"{original_col}_{counter}"
-                        counter += 1
-                    
-                    seen[col] = True
-                    unique_headers.append(col)
-                
-                # Batasi jumlah kolom sesuai data
-                if len(data) > 0:
-                    max_data_cols = len(data[0])
-                    unique_headers = unique_headers[:max_data_cols]
-                
-                df = pd.DataFrame(data, columns=unique_headers)
-                
-                # Drop kolom yang sepenuhnya kosong
-                df = df.dropna(axis=1, how='all')
-                
-                # Drop baris yang sepenuhnya kosong
-                df = df.dropna(how='all').reset_index(drop=True)
-                
-                st.success(f"✅ {label} berhasil dibaca! Header di baris {best_row}, {len(df)} baris data")
-                
+        File yang isinya sudah pernah diparse diambil dari cache kolumnar.
+        Sisanya diparse paralel; progress diperbarui setiap satu file selesai
+        dan pesan/error tiap file ditampilkan atas labelnya sendiri.
+        Return (dict label -> DataFrame atau None, dict label -> kunci isi file).
+        """
+        hasil_df = {label: None for label, _, _ in daftar_file}
+        kunci = {}
+        bersama = {}
+        dari_cache = {}
+        tugas = {}
+        pesan_file = {}
+        for label, uploaded_file, expected_headers in daftar_file:
+            if uploaded_file is None:
+                continue
+            isi_file = uploaded_file.getvalue()
+            kunci[label] = buat_kunci(hash_isi(isi_file), 'croscheck_pns', label, expected_headers)
+            if label == "Master Existing":
+                # Versi master yang sama sudah dibagikan (sesi lain / file Arrow): tidak diparse atau dimuat lagi
+                df_bersama = bagikan(kunci[label], lambda: None)
+                if df_bersama is not None:
+                    bersama[label] = df_bersama
+                    continue
+            df_cache, meta = muat(kunci[label])
+            if df_cache is not None:
+                dari_cache[label] = (df_cache, meta.get('pesan', []))
             else:
-                # Fallback: baca seluruh sheet
-                data = []
-                for row in sheet.iter_rows(min_row=1, max_row=total_rows, values_only=True):
-                    # ===== PERUBAHAN: GUNAKAN FORMAT ASLI UNTUK SETIAP SEL =====
-                    formatted_row = []
-                    for cell in row:
-                        if isinstance(cell, (int, float)):
-                            formatted_row.append(format_nilai_asli(cell))
-                        else:
-                            formatted_row.append(cell)
-                    data.append(formatted_row)
-                    # ===== END PERUBAHAN =====
-                
-                if len(data) < 2:
-                    st.error(f"❌ {label}: File tidak memiliki cukup data")
-                    return None
-                
-                # Handle header duplikat
-                headers = data[0]
-                seen = {}
-                unique_headers = []
-                for i, col in enumerate(headers):
-                    col_str = str(col).strip() if col else f"Unnamed_{i}"
-                    
-                    original_col = col_str
-                    counter = 1
-                    while col_str in seen:
-                        col_str = f"{original_col}_{counter}"
-                        counter += 1
-                    
-                    seen[col_str] = True
-                    unique_headers.append(col_str)
-                
-                df = pd.DataFrame(data[1:], columns=unique_headers)
-                df = df.dropna(axis=1, how='all')
-                df = df.dropna(how='all').reset_index(drop=True)
-                
-                st.warning(f"⚠️ {label}: Header tidak sepenuhnya cocok, menggunakan baris pertama")
-            
-            # ===== PERUBAHAN: BERSIHKAN KOLOM NUMERIK PENTING =====
-            # Daftar kolom yang perlu diformat khusus (angka panjang)
-            numeric_cols_keywords = ['nip', 'npwp', 'nik', 'rekening', 'nogaji', 'id']
-            
-            for col in df.columns:
-                col_lower = str(col).lower()
-                if any(keyword in col_lower for keyword in numeric_cols_keywords):
-                    df[col] = df[col].apply(format_angka_panjang)
-            # ===== END PERUBAHAN =====
+                tugas[label] = (parse_excel_flexible, (isi_file, expected_headers, label))
+        
+        hasil_tugas = {}
+        total_ms = 0.0
+        if tugas:
+            progress = st.progress(0.0, text=f"📥 Membaca {len(tugas)} file...")
+            selesai = []
             
-            # Tampilkan kolom yang ditemukan
-            st.info(f"Kolom ditemukan: {', '.join(df.columns.tolist()[:10])}{'...' if len(df.columns) > 10 else ''}")
+            def saat_selesai(label, hasil):
+                selesai.append(label)
+                progress.progress(len(selesai) / len(tugas),
+                                  text=f"📥 {label} selesai ({hasil['durasi_ms']:.0f} ms) - {len(selesai)}/{len(tugas)} file")
             
-            return df
+            mulai = time.perf_counter()
+            total_byte = sum(len(args[0]) for _, args in tugas.values())
+            hasil_tugas = jalankan_paralel(tugas, saat_selesai=saat_selesai, total_byte=total_byte)
+            total_ms = (time.perf_counter() - mulai) * 1000
+            progress.empty()
         
-        except Exception as e:
-            st.error(f"❌ Error membaca {label}: {e}")
-            import traceback
-            st.code(traceback.format_exc())
-            return None
+        for label, _, _ in daftar_file:
+            if label in bersama:
+                df = bersama[label]
+                tampilkan_pesan(df.attrs.get('pesan_baca', []))
+                st.caption(f"⚡ {label} dipakai bersama (versi sama sudah dibaca di server ini)")
+                hasil_df[label] = df
+                continue
+            if label in dari_cache:
+                df, pesan = dari_cache[label]
+                tampilkan_pesan(pesan)
+                st.caption(f"⚡ {label} diambil dari cache (file sama sudah pernah dibaca)")
+                hasil_df[label] = df
+                pesan_file[label] = pesan
+                continue
+            if label not in hasil_tugas:
+                continue
+            hasil = hasil_tugas[label]
+            if hasil['error'] is not None:
+                # Error di luar parser (mis. proses pembaca mati) tetap dilaporkan per file
+                st.error(f"❌ Error membaca {label}: {hasil['error']}")
+                if hasil['traceback']:
+                    st.code(hasil['traceback'])
+                continue
+            df, pesan = hasil['hasil']
+            tampilkan_pesan(pesan)
+            hasil_df[label] = df
+            pesan_file[label] = pesan
+            if df is not None:
+                simpan(kunci[label], df, {'pesan': pesan})
+        
+        if hasil_tugas:
+            durasi = ", ".join(f"{label} {hasil['durasi_ms']:.0f} ms" for label, hasil in hasil_tugas.items())
+            st.caption(f"⏱️ Waktu baca: {durasi} (total {total_ms:.0f} ms)")
+        
+        # Master Existing yang sama dipakai bersama oleh semua sesi (read-only, copy-on-write)
+        df_master = hasil_df.get("Master Existing")
+        if df_master is not None and "Master Existing" not in bersama:
+            def master_baru():
+                # Pesan baca ikut di frame bersama agar tetap tampil saat dipakai sesi lain
+                df_master.attrs['pesan_baca'] = [list(p) for p in pesan_file.get("Master Existing", [])]
+                return df_master
+            hasil_df["Master Existing"] = bagikan(kunci["Master Existing"], master_baru)
+        return hasil_df, kunci
     
     def fuzzy_match_row(nama, nip, df_master, threshold=80):
         """Cari baris yang cocok menggunakan fuzzy matching"""
-        if df_master is None or df_master.empty:
-            return None
-        
-        best_match_idx = None
-        best_score = 0
-        
-        # Cari kolom Nama dan NIP dengan pencarian fleksibel
-        nama_col = None
-        nip_col = None
-        
-        for col in df_master.columns:
-            col_upper = str(col).upper()
-            if 'NAMA' in col_upper and nama_col is None:
-                nama_col = col
-            if 'NIP' in col.upper() and nip_col is None:
-                nip_col = col
-        
-        if not nama_col and not nip_col:
-            return None
-        
-        for idx, row in df_master.iterrows():
-            # Match berdasarkan Nama dan NIP
-            nama_master = format_nilai_asli(row.get(nama_col, '')) if nama_col else ''
-            nip_master = format_nilai_asli(row.get(nip_col, '')) if nip_col else ''
-            
-            nama_score = fuzz.ratio(str(nama).lower(), nama_master.lower()) if nama and nama_master else 0
-            nip_score = fuzz.ratio(str(nip).lower(), nip_master.lower()) if nip and nip_master else 0
-            
-            # Gabungan score (prioritas NIP lebih tinggi)
-            if nip_col and nama_col:
-                combined_score = (nip_score * 0.7) + (nama_score * 0.3)
-            elif nip_col:
-                combined_score = nip_score
-            elif nama_col:
-                combined_score = nama_score
-            else:
-                combined_score = 0
-            
-            if combined_score > best_score and combined_score >= threshold:
-                best_score = combined_score
-                best_match_idx = idx
-        
-        return best_match_idx
+        kandidat = siapkan_kandidat(df_master, format_fn=format_nilai_asli)
+        pos = cocokkan_satu(nama, nip, kandidat, threshold=threshold)
+        return df_master.index[pos] if pos is not None else None
     
-    def process_data(df_mentah, df_bpmp, df_master_existing=None):
-        """Proses data dari file mentah dan BPMP ke format master"""
+    def fuzzy_match_banyak(pasangan, df_master, arah, threshold=80):
+        """Fuzzy matching banyak (nama, nip) sekaligus, paralel jika datanya besar.
         
-        if df_mentah is None or df_bpmp is None:
-            st.warning("⚠️ Pastikan file Data Mentah dan BPMP sudah di-upload!")
+        arah ('baru_ke_lama' / 'lama_ke_baru') memisahkan tautan memo kedua
+        arah pencocokan, karena kandidat di tiap arah berbeda.
+        """
+        kandidat = siapkan_kandidat(df_master, format_fn=format_nilai_asli)
+        # Tautan identitas dari bulan sebelumnya dipakai ulang lewat memo persisten
+        posisi = cocokkan_banyak(pasangan, kandidat, threshold=threshold, memo=memo_default(),
+                                 konteks=f'nama_nip|{arah}')
+        return [df_master.index[pos] if pos is not None else None for pos in posisi]
+    
+    # ===== TAHAP ALUR PROSES (lihat alur_tahap.py) =====
+    # Setiap tahap hanya bergantung pada masukannya sendiri; file yang tidak
+    # berubah tidak dibaca, dirapikan, atau dicek ulang.
+    def rapikan_kolom(df):
+        """Nama kolom di-strip (salinan, frame sumber tidak diubah)"""
+        if df is None:
             return None
+        df = df.copy(deep=False)
+        df.columns = [str(col).strip() for col in df.columns]
+        return df
+    
+    def duplikat_mentah(df_mentah):
+        """Duplikasi NIP dan NPWP di Data Mentah: kolom -> (df_duplikat, nilai)"""
+        return {kolom: check_duplicates(df_mentah, kolom, 'Data Mentah') for kolom in ('nip', 'npwp')}
+    
+    def duplikat_master(df_master):
+        """Duplikasi NIP dan NIK di Master Existing: 'nip'/'nik' -> (df_duplikat, nilai)"""
+        if df_master is None:
+            return {}
+        kolom_master = resolve(df_master, 'master')
+        return {
+            peran: check_duplicates(df_master, kolom_master[peran], 'Master Existing')
+            for peran in ('nip', 'nik') if kolom_master[peran]
+        }
+    
+    def duplikat_bpmp(df_bpmp):
+        """Duplikasi NPWP/NIK di Data BPMP: 'nik' -> (df_duplikat, nilai)"""
+        if df_bpmp is None:
+            return {}
+        nik_col_bpmp = resolve(df_bpmp, 'bpmp')['nik']
+        return {'nik': check_duplicates(df_bpmp, nik_col_bpmp, 'Data BPMP')} if nik_col_bpmp else {}
+    
+    def duplikat_hasil(df_hasil):
+        """Duplikasi NIP dan NIK di hasil proses"""
+        return {kolom: check_duplicates(df_hasil, kolom, 'Hasil') for kolom in ('NIP', 'NIK')}
+    
+    def siapkan_mentah(df_mentah):
+        """Kolom hasil yang hanya bergantung pada Data Mentah (format asli per baris)"""
+        ada = set(df_mentah.columns)
+        baris = []
+        for idx_mentah, row_mentah in df_mentah.iterrows():
+            # ===== PERUBAHAN: GUNAKAN FORMAT ASLI UNTUK DATA =====
+            kdgol = format_nilai_asli(row_mentah.get('kdgol', '')) if 'kdgol' in ada else ''
+            kdkawin = format_nilai_asli(row_mentah.get('kdkawin', '')) if 'kdkawin' in ada else ''
+            baris.append({
+                'No': idx_mentah + 1,
+                'Nama': format_nilai_asli(row_mentah.get('nmpeg', '')) if 'nmpeg' in ada else '',
+                'npwp_mentah': format_nilai_asli(row_mentah.get('npwp', '')) if 'npwp' in ada else '',
+                'KDGOL': kdgol,
+                'KODE OBJEK PAJAK': konversi_kode_objek(kdgol),
+                'KDKAWIN': kdkawin,
+                'STATUS': konversi_status(kdkawin),
+                'NIP': format_nilai_asli(row_mentah.get('nip', '')) if 'nip' in ada else '',
+                'nmrek': format_nilai_asli(row_mentah.get('nmrek', '')),
+                'nm_bank': format_nilai_asli(row_mentah.get('nm_bank', '')),
+                'rekening': format_angka_panjang(row_mentah.get('rekening', '')),
+                'kdbankspan': format_nilai_asli(row_mentah.get('kdbankspan', '')),
+                'nmbankspan': format_nilai_asli(row_mentah.get('nmbankspan', '')),
+                'kdpos': format_nilai_asli(row_mentah.get('kdpos', '')),
+            })
+            # ===== END PERUBAHAN =====
+        return pd.DataFrame(baris)
+    
+    def cocokkan_bpmp(df_siap, df_bpmp):
+        """Lengkapi baris Data Mentah dengan NIK dan posisi dari BPMP"""
+        # ===== FUZZY MATCHING NPWP MENTAH -> NIK BPMP (BATCH) =====
+        # Kolom BPMP di-resolve sekali per layout (lihat skema_kolom.py)
+        kolom_bpmp = resolve(df_bpmp, 'bpmp')
+        nik_col_bpmp = kolom_bpmp['nik']
+        posisi_col = kolom_bpmp['posisi']
         
-        # Normalisasi kolom - handle duplikat
-        df_mentah.columns = [str(col).strip() for col in df_mentah.columns]
-        df_bpmp.columns = [str(col).strip() for col in df_bpmp.columns]
-        
-        # Debug: tampilkan kolom yang tersedia
-        st.write("**Kolom Data Mentah:**", df_mentah.columns.tolist()[:15])
-        st.write("**Kolom Data BPMP:**", df_bpmp.columns.tolist())
+        baris_siap = df_siap.to_dict('records')
+        kandidat_bpmp = siapkan_kandidat(
+            df_bpmp, format_fn=format_nilai_asli, nip_col=nik_col_bpmp, lower=False
+        ) if nik_col_bpmp else None
+        match_bpmp = cocokkan_banyak([('', row['npwp_mentah']) for row in baris_siap], kandidat_bpmp, threshold=80)
         
-        # Buat DataFrame hasil dengan merge berdasarkan fuzzy matching
         hasil = []
-        
-        for idx_mentah, row_mentah in df_mentah.iterrows():
-            # ===== PERUBAHAN: GUNAKAN FORMAT ASLI UNTUK DATA =====
-            # Ambil data dari file mentah dengan penanganan error
-            nip = format_nilai_asli(row_mentah.get('nip', '')) if 'nip' in df_mentah.columns else ''
-            nama = format_nilai_asli(row_mentah.get('nmpeg', '')) if 'nmpeg' in df_mentah.columns else ''
-            npwp_mentah = format_nilai_asli(row_mentah.get('npwp', '')) if 'npwp' in df_mentah.columns else ''
+        for pos_mentah, row_siap in enumerate(baris_siap):
+            idx_mentah = row_siap['No'] - 1
+            npwp_mentah = row_siap['npwp_mentah']
             
-            # Cari data BPMP yang cocok menggunakan fuzzy matching
+            # Cari data BPMP yang cocok (hasil fuzzy matching batch di atas)
             matched_bpmp = None
-            best_match_score = 0
-            
-            for idx_bpmp, row_bpmp in df_bpmp.iterrows():
-                # Cek apakah kolom NPWP/NIK/TIN ada
-                nik_col = None
-                for col in df_bpmp.columns:
-                    if 'NPWP' in col.upper() or 'NIK' in col.upper() or 'TIN' in col.upper():
-                        nik_col = col
-                        break
-                
-                if nik_col:
-                    nik_bpmp = format_nilai_asli(row_bpmp.get(nik_col, ''))
-                    
-                    # Matching berdasarkan NPWP/NIK
-                    if npwp_mentah and nik_bpmp and npwp_mentah != '' and nik_bpmp != '':
-                        score = fuzz.ratio(npwp_mentah, nik_bpmp)
-                        if score > best_match_score and score >= 80:
-                            best_match_score = score
-                            matched_bpmp = row_bpmp
+            pos_bpmp = match_bpmp[pos_mentah]
+            if pos_bpmp is not None:
+                matched_bpmp = df_bpmp.iloc[pos_bpmp]
             
             # Jika tidak ada match berdasarkan NPWP, coba match berdasarkan urutan baris
             if matched_bpmp is None and idx_mentah < len(df_bpmp):
@@ -433,30 +601,13 @@ def show():
             nik_bpmp = npwp_mentah # default ke NPWP dari mentah
             
             if matched_bpmp is not None:
-                # Cari kolom Posisi
-                posisi_col = None
-                for col in df_bpmp.columns:
-                    if 'POSISI' in col.upper():
-                        posisi_col = col
-                        break
                 if posisi_col:
                     posisi = format_nilai_asli(matched_bpmp.get(posisi_col, ''))
                 
-                # Cari kolom NIK
-                nik_col = None
-                for col in df_bpmp.columns:
-                    if 'NPWP' in col.upper() or 'NIK' in col.upper() or 'TIN' in col.upper():
-                        nik_col = col
-                        break
-                if nik_col:
-                    nik_from_bpmp = format_nilai_asli(matched_bpmp.get(nik_col, ''))
+                if nik_col_bpmp:
+                    nik_from_bpmp = format_nilai_asli(matched_bpmp.get(nik_col_bpmp, ''))
                     if nik_from_bpmp:
                         nik_bpmp = nik_from_bpmp
-            # ===== END PERUBAHAN =====
-            
-            # Ambil data lainnya dari mentah
-            kdgol = format_nilai_asli(row_mentah.get('kdgol', '')) if 'kdgol' in df_mentah.columns else ''
-            kdkawin = format_nilai_asli(row_mentah.get('kdkawin', '')) if 'kdkawin' in df_mentah.columns else ''
             
             # Filter PNS/PPPK
             pns_pppk = ''
@@ -475,22 +626,22 @@ def show():
             # ===== END PERUBAHAN =====
             
             row_data = {
-                'No': idx_mentah + 1,
+                'No': row_siap['No'],
                 'PNS/PPPK': pns_pppk,
-                'Nama': nama,
+                'Nama': row_siap['Nama'],
                 'NIK': nik_bpmp,
                 'ID PENERIMA TKU': id_penerima_tku,  # Menggunakan format baru
-                'KDGOL': kdgol,
-                'KODE OBJEK PAJAK': konversi_kode_objek(kdgol),
-                'KDKAWIN': kdkawin,
-                'STATUS': konversi_status(kdkawin),
-                'NIP': nip,
-                'nmrek': format_nilai_asli(row_mentah.get('nmrek', '')),
-                'nm_bank': format_nilai_asli(row_mentah.get('nm_bank', '')),
-                'rekening': format_angka_panjang(row_mentah.get('rekening', '')),
-                'kdbankspan': format_nilai_asli(row_mentah.get('kdbankspan', '')),
-                'nmbankspan': format_nilai_asli(row_mentah.get('nmbankspan', '')),
-                'kdpos': format_nilai_asli(row_mentah.get('kdpos', '')),
+                'KDGOL': row_siap['KDGOL'],
+                'KODE OBJEK PAJAK': row_siap['KODE OBJEK PAJAK'],
+                'KDKAWIN': row_siap['KDKAWIN'],
+                'STATUS': row_siap['STATUS'],
+                'NIP': row_siap['NIP'],
+                'nmrek': row_siap['nmrek'],
+                'nm_bank': row_siap['nm_bank'],
+                'rekening': row_siap['rekening'],
+                'kdbankspan': row_siap['kdbankspan'],
+                'nmbankspan': row_siap['nmbankspan'],
+                'kdpos': row_siap['kdpos'],
                 'ID TKU': id_tku,  # Menggunakan nilai default
                 'AKTIF/TIDAK': 'AKTIF',
                 'Keterangan': ''
@@ -507,105 +658,150 @@ def show():
             if col in df_hasil.columns:
                 df_hasil[col] = df_hasil[col].apply(format_angka_panjang)
         # ===== END PERUBAHAN =====
+        return df_hasil
+    
+    def gabung_master(df_hasil, df_master_existing):
+        """Tandai status warna terhadap Master Existing dan tambahkan data lama yang tidak aktif"""
+        if df_master_existing is None or df_master_existing.empty:
+            # Semua data baru
+            df_hasil['Status_Color'] = 'HIJAU'
+            return df_hasil
         
-        # Merge dengan master existing jika ada
-        if df_master_existing is not None and not df_master_existing.empty:
-            # Normalisasi kolom master existing
-            df_master_existing.columns = [str(col).strip() for col in df_master_existing.columns]
+        # Tandai data yang sudah ada
+        match_master = fuzzy_match_banyak(
+            list(zip(df_hasil['Nama'].tolist(), df_hasil['NIP'].tolist())), df_master_existing, 'baru_ke_lama'
+        )
+        # Kolom master existing di-resolve sekali (bukan per baris)
+        kolom_master = resolve(df_master_existing, 'master')
+        ket_col = kolom_master['keterangan']
+        
+        for pos, (idx, row) in enumerate(df_hasil.iterrows()):
+            match_idx = match_master[pos]
             
-            st.write("**Kolom Master Existing:**", df_master_existing.columns.tolist())
+            if match_idx is not None:
+                # Data sudah ada - tandai KUNING
+                df_hasil.at[idx, 'Status_Color'] = 'KUNING'
+                
+                # Update keterangan jika ada
+                if ket_col:
+                    existing_ket = df_master_existing.at[match_idx, ket_col]
+                    if pd.notna(existing_ket) and existing_ket:
+                        df_hasil.at[idx, 'Keterangan'] = format_nilai_asli(existing_ket)
+            else:
+                # Data baru
+                df_hasil.at[idx, 'Status_Color'] = 'HIJAU'
+        
+        # Cek data lama yang tidak ada di bulan ini (MERAH)
+        # Fuzzy matching data lama -> data bulan ini sekaligus (paralel jika datanya besar)
+        nama_col_lama, nip_col_lama = cari_kolom_nama_nip(df_master_existing)
+        match_lama = [None] * len(df_master_existing)
+        if nama_col_lama and nip_col_lama:
+            match_lama = fuzzy_match_banyak([
+                (format_nilai_asli(n), format_nilai_asli(x))
+                for n, x in zip(df_master_existing[nama_col_lama].tolist(), df_master_existing[nip_col_lama].tolist())
+            ], df_hasil, 'lama_ke_baru')
+        jumlah_hasil_awal = len(df_hasil)
+        
+        for pos_old, (idx, row_old) in enumerate(df_master_existing.iterrows()):
+            if not nama_col_lama or not nip_col_lama:
+                break
             
-            # Tandai data yang sudah ada
-            for idx, row in df_hasil.iterrows():
-                match_idx = fuzzy_match_row(row['Nama'], row['NIP'], df_master_existing)
-                
-                if match_idx is not None:
-                    # Data sudah ada - tandai KUNING
-                    df_hasil.at[idx, 'Status_Color'] = 'KUNING'
-                    
-                    # Cari kolom Keterangan dengan fleksibel
-                    ket_col = None
-                    for col in df_master_existing.columns:
-                        if 'KETERANGAN' in str(col).upper():
-                            ket_col = col
-                            break
-                    
-                    # Update keterangan jika ada
-                    if ket_col:
-                        existing_ket = df_master_existing.at[match_idx, ket_col]
-                        if pd.notna(existing_ket) and existing_ket:
-                            df_hasil.at[idx, 'Keterangan'] = format_nilai_asli(existing_ket)
-                else:
-                    # Data baru
-                    df_hasil.at[idx, 'Status_Color'] = 'HIJAU'
+            nama_old = format_nilai_asli(row_old.get(nama_col_lama, ''))
+            nip_old = format_nilai_asli(row_old.get(nip_col_lama, ''))
             
-            # Cek data lama yang tidak ada di bulan ini (MERAH)
-            for idx, row_old in df_master_existing.iterrows():
-                # Cari kolom Nama dan NIP di master existing
-                nama_col = None
-                nip_col = None
-                
-                for col in df_master_existing.columns:
-                    col_upper = str(col).upper()
-                    if 'NAMA' in col_upper and nama_col is None:
-                        nama_col = col
-                    if 'NIP' in col_upper and nip_col is None:
-                        nip_col = col
-                
-                if not nama_col or not nip_col:
-                    continue
+            match_idx = match_lama[pos_old]
+            if match_idx is None and len(df_hasil) > jumlah_hasil_awal:
+                # Data lama yang sudah ditambahkan di atas juga ikut dicek
+                match_idx = fuzzy_match_row(nama_old, nip_old, df_hasil.iloc[jumlah_hasil_awal:])
+            
+            if match_idx is None:
+                # Data tidak ada di bulan ini - tambahkan dengan status TIDAK AKTIF
+                row_old_dict = row_old.to_dict()
                 
-                nama_old = format_nilai_asli(row_old.get(nama_col, ''))
-                nip_old = format_nilai_asli(row_old.get(nip_col, ''))
+                # ===== PERUBAHAN: UNTUK DATA LAMA YANG TIDAK AKTIF =====
+                # Format ID PENERIMA TKU dari NIK master lama
+                nik_master = format_nilai_asli(row_old_dict.get('NIK', ''))
+                id_penerima_tku_old = f"{nik_master}000000" if nik_master and nik_master.strip() != '' else ''
                 
-                match_idx = fuzzy_match_row(nama_old, nip_old, df_hasil)
+                # ID TKU tetap menggunakan nilai default
+                id_tku_old = "0001658723701000000000"
+                # ===== END PERUBAHAN =====
                 
-                if match_idx is None:
-                    # Data tidak ada di bulan ini - tambahkan dengan status TIDAK AKTIF
-                    row_old_dict = row_old.to_dict()
-                    
-                    # ===== PERUBAHAN: UNTUK DATA LAMA YANG TIDAK AKTIF =====
-                    # Format ID PENERIMA TKU dari NIK master lama
-                    nik_master = format_nilai_asli(row_old_dict.get('NIK', ''))
-                    id_penerima_tku_old = f"{nik_master}000000" if nik_master and nik_master.strip() != '' else ''
-                    
-                    # ID TKU tetap menggunakan nilai default
-                    id_tku_old = "0001658723701000000000"
-                    # ===== END PERUBAHAN =====
-                    
-                    # Map kolom dari master existing ke format hasil
-                    new_row = {
-                        'No': len(df_hasil) + 1,
-                        'PNS/PPPK': format_nilai_asli(row_old_dict.get('PNS/PPPK', '')),
-                        'Nama': nama_old,
-                        'NIK': format_nilai_asli(row_old_dict.get('NIK', '')),
-                        'ID PENERIMA TKU': id_penerima_tku_old,  # Menggunakan format baru
-                        'KDGOL': format_nilai_asli(row_old_dict.get('KDGOL', '')),
-                        'KODE OBJEK PAJAK': format_nilai_asli(row_old_dict.get('KODE OBJEK PAJAK', '')),
-                        'KDKAWIN': format_nilai_asli(row_old_dict.get('KDKAWIN', '')),
-                        'STATUS': format_nilai_asli(row_old_dict.get('STATUS', '')),
-                        'NIP': nip_old,
-                        'nmrek': format_nilai_asli(row_old_dict.get('nmrek', '')),
-                        'nm_bank': format_nilai_asli(row_old_dict.get('nm_bank', '')),
-                        'rekening': format_angka_panjang(row_old_dict.get('rekening', '')),
-                        'kdbankspan': format_nilai_asli(row_old_dict.get('kdbankspan', '')),
-                        'nmbankspan': format_nilai_asli(row_old_dict.get('nmbankspan', '')),
-                        'kdpos': format_nilai_asli(row_old_dict.get('kdpos', '')),
-                        'ID TKU': id_tku_old,  # Menggunakan nilai default
-                        'AKTIF/TIDAK': 'TIDAK',
-                        'Keterangan': format_nilai_asli(row_old_dict.get('Keterangan', '')),
-                        'Status_Color': 'MERAH'
-                    }
-                    
-                    df_hasil = pd.concat([df_hasil, pd.DataFrame([new_row])], ignore_index=True)
-        else:
-            # Semua data baru
-            df_hasil['Status_Color'] = 'HIJAU'
+                # Map kolom dari master existing ke format hasil
+                new_row = {
+                    'No': len(df_hasil) + 1,
+                    'PNS/PPPK': format_nilai_asli(row_old_dict.get('PNS/PPPK', '')),
+                    'Nama': nama_old,
+                    'NIK': format_nilai_asli(row_old_dict.get('NIK', '')),
+                    'ID PENERIMA TKU': id_penerima_tku_old,  # Menggunakan format baru
+                    'KDGOL': format_nilai_asli(row_old_dict.get('KDGOL', '')),
+                    'KODE OBJEK PAJAK': format_nilai_asli(row_old_dict.get('KODE OBJEK PAJAK', '')),
+                    'KDKAWIN': format_nilai_asli(row_old_dict.get('KDKAWIN', '')),
+                    'STATUS': format_nilai_asli(row_old_dict.get('STATUS', '')),
+                    'NIP': nip_old,
+                    'nmrek': format_nilai_asli(row_old_dict.get('nmrek', '')),
+                    'nm_bank': format_nilai_asli(row_old_dict.get('nm_bank', '')),
+                    'rekening': format_angka_panjang(row_old_dict.get('rekening', '')),
+                    'kdbankspan': format_nilai_asli(row_old_dict.get('kdbankspan', '')),
+                    'nmbankspan': format_nilai_asli(row_old_dict.get('nmbankspan', '')),
+                    'kdpos': format_nilai_asli(row_old_dict.get('kdpos', '')),
+                    'ID TKU': id_tku_old,  # Menggunakan nilai default
+                    'AKTIF/TIDAK': 'TIDAK',
+                    'Keterangan': format_nilai_asli(row_old_dict.get('Keterangan', '')),
+                    'Status_Color': 'MERAH'
+                }
+                
+                df_hasil = pd.concat([df_hasil, pd.DataFrame([new_row])], ignore_index=True)
         
         return df_hasil
     
+    # Mentah -> siapkan -> cocokkan BPMP -> gabung master; duplikat dicek per file
+    alur = Alur('croscheck_pns')
+    alur.tambah('mentah_rapi', rapikan_kolom, ['mentah'])
+    alur.tambah('bpmp_rapi', rapikan_kolom, ['bpmp'])
+    alur.tambah('master_rapi', rapikan_kolom, ['master'])
+    alur.tambah('duplikat_mentah', duplikat_mentah, ['mentah_rapi'])
+    alur.tambah('duplikat_bpmp', duplikat_bpmp, ['bpmp_rapi'])
+    alur.tambah('duplikat_master', duplikat_master, ['master_rapi'])
+    alur.tambah('siapkan_mentah', siapkan_mentah, ['mentah_rapi'], disk=True)
+    alur.tambah('cocokkan_bpmp', cocokkan_bpmp, ['siapkan_mentah', 'bpmp_rapi'], disk=True)
+    alur.tambah('gabung_master', gabung_master, ['cocokkan_bpmp', 'master_rapi'], disk=True)
+    alur.tambah('duplikat_hasil', duplikat_hasil, ['gabung_master'])
+    
+    def process_data(df_mentah, df_bpmp, df_master_existing=None, identitas_sumber=None):
+        """Proses data dari file mentah dan BPMP ke format master lewat alur tahap.
+        
+        Return dict hasil tahap (gabung_master, duplikat_hasil, frame sumber yang
+        sudah dirapikan), atau None jika file wajib belum lengkap.
+        """
+        if df_mentah is None or df_bpmp is None:
+            st.warning("⚠️ Pastikan file Data Mentah dan BPMP sudah di-upload!")
+            return None
+        
+        hasil_alur, laporan = alur.jalankan(
+            {'mentah': df_mentah, 'bpmp': df_bpmp, 'master': df_master_existing},
+            ['mentah_rapi', 'bpmp_rapi', 'master_rapi', 'gabung_master', 'duplikat_hasil'],
+            identitas_sumber,
+        )
+        df_mentah = hasil_alur['mentah_rapi']
+        df_bpmp = hasil_alur['bpmp_rapi']
+        df_master_existing = hasil_alur['master_rapi']
+        
+        # Debug: tampilkan kolom yang tersedia
+        st.write("**Kolom Data Mentah:**", df_mentah.columns.tolist()[:15])
+        st.write("**Kolom Data BPMP:**", df_bpmp.columns.tolist())
+        with st.expander("🧭 Pemetaan Kolom Otomatis"):
+            st.dataframe(pd.DataFrame(jelaskan(df_bpmp, 'bpmp')), use_container_width=True)
+        if df_master_existing is not None and not df_master_existing.empty:
+            st.write("**Kolom Master Existing:**", df_master_existing.columns.tolist())
+        
+        st.caption(f"🧩 {ringkas_laporan(laporan)}")
+        with st.expander("Detail tahap proses"):
+            st.dataframe(pd.DataFrame(laporan), hide_index=True, use_container_width=True)
+        return hasil_alur
+    
     def create_excel_with_colors(df):
-        """Buat Excel dengan warna berdasarkan status"""
+        """Buat Excel dengan warna berdasarkan status (+ salinan data tertanam untuk upload ulang)"""
         output = BytesIO()
         
         # Hapus kolom helper
@@ -648,8 +844,27 @@ def show():
                     for col in range(1, len(df_export.columns) + 1):
                         worksheet.cell(row=excel_row, column=col).fill = green_fill
         
-        output.seek(0)
-        return output
+        return tanam_sidecar(output, df_export)
+    
+    def create_excel_polos(df_show):
+        """Excel tanpa warna (+ salinan data tertanam untuk upload ulang)"""
+        output = BytesIO()
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            df_show.to_excel(writer, index=False, sheet_name='Master Data')
+        return tanam_sidecar(output, df_show)
+    
+    def ekspor_warna(df):
+        """Bytes Excel berwarna (tahap ekspor)"""
+        return create_excel_with_colors(df).getvalue()
+    
+    def ekspor_polos(df_show):
+        """Bytes Excel tanpa warna (tahap ekspor)"""
+        return create_excel_polos(df_show).getvalue()
+    
+    # File download dikunci isi tabel yang ditampilkan: rerun tanpa perubahan
+    # tidak menulis ulang xlsx maupun salinan Arrow-nya
+    alur.tambah('excel_warna', ekspor_warna, ['tampil'])
+    alur.tambah('excel_polos', ekspor_polos, ['tampil'])
     
     # ===== UI UNTUK FITUR MASTER DATA =====
     st.title("🔍 CROSCHECK DATA PNS")
@@ -735,13 +950,32 @@ def show():
     st.markdown("---")
     
     # Baca file
-    df_mentah = read_excel_flexible(uploaded_mentah, HEADERS_MENTAH, "Data Mentah")
-    df_bpmp = read_excel_flexible(uploaded_bpmp, HEADERS_BPMP, "Data BPMP")
-    df_master_existing = read_excel_flexible(uploaded_master, HEADERS_MASTER, "Master Existing")
+    # Ketiga file independen: diparse bersamaan, waktu baca ~ file paling lambat
+    hasil_baca, kunci_baca = baca_upload_paralel([
+        ("Data Mentah", uploaded_mentah, HEADERS_MENTAH),
+        ("Data BPMP", uploaded_bpmp, HEADERS_BPMP),
+        ("Master Existing", uploaded_master, HEADERS_MASTER),
+    ])
+    df_mentah = hasil_baca["Data Mentah"]
+    df_bpmp = hasil_baca["Data BPMP"]
+    df_master_existing = hasil_baca["Master Existing"]
+    
+    # Kunci sumber alur = kunci isi file (file yang tidak berubah tidak di-hash ulang)
+    label_sumber = {'mentah': "Data Mentah", 'bpmp': "Data BPMP", 'master': "Master Existing"}
+    identitas_sumber = {nama: kunci_baca[label] for nama, label in label_sumber.items()
+                        if hasil_baca[label] is not None}
     
     # ===== VALIDASI DUPLIKASI UNTUK SEMUA FILE =====
     st.subheader("🔍 Validasi Duplikasi NIP dan NPWP/NIK")
     
+    # Duplikasi dicek per file; file yang tidak berubah memakai hasil sebelumnya
+    duplikat, laporan_duplikat = alur.jalankan(
+        {'mentah': df_mentah, 'bpmp': df_bpmp, 'master': df_master_existing},
+        ['duplikat_mentah', 'duplikat_bpmp', 'duplikat_master'],
+        identitas_sumber,
+    )
+    st.caption(f"🧩 {ringkas_laporan(laporan_duplikat)}")
+    
     # Inisialisasi status duplikasi
     duplicate_status = {
         'mentah_nip': False,
@@ -760,7 +994,7 @@ def show():
         with col_check1:
             # Cek NIP duplikat di Data Mentah
             if 'nip' in df_mentah.columns:
-                df_nip_dup_mentah, dup_nip_values = check_duplicates(df_mentah, 'nip', 'Data Mentah')
+                df_nip_dup_mentah, dup_nip_values = duplikat['duplikat_mentah']['nip']
                 if df_nip_dup_mentah is not None:
                     duplicate_status['mentah_nip'] = True
                     st.error(f"❌ **DITEMUKAN {len(dup_nip_values)} NIP DUPLIKAT DI DATA MENTAH**")
@@ -772,7 +1006,7 @@ def show():
         with col_check2:
             # Cek NPWP duplikat di Data Mentah
             if 'npwp' in df_mentah.columns:
-                df_npwp_dup_mentah, dup_npwp_values = check_duplicates(df_mentah, 'npwp', 'Data Mentah')
+                df_npwp_dup_mentah, dup_npwp_values = duplikat['duplikat_mentah']['npwp']
                 if df_npwp_dup_mentah is not None:
                     duplicate_status['mentah_npwp'] = True
                     st.error(f"❌ **DITEMUKAN {len(dup_npwp_values)} NPWP DUPLIKAT DI DATA MENTAH**")
@@ -788,14 +1022,10 @@ def show():
         with col_check3:
             # Cek NIP duplikat di Master Existing
             # Cari kolom NIP dengan pencarian fleksibel
-            nip_col_master = None
-            for col in df_master_existing.columns:
-                if 'NIP' in str(col).upper():
-                    nip_col_master = col
-                    break
+            nip_col_master = resolve(df_master_existing, 'master')['nip']
             
             if nip_col_master:
-                df_nip_dup_master, dup_nip_master_values = check_duplicates(df_master_existing, nip_col_master, 'Master Existing')
+                df_nip_dup_master, dup_nip_master_values = duplikat['duplikat_master'].get('nip', (None, []))
                 if df_nip_dup_master is not None:
                     duplicate_status['master_nip'] = True
                     st.error(f"❌ **DITEMUKAN {len(dup_nip_master_values)} NIP DUPLIKAT DI MASTER EXISTING**")
@@ -807,14 +1037,10 @@ def show():
         with col_check4:
             # Cek NIK duplikat di Master Existing
             # Cari kolom NIK dengan pencarian fleksibel
-            nik_col_master = None
-            for col in df_master_existing.columns:
-                if 'NIK' in str(col).upper() and 'PENERIMA' not in str(col).upper():
-                    nik_col_master = col
-                    break
+            nik_col_master = resolve(df_master_existing, 'master')['nik']
             
             if nik_col_master:
-                df_nik_dup_master, dup_nik_master_values = check_duplicates(df_master_existing, nik_col_master, 'Master Existing')
+                df_nik_dup_master, dup_nik_master_values = duplikat['duplikat_master'].get('nik', (None, []))
                 if df_nik_dup_master is not None:
                     duplicate_status['master_nik'] = True
                     st.error(f"❌ **DITEMUKAN {len(dup_nik_master_values)} NIK DUPLIKAT DI MASTER EXISTING**")
@@ -826,24 +1052,16 @@ def show():
     # Cek duplikasi di Data BPMP
     if df_bpmp is not None:
         # Cari kolom NPWP/NIK/TIN di BPMP
-        nik_col_bpmp = None
-        for col in df_bpmp.columns:
-            if 'NPWP' in col.upper() or 'NIK' in col.upper() or 'TIN' in col.upper():
-                nik_col_bpmp = col
-                break
+        nik_col_bpmp = resolve(df_bpmp, 'bpmp')['nik']
         
         if nik_col_bpmp:
-            df_nik_dup_bpmp, dup_nik_bpmp_values = check_duplicates(df_bpmp, nik_col_bpmp, 'Data BPMP')
+            df_nik_dup_bpmp, dup_nik_bpmp_values = duplikat['duplikat_bpmp'].get('nik', (None, []))
             if df_nik_dup_bpmp is not None:
                 duplicate_status['bpmp_nik'] = True
                 st.error(f"❌ **DITEMUKAN {len(dup_nik_bpmp_values)} NPWP/NIK DUPLIKAT DI DATA BPMP**")
                 with st.expander("🔍 Lihat Detail NPWP/NIK Duplikat di Data BPMP"):
                     # Cari kolom nama di BPMP
-                    nama_col_bpmp = None
-                    for col in df_bpmp.columns:
-                        if 'NAMA' in col.upper() or 'PEGAWAI' in col.upper():
-                            nama_col_bpmp = col
-                            break
+                    nama_col_bpmp = resolve(df_bpmp, 'bpmp')['nama']
                     
                     if nama_col_bpmp:
                         st.dataframe(df_nik_dup_bpmp[['Baris_Asli', 'Nilai_Duplikat', nama_col_bpmp]].head(20))
@@ -899,12 +1117,18 @@ def show():
             st.error("⚠️ Tidak dapat memproses data karena terdapat duplikasi. Perbaiki terlebih dahulu.")
         else:
             with st.spinner("Memproses data..."):
-                df_hasil = process_data(df_mentah, df_bpmp, df_master_existing)
+                hasil_alur = process_data(df_mentah, df_bpmp, df_master_existing, identitas_sumber)
                 
-                if df_hasil is not None:
+                if hasil_alur is not None:
+                    df_hasil = hasil_alur['gabung_master']
+                    # Frame sumber yang disimpan adalah versi dengan nama kolom sudah dirapikan
+                    df_mentah = hasil_alur['mentah_rapi']
+                    df_bpmp = hasil_alur['bpmp_rapi']
+                    df_master_existing = hasil_alur['master_rapi']
+                    
                     # Cek duplikasi di hasil
-                    df_nip_dup_hasil, dup_nip_hasil = check_duplicates(df_hasil, 'NIP', 'Hasil')
-                    df_nik_dup_hasil, dup_nik_hasil = check_duplicates(df_hasil, 'NIK', 'Hasil')
+                    df_nip_dup_hasil, dup_nip_hasil = hasil_alur['duplikat_hasil']['NIP']
+                    df_nik_dup_hasil, dup_nik_hasil = hasil_alur['duplikat_hasil']['NIK']
                     
                     if df_nip_dup_hasil is not None:
                         duplicate_status['hasil_nip'] = True
@@ -923,17 +1147,37 @@ def show():
                     has_duplicates = any(duplicate_status.values())
                     
                     if not has_duplicates:
-                        st.session_state['df_hasil'] = df_hasil
-                        st.session_state['df_master_existing'] = df_master_existing
-                        st.session_state['df_mentah'] = df_mentah
-                        st.session_state['df_bpmp'] = df_bpmp
+                        # Disimpan dengan dtype ringkas (identitas string[pyarrow], kode category, rupiah int64)
+                        st.session_state['laporan_memori'] = simpan_ringkas(
+                            st.session_state,
+                            df_hasil=df_hasil,
+                            df_master_existing=df_master_existing,
+                            df_mentah=df_mentah,
+                            df_bpmp=df_bpmp,
+                        )
                         st.success("✅ Data berhasil diproses!")
+                        # Master hasil croscheck didaftarkan untuk cek identitas lintas PNS/PPPK
+                        try:
+                            identitas_lintas.daftarkan('pns', df_hasil, 'croscheck_pns')
+                        except Exception as e:
+                            st.warning(f"⚠️ Master tidak terdaftar untuk cek identitas lintas PNS/PPPK: {str(e)}")
                     else:
                         st.error("❌ Proses data gagal karena menghasilkan data duplikat. Periksa file sumber.")
     
     # Tampilkan hasil
     if 'df_hasil' in st.session_state:
         st.markdown("---")
+        identitas_lintas.tampilkan_identitas_lintas('pns')
+        
+        if st.session_state.get('laporan_memori'):
+            with st.expander("🧠 Laporan Memori Session (dtype ringkas)", expanded=False):
+                df_laporan = pd.DataFrame(st.session_state['laporan_memori'])
+                st.dataframe(df_laporan, use_container_width=True, hide_index=True)
+                st.caption(f"Total: {df_laporan['Sebelum (MB)'].sum():.2f} MB → {df_laporan['Sesudah (MB)'].sum():.2f} MB")
+                st.markdown("**Lokasi frame sesi** (frame lama dipindah ke disk jika melebihi batas memori)")
+                st.dataframe(pd.DataFrame(ringkasan_sesi(st.session_state)), use_container_width=True, hide_index=True)
+                st.markdown("**Master bersama** (satu salinan per versi master untuk semua sesi)")
+                st.dataframe(pd.DataFrame(info_master()), use_container_width=True, hide_index=True)
         
         # Cek apakah ada duplikasi di hasil sebelum menampilkan tab
         current_has_duplicates = st.session_state.get('duplicate_status', {}).get('hasil_nip', False) or \
@@ -951,7 +1195,8 @@ def show():
         with tab1:
             st.subheader("📋 Hasil Master Data Baru")
             
-            df_display = st.session_state['df_hasil'].copy()
+            # Copy-on-Write aktif: tidak perlu salinan defensif, data dibagi sampai diubah
+            df_display = st.session_state['df_hasil']
             
             # Cek duplikasi di tab ini juga
             if current_has_duplicates:
@@ -1009,15 +1254,13 @@ def show():
             download_disabled = current_has_duplicates
             
             if download_format == "Excel dengan warna":
-                excel_file = create_excel_with_colors(df_display)
+                hasil_ekspor, _ = alur.jalankan({'tampil': df_display}, ['excel_warna'])
+                excel_file = hasil_ekspor['excel_warna']
                 file_name = "master_data_pegawai.xlsx"
                 mime_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             elif download_format == "Excel tanpa warna":
-                output = BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    df_show.to_excel(writer, index=False, sheet_name='Master Data')
-                output.seek(0)
-                excel_file = output
+                hasil_ekspor, _ = alur.jalankan({'tampil': df_show}, ['excel_polos'])
+                excel_file = hasil_ekspor['excel_polos']
                 file_name = "master_data_pegawai_tanpa_warna.xlsx"
                 mime_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             else:  # CSV
@@ -1118,12 +1361,19 @@ def show():
                 # Buat dataframe perbandingan
                 comparison_data = []
                 
-                for idx_new, row_new in df_new.iterrows():
+                # Fuzzy matching semua baris master baru sekaligus (paralel jika datanya besar)
+                nama_semua_new = df_new['Nama'].tolist() if 'Nama' in df_new.columns else [''] * len(df_new)
+                nip_semua_new = df_new['NIP'].tolist() if 'NIP' in df_new.columns else [''] * len(df_new)
+                match_baru = fuzzy_match_banyak([
+                    (format_nilai_asli(n), format_nilai_asli(x)) for n, x in zip(nama_semua_new, nip_semua_new)
+                ], df_old, 'baru_ke_lama')
+                
+                for pos_new, (idx_new, row_new) in enumerate(df_new.iterrows()):
                     nama_new = format_nilai_asli(row_new.get('Nama', ''))
                     nip_new = format_nilai_asli(row_new.get('NIP', ''))
                     
                     # Cari matching row di master lama
-                    match_idx = fuzzy_match_row(nama_new, nip_new, df_old)
+                    match_idx = match_baru[pos_new]
                     
                     if match_idx is not None:
                         row_old = df_old.iloc[match_idx]
@@ -1154,25 +1404,23 @@ def show():
                     comparison_data.append(comparison_row)
                 
                 # Tambahkan data yang hilang (ada di master lama tapi tidak di master baru)
-                for idx_old, row_old in df_old.iterrows():
+                nama_col_old, nip_col_old = cari_kolom_nama_nip(df_old)
+                match_hilang = [None] * len(df_old)
+                if nama_col_old and nip_col_old:
+                    match_hilang = fuzzy_match_banyak([
+                        (format_nilai_asli(n), format_nilai_asli(x))
+                        for n, x in zip(df_old[nama_col_old].tolist(), df_old[nip_col_old].tolist())
+                    ], df_new, 'lama_ke_baru')
+                
+                for pos_old, (idx_old, row_old) in enumerate(df_old.iterrows()):
                     nama_old = format_nilai_asli(row_old.get('Nama', ''))
                     nip_old = format_nilai_asli(row_old.get('NIP', ''))
                     
-                    # Cek apakah kolom ada
-                    nama_col = None
-                    nip_col = None
-                    for col in df_old.columns:
-                        col_upper = str(col).upper()
-                        if 'NAMA' in col_upper and nama_col is None:
-                            nama_col = col
-                        if 'NIP' in col_upper and nip_col is None:
-                            nip_col = col
-                    
-                    if nama_col and nip_col:
-                        nama_old = format_nilai_asli(row_old.get(nama_col, ''))
-                        nip_old = format_nilai_asli(row_old.get(nip_col, ''))
+                    if nama_col_old and nip_col_old:
+                        nama_old = format_nilai_asli(row_old.get(nama_col_old, ''))
+                        nip_old = format_nilai_asli(row_old.get(nip_col_old, ''))
                         
-                        match_idx = fuzzy_match_row(nama_old, nip_old, df_new)
+                        match_idx = match_hilang[pos_old]
                         
                         if match_idx is None:
                             comparison_row = {
@@ -1417,11 +1665,7 @@ def show():
                 df_npwp_dup_mentah_valid, _ = check_duplicates(df_mentah, 'npwp', 'Data Mentah (Validasi)')
                 
                 # Cari kolom NPWP/NIK/TIN di BPMP
-                nik_col_bpmp = None
-                for col in df_bpmp.columns:
-                    if 'NPWP' in col.upper() or 'NIK' in col.upper() or 'TIN' in col.upper():
-                        nik_col_bpmp = col
-                        break
+                nik_col_bpmp = resolve(df_bpmp, 'bpmp')['nik']
                 
                 if nik_col_bpmp:
                     df_nik_dup_bpmp_valid, _ = check_duplicates(df_bpmp, nik_col_bpmp, 'Data BPMP (Validasi)')
@@ -1467,38 +1711,18 @@ def show():
                 
                 # ===== PERUBAHAN: CARI KOLOM UNTUK PERBANDINGAN TAMBAHAN =====
                 # Cari kolom di Data Mentah untuk perbandingan
-                bulan_col_mentah = None
-                tahun_col_mentah = None
-                gaji_kotor_col_mentah = None
-                kdkawin_col_mentah = None
-                
-                for col in df_mentah.columns:
-                    col_lower = str(col).lower()
-                    if 'bulan' in col_lower and bulan_col_mentah is None:
-                        bulan_col_mentah = col
-                    elif 'tahun' in col_lower and tahun_col_mentah is None:
-                        tahun_col_mentah = col
-                    elif 'gajikotor' in col_lower.replace(' ', '') and gaji_kotor_col_mentah is None:
-                        gaji_kotor_col_mentah = col
-                    elif 'kdkawin' in col_lower and kdkawin_col_mentah is None:
-                        kdkawin_col_mentah = col
+                kolom_mentah = resolve(df_mentah, 'mentah')
+                bulan_col_mentah = kolom_mentah['bulan']
+                tahun_col_mentah = kolom_mentah['tahun']
+                gaji_kotor_col_mentah = kolom_mentah['gaji_kotor']
+                kdkawin_col_mentah = kolom_mentah['kdkawin']
                 
                 # Cari kolom di Data BPMP untuk perbandingan
-                masa_pajak_col_bpmp = None
-                tahun_pajak_col_bpmp = None
-                penghasilan_kotor_col_bpmp = None
-                status_col_bpmp = None
-                
-                for col in df_bpmp.columns:
-                    col_lower = str(col).lower()
-                    if 'masa' in col_lower and 'pajak' in col_lower and masa_pajak_col_bpmp is None:
-                        masa_pajak_col_bpmp = col
-                    elif 'tahun' in col_lower and 'pajak' in col_lower and tahun_pajak_col_bpmp is None:
-                        tahun_pajak_col_bpmp = col
-                    elif 'penghasilan' in col_lower and 'kotor' in col_lower and penghasilan_kotor_col_bpmp is None:
-                        penghasilan_kotor_col_bpmp = col
-                    elif 'status' in col_lower and 'pegawai' not in col_lower and status_col_bpmp is None:
-                        status_col_bpmp = col
+                kolom_bpmp = resolve(df_bpmp, 'bpmp')
+                masa_pajak_col_bpmp = kolom_bpmp['masa_pajak']
+                tahun_pajak_col_bpmp = kolom_bpmp['tahun_pajak']
+                penghasilan_kotor_col_bpmp = kolom_bpmp['penghasilan_kotor']
+                status_col_bpmp = kolom_bpmp['status']
                 # ===== END PERUBAHAN =====
                 
                 # Proses validasi
@@ -1507,31 +1731,133 @@ def show():
                 validation_data = []
                 
                 # Cari kolom NPWP/NIK/TIN di BPMP
-                nik_col_bpmp = None
-                for col in df_bpmp.columns:
-                    if 'NPWP' in col.upper() or 'NIK' in col.upper() or 'TIN' in col.upper():
-                        nik_col_bpmp = col
-                        break
+                nik_col_bpmp = resolve(df_bpmp, 'bpmp')['nik']
+                
+                # ===== REKONSILIASI CEPAT: TOTAL KONTROL PER (MASA, TAHUN) =====
+                # Periode yang jumlah, total kotor, dan digest NPWP-nya sama di kedua sisi
+                # tidak perlu divalidasi per baris; hanya periode yang berbeda masuk loop di bawah
+                def kolom_teks(df, col):
+                    if not col or col not in df.columns:
+                        return pd.Series('', index=df.index, dtype=object)
+                    return df[col].map(format_nilai_asli).astype(object)
+                
+                kolom_lengkap = all([
+                    nik_col_bpmp, bulan_col_mentah, tahun_col_mentah, gaji_kotor_col_mentah, kdkawin_col_mentah,
+                    masa_pajak_col_bpmp, tahun_pajak_col_bpmp, penghasilan_kotor_col_bpmp, status_col_bpmp,
+                ]) and 'nip' in df_mentah.columns and 'npwp' in df_mentah.columns
+                teks_mentah = pd.DataFrame({
+                    'nip': kolom_teks(df_mentah, 'nip'),
+                    'npwp': kolom_teks(df_mentah, 'npwp'),
+                    'nama': kolom_teks(df_mentah, 'nmpeg'),
+                    'bulan': kolom_teks(df_mentah, bulan_col_mentah),
+                    'tahun': kolom_teks(df_mentah, tahun_col_mentah),
+                    'gaji': kolom_teks(df_mentah, gaji_kotor_col_mentah),
+                    'kdkawin': kolom_teks(df_mentah, kdkawin_col_mentah),
+                })
+                teks_mentah['status_kawin'] = teks_mentah['kdkawin'].map(konversi_status)
+                teks_bpmp = pd.DataFrame({
+                    'nik': kolom_teks(df_bpmp, nik_col_bpmp),
+                    'masa': kolom_teks(df_bpmp, masa_pajak_col_bpmp),
+                    'tahun': kolom_teks(df_bpmp, tahun_pajak_col_bpmp),
+                    'kotor': kolom_teks(df_bpmp, penghasilan_kotor_col_bpmp),
+                    'status': kolom_teks(df_bpmp, status_col_bpmp),
+                })
+                
+                # Gaji kotor diparse sekali per kolom ke int64 sen (rekonsiliasi + validasi per baris)
+                kotor_sen_mentah, _, _ = parse_rupiah(teks_mentah['gaji'], SATUAN_SEN)
+                kotor_sen_bpmp, _, _ = parse_rupiah(teks_bpmp['kotor'], SATUAN_SEN)
+                sen_mentah = kotor_sen_mentah.astype(object).where(kotor_sen_mentah.notna(), None).to_dict()
+                
+                tabel_rekon, baris_cocok = rekonsiliasi(
+                    pd.DataFrame({
+                        'masa': teks_mentah['bulan'], 'tahun': teks_mentah['tahun'], 'npwp': teks_mentah['npwp'],
+                        'kotor': kotor_sen_mentah, 'status': teks_mentah['status_kawin'],
+                        'lengkap': kolom_lengkap & (teks_mentah['nip'] != ''),
+                    }),
+                    pd.DataFrame({
+                        'masa': teks_bpmp['masa'], 'tahun': teks_bpmp['tahun'], 'npwp': teks_bpmp['nik'],
+                        'kotor': kotor_sen_bpmp, 'status': teks_bpmp['status'],
+                        'lengkap': kolom_lengkap,
+                    }),
+                )
+                periode_cocok = int((tabel_rekon['Status'] == 'COCOK').sum())
+                if len(tabel_rekon) > 0 and periode_cocok == len(tabel_rekon):
+                    st.success(f"✅ **Fully reconciled** - {periode_cocok} periode, {int(baris_cocok.sum())} baris: "
+                               f"jumlah, total Penghasilan Kotor, dan digest NPWP sama. Validasi per baris dilewati.")
+                elif periode_cocok > 0:
+                    st.info(f"⚡ {periode_cocok} dari {len(tabel_rekon)} periode sudah cocok ({int(baris_cocok.sum())} baris). "
+                            f"Validasi per baris hanya untuk periode yang berbeda.")
+                with st.expander("🧮 Total Kontrol per Periode (Masa, Tahun)"):
+                    st.dataframe(tabel_rekon, use_container_width=True, hide_index=True)
+                
+                # Baris periode COCOK: semua perbandingan SESUAI, nilai BPMP diambil lewat NPWP
+                cocok = teks_mentah[baris_cocok]
+                pasangan = teks_bpmp[teks_bpmp['nik'] != ''].drop_duplicates('nik', keep='last').set_index('nik')
+                pasangan = pasangan.reindex(cocok['npwp'])
+                df_validasi_cepat = pd.DataFrame({
+                    'No': cocok.index + 1,
+                    'Nama': cocok['nama'].to_numpy(),
+                    'NIP (Data Mentah)': cocok['nip'].to_numpy(),
+                    'NPWP (Data Mentah)': cocok['npwp'].to_numpy(),
+                    'NPWP (Data BPMP)': cocok['npwp'].to_numpy(),
+                    'Bulan (Mentah)': cocok['bulan'].to_numpy(),
+                    'Masa Pajak (BPMP)': pasangan['masa'].to_numpy(),
+                    'Status Bulan': 'SESUAI',
+                    'Tahun (Mentah)': cocok['tahun'].to_numpy(),
+                    'Tahun Pajak (BPMP)': pasangan['tahun'].to_numpy(),
+                    'Status Tahun': 'SESUAI',
+                    'GajiKotor (Mentah)': cocok['gaji'].to_numpy(),
+                    'Penghasilan Kotor (BPMP)': pasangan['kotor'].to_numpy(),
+                    'Status Gaji Kotor': 'SESUAI',
+                    'KDKAWIN (Mentah)': cocok['kdkawin'].to_numpy(),
+                    'Status Kawin (Mentah)': cocok['status_kawin'].to_numpy(),
+                    'Status (BPMP)': pasangan['status'].to_numpy(),
+                    'Status Perbandingan Kawin': 'SESUAI',
+                    'Status': 'VALID',
+                    'Rekomendasi': 'Data lengkap dan cocok (Match: 100%)',
+                })
+                # ===== END REKONSILIASI CEPAT =====
                 
                 # ===== PERUBAHAN PENTING: BUAT DICTIONARY UNTUK MAPPING BPMP BERDASARKAN NIK =====
-                # Buat mapping dari NIK ke baris BPMP untuk pencarian yang lebih cepat
+                # Mapping NIK -> data BPMP untuk baris yang masih divalidasi per baris
+                # (dibangun dari kolom yang sudah diformat; dilewati jika semua periode cocok)
+                # ===== VALIDASI INKREMENTAL =====
+                # Baris yang isi, kunci NPWP, dan pasangan BPMP-nya tidak berubah sejak run
+                # sebelumnya memakai hasil lama; hanya sisanya yang masuk loop di bawah
+                teks_per_baris = teks_mentah[~baris_cocok]
+                hash_mentah = validasi_inkremental.hash_baris(teks_per_baris)
+                kunci_npwp = teks_per_baris['npwp']
+                pembanding_bpmp = validasi_inkremental.hash_pembanding(teks_bpmp, 'nik', keep='last')
+                konteks_bpmp = validasi_inkremental.konteks(
+                    'bpmp_pns', 1, list(teks_per_baris.columns), bulan_col_mentah, tahun_col_mentah,
+                    gaji_kotor_col_mentah, kdkawin_col_mentah, nik_col_bpmp, masa_pajak_col_bpmp,
+                    tahun_pajak_col_bpmp, penghasilan_kotor_col_bpmp, status_col_bpmp,
+                )
+                ulang_bpmp, hasil_lama_bpmp = validasi_inkremental.rencana_ulang(
+                    st.session_state.get('riwayat_validasi_bpmp'), konteks_bpmp,
+                    hash_mentah, kunci_npwp, pembanding_bpmp,
+                )
+                if hasil_lama_bpmp is not None and len(ulang_bpmp) > 0:
+                    st.caption(f"♻️ Validasi inkremental: {validasi_inkremental.ringkas(ulang_bpmp)}")
+                # ===== END VALIDASI INKREMENTAL =====
+                
                 bpmp_mapping = {}
-                if nik_col_bpmp:
-                    for idx_bpmp, row_bpmp in df_bpmp.iterrows():
-                        nik_bpmp = format_nilai_asli(row_bpmp.get(nik_col_bpmp, ''))
+                if nik_col_bpmp and ulang_bpmp.any():
+                    sen_bpmp = kotor_sen_bpmp.astype(object).where(kotor_sen_bpmp.notna(), None)
+                    for (nik_bpmp, masa_bpmp, tahun_bpmp, kotor_bpmp, status_bpmp), kotor_sen in zip(
+                            teks_bpmp.itertuples(index=False), sen_bpmp):
                         if nik_bpmp:
-                            # Simpan row dan data tambahan
-                            bpmp_data = {
-                                'row': row_bpmp,
-                                'masa_pajak': format_nilai_asli(row_bpmp.get(masa_pajak_col_bpmp, '')) if masa_pajak_col_bpmp else '',
-                                'tahun_pajak': format_nilai_asli(row_bpmp.get(tahun_pajak_col_bpmp, '')) if tahun_pajak_col_bpmp else '',
-                                'penghasilan_kotor': format_nilai_asli(row_bpmp.get(penghasilan_kotor_col_bpmp, '')) if penghasilan_kotor_col_bpmp else '',
-                                'status_bpmp': format_nilai_asli(row_bpmp.get(status_col_bpmp, '')) if status_col_bpmp else ''
+                            bpmp_mapping[nik_bpmp] = {
+                                'masa_pajak': masa_bpmp,
+                                'tahun_pajak': tahun_bpmp,
+                                'penghasilan_kotor': kotor_bpmp,
+                                'kotor_sen': kotor_sen,
+                                'status_bpmp': status_bpmp,
                             }
-                            bpmp_mapping[nik_bpmp] = bpmp_data
                 # ===== END PERUBAHAN =====
                 
-                for idx_mentah, row_mentah in df_mentah.iterrows():
+                indeks_ulang = ulang_bpmp.index[ulang_bpmp]
+                for idx_mentah, row_mentah in df_mentah.loc[indeks_ulang].iterrows():
                     nip_mentah = format_nilai_asli(row_mentah.get('nip', '')) if 'nip' in df_mentah.columns else ''
                     npwp_mentah = format_nilai_asli(row_mentah.get('npwp', '')) if 'npwp' in df_mentah.columns else ''
                     nama_mentah = format_nilai_asli(row_mentah.get('nmpeg', '')) if 'nmpeg' in df_mentah.columns else ''
@@ -1593,17 +1919,13 @@ def show():
                                 status_tahun = 'TIDAK SESUAI' if tahun_mentah != tahun_pajak_bpmp else 'SESUAI'
                         
                         if gaji_kotor_mentah and penghasilan_kotor_bpmp:
-                            try:
-                                # Bersihkan format angka
-                                gaji_mentah_clean = gaji_kotor_mentah.replace('.', '').replace(',', '.')
-                                gaji_bpmp_clean = penghasilan_kotor_bpmp.replace('.', '').replace(',', '.')
-                                
-                                gaji_mentah_num = float(gaji_mentah_clean)
-                                gaji_bpmp_num = float(gaji_bpmp_clean)
-                                
-                                # Toleransi 1 untuk perbedaan pembulatan
-                                status_gaji = 'SESUAI' if abs(gaji_mentah_num - gaji_bpmp_num) <= 1 else 'TIDAK SESUAI'
-                            except:
+                            # Nominal sudah diparse per kolom ke int64 sen; toleransi 1 rupiah untuk pembulatan
+                            gaji_mentah_sen = sen_mentah.get(idx_mentah)
+                            gaji_bpmp_sen = bpmp_data['kotor_sen']
+                            if gaji_mentah_sen is not None and gaji_bpmp_sen is not None:
+                                selisih = abs(gaji_mentah_sen - gaji_bpmp_sen)
+                                status_gaji = 'SESUAI' if selisih <= TOLERANSI_RUPIAH * SATUAN_SEN else 'TIDAK SESUAI'
+                            else:
                                 status_gaji = 'TIDAK SESUAI' if gaji_kotor_mentah != penghasilan_kotor_bpmp else 'SESUAI'
                         
                         # ===== TAMBAHAN: PERBANDINGAN STATUS KAWIN =====
@@ -1684,15 +2006,13 @@ def show():
                                     status_tahun = 'TIDAK SESUAI' if tahun_mentah != tahun_pajak_bpmp else 'SESUAI'
                             
                             if gaji_kotor_mentah and penghasilan_kotor_bpmp:
-                                try:
-                                    gaji_mentah_clean = gaji_kotor_mentah.replace('.', '').replace(',', '.')
-                                    gaji_bpmp_clean = penghasilan_kotor_bpmp.replace('.', '').replace(',', '.')
-                                    
-                                    gaji_mentah_num = float(gaji_mentah_clean)
-                                    gaji_bpmp_num = float(gaji_bpmp_clean)
-                                    
-                                    status_gaji = 'SESUAI' if abs(gaji_mentah_num - gaji_bpmp_num) <= 1 else 'TIDAK SESUAI'
-                                except:
+                                # Nominal sudah diparse per kolom ke int64 sen; toleransi 1 rupiah untuk pembulatan
+                                gaji_mentah_sen = sen_mentah.get(idx_mentah)
+                                gaji_bpmp_sen = bpmp_data['kotor_sen']
+                                if gaji_mentah_sen is not None and gaji_bpmp_sen is not None:
+                                    selisih = abs(gaji_mentah_sen - gaji_bpmp_sen)
+                                    status_gaji = 'SESUAI' if selisih <= TOLERANSI_RUPIAH * SATUAN_SEN else 'TIDAK SESUAI'
+                                else:
                                     status_gaji = 'TIDAK SESUAI' if gaji_kotor_mentah != penghasilan_kotor_bpmp else 'SESUAI'
                             
                             # ===== TAMBAHAN: PERBANDINGAN STATUS KAWIN UNTUK FUZZY MATCH =====
@@ -1775,10 +2095,28 @@ def show():
                         'Rekomendasi': rekomendasi
                     })
                 
-                df_validation = pd.DataFrame(validation_data)
+                df_validation = validasi_inkremental.gabung(
+                    pd.DataFrame(validation_data, index=indeks_ulang), hasil_lama_bpmp
+                )
+                st.session_state['riwayat_validasi_bpmp'] = validasi_inkremental.simpan_riwayat(
+                    df_validation, hash_mentah, kunci_npwp,
+                    kunci_npwp.isin(pembanding_bpmp.index) | (kunci_npwp == ''),
+                    konteks_bpmp, pembanding_bpmp,
+                )
+                df_validation = df_validation.reset_index(drop=True)
+                if not df_validasi_cepat.empty:
+                    bagian = [df_validasi_cepat] + ([df_validation] if not df_validation.empty else [])
+                    df_validation = pd.concat(bagian, ignore_index=True).sort_values('No', kind='stable').reset_index(drop=True)
                 
                 # Simpan ke session state untuk download
-                st.session_state['df_validation_bpmp'] = df_validation
+                simpan_ringkas(st.session_state, df_validation_bpmp=df_validation)
+
+                # Arsipkan hasil validasi per bulan/tahun Data Mentah (riwayat untuk analisis arsip)
+                try:
+                    periode_validasi, _ = pecah_periode(df_validation, 'Bulan (Mentah)', 'Tahun (Mentah)')
+                    arsipkan(ArsipBulanan('validasi_pns'), df_validation, (), periode_validasi)
+                except Exception as e:
+                    st.warning(f"⚠️ Hasil validasi tidak tersimpan ke arsip bulanan: {str(e)}")
                 
                 # Statistik validasi utama
                 st.markdown("### 📊 Ringkasan Validasi Utama")
@@ -2029,13 +2367,9 @@ def show():
                 df_npwp_dup_mentah_master, _ = check_duplicates(df_mentah, 'npwp', 'Data Mentah (Validasi Master)')
                 
                 # Cari kolom NIP dan NIK di Master
-                nip_col_master = None
-                nik_col_master = None
-                for col in df_master.columns:
-                    if 'NIP' in str(col).upper():
-                        nip_col_master = col
-                    if 'NIK' in str(col).upper() and 'PENERIMA' not in str(col).upper():
-                        nik_col_master = col
+                kolom_master = resolve(df_master, 'master')
+                nip_col_master = kolom_master['nip_terakhir']
+                nik_col_master = kolom_master['nik_terakhir']
                 
                 df_nip_dup_master_valid, _ = check_duplicates(df_master, nip_col_master, 'Master (Validasi)') if nip_col_master else (None, [])
                 df_nik_dup_master_valid, _ = check_duplicates(df_master, nik_col_master, 'Master (Validasi)') if nik_col_master else (None, [])
@@ -2152,19 +2486,46 @@ def show():
                 st.markdown("---")
                 
                 # Cari kolom di master dengan pencarian fleksibel
-                master_cols = {}
-                for master_col in comparison_mapping.keys():
-                    for col in df_master.columns:
-                        if master_col.upper() in str(col).upper():
-                            master_cols[master_col] = col
-                            break
+                master_cols = {
+                    field: col for field, col in petakan_nama(df_master, list(comparison_mapping)).items()
+                    if col is not None
+                }
                 
                 st.markdown("### 🔍 Hasil Validasi Data Mentah vs Master")
                 st.info(f"**Mapping Kolom:** Nama={comparison_mapping['Nama']}, NIP={comparison_mapping['NIP']}, NIK={comparison_mapping['NIK']}, KDGOL={comparison_mapping['KDGOL']}, KDKAWIN={comparison_mapping['KDKAWIN']}")
                 
+                # ===== VALIDASI INKREMENTAL =====
+                # Baris yang isinya dan baris Master dengan NIP yang sama tidak berubah sejak
+                # run sebelumnya memakai hasil lama; hanya sisanya yang dicari ulang di Master
+                teks_mentah_master = pd.DataFrame({
+                    kolom: df_mentah[kolom].map(format_nilai_asli) if kolom in df_mentah.columns else ''
+                    for kolom in ('nip', 'nmpeg', 'npwp', 'kdgol', 'kdkawin')
+                }, index=df_mentah.index)
+                teks_master = pd.DataFrame({
+                    field: df_master[col].map(format_nilai_asli) for field, col in master_cols.items()
+                }, index=df_master.index)
+                hash_mentah_master = validasi_inkremental.hash_baris(teks_mentah_master)
+                kunci_nip = teks_mentah_master['nip'].astype(str)
+                if 'NIP' in master_cols:
+                    pembanding_master = validasi_inkremental.hash_pembanding(teks_master, 'NIP', keep='first')
+                else:
+                    pembanding_master = pd.Series(dtype='uint64')
+                konteks_master = validasi_inkremental.konteks(
+                    'master_pns', 1, sorted(master_cols.items()),
+                    [kolom for kolom in ('nip', 'nmpeg', 'npwp', 'kdgol', 'kdkawin') if kolom in df_mentah.columns],
+                )
+                ulang_master, hasil_lama_master = validasi_inkremental.rencana_ulang(
+                    st.session_state.get('riwayat_validasi_master'), konteks_master,
+                    hash_mentah_master, kunci_nip, pembanding_master,
+                )
+                if hasil_lama_master is not None and len(ulang_master) > 0:
+                    st.caption(f"♻️ Validasi inkremental: {validasi_inkremental.ringkas(ulang_master)}")
+                # ===== END VALIDASI INKREMENTAL =====
+                
                 validation_master_data = []
                 
-                for idx_mentah, row_mentah in df_mentah.iterrows():
+                indeks_ulang_master = ulang_master.index[ulang_master]
+                for idx_mentah, row_mentah in df_mentah.loc[indeks_ulang_master].iterrows():
                     # Ambil data dari mentah
                     nip_mentah = format_nilai_asli(row_mentah.get('nip', '')) if 'nip' in df_mentah.columns else ''
                     nmpeg_mentah = format_nilai_asli(row_mentah.get('nmpeg', '')) if 'nmpeg' in df_mentah.columns else ''
@@ -2205,8 +2566,9 @@ def show():
                                     kdkawin_master = format_nilai_asli(row_master.get(master_cols['KDKAWIN'], ''))
                                 
                                 # Bandingkan HANYA field selain NIP (NIP sudah match sebagai Primary Key)
+                                # Nama dibandingkan dalam bentuk kanonik (tanpa gelar, token terurut)
                                 if nama_master and nmpeg_mentah:
-                                    if fuzz.ratio(nmpeg_mentah.lower(), nama_master.lower()) < 90:
+                                    if fuzz.ratio(nama_urut(nmpeg_mentah), nama_urut(nama_master)) < 90:
                                         errors.append('Nama')
                                 
                                 if nik_master and npwp_mentah:
@@ -2258,10 +2620,17 @@ def show():
                         'Rekomendasi': rekomendasi
                     })
                 
-                df_validation_master = pd.DataFrame(validation_master_data)
+                df_validation_master = validasi_inkremental.gabung(
+                    pd.DataFrame(validation_master_data, index=indeks_ulang_master), hasil_lama_master
+                )
+                st.session_state['riwayat_validasi_master'] = validasi_inkremental.simpan_riwayat(
+                    df_validation_master, hash_mentah_master, kunci_nip,
+                    pd.Series(True, index=kunci_nip.index), konteks_master, pembanding_master,
+                )
+                df_validation_master = df_validation_master.reset_index(drop=True)
                 
                 # Simpan ke session state untuk download
-                st.session_state['df_validation_master'] = df_validation_master
+                simpan_ringkas(st.session_state, df_validation_master=df_validation_master)
                 
                 # Statistik
                 st.markdown("### 📊 Ringkasan Validasi")
@@ -2440,7 +2809,8 @@ def show():
         with tab5:
             st.subheader("📈 Analisis Detail Perubahan")
             
-            df_display = st.session_state['df_hasil'].copy()
+            # Copy-on-Write aktif: tidak perlu salinan defensif, data dibagi sampai diubah
+            df_display = st.session_state['df_hasil']
             
             # Cek duplikasi di data analisis
             df_nip_dup_analisis, _ = check_duplicates(df_display, 'NIP', 'Analisis')
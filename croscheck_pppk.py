@@ -7,7 +7,273 @@ from fuzzywuzzy import process
 from io import BytesIO
 import sys
 import os
+import time
 import zipfile
+from pencocokan_fuzzy import (
+    cari_kolom_nama_nip, cocokkan_banyak, cocokkan_satu, siapkan_kandidat
+)
+from memo_identitas import memo_default
+from kanonik_nama import nama_urut
+from skema_kolom import resolve, jelaskan, petakan_nama
+from baca_paralel import jalankan_paralel
+from cache_kolumnar import buat_kunci, hash_isi, muat, simpan
+from sidecar_master import baca_sidecar, tanam_sidecar
+from tipe_ringkas import simpan_ringkas
+from pengelola_sesi import ringkasan as ringkasan_sesi
+from master_bersama import bagikan, info_master
+from rekonsiliasi import rekonsiliasi
+from rupiah import SATUAN_SEN, TOLERANSI_RUPIAH, parse_rupiah
+from arsip_bulanan import ArsipBulanan, arsipkan, pecah_periode
+from alur_tahap import Alur, ringkas_laporan
+import validasi_inkremental
+import identitas_lintas
+
+
+# ===== FUNGSI FORMAT NILAI ASLI =====
+def format_nilai_asli(nilai):
+    """Mengonversi nilai float yang merupakan integer menjadi string tanpa .0"""
+    if nilai is None:
+        return ''
+    
+    # Jika sudah string, kembalikan as is
+    if isinstance(nilai, str):
+        return nilai.strip()
+    
+    # Jika float
+    if isinstance(nilai, float):
+        # Cek apakah ini integer
+        if nilai.is_integer():
+            # Konversi ke int lalu ke string untuk menghilangkan .0
+            return str(int(nilai))
+        else:
+            # Untuk float non-integer, kembalikan string tanpa trailing zeros
+            return str(nilai).rstrip('0').rstrip('.')
+    
+    # Untuk tipe data lainnya, konversi ke string
+    return str(nilai).strip()
+
+
+def format_angka_panjang(angka_str):
+    """Menangani notasi ilmiah menjadi format angka biasa"""
+    if not angka_str or pd.isna(angka_str):
+        return ''
+    
+    str_angka = str(angka_str).strip()
+    
+    # Jika mengandung notasi ilmiah (e+)
+    if 'e+' in str_angka.lower():
+        try:
+            # Konversi dari notasi ilmiah ke float
+            num = float(str_angka)
+            # Konversi ke int jika tidak ada desimal
+            if num.is_integer():
+                return str(int(num))
+            else:
+                # Format dengan string tanpa notasi ilmiah
+                return format(num, 'f').rstrip('0').rstrip('.')
+        except:
+            return str_angka
+    
+    # Jika mengandung .000000 di akhir
+    if str_angka.endswith('.000000'):
+        return str_angka.replace('.000000', '')
+    
+    # Jika mengandung .0 di akhir
+    if str_angka.endswith('.0'):
+        return str_angka.replace('.0', '')
+    
+    return str_angka
+# ===== END FUNGSI FORMAT NILAI ASLI =====
+
+
+def rapikan_sidecar(df):
+    """Samakan salinan tertanam dengan hasil parse sel (angka -> teks format asli)"""
+    df = df.astype(object).where(df.notna(), None)
+    for col in df.columns:
+        df[col] = df[col].map(lambda v: format_nilai_asli(v) if isinstance(v, (int, float)) else v)
+    df = df.dropna(axis=1, how='all')
+    df = df.dropna(how='all').reset_index(drop=True)
+    # Kolom angka panjang diperlakukan sama seperti hasil parse sel
+    for col in df.columns:
+        if isinstance(col, str):
+            col_lower = col.lower()
+            if 'nip' in col_lower or 'npwp' in col_lower or 'nik' in col_lower or 'tin' in col_lower or 'rekening' in col_lower:
+                df[col] = df[col].apply(lambda x: format_angka_panjang(format_nilai_asli(x)))
+    return df
+
+
+def parse_excel_flexible(isi_file, expected_headers, label):
+    """Baca Excel dengan pencarian header fleksibel - REVISI: Menggunakan logika dari croscheck_pns.py
+
+    Tidak memanggil Streamlit: pesan dikembalikan sebagai list (level, teks)
+    agar bisa dijalankan di proses pembaca terpisah. Return (df, pesan).
+    """
+    pesan = []
+    try:
+        # Master hasil export aplikasi membawa salinan bertipe: pakai jika sheet belum diubah
+        df_sidecar, status_sidecar = baca_sidecar(isi_file)
+        if df_sidecar is not None:
+            df = rapikan_sidecar(df_sidecar)
+            pesan.append(('success', f"✅ {label} dibaca dari salinan data tertanam (tanpa parse sel), {len(df)} baris data"))
+            pesan.append(('info', f"Kolom ditemukan: {', '.join(df.columns.tolist()[:10])}{'...' if len(df.columns) > 10 else ''}"))
+            return df, pesan
+        if status_sidecar == 'diubah':
+            pesan.append(('info', f"ℹ️ {label}: sheet sudah diubah sejak diexport, data dibaca ulang dari sel"))
+        
+        wb = openpyxl.load_workbook(BytesIO(isi_file), data_only=True, read_only=True)
+        sheet = wb.active
+        
+        total_rows = sheet.max_row
+        total_columns = sheet.max_column
+        expected_set = set(h.lower().strip() for h in expected_headers)
+        
+        pesan.append(('write', f"📊 {label}: {total_rows} baris, {total_columns} kolom terdeteksi"))
+        
+        # Cari baris header
+        best_row = -1
+        max_matches = 0
+        best_row_values = []
+        
+        for row_idx in range(1, min(21, total_rows + 1)):
+            row_values = [str(cell.value).strip() if cell.value is not None else "" for cell in sheet[row_idx]]
+            row_values_lower = [v.lower() for v in row_values]
+            row_set = set(v for v in row_values_lower if v)
+            matches = len(expected_set.intersection(row_set))
+            if matches > max_matches:
+                max_matches = matches
+                best_row = row_idx
+                best_row_values = row_values
+        
+        if best_row > 0 and max_matches >= len(expected_headers) // 2:
+            # Handle kolom kosong di kiri
+            first_non_empty_col = next((i for i, val in enumerate(best_row_values) if val), 0)
+            
+            # Ekstrak data mulai dari baris setelah header
+            data = []
+            for row in sheet.iter_rows(min_row=best_row + 1, max_row=total_rows,
+                                      min_col=first_non_empty_col + 1, values_only=True):
+                # Terapkan format_nilai_asli() pada setiap sel
+                formatted_row = []
+                for cell_value in row:
+                    if isinstance(cell_value, (int, float)):
+                        formatted_row.append(format_nilai_asli(cell_value))
+                    else:
+                        formatted_row.append(cell_value)
+                data.append(formatted_row)
+            
+            # Ambil header yang valid (mulai dari kolom pertama yang tidak kosong)
+            actual_headers = best_row_values[first_non_empty_col:]
+            
+            # Handle kolom duplikat dan kosong
+            seen = {}
+            unique_headers = []
+            for i, col in enumerate(actual_headers):
+                if not col or col.strip() == "":
+                    col = f"Unnamed_{i}"
+                
+                # Handle duplikat
+                original_col = col
+                counter = 1
+                while col in seen:
+                    col = f"{original_col}_{counter}"
+                    counter += 1
+                
+                seen[col] = True
+                unique_headers.append(col)
+            
+            # Batasi jumlah kolom sesuai data
+            if len(data) > 0:
+                max_data_cols = len(data[0])
+                unique_headers = unique_headers[:max_data_cols]
+            
+            df = pd.DataFrame(data, columns=unique_headers)
+            
+            # Drop kolom yang sepenuhnya kosong
+            df = df.dropna(axis=1, how='all')
+            
+            # Drop baris yang sepenuhnya kosong
+            df = df.dropna(how='all').reset_index(drop=True)
+            
+            pesan.append(('success', f"✅ {label} berhasil dibaca! Header di baris {best_row}, {len(df)} baris data"))
+            
+            # Bersihkan kolom-kolom penting
+            for col in df.columns:
+                if isinstance(col, str):
+                    col_lower = col.lower()
+                    # Kolom NIP
+                    if 'nip' in col_lower:
+                        df[col] = df[col].apply(lambda x: format_angka_panjang(format_nilai_asli(x)))
+                    # Kolom NPWP
+                    elif 'npwp' in col_lower or 'nik' in col_lower or 'tin' in col_lower:
+                        df[col] = df[col].apply(lambda x: format_angka_panjang(format_nilai_asli(x)))
+                    # Kolom rekening
+                    elif 'rekening' in col_lower:
+                        df[col] = df[col].apply(lambda x: format_angka_panjang(format_nilai_asli(x)))
+            
+        else:
+            # Fallback: baca seluruh sheet
+            data = []
+            for row in sheet.iter_rows(min_row=1, max_row=total_rows, values_only=True):
+                # Terapkan format_nilai_asli() pada setiap sel
+                formatted_row = []
+                for cell_value in row:
+                    if isinstance(cell_value, (int, float)):
+                        formatted_row.append(format_nilai_asli(cell_value))
+                    else:
+                        formatted_row.append(cell_value)
+                data.append(formatted_row)
+            
+            if len(data) < 2:
+                pesan.append(('error', f"❌ {label}: File tidak memiliki cukup data"))
+                return None, pesan
+            
+            # Handle header duplikat
+            headers = data[0]
+            seen = {}
+            unique_headers = []
+            for i, col in enumerate(headers):
+                col_str = str(col).strip() if col else f"Unnamed_{i}"
+                
+                original_col = col_str
+                counter = 1
+                while col_str in seen:
+                    col_str = f"{original_col}_{counter}"
+                    counter += 1
+                
+                seen[col_str] = True
+                unique_headers.append(col_str)
+            
+            df = pd.DataFrame(data[1:], columns=unique_headers)
+            df = df.dropna(axis=1, how='all')
+            df = df.dropna(how='all').reset_index(drop=True)
+            
+            # Bersihkan kolom-kolom penting
+            for col in df.columns:
+                if isinstance(col, str):
+                    col_lower = col.lower()
+                    # Kolom NIP
+                    if 'nip' in col_lower:
+                        df[col] = df[col].apply(lambda x: format_angka_panjang(format_nilai_asli(x)))
+                    # Kolom NPWP
+                    elif 'npwp' in col_lower or 'nik' in col_lower or 'tin' in col_lower:
+                        df[col] = df[col].apply(lambda x: format_angka_panjang(format_nilai_asli(x)))
+                    # Kolom rekening
+                    elif 'rekening' in col_lower:
+                        df[col] = df[col].apply(lambda x: format_angka_panjang(format_nilai_asli(x)))
+            
+            pesan.append(('warning', f"⚠️ {label}: Header tidak sepenuhnya cocok, menggunakan baris pertama"))
+        
+        # Tampilkan kolom yang ditemukan
+        pesan.append(('info', f"Kolom ditemukan: {', '.join(df.columns.tolist()[:10])}{'...' if len(df.columns) > 10 else ''}"))
+        
+        return df, pesan
+    
+    except Exception as e:
+        pesan.append(('error', f"❌ Error membaca {label}: {e}"))
+        import traceback
+        pesan.append(('code', traceback.format_exc()))
+        return None, pesan
+
 
 def show():
     """Fitur Sistem Master Data PPPK dengan Tracking Bulanan"""
@@ -158,61 +424,6 @@ def show():
    
     # ===== FUNGSI UNTUK FITUR MASTER DATA PPPK =====
     
-    # ===== FUNGSI FORMAT NILAI ASLI =====
-    def format_nilai_asli(nilai):
-        """Mengonversi nilai float yang merupakan integer menjadi string tanpa .0"""
-        if nilai is None:
-            return ''
-        
-        # Jika sudah string, kembalikan as is
-        if isinstance(nilai, str):
-            return nilai.strip()
-        
-        # Jika float
-        if isinstance(nilai, float):
-            # Cek apakah ini integer
-            if nilai.is_integer():
-                # Konversi ke int lalu ke string untuk menghilangkan .0
-                return str(int(nilai))
-            else:
-                # Untuk float non-integer, kembalikan string tanpa trailing zeros
-                return str(nilai).rstrip('0').rstrip('.')
-        
-        # Untuk tipe data lainnya, konversi ke string
-        return str(nilai).strip()
-    
-    def format_angka_panjang(angka_str):
-        """Menangani notasi ilmiah menjadi format angka biasa"""
-        if not angka_str or pd.isna(angka_str):
-            return ''
-        
-        str_angka = str(angka_str).strip()
-        
-        # Jika mengandung notasi ilmiah (e+)
-        if 'e+' in str_angka.lower():
-            try:
-                # Konversi dari notasi ilmiah ke float
-                num = float(str_angka)
-                # Konversi ke int jika tidak ada desimal
-                if num.is_integer():
-                    return str(int(num))
-                else:
-                    # Format dengan string tanpa notasi ilmiah
-                    return format(num, 'f').rstrip('0').rstrip('.')
-            except:
-                return str_angka
-        
-        # Jika mengandung .000000 di akhir
-        if str_angka.endswith('.000000'):
-            return str_angka.replace('.000000', '')
-        
-        # Jika mengandung .0 di akhir
-        if str_angka.endswith('.0'):
-            return str_angka.replace('.0', '')
-        
-        return str_angka
-    # ===== END FUNGSI FORMAT NILAI ASLI =====
-   
     # Definisi header untuk setiap file
     HEADERS_MENTAH_PPPK = [
         "kdsatker", "kdanak", "kdsubanak", "bulan", "tahun", "nogaji", "kdjns", "nip", "nmpeg",
@@ -266,422 +477,230 @@ def show():
         kdkawin = str(kdkawin).strip()
         return KDKAWIN_MAP.get(kdkawin, "-")
     
+    def tampilkan_pesan(pesan):
+        """Tampilkan pesan hasil parse dengan level Streamlit yang sesuai"""
+        for level, teks in pesan:
+            getattr(st, level)(teks)
+    
     def read_excel_flexible(uploaded_file, expected_headers, label):
-        """Baca Excel dengan pencarian header fleksibel - REVISI: Menggunakan logika dari croscheck_pns.py"""
+        """Baca satu file upload di proses utama"""
         if uploaded_file is None:
             return None
+        df, pesan = parse_excel_flexible(uploaded_file.getvalue(), expected_headers, label)
+        tampilkan_pesan(pesan)
+        return df
+    
+    def baca_upload_paralel(daftar_file):
+        """Parse beberapa file upload bersamaan: list (label, uploaded_file, expected_headers).
         
-        try:
-            uploaded_file.seek(0)
-            wb = openpyxl.load_workbook(uploaded_file, data_only=True, read_only=True)
-            sheet = wb.active
-            
-            total_rows = sheet.max_row
-            total_columns = sheet.max_column
-            expected_set = set(h.lower().strip() for h in expected_headers)
-            
-            st.write(f"📊 {label}: {total_rows} baris, {total_columns} kolom terdeteksi")
-            
-            # Cari baris header
-            best_row = -1
-            max_matches = 0
-            best_row_values = []
-            
-            for row_idx in range(1, min(21, total_rows + 1)):
-                row_values = [str(cell.value).strip() if cell.value is not None else "" for cell in sheet[row_idx]]
-                row_values_lower = [v.lower() for v in row_values]
-                row_set = set(v for v in row_values_lower if v)
-                matches = len(expected_set.intersection(row_set))
-                if matches > max_matches:
-                    max_matches = matches
-                    best_row = row_idx
-                    best_row_values = row_values
-            
-            if best_row > 0 and max_matches >= len(expected_headers) // 2:
-                # Handle kolom kosong di kiri
-                first_non_empty_col = next((i for i, val in enumerate(best_row_values) if val), 0)
-                
-                # Ekstrak data mulai dari baris setelah header
-                data = []
-                for row in sheet.iter_rows(min_row=best_row + 1, max_row=total_rows,
-                                          min_col=first_non_empty_col + 1, values_only=True):
-                    # Terapkan format_nilai_asli() pada setiap sel
-                    formatted_row = []
-                    for cell_value in row:
-                        if isinstance(cell_value, (int, float)):
-                            formatted_row.append(format_nilai_asli(cell_value))
-                        else:
-                            formatted_row.append(cell_value)
-                    data.append(formatted_row)
-                
-                # Ambil header yang valid (mulai dari kolom pertama yang tidak kosong)
-                actual_headers = best_row_values[first_non_empty_col:]
-                
-                # Handle kolom duplikat dan kosong
-                seen = {}
-                unique_headers = []
-                for i, col in enumerate(actual_headers):
-                    if not col or col.strip() == "":
-                        col = f"Unnamed_{i}"
-                    
-                    # Handle duplikat
-                    original_col = col
-                    counter = 1
-                    while col in seen:
-                        col = f"{original_col}_{counter}"
-                        counter += 1
-                    
-                    seen[col] = True
-                    unique_headers.append(col)
-                
-                # Batasi jumlah kolom sesuai data
-                if len(data) > 0:
-                    max_data_cols = len(data[0])
-                    unique_headers = unique_headers[:max_data_cols]
-                
-                df = pd.DataFrame(data, columns=unique_headers)
-                
-                # Drop kolom yang sepenuhnya kosong
-                df = df.dropna(axis=1, how='all')
-                
-                # Drop baris yang sepenuhnya kosong
-                df = df.dropna(how='all').reset_index(drop=True)
-                
-                st.success(f"✅ {label} berhasil dibaca! Header di baris {best_row}, {len(df)} baris data")
-                
-                # Bersihkan kolom-kolom penting
-                for col in df.columns:
-                    if isinstance(col, str):
-                        col_lower = col.lower()
-                        # Kolom NIP
-                        if 'nip' in col_lower:
-                            df[col] = df[col].apply(lambda x: format_angka_panjang(format_nilai_asli(x)))
-                        # Kolom NPWP
-                        elif 'npwp' in col_lower or 'nik' in col_lower or 'tin' in col_lower:
-                            df[col] = df[col].apply(lambda x: format_angka_panjang(format_nilai_asli(x)))
-                        # Kolom rekening
-                        elif 'rekening' in col_lower:
-                            df[col] = df[col].apply(lambda x: format_angka_panjang(format_nilai_asli(x)))
-                
+        File yang isinya sudah pernah diparse diambil dari cache kolumnar.
+        Sisanya diparse paralel; progress diperbarui setiap satu file selesai
+        dan pesan/error tiap file ditampilkan atas labelnya sendiri.
+        Return (dict label -> DataFrame atau None, dict label -> kunci isi file).
+        """
+        hasil_df = {label: None for label, _, _ in daftar_file}
+        kunci = {}
+        bersama = {}
+        dari_cache = {}
+        tugas = {}
+        pesan_file = {}
+        for label, uploaded_file, expected_headers in daftar_file:
+            if uploaded_file is None:
+                continue
+            isi_file = uploaded_file.getvalue()
+            kunci[label] = buat_kunci(hash_isi(isi_file), 'croscheck_pppk', label, expected_headers)
+            if label == "Master Existing":
+                # Versi master yang sama sudah dibagikan (sesi lain / file Arrow): tidak diparse atau dimuat lagi
+                df_bersama = bagikan(kunci[label], lambda: None)
+                if df_bersama is not None:
+                    bersama[label] = df_bersama
+                    continue
+            df_cache, meta = muat(kunci[label])
+            if df_cache is not None:
+                dari_cache[label] = (df_cache, meta.get('pesan', []))
             else:
-                # Fallback: baca seluruh sheet
-                data = []
-                for row in sheet.iter_rows(min_row=1, max_row=total_rows, values_only=True):
-                    # Terapkan format_nilai_asli() pada setiap sel
-                    formatted_row = []
-                    for cell_value in row:
-                        if isinstance(cell_value, (int, float)):
-                            formatted_row.append(format_nilai_asli(cell_value))
-                        else:
-                            formatted_row.append(cell_value)
-                    data.append(formatted_row)
-                
-                if len(data) < 2:
-                    st.error(f"❌ {label}: File tidak memiliki cukup data")
-                    return None
-                
-                # Handle header duplikat
-                headers = data[0]
-                seen = {}
-                unique_headers = []
-                for i, col in enumerate(headers):
-                    col_str = str(col).strip() if col else f"Unnamed_{i}"
-                    
-                    original_col = col_str
-                    counter = 1
-                    while col_str in seen:
-                        col_str = f"{original_col}_{counter}"
-                        counter += 1
-                    
-                    seen[col_str] = True
-                    unique_headers.append(col_str)
-                
-                df = pd.DataFrame(data[1:], columns=unique_headers)
-                df = df.dropna(axis=1, how='all')
-                df = df.dropna(how='all').reset_index(drop=True)
-                
-                # Bersihkan kolom-kolom penting
-                for col in df.columns:
-                    if isinstance(col, str):
-                        col_lower = col.lower()
-                        # Kolom NIP
-                        if 'nip' in col_lower:
-                            df[col] = df[col].apply(lambda x: format_angka_panjang(format_nilai_asli(x)))
-                        # Kolom NPWP
-                        elif 'npwp' in col_lower or 'nik' in col_lower or 'tin' in col_lower:
-                            df[col] = df[col].apply(lambda x: format_angka_panjang(format_nilai_asli(x)))
-                        # Kolom rekening
-                        elif 'rekening' in col_lower:
-                            df[col] = df[col].apply(lambda x: format_angka_panjang(format_nilai_asli(x)))
-                
-                st.warning(f"⚠️ {label}: Header tidak sepenuhnya cocok, menggunakan baris pertama")
+                tugas[label] = (parse_excel_flexible, (isi_file, expected_headers, label))
+        
+        hasil_tugas = {}
+        total_ms = 0.0
+        if tugas:
+            progress = st.progress(0.0, text=f"📥 Membaca {len(tugas)} file...")
+            selesai = []
             
-            # Tampilkan kolom yang ditemukan
-            st.info(f"Kolom ditemukan: {', '.join(df.columns.tolist()[:10])}{'...' if len(df.columns) > 10 else ''}")
+            def saat_selesai(label, hasil):
+                selesai.append(label)
+                progress.progress(len(selesai) / len(tugas),
+                                  text=f"📥 {label} selesai ({hasil['durasi_ms']:.0f} ms) - {len(selesai)}/{len(tugas)} file")
             
-            return df
-        
-        except Exception as e:
-            st.error(f"❌ Error membaca {label}: {e}")
-            import traceback
-            st.code(traceback.format_exc())
-            return None
-    
-    def detect_duplicates(df, column_name, label):
-        """Deteksi data duplikat dalam kolom tertentu dan tampilkan dengan highlight merah"""
-        if df is None or df.empty or column_name not in df.columns:
-            return False
+            mulai = time.perf_counter()
+            total_byte = sum(len(args[0]) for _, args in tugas.values())
+            hasil_tugas = jalankan_paralel(tugas, saat_selesai=saat_selesai, total_byte=total_byte)
+            total_ms = (time.perf_counter() - mulai) * 1000
+            progress.empty()
         
-        # Format nilai untuk deteksi duplikasi
-        df[column_name] = df[column_name].apply(lambda x: format_nilai_asli(x))
+        for label, _, _ in daftar_file:
+            if label in bersama:
+                df = bersama[label]
+                tampilkan_pesan(df.attrs.get('pesan_baca', []))
+                st.caption(f"⚡ {label} dipakai bersama (versi sama sudah dibaca di server ini)")
+                hasil_df[label] = df
+                continue
+            if label in dari_cache:
+                df, pesan = dari_cache[label]
+                tampilkan_pesan(pesan)
+                st.caption(f"⚡ {label} diambil dari cache (file sama sudah pernah dibaca)")
+                hasil_df[label] = df
+                pesan_file[label] = pesan
+                continue
+            if label not in hasil_tugas:
+                continue
+            hasil = hasil_tugas[label]
+            if hasil['error'] is not None:
+                # Error di luar parser (mis. proses pembaca mati) tetap dilaporkan per file
+                st.error(f"❌ Error membaca {label}: {hasil['error']}")
+                if hasil['traceback']:
+                    st.code(hasil['traceback'])
+                continue
+            df, pesan = hasil['hasil']
+            tampilkan_pesan(pesan)
+            hasil_df[label] = df
+            pesan_file[label] = pesan
+            if df is not None:
+                simpan(kunci[label], df, {'pesan': pesan})
         
-        # Cek duplikasi (termasuk baris pertama)
-        duplicates = df[df[column_name].duplicated(keep=False)]
+        if hasil_tugas:
+            durasi = ", ".join(f"{label} {hasil['durasi_ms']:.0f} ms" for label, hasil in hasil_tugas.items())
+            st.caption(f"⏱️ Waktu baca: {durasi} (total {total_ms:.0f} ms)")
         
-        if not duplicates.empty:
-            # Hitung jumlah baris duplikat
-            duplicate_count = len(duplicates)
-            unique_duplicate_values = duplicates[column_name].unique()
-            
-            # Tampilkan warning
-            st.error(f"⚠️ **DETEKSI DUPLIKASI DI {label}**")
-            st.error(f"Ditemukan **{duplicate_count} baris** dengan **{column_name} yang sama/duplikat**")
-            st.error(f"Nilai {column_name} yang duplikat: {', '.join(map(str, unique_duplicate_values[:10]))}{'...' if len(unique_duplicate_values) > 10 else ''}")
-            
-            # Tampilkan data duplikat dengan highlight merah
-            st.markdown(f"#### 📋 Daftar Data Duplikat ({column_name}):")
-            
-            # Fungsi untuk highlight baris duplikat
-            def highlight_duplicates_row(row):
-                is_duplicate = row[column_name] in unique_duplicate_values
-                return ['background-color: #FF6B6B' if is_duplicate else '' for _ in row]
-            
-            # Tampilkan semua baris (tanpa batas)
-            st.dataframe(
-                df.style.apply(highlight_duplicates_row, axis=1),
-                height=400,
-                use_container_width=True
-            )
-            
-            # Download button untuk data duplikat
-            output_duplicates = BytesIO()
-            with pd.ExcelWriter(output_duplicates, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Data dengan Duplikat')
-                
-                workbook = writer.book
-                worksheet = writer.sheets['Data dengan Duplikat']
-                
-                red_fill = PatternFill(start_color='FF6B6B', end_color='FF6B6B', fill_type='solid')
-                
-                # Highlight baris duplikat di Excel
-                for idx, row in df.iterrows():
-                    if row[column_name] in unique_duplicate_values:
-                        excel_row = idx + 2  # +2 karena header di row 1
-                        for col in range(1, len(df.columns) + 1):
-                            worksheet.cell(row=excel_row, column=col).fill = red_fill
-            
-            output_duplicates.seek(0)
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                st.download_button(
-                    label=f"📥 Download Data {label} dengan Duplikat",
-                    data=output_duplicates,
-                    file_name=f"duplikat_{column_name}_{label}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    key=f"download_duplicates_{column_name}_{label}"
-                )
-            with col2:
-                if st.button(f"⚠️ PERBAIKI DUPLIKASI {column_name.upper()} TERLEBIH DAHULU", key=f"warning_{column_name}_{label}"):
-                    st.warning("Harap perbaiki data duplikat sebelum melanjutkan proses!")
-            
-            return True
-        return False
-   
+        # Master Existing yang sama dipakai bersama oleh semua sesi (read-only, copy-on-write)
+        df_master = hasil_df.get("Master Existing")
+        if df_master is not None and "Master Existing" not in bersama:
+            def master_baru():
+                # Pesan baca ikut di frame bersama agar tetap tampil saat dipakai sesi lain
+                df_master.attrs['pesan_baca'] = [list(p) for p in pesan_file.get("Master Existing", [])]
+                return df_master
+            hasil_df["Master Existing"] = bagikan(kunci["Master Existing"], master_baru)
+        return hasil_df, kunci
+    
     def fuzzy_match_row(nama, nip, df_master, threshold=80):
         """Cari baris yang cocok menggunakan fuzzy matching"""
-        if df_master is None or df_master.empty:
-            return None
-       
-        best_match_idx = None
-        best_score = 0
-       
-        # Cari kolom Nama dan NIP dengan pencarian fleksibel
-        nama_col = None
-        nip_col = None
-       
-        for col in df_master.columns:
-            col_upper = str(col).upper()
-            if 'NAMA' in col_upper and nama_col is None:
-                nama_col = col
-            if 'NIP' in col.upper() and nip_col is None:
-                nip_col = col
-       
-        if not nama_col and not nip_col:
-            return None
-       
-        for idx, row in df_master.iterrows():
-            # Match berdasarkan Nama dan NIP
-            nama_master = str(row.get(nama_col, '')).strip() if nama_col else ''
-            nip_master = str(row.get(nip_col, '')).strip() if nip_col else ''
-           
-            nama_score = fuzz.ratio(str(nama).lower(), nama_master.lower()) if nama and nama_master else 0
-            nip_score = fuzz.ratio(str(nip).lower(), nip_master.lower()) if nip and nip_master else 0
-           
-            # Gabungan score (prioritas NIP lebih tinggi)
-            if nip_col and nama_col:
-                combined_score = (nip_score * 0.7) + (nama_score * 0.3)
-            elif nip_col:
-                combined_score = nip_score
-            elif nama_col:
-                combined_score = nama_score
-            else:
-                combined_score = 0
-           
-            if combined_score > best_score and combined_score >= threshold:
-                best_score = combined_score
-                best_match_idx = idx
-       
-        return best_match_idx
+        kandidat = siapkan_kandidat(df_master, format_fn=lambda x: str(x).strip())
+        pos = cocokkan_satu(nama, nip, kandidat, threshold=threshold)
+        return df_master.index[pos] if pos is not None else None
    
-    def process_data(df_mentah, df_bpmp, df_master_existing=None):
-        """Proses data dari file mentah dan BPMP ke format master"""
-       
-        if df_mentah is None or df_bpmp is None:
-            st.warning("⚠️ Pastikan file Data Mentah dan BPMP sudah di-upload!")
-            return None
-       
-        # ===== DETEKSI DUPLIKASI SEBELUM PROSES =====
-        st.markdown("### 🔍 Deteksi Duplikasi Data")
-        
-        has_duplicates = False
-        
-        # Deteksi duplikasi NIP di Data Mentah
-        if 'nip' in df_mentah.columns:
-            if detect_duplicates(df_mentah, 'nip', 'Data Mentah PPPK (NIP)'):
-                has_duplicates = True
-        
-        # Deteksi duplikasi NPWP di Data Mentah
-        if 'npwp' in df_mentah.columns:
-            if detect_duplicates(df_mentah, 'npwp', 'Data Mentah PPPK (NPWP)'):
-                has_duplicates = True
-        
-        # Deteksi duplikasi di Data BPMP
-        # Cari kolom NPWP/NIK/TIN di BPMP
-        nik_col_bpmp = None
-        for col in df_bpmp.columns:
-            if 'NPWP' in col.upper() or 'NIK' in col.upper() or 'TIN' in col.upper():
-                nik_col_bpmp = col
-                break
-        
-        if nik_col_bpmp:
-            if detect_duplicates(df_bpmp, nik_col_bpmp, 'Data BPMP (NPWP/NIK/TIN)'):
-                has_duplicates = True
-        
-        # Deteksi duplikasi di Master Existing
-        if df_master_existing is not None and not df_master_existing.empty:
-            # Cari kolom NIP di Master
-            nip_col_master = None
-            nik_col_master = None
-            
-            for col in df_master_existing.columns:
-                col_upper = str(col).upper()
-                if 'NIP' in col_upper:
-                    nip_col_master = col
-                if 'NIK' in col_upper:
-                    nik_col_master = col
-            
-            if nip_col_master:
-                if detect_duplicates(df_master_existing, nip_col_master, 'Master Existing (NIP)'):
-                    has_duplicates = True
-            
-            if nik_col_master:
-                if detect_duplicates(df_master_existing, nik_col_master, 'Master Existing (NIK)'):
-                    has_duplicates = True
+    def fuzzy_match_banyak(pasangan, df_master, arah, threshold=80):
+        """Fuzzy matching banyak (nama, nip) sekaligus, paralel jika datanya besar.
         
-        # Jika ada duplikasi, hentikan proses
-        if has_duplicates:
-            st.error("⛔ **PROSES DIBATALKAN** karena ditemukan data duplikat!")
-            st.error("Harap perbaiki data duplikat terlebih dahulu sebelum melanjutkan proses.")
+        arah ('baru_ke_lama' / 'lama_ke_baru') memisahkan tautan memo kedua
+        arah pencocokan, karena kandidat di tiap arah berbeda.
+        """
+        kandidat = siapkan_kandidat(df_master, format_fn=lambda x: str(x).strip())
+        # Tautan identitas dari bulan sebelumnya dipakai ulang lewat memo persisten
+        posisi = cocokkan_banyak(pasangan, kandidat, threshold=threshold, memo=memo_default(),
+                                 konteks=f'nama_nip|{arah}')
+        return [df_master.index[pos] if pos is not None else None for pos in posisi]
+   
+    # ===== TAHAP ALUR PROSES (lihat alur_tahap.py) =====
+    # Setiap tahap hanya bergantung pada masukannya sendiri; file yang tidak
+    # berubah tidak dibaca, dirapikan, atau dicek ulang.
+    def rapikan_kolom(df):
+        """Nama kolom di-strip (salinan, frame sumber tidak diubah)"""
+        if df is None:
             return None
-        
-        st.success("✅ Tidak ditemukan data duplikat. Melanjutkan proses...")
-        # ===== END DETEKSI DUPLIKASI =====
-       
-        # Normalisasi kolom - handle duplikat
-        df_mentah.columns = [str(col).strip() for col in df_mentah.columns]
-        df_bpmp.columns = [str(col).strip() for col in df_bpmp.columns]
-       
-        # Debug: tampilkan kolom yang tersedia
-        st.write("**Kolom Data Mentah PPPK:**", df_mentah.columns.tolist()[:15])
-        st.write("**Kolom Data BPMP:**", df_bpmp.columns.tolist())
-       
-        # Buat DataFrame hasil dengan merge berdasarkan fuzzy matching
-        hasil = []
-       
+        df = df.copy(deep=False)
+        df.columns = [str(col).strip() for col in df.columns]
+        return df
+    
+    def baris_duplikat(df, daftar_kolom):
+        """Baris duplikat per kolom: list (kolom, label) -> dict label -> info"""
+        info = {}
+        if df is None:
+            return info
+        for kolom, label in daftar_kolom:
+            if not kolom or kolom not in df.columns:
+                continue
+            nilai_format = df[kolom].apply(lambda x: format_nilai_asli(x))
+            duplikat = df[nilai_format.duplicated(keep=False)]
+            if not duplikat.empty:
+                info[label] = {'data': duplikat, 'column': kolom, 'count': len(duplikat)}
+        return info
+    
+    def duplikat_mentah(df_mentah):
+        return baris_duplikat(df_mentah, [('nip', 'NIP Data Mentah'), ('npwp', 'NPWP Data Mentah')])
+    
+    def duplikat_bpmp(df_bpmp):
+        if df_bpmp is None:
+            return {}
+        return baris_duplikat(df_bpmp, [(resolve(df_bpmp, 'bpmp')['nik'], 'NPWP/NIK Data BPMP')])
+    
+    def duplikat_master(df_master):
+        if df_master is None:
+            return {}
+        return baris_duplikat(df_master, [
+            (resolve(df_master, 'master')['nip'], 'NIP Master Existing'),
+            (resolve(df_master, 'master_pppk')['nik'], 'NIK Master Existing'),
+        ])
+    
+    def siapkan_mentah(df_mentah):
+        """Kolom hasil yang hanya bergantung pada Data Mentah (format asli per baris)"""
+        ada = set(df_mentah.columns)
+        baris = []
         for idx_mentah, row_mentah in df_mentah.iterrows():
             # Ambil data dari file mentah dengan penanganan error - gunakan format_nilai_asli()
-            nip = format_nilai_asli(row_mentah.get('nip', '')) if 'nip' in df_mentah.columns else ''
-            nama = format_nilai_asli(row_mentah.get('nmpeg', '')) if 'nmpeg' in df_mentah.columns else ''
-            npwp_mentah = format_nilai_asli(row_mentah.get('npwp', '')) if 'npwp' in df_mentah.columns else ''
+            kdgol = format_nilai_asli(row_mentah.get('kdgol', '')) if 'kdgol' in ada else ''
+            kdkawin = format_nilai_asli(row_mentah.get('kdkawin', '')) if 'kdkawin' in ada else ''
+            baris.append({
+                'No': idx_mentah + 1,
+                'Nama': format_nilai_asli(row_mentah.get('nmpeg', '')) if 'nmpeg' in ada else '',
+                'npwp_mentah': format_nilai_asli(row_mentah.get('npwp', '')) if 'npwp' in ada else '',
+                'KDGOL': kdgol,
+                'KODE OBJEK PAJAK': konversi_kode_objek(kdgol),
+                'KDKAWIN': kdkawin,
+                'STATUS': konversi_status(kdkawin),
+                'NIP': format_nilai_asli(row_mentah.get('nip', '')) if 'nip' in ada else '',
+                'nmrek': format_nilai_asli(row_mentah.get('nmrek', '')),
+                'nm_bank': format_nilai_asli(row_mentah.get('nm_bank', '')),
+                'rekening': format_nilai_asli(row_mentah.get('rekening', '')),
+                'kdbankspan': format_nilai_asli(row_mentah.get('kdbankspan', '')),
+                'nmbankspan': format_nilai_asli(row_mentah.get('nmbankspan', '')),
+                'kdpos': format_nilai_asli(row_mentah.get('kdpos', '')),
+            })
+        return pd.DataFrame(baris)
+    
+    def cocokkan_bpmp(df_siap, df_bpmp):
+        """Lengkapi baris Data Mentah dengan NIK dari BPMP"""
+        # ===== FUZZY MATCHING NPWP MENTAH -> NIK BPMP (BATCH) =====
+        # Kolom BPMP di-resolve sekali per layout (lihat skema_kolom.py)
+        nik_col_bpmp = resolve(df_bpmp, 'bpmp')['nik']
+        
+        baris_siap = df_siap.to_dict('records')
+        kandidat_bpmp = siapkan_kandidat(
+            df_bpmp, format_fn=format_nilai_asli, nip_col=nik_col_bpmp, lower=False
+        ) if nik_col_bpmp else None
+        match_bpmp = cocokkan_banyak([('', row['npwp_mentah']) for row in baris_siap], kandidat_bpmp, threshold=80)
+        
+        hasil = []
+        for pos_mentah, row_siap in enumerate(baris_siap):
+            idx_mentah = row_siap['No'] - 1
+            npwp_mentah = row_siap['npwp_mentah']
            
-            # Cari data BPMP yang cocok menggunakan fuzzy matching
+            # Cari data BPMP yang cocok (hasil fuzzy matching batch di atas)
             matched_bpmp = None
-            best_match_score = 0
-           
-            for idx_bpmp, row_bpmp in df_bpmp.iterrows():
-                # Cek apakah kolom NPWP/NIK/TIN ada
-                nik_col = None
-                for col in df_bpmp.columns:
-                    if 'NPWP' in col.upper() or 'NIK' in col.upper() or 'TIN' in col.upper():
-                        nik_col = col
-                        break
-               
-                if nik_col:
-                    nik_bpmp = format_nilai_asli(row_bpmp.get(nik_col, ''))
-                   
-                    # Matching berdasarkan NPWP/NIK
-                    if npwp_mentah and nik_bpmp and npwp_mentah != '' and nik_bpmp != '':
-                        score = fuzz.ratio(npwp_mentah, nik_bpmp)
-                        if score > best_match_score and score >= 80:
-                            best_match_score = score
-                            matched_bpmp = row_bpmp
+            pos_bpmp = match_bpmp[pos_mentah]
+            if pos_bpmp is not None:
+                matched_bpmp = df_bpmp.iloc[pos_bpmp]
            
             # Jika tidak ada match berdasarkan NPWP, coba match berdasarkan urutan baris
             if matched_bpmp is None and idx_mentah < len(df_bpmp):
                 matched_bpmp = df_bpmp.iloc[idx_mentah]
            
             # Ambil data dari matched BPMP
-            posisi = ''
             nik_bpmp = npwp_mentah # default ke NPWP dari mentah
            
-            if matched_bpmp is not None:
-                # Cari kolom Posisi
-                posisi_col = None
-                for col in df_bpmp.columns:
-                    if 'POSISI' in col.upper():
-                        posisi_col = col
-                        break
-                if posisi_col:
-                    posisi = format_nilai_asli(matched_bpmp.get(posisi_col, ''))
-               
-                # Cari kolom NIK
-                nik_col = None
-                for col in df_bpmp.columns:
-                    if 'NPWP' in col.upper() or 'NIK' in col.upper() or 'TIN' in col.upper():
-                        nik_col = col
-                        break
-                if nik_col:
-                    nik_from_bpmp = format_nilai_asli(matched_bpmp.get(nik_col, ''))
-                    if nik_from_bpmp:
-                        nik_bpmp = nik_from_bpmp
-           
-            # Ambil data lainnya dari mentah
-            kdgol = format_nilai_asli(row_mentah.get('kdgol', '')) if 'kdgol' in df_mentah.columns else ''
-            kdkawin = format_nilai_asli(row_mentah.get('kdkawin', '')) if 'kdkawin' in df_mentah.columns else ''
-           
-            # Filter PNS/PPPK
-            pns_pppk = 'PPPK' # Default untuk PPPK
+            if matched_bpmp is not None and nik_col_bpmp:
+                nik_from_bpmp = format_nilai_asli(matched_bpmp.get(nik_col_bpmp, ''))
+                if nik_from_bpmp:
+                    nik_bpmp = nik_from_bpmp
            
             # ===== PERUBAHAN: FORMAT ID PENERIMA TKU DAN ID TKU =====
             # Format ID PENERIMA TKU: ambil NIK lalu tambahkan "000000" di akhir
@@ -692,22 +711,22 @@ def show():
             # ===== END PERUBAHAN =====
            
             row_data = {
-                'No': idx_mentah + 1,
-                'PNS/PPPK': pns_pppk,
-                'Nama': nama,
+                'No': row_siap['No'],
+                'PNS/PPPK': 'PPPK', # Default untuk PPPK
+                'Nama': row_siap['Nama'],
                 'NIK': nik_bpmp,
                 'ID PENERIMA TKU': id_penerima_tku, # Menggunakan format baru
-                'KDGOL': kdgol,
-                'KODE OBJEK PAJAK': konversi_kode_objek(kdgol),
-                'KDKAWIN': kdkawin,
-                'STATUS': konversi_status(kdkawin),
-                'NIP': nip,
-                'nmrek': format_nilai_asli(row_mentah.get('nmrek', '')),
-                'nm_bank': format_nilai_asli(row_mentah.get('nm_bank', '')),
-                'rekening': format_nilai_asli(row_mentah.get('rekening', '')),
-                'kdbankspan': format_nilai_asli(row_mentah.get('kdbankspan', '')),
-                'nmbankspan': format_nilai_asli(row_mentah.get('nmbankspan', '')),
-                'kdpos': format_nilai_asli(row_mentah.get('kdpos', '')),
+                'KDGOL': row_siap['KDGOL'],
+                'KODE OBJEK PAJAK': row_siap['KODE OBJEK PAJAK'],
+                'KDKAWIN': row_siap['KDKAWIN'],
+                'STATUS': row_siap['STATUS'],
+                'NIP': row_siap['NIP'],
+                'nmrek': row_siap['nmrek'],
+                'nm_bank': row_siap['nm_bank'],
+                'rekening': row_siap['rekening'],
+                'kdbankspan': row_siap['kdbankspan'],
+                'nmbankspan': row_siap['nmbankspan'],
+                'kdpos': row_siap['kdpos'],
                 'ID TKU': id_tku, # Menggunakan nilai default
                 'AKTIF/TIDAK': 'AKTIF',
                 'Keterangan': ''
@@ -715,133 +734,180 @@ def show():
            
             hasil.append(row_data)
        
-        df_hasil = pd.DataFrame(hasil)
-       
-        # Merge dengan master existing jika ada
-        if df_master_existing is not None and not df_master_existing.empty:
-            # Normalisasi kolom master existing
-            df_master_existing.columns = [str(col).strip() for col in df_master_existing.columns]
-           
-            st.write("**Kolom Master Existing:**", df_master_existing.columns.tolist())
+        return pd.DataFrame(hasil)
+    
+    def gabung_master(df_hasil, df_master_existing):
+        """Tandai status warna terhadap Master Existing dan tambahkan data lama yang tidak aktif"""
+        if df_master_existing is None or df_master_existing.empty:
+            # Semua data baru
+            df_hasil['Status_Color'] = 'HIJAU'
+            return df_hasil
+        
+        # Tandai data yang sudah ada dengan membandingkan kolom kunci (tidak termasuk kolom bank)
+        match_master = fuzzy_match_banyak(
+            list(zip(df_hasil['Nama'].tolist(), df_hasil['NIP'].tolist())), df_master_existing, 'baru_ke_lama'
+        )
+        
+        # Kolom kunci yang dibandingkan, di-resolve sekali ke kolom master existing
+        key_columns = ['Nama', 'NIP', 'NIK', 'KDGOL', 'KDKAWIN', 'STATUS', 'KODE OBJEK PAJak', 'PNS/PPPK']
+        kolom_kunci_master = petakan_nama(df_master_existing, key_columns)
+        ket_col = resolve(df_master_existing, 'master')['keterangan']
+        
+        for pos, (idx, row) in enumerate(df_hasil.iterrows()):
+            match_idx = match_master[pos]
            
-            # Tandai data yang sudah ada dengan membandingkan kolom kunci (tidak termasuk kolom bank)
-            for idx, row in df_hasil.iterrows():
-                match_idx = fuzzy_match_row(row['Nama'], row['NIP'], df_master_existing)
-               
-                if match_idx is not None:
-                    # Cek perbedaan hanya pada kolom kunci, abaikan kolom bank
-                    row_master = df_master_existing.iloc[match_idx]
-                   
-                    # Kolom kunci yang dibandingkan
-                    key_columns = ['Nama', 'NIP', 'NIK', 'KDGOL', 'KDKAWIN', 'STATUS', 'KODE OBJEK PAJak', 'PNS/PPPK']
-                   
-                    is_different = False
-                    for col in key_columns:
-                        # Cari kolom di master existing
-                        master_col = None
-                        for c in df_master_existing.columns:
-                            if col.upper() in str(c).upper():
-                                master_col = c
-                                break
-                       
-                        if master_col:
-                            val_master = format_nilai_asli(row_master.get(master_col, ''))
-                            val_new = format_nilai_asli(row.get(col, ''))
-                           
-                            if val_master != val_new:
-                                is_different = True
-                                break
-                   
-                    if is_different:
-                        # Data ada tapi berbeda pada kolom kunci - ORANGE
-                        df_hasil.at[idx, 'Status_Color'] = 'ORANGE'
-                        df_hasil.at[idx, 'Keterangan'] = f'Data berubah (kolom kunci berbeda)'
-                    else:
-                        # Data sama pada kolom kunci - KUNING
-                        df_hasil.at[idx, 'Status_Color'] = 'KUNING'
+            if match_idx is not None:
+                # Cek perbedaan hanya pada kolom kunci, abaikan kolom bank
+                row_master = df_master_existing.iloc[match_idx]
+               
+                is_different = False
+                for col in key_columns:
+                    master_col = kolom_kunci_master[col]
+                    if master_col:
+                        val_master = format_nilai_asli(row_master.get(master_col, ''))
+                        val_new = format_nilai_asli(row.get(col, ''))
                        
-                        # Update keterangan dari master jika ada
-                        ket_col = None
-                        for col in df_master_existing.columns:
-                            if 'KETERANGAN' in str(col).upper():
-                                ket_col = col
-                                break
-                       
-                        if ket_col:
-                            existing_ket = format_nilai_asli(df_master_existing.at[match_idx, ket_col])
-                            if pd.notna(existing_ket) and existing_ket:
-                                df_hasil.at[idx, 'Keterangan'] = existing_ket
+                        if val_master != val_new:
+                            is_different = True
+                            break
+               
+                if is_different:
+                    # Data ada tapi berbeda pada kolom kunci - ORANGE
+                    df_hasil.at[idx, 'Status_Color'] = 'ORANGE'
+                    df_hasil.at[idx, 'Keterangan'] = f'Data berubah (kolom kunci berbeda)'
                 else:
-                    # Data baru
-                    df_hasil.at[idx, 'Status_Color'] = 'HIJAU'
+                    # Data sama pada kolom kunci - KUNING
+                    df_hasil.at[idx, 'Status_Color'] = 'KUNING'
+                   
+                    # Update keterangan dari master jika ada
+                    if ket_col:
+                        existing_ket = format_nilai_asli(df_master_existing.at[match_idx, ket_col])
+                        if pd.notna(existing_ket) and existing_ket:
+                            df_hasil.at[idx, 'Keterangan'] = existing_ket
+            else:
+                # Data baru
+                df_hasil.at[idx, 'Status_Color'] = 'HIJAU'
+       
+        # Cek data lama yang tidak ada di bulan ini (MERAH)
+        # Fuzzy matching data lama -> data bulan ini sekaligus (paralel jika datanya besar)
+        nama_col_lama, nip_col_lama = cari_kolom_nama_nip(df_master_existing)
+        match_lama = [None] * len(df_master_existing)
+        if nama_col_lama and nip_col_lama:
+            match_lama = fuzzy_match_banyak([
+                (format_nilai_asli(n), format_nilai_asli(x))
+                for n, x in zip(df_master_existing[nama_col_lama].tolist(), df_master_existing[nip_col_lama].tolist())
+            ], df_hasil, 'lama_ke_baru')
+        jumlah_hasil_awal = len(df_hasil)
+        
+        for pos_old, (idx, row_old) in enumerate(df_master_existing.iterrows()):
+            if not nama_col_lama or not nip_col_lama:
+                break
            
-            # Cek data lama yang tidak ada di bulan ini (MERAH)
-            for idx, row_old in df_master_existing.iterrows():
-                # Cari kolom Nama dan NIP di master existing
-                nama_col = None
-                nip_col = None
-               
-                for col in df_master_existing.columns:
-                    col_upper = str(col).upper()
-                    if 'NAMA' in col_upper and nama_col is None:
-                        nama_col = col
-                    if 'NIP' in col.upper() and nip_col is None:
-                        nip_col = col
-               
-                if not nama_col or not nip_col:
-                    continue
+            nama_old = format_nilai_asli(row_old.get(nama_col_lama, ''))
+            nip_old = format_nilai_asli(row_old.get(nip_col_lama, ''))
+           
+            match_idx = match_lama[pos_old]
+            if match_idx is None and len(df_hasil) > jumlah_hasil_awal:
+                # Data lama yang sudah ditambahkan di atas juga ikut dicek
+                match_idx = fuzzy_match_row(nama_old, nip_old, df_hasil.iloc[jumlah_hasil_awal:])
+           
+            if match_idx is None:
+                # Data tidak ada di bulan ini - tambahkan dengan status TIDAK AKTIF
+                row_old_dict = row_old.to_dict()
                
-                nama_old = format_nilai_asli(row_old.get(nama_col, ''))
-                nip_old = format_nilai_asli(row_old.get(nip_col, ''))
+                # ===== PERUBAHAN: UNTUK DATA LAMA YANG TIDAK AKTIF =====
+                # Format ID PENERIMA TKU dari NIK master lama
+                nik_master = format_nilai_asli(row_old_dict.get('NIK', ''))
+                id_penerima_tku_old = f"{nik_master}000000" if nik_master and nik_master.strip() != '' else ''
                
-                match_idx = fuzzy_match_row(nama_old, nip_old, df_hasil)
+                # ID TKU tetap menggunakan nilai default
+                id_tku_old = "0001658723701000000000"
+                # ===== END PERUBAHAN =====
                
-                if match_idx is None:
-                    # Data tidak ada di bulan ini - tambahkan dengan status TIDAK AKTIF
-                    row_old_dict = row_old.to_dict()
-                   
-                    # ===== PERUBAHAN: UNTUK DATA LAMA YANG TIDAK AKTIF =====
-                    # Format ID PENERIMA TKU dari NIK master lama
-                    nik_master = format_nilai_asli(row_old_dict.get('NIK', ''))
-                    id_penerima_tku_old = f"{nik_master}000000" if nik_master and nik_master.strip() != '' else ''
-                   
-                    # ID TKU tetap menggunakan nilai default
-                    id_tku_old = "0001658723701000000000"
-                    # ===== END PERUBAHAN =====
-                   
-                    # Map kolom dari master existing ke format hasil
-                    new_row = {
-                        'No': len(df_hasil) + 1,
-                        'PNS/PPPK': format_nilai_asli(row_old_dict.get('PNS/PPPK', '')),
-                        'Nama': nama_old,
-                        'NIK': format_nilai_asli(row_old_dict.get('NIK', '')),
-                        'ID PENERIMA TKU': id_penerima_tku_old, # Menggunakan format baru
-                        'KDGOL': format_nilai_asli(row_old_dict.get('KDGOL', '')),
-                        'KODE OBJEK PAJAK': format_nilai_asli(row_old_dict.get('KODE OBJEK PAJAK', '')),
-                        'KDKAWIN': format_nilai_asli(row_old_dict.get('KDKAWIN', '')),
-                        'STATUS': format_nilai_asli(row_old_dict.get('STATUS', '')),
-                        'NIP': nip_old,
-                        'nmrek': format_nilai_asli(row_old_dict.get('nmrek', '')),
-                        'nm_bank': format_nilai_asli(row_old_dict.get('nm_bank', '')),
-                        'rekening': format_nilai_asli(row_old_dict.get('rekening', '')),
-                        'kdbankspan': format_nilai_asli(row_old_dict.get('kdbankspan', '')),
-                        'nmbankspan': format_nilai_asli(row_old_dict.get('nmbankspan', '')),
-                        'kdpos': format_nilai_asli(row_old_dict.get('kdpos', '')),
-                        'ID TKU': id_tku_old, # Menggunakan nilai default
-                        'AKTIF/TIDAK': 'TIDAK',
-                        'Keterangan': format_nilai_asli(row_old_dict.get('Keterangan', '')),
-                        'Status_Color': 'MERAH'
-                    }
-                   
-                    df_hasil = pd.concat([df_hasil, pd.DataFrame([new_row])], ignore_index=True)
-        else:
-            # Semua data baru
-            df_hasil['Status_Color'] = 'HIJAU'
-       
+                # Map kolom dari master existing ke format hasil
+                new_row = {
+                    'No': len(df_hasil) + 1,
+                    'PNS/PPPK': format_nilai_asli(row_old_dict.get('PNS/PPPK', '')),
+                    'Nama': nama_old,
+                    'NIK': format_nilai_asli(row_old_dict.get('NIK', '')),
+                    'ID PENERIMA TKU': id_penerima_tku_old, # Menggunakan format baru
+                    'KDGOL': format_nilai_asli(row_old_dict.get('KDGOL', '')),
+                    'KODE OBJEK PAJAK': format_nilai_asli(row_old_dict.get('KODE OBJEK PAJAK', '')),
+                    'KDKAWIN': format_nilai_asli(row_old_dict.get('KDKAWIN', '')),
+                    'STATUS': format_nilai_asli(row_old_dict.get('STATUS', '')),
+                    'NIP': nip_old,
+                    'nmrek': format_nilai_asli(row_old_dict.get('nmrek', '')),
+                    'nm_bank': format_nilai_asli(row_old_dict.get('nm_bank', '')),
+                    'rekening': format_nilai_asli(row_old_dict.get('rekening', '')),
+                    'kdbankspan': format_nilai_asli(row_old_dict.get('kdbankspan', '')),
+                    'nmbankspan': format_nilai_asli(row_old_dict.get('nmbankspan', '')),
+                    'kdpos': format_nilai_asli(row_old_dict.get('kdpos', '')),
+                    'ID TKU': id_tku_old, # Menggunakan nilai default
+                    'AKTIF/TIDAK': 'TIDAK',
+                    'Keterangan': format_nilai_asli(row_old_dict.get('Keterangan', '')),
+                    'Status_Color': 'MERAH'
+                }
+               
+                df_hasil = pd.concat([df_hasil, pd.DataFrame([new_row])], ignore_index=True)
+        
         return df_hasil
+    
+    # Mentah -> siapkan -> cocokkan BPMP -> gabung master; duplikat dicek per file
+    alur = Alur('croscheck_pppk')
+    alur.tambah('mentah_rapi', rapikan_kolom, ['mentah'])
+    alur.tambah('bpmp_rapi', rapikan_kolom, ['bpmp'])
+    alur.tambah('master_rapi', rapikan_kolom, ['master'])
+    alur.tambah('duplikat_mentah', duplikat_mentah, ['mentah_rapi'])
+    alur.tambah('duplikat_bpmp', duplikat_bpmp, ['bpmp_rapi'])
+    alur.tambah('duplikat_master', duplikat_master, ['master_rapi'])
+    alur.tambah('siapkan_mentah', siapkan_mentah, ['mentah_rapi'], disk=True)
+    alur.tambah('cocokkan_bpmp', cocokkan_bpmp, ['siapkan_mentah', 'bpmp_rapi'], disk=True)
+    alur.tambah('gabung_master', gabung_master, ['cocokkan_bpmp', 'master_rapi'], disk=True)
+    
+    def process_data(df_mentah, df_bpmp, df_master_existing=None, identitas_sumber=None, ada_duplikat=False):
+        """Proses data dari file mentah dan BPMP ke format master lewat alur tahap.
+        
+        Return dict hasil tahap (gabung_master dan frame sumber yang sudah
+        dirapikan), atau None jika proses dibatalkan.
+        """
+        if df_mentah is None or df_bpmp is None:
+            st.warning("⚠️ Pastikan file Data Mentah dan BPMP sudah di-upload!")
+            return None
+        
+        # ===== DETEKSI DUPLIKASI SEBELUM PROSES =====
+        # Hasil tahap duplikat per file (lihat bagian Validasi Duplikasi di atas)
+        if ada_duplikat:
+            st.error("⛔ **PROSES DIBATALKAN** karena ditemukan data duplikat!")
+            st.error("Harap perbaiki data duplikat terlebih dahulu sebelum melanjutkan proses.")
+            return None
+        
+        st.success("✅ Tidak ditemukan data duplikat. Melanjutkan proses...")
+        # ===== END DETEKSI DUPLIKASI =====
+        
+        hasil_alur, laporan = alur.jalankan(
+            {'mentah': df_mentah, 'bpmp': df_bpmp, 'master': df_master_existing},
+            ['mentah_rapi', 'bpmp_rapi', 'master_rapi', 'gabung_master'],
+            identitas_sumber,
+        )
+        df_mentah = hasil_alur['mentah_rapi']
+        df_bpmp = hasil_alur['bpmp_rapi']
+        df_master_existing = hasil_alur['master_rapi']
+       
+        # Debug: tampilkan kolom yang tersedia
+        st.write("**Kolom Data Mentah PPPK:**", df_mentah.columns.tolist()[:15])
+        st.write("**Kolom Data BPMP:**", df_bpmp.columns.tolist())
+        with st.expander("🧭 Pemetaan Kolom Otomatis"):
+            st.dataframe(pd.DataFrame(jelaskan(df_bpmp, 'bpmp')), use_container_width=True)
+        if df_master_existing is not None and not df_master_existing.empty:
+            st.write("**Kolom Master Existing:**", df_master_existing.columns.tolist())
+        
+        st.caption(f"🧩 {ringkas_laporan(laporan)}")
+        with st.expander("Detail tahap proses"):
+            st.dataframe(pd.DataFrame(laporan), hide_index=True, use_container_width=True)
+        return hasil_alur
    
     def create_excel_with_colors(df):
-        """Buat Excel dengan warna berdasarkan status"""
+        """Buat Excel dengan warna berdasarkan status (+ salinan data tertanam untuk upload ulang)"""
         output = BytesIO()
        
         # Hapus kolom helper
@@ -883,8 +949,32 @@ def show():
                     for col in range(1, len(df_export.columns) + 1):
                         worksheet.cell(row=excel_row, column=col).fill = green_fill
        
-        output.seek(0)
-        return output
+        return tanam_sidecar(output, df_export)
+   
+    def create_excel_polos(df_show):
+        """Excel tanpa warna (+ salinan data tertanam untuk upload ulang)"""
+        output = BytesIO()
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            # Format kolom numerik
+            df_export = df_show.copy()
+            for col in df_export.columns:
+                if col in ['NIP', 'NIK', 'ID PENERIMA TKU', 'ID TKU', 'rekening']:
+                    df_export[col] = df_export[col].apply(lambda x: format_nilai_asli(x))
+            df_export.to_excel(writer, index=False, sheet_name='Master Data')
+        return tanam_sidecar(output, df_export)
+   
+    def ekspor_warna(df):
+        """Bytes Excel berwarna (tahap ekspor)"""
+        return create_excel_with_colors(df).getvalue()
+   
+    def ekspor_polos(df_show):
+        """Bytes Excel tanpa warna (tahap ekspor)"""
+        return create_excel_polos(df_show).getvalue()
+   
+    # File download dikunci isi tabel yang ditampilkan: rerun tanpa perubahan
+    # tidak menulis ulang xlsx maupun salinan Arrow-nya
+    alur.tambah('excel_warna', ekspor_warna, ['tampil'])
+    alur.tambah('excel_polos', ekspor_polos, ['tampil'])
    
     # ===== UI UNTUK FITUR MASTER DATA =====
     st.title("🔍 CROSCHECK DATA GAJI PPPK")
@@ -957,96 +1047,33 @@ def show():
     st.markdown("---")
    
     # Baca file dengan metode yang diperbaiki
-    df_mentah = read_excel_flexible(uploaded_mentah, HEADERS_MENTAH_PPPK, "Data Mentah PPPK")
-    df_bpmp = read_excel_flexible(uploaded_bpmp, HEADERS_BPMP, "Data BPMP")
-    df_master_existing = read_excel_flexible(uploaded_master, HEADERS_MASTER, "Master Existing")
+    # Ketiga file independen: diparse bersamaan, waktu baca ~ file paling lambat
+    hasil_baca, kunci_baca = baca_upload_paralel([
+        ("Data Mentah PPPK", uploaded_mentah, HEADERS_MENTAH_PPPK),
+        ("Data BPMP", uploaded_bpmp, HEADERS_BPMP),
+        ("Master Existing", uploaded_master, HEADERS_MASTER),
+    ])
+    df_mentah = hasil_baca["Data Mentah PPPK"]
+    df_bpmp = hasil_baca["Data BPMP"]
+    df_master_existing = hasil_baca["Master Existing"]
     
     # ===== VALIDASI DUPLIKASI DATA =====
     st.subheader("🔍 VALIDASI DUPLIKASI DATA")
     
-    duplicate_found = False
-    duplicate_info = {}
-    
-    if df_mentah is not None:
-        # Cek NIP duplicate di Data Mentah
-        if 'nip' in df_mentah.columns:
-            df_mentah['nip_formatted'] = df_mentah['nip'].apply(lambda x: format_nilai_asli(x))
-            nip_duplicates = df_mentah[df_mentah['nip_formatted'].duplicated(keep=False)]
-            if not nip_duplicates.empty:
-                duplicate_found = True
-                duplicate_info['NIP Data Mentah'] = {
-                    'data': nip_duplicates,
-                    'column': 'nip',
-                    'count': len(nip_duplicates)
-                }
-        
-        # Cek NPWP duplicate di Data Mentah
-        if 'npwp' in df_mentah.columns:
-            df_mentah['npwp_formatted'] = df_mentah['npwp'].apply(lambda x: format_nilai_asli(x))
-            npwp_duplicates = df_mentah[df_mentah['npwp_formatted'].duplicated(keep=False)]
-            if not npwp_duplicates.empty:
-                duplicate_found = True
-                duplicate_info['NPWP Data Mentah'] = {
-                    'data': npwp_duplicates,
-                    'column': 'npwp',
-                    'count': len(npwp_duplicates)
-                }
-    
-    if df_bpmp is not None:
-        # Cek NPWP/NIK/TIN duplicate di Data BPMP
-        nik_col_bpmp = None
-        for col in df_bpmp.columns:
-            if 'NPWP' in col.upper() or 'NIK' in col.upper() or 'TIN' in col.upper():
-                nik_col_bpmp = col
-                break
-        
-        if nik_col_bpmp:
-            df_bpmp[f'{nik_col_bpmp}_formatted'] = df_bpmp[nik_col_bpmp].apply(lambda x: format_nilai_asli(x))
-            nik_bpmp_duplicates = df_bpmp[df_bpmp[f'{nik_col_bpmp}_formatted'].duplicated(keep=False)]
-            if not nik_bpmp_duplicates.empty:
-                duplicate_found = True
-                duplicate_info['NPWP/NIK Data BPMP'] = {
-                    'data': nik_bpmp_duplicates,
-                    'column': nik_col_bpmp,
-                    'count': len(nik_bpmp_duplicates)
-                }
+    # Kunci sumber alur = kunci isi file (file yang tidak berubah tidak di-hash ulang)
+    label_sumber = {'mentah': "Data Mentah PPPK", 'bpmp': "Data BPMP", 'master': "Master Existing"}
+    identitas_sumber = {nama: kunci_baca[label] for nama, label in label_sumber.items()
+                        if hasil_baca[label] is not None}
     
-    if df_master_existing is not None:
-        # Cek NIP duplicate di Data Master
-        nip_col_master = None
-        for col in df_master_existing.columns:
-            if 'NIP' in str(col).upper():
-                nip_col_master = col
-                break
-        
-        if nip_col_master:
-            df_master_existing[f'{nip_col_master}_formatted'] = df_master_existing[nip_col_master].apply(lambda x: format_nilai_asli(x))
-            nip_master_duplicates = df_master_existing[df_master_existing[f'{nip_col_master}_formatted'].duplicated(keep=False)]
-            if not nip_master_duplicates.empty:
-                duplicate_found = True
-                duplicate_info['NIP Master Existing'] = {
-                    'data': nip_master_duplicates,
-                    'column': nip_col_master,
-                    'count': len(nip_master_duplicates)
-                }
-        
-        # Cek NIK duplicate di Data Master
-        nik_col_master = None
-        for col in df_master_existing.columns:
-            if 'NIK' in str(col).upper():
-                nik_col_master = col
-                break
-        
-        if nik_col_master:
-            df_master_existing[f'{nik_col_master}_formatted'] = df_master_existing[nik_col_master].apply(lambda x: format_nilai_asli(x))
-            nik_master_duplicates = df_master_existing[df_master_existing[f'{nik_col_master}_formatted'].duplicated(keep=False)]
-            if not nik_master_duplicates.empty:
-                duplicate_found = True
-                duplicate_info['NIK Master Existing'] = {
-                    'data': nik_master_duplicates,
-                    'column': nik_col_master,
-                    'count': len(nik_master_duplicates)
-                }
+    # Duplikasi dicek per file; file yang tidak berubah memakai hasil sebelumnya
+    duplikat, laporan_duplikat = alur.jalankan(
+        {'mentah': df_mentah, 'bpmp': df_bpmp, 'master': df_master_existing},
+        ['duplikat_mentah', 'duplikat_bpmp', 'duplikat_master'],
+        identitas_sumber,
+    )
+    st.caption(f"🧩 {ringkas_laporan(laporan_duplikat)}")
+    duplicate_info = {**duplikat['duplikat_mentah'], **duplikat['duplikat_bpmp'], **duplikat['duplikat_master']}
+    duplicate_found = bool(duplicate_info)
     
     # Tampilkan hasil validasi duplikasi
     if duplicate_found:
@@ -1118,18 +1145,43 @@ def show():
             st.error("❌ File Data Mentah PPPK dan Data BPMP wajib diupload!")
         else:
             with st.spinner("Memproses data..."):
-                df_hasil = process_data(df_mentah, df_bpmp, df_master_existing)
-               
-                if df_hasil is not None:
-                    st.session_state['df_hasil'] = df_hasil
-                    st.session_state['df_master_existing'] = df_master_existing
-                    st.session_state['df_mentah'] = df_mentah
-                    st.session_state['df_bpmp'] = df_bpmp
+                hasil_alur = process_data(df_mentah, df_bpmp, df_master_existing, identitas_sumber, duplicate_found)
+               
+                if hasil_alur is not None:
+                    df_hasil = hasil_alur['gabung_master']
+                    # Frame sumber yang disimpan adalah versi dengan nama kolom sudah dirapikan
+                    df_mentah = hasil_alur['mentah_rapi']
+                    df_bpmp = hasil_alur['bpmp_rapi']
+                    df_master_existing = hasil_alur['master_rapi']
+                    # Disimpan dengan dtype ringkas (identitas string[pyarrow], kode category, rupiah int64)
+                    st.session_state['laporan_memori'] = simpan_ringkas(
+                        st.session_state,
+                        df_hasil=df_hasil,
+                        df_master_existing=df_master_existing,
+                        df_mentah=df_mentah,
+                        df_bpmp=df_bpmp,
+                    )
                     st.success("✅ Data berhasil diproses!")
+                    # Master hasil croscheck didaftarkan untuk cek identitas lintas PNS/PPPK
+                    try:
+                        identitas_lintas.daftarkan('pppk', df_hasil, 'croscheck_pppk')
+                    except Exception as e:
+                        st.warning(f"⚠️ Master tidak terdaftar untuk cek identitas lintas PNS/PPPK: {str(e)}")
    
     # Tampilkan hasil
     if 'df_hasil' in st.session_state:
         st.markdown("---")
+        identitas_lintas.tampilkan_identitas_lintas('pppk')
+        
+        if st.session_state.get('laporan_memori'):
+            with st.expander("🧠 Laporan Memori Session (dtype ringkas)", expanded=False):
+                df_laporan = pd.DataFrame(st.session_state['laporan_memori'])
+                st.dataframe(df_laporan, use_container_width=True, hide_index=True)
+                st.caption(f"Total: {df_laporan['Sebelum (MB)'].sum():.2f} MB → {df_laporan['Sesudah (MB)'].sum():.2f} MB")
+                st.markdown("**Lokasi frame sesi** (frame lama dipindah ke disk jika melebihi batas memori)")
+                st.dataframe(pd.DataFrame(ringkasan_sesi(st.session_state)), use_container_width=True, hide_index=True)
+                st.markdown("**Master bersama** (satu salinan per versi master untuk semua sesi)")
+                st.dataframe(pd.DataFrame(info_master()), use_container_width=True, hide_index=True)
         
         # Tab informasi
         st.info("""
@@ -1155,7 +1207,8 @@ def show():
         with tab1:
             st.subheader("📋 Hasil Master Data Baru PPPK")
            
-            df_display = st.session_state['df_hasil'].copy()
+            # Copy-on-Write aktif: tidak perlu salinan defensif, data dibagi sampai diubah
+            df_display = st.session_state['df_hasil']
            
             # Fungsi untuk styling
             def highlight_rows(row):
@@ -1196,20 +1249,13 @@ def show():
             )
            
             if download_format == "Excel dengan warna":
-                excel_file = create_excel_with_colors(df_display)
+                hasil_ekspor, _ = alur.jalankan({'tampil': df_display}, ['excel_warna'])
+                excel_file = hasil_ekspor['excel_warna']
                 file_name = "master_data_pppk.xlsx"
                 mime_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             elif download_format == "Excel tanpa warna":
-                output = BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    # Format kolom numerik
-                    df_export = df_show.copy()
-                    for col in df_export.columns:
-                        if col in ['NIP', 'NIK', 'ID PENERIMA TKU', 'ID TKU', 'rekening']:
-                            df_export[col] = df_export[col].apply(lambda x: format_nilai_asli(x))
-                    df_export.to_excel(writer, index=False, sheet_name='Master Data')
-                output.seek(0)
-                excel_file = output
+                hasil_ekspor, _ = alur.jalankan({'tampil': df_show}, ['excel_polos'])
+                excel_file = hasil_ekspor['excel_polos']
                 file_name = "master_data_pppk_tanpa_warna.xlsx"
                 mime_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             else: # CSV
@@ -1309,12 +1355,19 @@ def show():
                 # Buat dataframe perbandingan
                 comparison_data = []
                
-                for idx_new, row_new in df_new.iterrows():
+                # Fuzzy matching semua baris master baru sekaligus (paralel jika datanya besar)
+                nama_semua_new = df_new['Nama'].tolist() if 'Nama' in df_new.columns else [''] * len(df_new)
+                nip_semua_new = df_new['NIP'].tolist() if 'NIP' in df_new.columns else [''] * len(df_new)
+                match_baru = fuzzy_match_banyak([
+                    (format_nilai_asli(n), format_nilai_asli(x)) for n, x in zip(nama_semua_new, nip_semua_new)
+                ], df_old, 'baru_ke_lama')
+                
+                for pos_new, (idx_new, row_new) in enumerate(df_new.iterrows()):
                     nama_new = format_nilai_asli(row_new.get('Nama', ''))
                     nip_new = format_nilai_asli(row_new.get('NIP', ''))
                    
                     # Cari matching row di master lama
-                    match_idx = fuzzy_match_row(nama_new, nip_new, df_old)
+                    match_idx = match_baru[pos_new]
                    
                     if match_idx is not None:
                         row_old = df_old.iloc[match_idx]
@@ -1345,25 +1398,23 @@ def show():
                     comparison_data.append(comparison_row)
                
                 # Tambahkan data yang hilang (ada di master lama tapi tidak di master baru)
-                for idx_old, row_old in df_old.iterrows():
+                nama_col_old, nip_col_old = cari_kolom_nama_nip(df_old)
+                match_hilang = [None] * len(df_old)
+                if nama_col_old and nip_col_old:
+                    match_hilang = fuzzy_match_banyak([
+                        (format_nilai_asli(n), format_nilai_asli(x))
+                        for n, x in zip(df_old[nama_col_old].tolist(), df_old[nip_col_old].tolist())
+                    ], df_new, 'lama_ke_baru')
+                
+                for pos_old, (idx_old, row_old) in enumerate(df_old.iterrows()):
                     nama_old = format_nilai_asli(row_old.get('Nama', ''))
                     nip_old = format_nilai_asli(row_old.get('NIP', ''))
                    
-                    # Cek apakah kolom ada
-                    nama_col = None
-                    nip_col = None
-                    for col in df_old.columns:
-                        col_upper = str(col).upper()
-                        if 'NAMA' in col_upper and nama_col is None:
-                            nama_col = col
-                        if 'NIP' in col.upper() and nip_col is None:
-                            nip_col = col
-                   
-                    if nama_col and nip_col:
-                        nama_old = format_nilai_asli(row_old.get(nama_col, ''))
-                        nip_old = format_nilai_asli(row_old.get(nip_col, ''))
+                    if nama_col_old and nip_col_old:
+                        nama_old = format_nilai_asli(row_old.get(nama_col_old, ''))
+                        nip_old = format_nilai_asli(row_old.get(nip_col_old, ''))
                        
-                        match_idx = fuzzy_match_row(nama_old, nip_old, df_new)
+                        match_idx = match_hilang[pos_old]
                        
                         if match_idx is None:
                             comparison_row = {
@@ -1627,38 +1678,18 @@ def show():
                
                 # ===== CARI KOLOM UNTUK PERBANDINGAN TAMBAHAN =====
                 # Cari kolom di Data Mentah untuk perbandingan
-                bulan_col_mentah = None
-                tahun_col_mentah = None
-                gaji_kotor_col_mentah = None
-                kdkawin_col_mentah = None
-               
-                for col in df_mentah.columns:
-                    col_lower = str(col).lower()
-                    if 'bulan' in col_lower and bulan_col_mentah is None:
-                        bulan_col_mentah = col
-                    elif 'tahun' in col_lower and tahun_col_mentah is None:
-                        tahun_col_mentah = col
-                    elif 'gajikotor' in col_lower.replace(' ', '') and gaji_kotor_col_mentah is None:
-                        gaji_kotor_col_mentah = col
-                    elif 'kdkawin' in col_lower and kdkawin_col_mentah is None:
-                        kdkawin_col_mentah = col
+                kolom_mentah = resolve(df_mentah, 'mentah')
+                bulan_col_mentah = kolom_mentah['bulan']
+                tahun_col_mentah = kolom_mentah['tahun']
+                gaji_kotor_col_mentah = kolom_mentah['gaji_kotor']
+                kdkawin_col_mentah = kolom_mentah['kdkawin']
                
                 # Cari kolom di Data BPMP untuk perbandingan
-                masa_pajak_col_bpmp = None
-                tahun_pajak_col_bpmp = None
-                penghasilan_kotor_col_bpmp = None
-                status_col_bpmp = None
-               
-                for col in df_bpmp.columns:
-                    col_lower = str(col).lower()
-                    if 'masa' in col_lower and 'pajak' in col_lower and masa_pajak_col_bpmp is None:
-                        masa_pajak_col_bpmp = col
-                    elif 'tahun' in col_lower and 'pajak' in col_lower and tahun_pajak_col_bpmp is None:
-                        tahun_pajak_col_bpmp = col
-                    elif 'penghasilan' in col_lower and 'kotor' in col_lower and penghasilan_kotor_col_bpmp is None:
-                        penghasilan_kotor_col_bpmp = col
-                    elif 'status' in col_lower and 'pegawai' not in col_lower and status_col_bpmp is None:
-                        status_col_bpmp = col
+                kolom_bpmp = resolve(df_bpmp, 'bpmp')
+                masa_pajak_col_bpmp = kolom_bpmp['masa_pajak']
+                tahun_pajak_col_bpmp = kolom_bpmp['tahun_pajak']
+                penghasilan_kotor_col_bpmp = kolom_bpmp['penghasilan_kotor']
+                status_col_bpmp = kolom_bpmp['status']
                 # ===== END CARI KOLOM =====
                
                 # Proses validasi
@@ -1667,31 +1698,133 @@ def show():
                 validation_data = []
                
                 # Cari kolom NPWP/NIK/TIN di BPMP
-                nik_col_bpmp = None
-                for col in df_bpmp.columns:
-                    if 'NPWP' in col.upper() or 'NIK' in col.upper() or 'TIN' in col.upper():
-                        nik_col_bpmp = col
-                        break
-               
+                nik_col_bpmp = kolom_bpmp['nik']
+               
+                # ===== REKONSILIASI CEPAT: TOTAL KONTROL PER (MASA, TAHUN) =====
+                # Periode yang jumlah, total kotor, dan digest NPWP-nya sama di kedua sisi
+                # tidak perlu divalidasi per baris; hanya periode yang berbeda masuk loop di bawah
+                def kolom_teks(df, col):
+                    if not col or col not in df.columns:
+                        return pd.Series('', index=df.index, dtype=object)
+                    return df[col].map(format_nilai_asli).astype(object)
+                
+                kolom_lengkap = all([
+                    nik_col_bpmp, bulan_col_mentah, tahun_col_mentah, gaji_kotor_col_mentah, kdkawin_col_mentah,
+                    masa_pajak_col_bpmp, tahun_pajak_col_bpmp, penghasilan_kotor_col_bpmp, status_col_bpmp,
+                ]) and 'nip' in df_mentah.columns and 'npwp' in df_mentah.columns
+                teks_mentah = pd.DataFrame({
+                    'nip': kolom_teks(df_mentah, 'nip'),
+                    'npwp': kolom_teks(df_mentah, 'npwp'),
+                    'nama': kolom_teks(df_mentah, 'nmpeg'),
+                    'bulan': kolom_teks(df_mentah, bulan_col_mentah),
+                    'tahun': kolom_teks(df_mentah, tahun_col_mentah),
+                    'gaji': kolom_teks(df_mentah, gaji_kotor_col_mentah),
+                    'kdkawin': kolom_teks(df_mentah, kdkawin_col_mentah),
+                })
+                teks_mentah['status_kawin'] = teks_mentah['kdkawin'].map(konversi_status)
+                teks_bpmp = pd.DataFrame({
+                    'nik': kolom_teks(df_bpmp, nik_col_bpmp),
+                    'masa': kolom_teks(df_bpmp, masa_pajak_col_bpmp),
+                    'tahun': kolom_teks(df_bpmp, tahun_pajak_col_bpmp),
+                    'kotor': kolom_teks(df_bpmp, penghasilan_kotor_col_bpmp),
+                    'status': kolom_teks(df_bpmp, status_col_bpmp),
+                })
+                
+                # Gaji kotor diparse sekali per kolom ke int64 sen (rekonsiliasi + validasi per baris)
+                kotor_sen_mentah, _, _ = parse_rupiah(teks_mentah['gaji'], SATUAN_SEN)
+                kotor_sen_bpmp, _, _ = parse_rupiah(teks_bpmp['kotor'], SATUAN_SEN)
+                sen_mentah = kotor_sen_mentah.astype(object).where(kotor_sen_mentah.notna(), None).to_dict()
+                
+                tabel_rekon, baris_cocok = rekonsiliasi(
+                    pd.DataFrame({
+                        'masa': teks_mentah['bulan'], 'tahun': teks_mentah['tahun'], 'npwp': teks_mentah['npwp'],
+                        'kotor': kotor_sen_mentah, 'status': teks_mentah['status_kawin'],
+                        'lengkap': kolom_lengkap & (teks_mentah['nip'] != ''),
+                    }),
+                    pd.DataFrame({
+                        'masa': teks_bpmp['masa'], 'tahun': teks_bpmp['tahun'], 'npwp': teks_bpmp['nik'],
+                        'kotor': kotor_sen_bpmp, 'status': teks_bpmp['status'],
+                        'lengkap': kolom_lengkap,
+                    }),
+                )
+                periode_cocok = int((tabel_rekon['Status'] == 'COCOK').sum())
+                if len(tabel_rekon) > 0 and periode_cocok == len(tabel_rekon):
+                    st.success(f"✅ **Fully reconciled** - {periode_cocok} periode, {int(baris_cocok.sum())} baris: "
+                               f"jumlah, total Penghasilan Kotor, dan digest NPWP sama. Validasi per baris dilewati.")
+                elif periode_cocok > 0:
+                    st.info(f"⚡ {periode_cocok} dari {len(tabel_rekon)} periode sudah cocok ({int(baris_cocok.sum())} baris). "
+                            f"Validasi per baris hanya untuk periode yang berbeda.")
+                with st.expander("🧮 Total Kontrol per Periode (Masa, Tahun)"):
+                    st.dataframe(tabel_rekon, use_container_width=True, hide_index=True)
+                
+                # Baris periode COCOK: semua perbandingan SESUAI, nilai BPMP diambil lewat NPWP
+                cocok = teks_mentah[baris_cocok]
+                pasangan = teks_bpmp[teks_bpmp['nik'] != ''].drop_duplicates('nik', keep='last').set_index('nik')
+                pasangan = pasangan.reindex(cocok['npwp'])
+                df_validasi_cepat = pd.DataFrame({
+                    'No': cocok.index + 1,
+                    'Nama': cocok['nama'].to_numpy(),
+                    'NIP (Data Mentah)': cocok['nip'].to_numpy(),
+                    'NPWP (Data Mentah)': cocok['npwp'].to_numpy(),
+                    'NPWP (Data BPMP)': cocok['npwp'].to_numpy(),
+                    'Bulan (Mentah)': cocok['bulan'].to_numpy(),
+                    'Masa Pajak (BPMP)': pasangan['masa'].to_numpy(),
+                    'Status Bulan': 'SESUAI',
+                    'Tahun (Mentah)': cocok['tahun'].to_numpy(),
+                    'Tahun Pajak (BPMP)': pasangan['tahun'].to_numpy(),
+                    'Status Tahun': 'SESUAI',
+                    'GajiKotor (Mentah)': cocok['gaji'].to_numpy(),
+                    'Penghasilan Kotor (BPMP)': pasangan['kotor'].to_numpy(),
+                    'Status Gaji Kotor': 'SESUAI',
+                    'KDKAWIN (Mentah)': cocok['kdkawin'].to_numpy(),
+                    'Status Kawin (Mentah)': cocok['status_kawin'].to_numpy(),
+                    'Status (BPMP)': pasangan['status'].to_numpy(),
+                    'Status Perbandingan Kawin': 'SESUAI',
+                    'Status': 'VALID',
+                    'Rekomendasi': 'Data lengkap dan cocok (Match: 100%)',
+                })
+                # ===== END REKONSILIASI CEPAT =====
+                
                 # ===== BUAT DICTIONARY UNTUK MAPPING BPMP BERDASARKAN NIK =====
-                # Buat mapping dari NIK ke baris BPMP untuk pencarian yang lebih cepat
+                # Mapping NIK -> data BPMP untuk baris yang masih divalidasi per baris
+                # (dibangun dari kolom yang sudah diformat; dilewati jika semua periode cocok)
+                # ===== VALIDASI INKREMENTAL =====
+                # Baris yang isi, kunci NPWP, dan pasangan BPMP-nya tidak berubah sejak run
+                # sebelumnya memakai hasil lama; hanya sisanya yang masuk loop di bawah
+                teks_per_baris = teks_mentah[~baris_cocok]
+                hash_mentah = validasi_inkremental.hash_baris(teks_per_baris)
+                kunci_npwp = teks_per_baris['npwp']
+                pembanding_bpmp = validasi_inkremental.hash_pembanding(teks_bpmp, 'nik', keep='last')
+                konteks_bpmp = validasi_inkremental.konteks(
+                    'bpmp_pppk', 1, list(teks_per_baris.columns), bulan_col_mentah, tahun_col_mentah,
+                    gaji_kotor_col_mentah, kdkawin_col_mentah, nik_col_bpmp, masa_pajak_col_bpmp,
+                    tahun_pajak_col_bpmp, penghasilan_kotor_col_bpmp, status_col_bpmp,
+                )
+                ulang_bpmp, hasil_lama_bpmp = validasi_inkremental.rencana_ulang(
+                    st.session_state.get('riwayat_validasi_bpmp'), konteks_bpmp,
+                    hash_mentah, kunci_npwp, pembanding_bpmp,
+                )
+                if hasil_lama_bpmp is not None and len(ulang_bpmp) > 0:
+                    st.caption(f"♻️ Validasi inkremental: {validasi_inkremental.ringkas(ulang_bpmp)}")
+                # ===== END VALIDASI INKREMENTAL =====
+                
                 bpmp_mapping = {}
-                if nik_col_bpmp:
-                    for idx_bpmp, row_bpmp in df_bpmp.iterrows():
-                        nik_bpmp = format_nilai_asli(row_bpmp.get(nik_col_bpmp, ''))
+                if nik_col_bpmp and ulang_bpmp.any():
+                    sen_bpmp = kotor_sen_bpmp.astype(object).where(kotor_sen_bpmp.notna(), None)
+                    for (nik_bpmp, masa_bpmp, tahun_bpmp, kotor_bpmp, status_bpmp), kotor_sen in zip(
+                            teks_bpmp.itertuples(index=False), sen_bpmp):
                         if nik_bpmp:
-                            # Simpan row dan data tambahan
-                            bpmp_data = {
-                                'row': row_bpmp,
-                                'masa_pajak': format_nilai_asli(row_bpmp.get(masa_pajak_col_bpmp, '')) if masa_pajak_col_bpmp else '',
-                                'tahun_pajak': format_nilai_asli(row_bpmp.get(tahun_pajak_col_bpmp, '')) if tahun_pajak_col_bpmp else '',
-                                'penghasilan_kotor': format_nilai_asli(row_bpmp.get(penghasilan_kotor_col_bpmp, '')) if penghasilan_kotor_col_bpmp else '',
-                                'status_bpmp': format_nilai_asli(row_bpmp.get(status_col_bpmp, '')) if status_col_bpmp else ''
+                            bpmp_mapping[nik_bpmp] = {
+                                'masa_pajak': masa_bpmp,
+                                'tahun_pajak': tahun_bpmp,
+                                'penghasilan_kotor': kotor_bpmp,
+                                'kotor_sen': kotor_sen,
+                                'status_bpmp': status_bpmp,
                             }
-                            bpmp_mapping[nik_bpmp] = bpmp_data
                 # ===== END MAPPING =====
-               
-                for idx_mentah, row_mentah in df_mentah.iterrows():
+                
+                indeks_ulang = ulang_bpmp.index[ulang_bpmp]
+                for idx_mentah, row_mentah in df_mentah.loc[indeks_ulang].iterrows():
                     nip_mentah = format_nilai_asli(row_mentah.get('nip', '')) if 'nip' in df_mentah.columns else ''
                     npwp_mentah = format_nilai_asli(row_mentah.get('npwp', '')) if 'npwp' in df_mentah.columns else ''
                     nama_mentah = format_nilai_asli(row_mentah.get('nmpeg', '')) if 'nmpeg' in df_mentah.columns else ''
@@ -1753,17 +1886,13 @@ def show():
                                 status_tahun = 'TIDAK SESUAI' if tahun_mentah != tahun_pajak_bpmp else 'SESUAI'
                        
                         if gaji_kotor_mentah and penghasilan_kotor_bpmp:
-                            try:
-                                # Bersihkan format angka
-                                gaji_mentah_clean = gaji_kotor_mentah.replace('.', '').replace(',', '.')
-                                gaji_bpmp_clean = penghasilan_kotor_bpmp.replace('.', '').replace(',', '.')
-                               
-                                gaji_mentah_num = float(gaji_mentah_clean)
-                                gaji_bpmp_num = float(gaji_bpmp_clean)
-                               
-                                # Toleransi 1 untuk perbedaan pembulatan
-                                status_gaji = 'SESUAI' if abs(gaji_mentah_num - gaji_bpmp_num) <= 1 else 'TIDAK SESUAI'
-                            except:
+                            # Nominal sudah diparse per kolom ke int64 sen; toleransi 1 rupiah untuk pembulatan
+                            gaji_mentah_sen = sen_mentah.get(idx_mentah)
+                            gaji_bpmp_sen = bpmp_data['kotor_sen']
+                            if gaji_mentah_sen is not None and gaji_bpmp_sen is not None:
+                                selisih = abs(gaji_mentah_sen - gaji_bpmp_sen)
+                                status_gaji = 'SESUAI' if selisih <= TOLERANSI_RUPIAH * SATUAN_SEN else 'TIDAK SESUAI'
+                            else:
                                 status_gaji = 'TIDAK SESUAI' if gaji_kotor_mentah != penghasilan_kotor_bpmp else 'SESUAI'
                        
                         # ===== PERBANDINGAN STATUS KAWIN =====
@@ -1844,15 +1973,13 @@ def show():
                                     status_tahun = 'TIDAK SESUAI' if tahun_mentah != tahun_pajak_bpmp else 'SESUAI'
                            
                             if gaji_kotor_mentah and penghasilan_kotor_bpmp:
-                                try:
-                                    gaji_mentah_clean = gaji_kotor_mentah.replace('.', '').replace(',', '.')
-                                    gaji_bpmp_clean = penghasilan_kotor_bpmp.replace('.', '').replace(',', '.')
-                                   
-                                    gaji_mentah_num = float(gaji_mentah_clean)
-                                    gaji_bpmp_num = float(gaji_bpmp_clean)
-                                   
-                                    status_gaji = 'SESUAI' if abs(gaji_mentah_num - gaji_bpmp_num) <= 1 else 'TIDAK SESUAI'
-                                except:
+                                # Nominal sudah diparse per kolom ke int64 sen; toleransi 1 rupiah untuk pembulatan
+                                gaji_mentah_sen = sen_mentah.get(idx_mentah)
+                                gaji_bpmp_sen = bpmp_data['kotor_sen']
+                                if gaji_mentah_sen is not None and gaji_bpmp_sen is not None:
+                                    selisih = abs(gaji_mentah_sen - gaji_bpmp_sen)
+                                    status_gaji = 'SESUAI' if selisih <= TOLERANSI_RUPIAH * SATUAN_SEN else 'TIDAK SESUAI'
+                                else:
                                     status_gaji = 'TIDAK SESUAI' if gaji_kotor_mentah != penghasilan_kotor_bpmp else 'SESUAI'
                            
                             # ===== PERBANDINGAN STATUS KAWIN UNTUK FUZZY MATCH =====
@@ -1932,10 +2059,28 @@ def show():
                         'Rekomendasi': rekomendasi
                     })
                
-                df_validation = pd.DataFrame(validation_data)
+                df_validation = validasi_inkremental.gabung(
+                    pd.DataFrame(validation_data, index=indeks_ulang), hasil_lama_bpmp
+                )
+                st.session_state['riwayat_validasi_bpmp'] = validasi_inkremental.simpan_riwayat(
+                    df_validation, hash_mentah, kunci_npwp,
+                    kunci_npwp.isin(pembanding_bpmp.index) | (kunci_npwp == ''),
+                    konteks_bpmp, pembanding_bpmp,
+                )
+                df_validation = df_validation.reset_index(drop=True)
+                if not df_validasi_cepat.empty:
+                    bagian = [df_validasi_cepat] + ([df_validation] if not df_validation.empty else [])
+                    df_validation = pd.concat(bagian, ignore_index=True).sort_values('No', kind='stable').reset_index(drop=True)
                
                 # Simpan ke session state untuk download
-                st.session_state['df_validation_bpmp'] = df_validation
+                simpan_ringkas(st.session_state, df_validation_bpmp=df_validation)
+
+                # Arsipkan hasil validasi per bulan/tahun Data Mentah (riwayat untuk analisis arsip)
+                try:
+                    periode_validasi, _ = pecah_periode(df_validation, 'Bulan (Mentah)', 'Tahun (Mentah)')
+                    arsipkan(ArsipBulanan('validasi_pppk'), df_validation, (), periode_validasi)
+                except Exception as e:
+                    st.warning(f"⚠️ Hasil validasi tidak tersimpan ke arsip bulanan: {str(e)}")
                
                 # Statistik validasi utama
                 st.markdown("### 📊 Ringkasan Validasi Utama")
@@ -2262,19 +2407,46 @@ def show():
                 st.markdown("---")
                
                 # Cari kolom di master dengan pencarian fleksibel
-                master_cols = {}
-                for master_col in comparison_mapping.keys():
-                    for col in df_master.columns:
-                        if master_col.upper() in str(col).upper():
-                            master_cols[master_col] = col
-                            break
+                master_cols = {
+                    field: col for field, col in petakan_nama(df_master, list(comparison_mapping)).items()
+                    if col is not None
+                }
                
                 st.markdown("### 🔍 Hasil Validasi Data Mentah vs Master")
                 st.info(f"**Mapping Kolom:** Nama={comparison_mapping['Nama']}, NIP={comparison_mapping['NIP']}, NIK={comparison_mapping['NIK']}, KDGOL={comparison_mapping['KDGOL']}, KDKAWIN={comparison_mapping['KDKAWIN']}")
                
+                # ===== VALIDASI INKREMENTAL =====
+                # Baris yang isinya dan baris Master dengan NIP yang sama tidak berubah sejak
+                # run sebelumnya memakai hasil lama; hanya sisanya yang dicari ulang di Master
+                teks_mentah_master = pd.DataFrame({
+                    kolom: df_mentah[kolom].map(format_nilai_asli) if kolom in df_mentah.columns else ''
+                    for kolom in ('nip', 'nmpeg', 'npwp', 'kdgol', 'kdkawin')
+                }, index=df_mentah.index)
+                teks_master = pd.DataFrame({
+                    field: df_master[col].map(format_nilai_asli) for field, col in master_cols.items()
+                }, index=df_master.index)
+                hash_mentah_master = validasi_inkremental.hash_baris(teks_mentah_master)
+                kunci_nip = teks_mentah_master['nip'].astype(str)
+                if 'NIP' in master_cols:
+                    pembanding_master = validasi_inkremental.hash_pembanding(teks_master, 'NIP', keep='first')
+                else:
+                    pembanding_master = pd.Series(dtype='uint64')
+                konteks_master = validasi_inkremental.konteks(
+                    'master_pppk', 1, sorted(master_cols.items()),
+                    [kolom for kolom in ('nip', 'nmpeg', 'npwp', 'kdgol', 'kdkawin') if kolom in df_mentah.columns],
+                )
+                ulang_master, hasil_lama_master = validasi_inkremental.rencana_ulang(
+                    st.session_state.get('riwayat_validasi_master'), konteks_master,
+                    hash_mentah_master, kunci_nip, pembanding_master,
+                )
+                if hasil_lama_master is not None and len(ulang_master) > 0:
+                    st.caption(f"♻️ Validasi inkremental: {validasi_inkremental.ringkas(ulang_master)}")
+                # ===== END VALIDASI INKREMENTAL =====
+                
                 validation_master_data = []
                
-                for idx_mentah, row_mentah in df_mentah.iterrows():
+                indeks_ulang_master = ulang_master.index[ulang_master]
+                for idx_mentah, row_mentah in df_mentah.loc[indeks_ulang_master].iterrows():
                     # Ambil data dari mentah dengan format_nilai_asli
                     nip_mentah = format_nilai_asli(row_mentah.get('nip', '')) if 'nip' in df_mentah.columns else ''
                     nmpeg_mentah = format_nilai_asli(row_mentah.get('nmpeg', '')) if 'nmpeg' in df_mentah.columns else ''
@@ -2315,8 +2487,9 @@ def show():
                                     kdkawin_master = format_nilai_asli(row_master.get(master_cols['KDKAWIN'], ''))
                                
                                 # Bandingkan HANYA field selain NIP (NIP sudah match sebagai Primary Key)
+                                # Nama dibandingkan dalam bentuk kanonik (tanpa gelar, token terurut)
                                 if nama_master and nmpeg_mentah:
-                                    if fuzz.ratio(nmpeg_mentah.lower(), nama_master.lower()) < 90:
+                                    if fuzz.ratio(nama_urut(nmpeg_mentah), nama_urut(nama_master)) < 90:
                                         errors.append('Nama')
                                
                                 if nik_master and npwp_mentah:
@@ -2368,10 +2541,17 @@ def show():
                         'Rekomendasi': rekomendasi
                     })
                
-                df_validation_master = pd.DataFrame(validation_master_data)
+                df_validation_master = validasi_inkremental.gabung(
+                    pd.DataFrame(validation_master_data, index=indeks_ulang_master), hasil_lama_master
+                )
+                st.session_state['riwayat_validasi_master'] = validasi_inkremental.simpan_riwayat(
+                    df_validation_master, hash_mentah_master, kunci_nip,
+                    pd.Series(True, index=kunci_nip.index), konteks_master, pembanding_master,
+                )
+                df_validation_master = df_validation_master.reset_index(drop=True)
                
                 # Simpan ke session state untuk download
-                st.session_state['df_validation_master'] = df_validation_master
+                simpan_ringkas(st.session_state, df_validation_master=df_validation_master)
                
                 # Statistik
                 st.markdown("### 📊 Ringkasan Validasi")
@@ -2540,7 +2720,8 @@ def show():
         with tab5:
             st.subheader("📈 Analisis Detail Perubahan")
            
-            df_display = st.session_state['df_hasil'].copy()
+            # Copy-on-Write aktif: tidak perlu salinan defensif, data dibagi sampai diubah
+            df_display = st.session_state['df_hasil']
            
             if 'df_master_existing' in st.session_state and st.session_state['df_master_existing'] is not None:
                
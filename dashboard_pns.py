@@ -50,4 +50,22 @@ def show():
             st.rerun()
         st.caption("Upload data pajak lembur PNS")
     
+    with col5:
+        st.markdown("### 📑")
+        st.markdown("### Rekap Tahunan 1721-A1")
+        if st.button("Rekap Tahunan 1721-A1", key="rekap_1721a1_pns"):
+            st.session_state.current_page = 'rekap_1721a1'
+            st.session_state.asal_rekap_1721a1 = 'dashboard_pns'
+            st.rerun()
+        st.caption("Total penghasilan dan PPh 21 setahun per pegawai")
+    
+    with col6:
+        st.markdown("### 🔎")
+        st.markdown("### Analisis Arsip")
+        if st.button("Buka Analisis Arsip", key="analisis_arsip_pns"):
+            st.session_state.current_page = 'analisis_arsip'
+            st.session_state.asal_analisis_arsip = 'dashboard_pns'
+            st.rerun()
+        st.caption("Kueri riwayat hasil, master, dan validasi per bulan")
+    
     st.markdown("---")
\ No newline at end of file
@@ -38,4 +38,26 @@ def show():
             st.rerun()
         st.caption("Upload data pajak makan PPPK")
     
+    # Baris kedua - Rekap tahunan
+    st.markdown("<br>", unsafe_allow_html=True)
+    col4, col5, col6 = st.columns(3)
+    
+    with col4:
+        st.markdown("### 📑")
+        st.markdown("### Rekap Tahunan 1721-A1")
+        if st.button("Rekap Tahunan 1721-A1", key="rekap_1721a1_pppk"):
+            st.session_state.current_page = 'rekap_1721a1'
+            st.session_state.asal_rekap_1721a1 = 'dashboard_pppk'
+            st.rerun()
+        st.caption("Total penghasilan dan PPh 21 setahun per pegawai")
+    
+    with col5:
+        st.markdown("### 🔎")
+        st.markdown("### Analisis Arsip")
+        if st.button("Buka Analisis Arsip", key="analisis_arsip_pppk"):
+            st.session_state.current_page = 'analisis_arsip'
+            st.session_state.asal_analisis_arsip = 'dashboard_pppk'
+            st.rerun()
+        st.caption("Kueri riwayat hasil, master, dan validasi per bulan")
+    
     st.markdown("---")
\ No newline at end of file
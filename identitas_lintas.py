@@ -0,0 +1,224 @@
+# identitas_lintas.py
+"""Cek identitas ganda lintas populasi: Master PNS vs Master PPPK.
+
+Pipeline PNS dan PPPK berjalan terpisah, jadi pegawai yang alih status
+(mis. PPPK -> PNS di tengah tahun) bisa tercatat di kedua master dan
+dipajaki dua kali. Setiap kali salah satu master diperbarui (upload di
+halaman gaji, hasil croscheck), kolom identitasnya didaftarkan di sini:
+
+  - NIP, NIK, dan NPWP dinormalisasi (hanya digit, tanpa akhiran .0)
+  - pegawai dengan AKTIF/TIDAK = TIDAK tidak didaftarkan, karena pegawai
+    alih status memang tetap tercatat (nonaktif) di master lamanya
+  - versi terakhir per populasi disimpan di memori proses dan sebagai
+    Parquet di direktori data, jadi halaman PNS melihat master PPPK yang
+    diupload di sesi lain (dan sebaliknya)
+  - tabrakan dicari dengan satu hash join atas (ruang identitas, nilai):
+    NIP dengan NIP, NIK/NPWP dengan NIK/NPWP (NPWP 16 digit = NIK)
+
+Hasil dikunci versi kedua master, jadi rerun tanpa perubahan master tidak
+menghitung ulang. tampilkan_identitas_lintas() adalah tampilan bersama untuk
+halaman gaji dan croscheck; streamlit hanya diimport di dalamnya.
+"""
+import os
+import threading
+import time
+
+import pandas as pd
+
+from alur_tahap import identitas
+from cache_kolumnar import baca_frame, tulis_frame
+from penyimpanan import direktori_data
+from skema_kolom import resolve
+
+# ===== KONFIGURASI =====
+POPULASI = ('pns', 'pppk')
+LABEL = {'pns': 'PNS', 'pppk': 'PPPK'}
+# kolom identitas -> ruang nilai yang dibandingkan
+RUANG = {'NIP': 'NIP', 'NIK': 'NIK/NPWP', 'NPWP': 'NIK/NPWP'}
+
+# populasi -> DataFrame identitas terdaftar (attrs: versi, sumber, waktu, versi_sumber)
+_TERDAFTAR = {}
+# (versi pns, versi pppk) -> DataFrame tabrakan
+_HASIL = {}
+_LOCK = threading.Lock()
+
+
+def _path(populasi):
+    return os.path.join(direktori_data("identitas_master"), f"{populasi}.parquet")
+
+
+def normalisasi(series):
+    """Nilai identitas -> teks digit saja ('' jika kosong atau nol semua)"""
+    if pd.api.types.is_float_dtype(series):
+        teks = series.map(lambda v: '' if pd.isna(v) else f'{v:.0f}')
+    else:
+        # where: astype(str) di pandas 3 mempertahankan NA, bukan teks 'None'/'nan'
+        teks = series.astype(str).where(series.notna(), '').str.strip().str.replace(r'\.0$', '', regex=True)
+    teks = teks.str.replace(r'\D', '', regex=True)
+    return teks.where(teks.str.strip('0') != '', '')
+
+
+def kunci_identitas(df, populasi='pns'):
+    """Master aktif -> DataFrame Baris, NIP, NIK, NPWP (ternormalisasi), Nama"""
+    kolom = resolve(df, 'master')
+    if populasi == 'pppk':
+        # Master PPPK: kolom NIK dicari seperti di croscheck PPPK (tanpa pengecualian PENERIMA)
+        kolom['nik'] = resolve(df, 'master_pppk')['nik']
+    hasil = pd.DataFrame({'Baris': df.index + 2}, index=df.index)
+    for nama, field in (('NIP', 'nip'), ('NIK', 'nik'), ('NPWP', 'npwp')):
+        col = kolom.get(field)
+        hasil[nama] = normalisasi(df[col]) if col else ''
+    nama_col = kolom.get('nama')
+    hasil['Nama'] = df[nama_col].fillna('').astype(str).str.strip() if nama_col else ''
+    aktif_col = kolom.get('aktif')
+    if aktif_col:
+        hasil = hasil[df[aktif_col].fillna('').astype(str).str.strip().str.upper() != 'TIDAK']
+    return hasil.reset_index(drop=True)
+
+
+def master_terdaftar(populasi):
+    """DataFrame identitas versi terakhir satu populasi (None jika belum ada)"""
+    with _LOCK:
+        if populasi in _TERDAFTAR:
+            return _TERDAFTAR[populasi]
+    df, _ = baca_frame(_path(populasi))
+    if df is not None:
+        with _LOCK:
+            _TERDAFTAR.setdefault(populasi, df)
+    return df
+
+
+def daftarkan(populasi, df_master, sumber):
+    """Daftarkan master terbaru satu populasi. Return versi identitasnya.
+
+    Hanya ditulis jika versi dari sumber (halaman) ini berubah sejak
+    pendaftaran terakhirnya, jadi rerun halaman dengan master yang sama
+    tidak menimpa versi lebih baru dari halaman lain.
+    """
+    if populasi not in POPULASI:
+        raise ValueError(f"populasi harus salah satu dari {POPULASI}")
+    kunci = kunci_identitas(df_master, populasi)
+    versi = identitas(kunci)
+
+    lama = master_terdaftar(populasi)
+    versi_sumber = dict(lama.attrs.get('versi_sumber', {})) if lama is not None else {}
+    if versi_sumber.get(sumber) == versi:
+        return versi
+
+    versi_sumber[sumber] = versi
+    kunci.attrs = {'versi': versi, 'sumber': sumber, 'waktu': time.time(), 'versi_sumber': versi_sumber}
+    with _LOCK:
+        _TERDAFTAR[populasi] = kunci
+    tulis_frame(_path(populasi), kunci)
+    return versi
+
+
+def tabrakan(kiri, kanan, label_kiri='PNS', label_kanan='PPPK'):
+    """Pasangan baris kiri/kanan yang berbagi NIP atau NIK/NPWP (satu hash join).
+
+    Return DataFrame: Cocok Pada, lalu NIP, Nama, Baris untuk tiap sisi;
+    satu baris per pasangan pegawai.
+    """
+    kolom_hasil = ['Cocok Pada', 'Nilai',
+                   f'NIP {label_kiri}', f'Nama {label_kiri}', f'Baris {label_kiri}',
+                   f'NIP {label_kanan}', f'Nama {label_kanan}', f'Baris {label_kanan}']
+
+    def panjang(df):
+        bagian = []
+        for kolom, ruang in RUANG.items():
+            ada = df[kolom] != ''
+            bagian.append(pd.DataFrame({
+                'ruang': ruang, 'nilai': df.loc[ada, kolom].to_numpy(),
+                'kolom': kolom, 'posisi': df.index[ada],
+            }))
+        return pd.concat(bagian, ignore_index=True).drop_duplicates(['ruang', 'nilai', 'posisi'])
+
+    cocok = panjang(kiri).merge(panjang(kanan), on=['ruang', 'nilai'], suffixes=('_kiri', '_kanan'))
+    if cocok.empty:
+        return pd.DataFrame(columns=kolom_hasil)
+
+    cocok['label'] = cocok['kolom_kiri'].where(
+        cocok['kolom_kiri'] == cocok['kolom_kanan'], cocok['kolom_kiri'] + '/' + cocok['kolom_kanan']
+    )
+    # Umumnya satu pasangan cocok di satu nilai; hanya pasangan yang cocok
+    # di beberapa kolom yang perlu digabung per grup
+    kunci_pasangan = ['posisi_kiri', 'posisi_kanan']
+    cocok = cocok.rename(columns={'label': 'Cocok Pada', 'nilai': 'Nilai'})
+    ganda = cocok.duplicated(kunci_pasangan, keep=False)
+    pasangan = cocok.loc[~ganda, kunci_pasangan + ['Cocok Pada', 'Nilai']]
+    if ganda.any():
+        gabung = lambda s: ', '.join(dict.fromkeys(s))
+        jamak = cocok[ganda].groupby(kunci_pasangan, sort=False).agg(
+            {'Cocok Pada': gabung, 'Nilai': gabung}
+        ).reset_index()
+        pasangan = pd.concat([pasangan, jamak], ignore_index=True)
+    pasangan = pasangan.sort_values(kunci_pasangan, kind='stable').reset_index(drop=True)
+
+    hasil = pasangan[['Cocok Pada', 'Nilai']].copy()
+    for posisi, df, label in (('posisi_kiri', kiri, label_kiri), ('posisi_kanan', kanan, label_kanan)):
+        baris = df.loc[pasangan[posisi]]
+        hasil[f'NIP {label}'] = baris['NIP'].to_numpy()
+        hasil[f'Nama {label}'] = baris['Nama'].to_numpy()
+        hasil[f'Baris {label}'] = baris['Baris'].to_numpy()
+    return hasil[kolom_hasil]
+
+
+def cek_lintas():
+    """Tabrakan antara master PNS dan PPPK terdaftar.
+
+    Return (DataFrame tabrakan atau None jika salah satu master belum
+    terdaftar, dict populasi -> info versi {sumber, waktu, baris}).
+    """
+    master = {p: master_terdaftar(p) for p in POPULASI}
+    info = {
+        p: {'sumber': df.attrs.get('sumber', ''), 'waktu': df.attrs.get('waktu'), 'baris': len(df)}
+        for p, df in master.items() if df is not None
+    }
+    if any(df is None for df in master.values()):
+        return None, info
+
+    kunci = tuple(master[p].attrs.get('versi') for p in POPULASI)
+    with _LOCK:
+        if kunci in _HASIL:
+            return _HASIL[kunci], info
+    hasil = tabrakan(master['pns'], master['pppk'], LABEL['pns'], LABEL['pppk'])
+    with _LOCK:
+        _HASIL.clear()
+        _HASIL[kunci] = hasil
+    return hasil, info
+
+
+def tampilkan_identitas_lintas(populasi, df_master=None, sumber=''):
+    """Tampilkan pegawai satu populasi yang juga ada di master populasi lain.
+
+    Jika df_master diberikan, master itu didaftarkan dulu atas nama sumber.
+    """
+    import streamlit as st
+
+    lawan = LABEL['pppk' if populasi == 'pns' else 'pns']
+    try:
+        if df_master is not None:
+            daftarkan(populasi, df_master, sumber)
+        df_ganda, info = cek_lintas()
+    except Exception as e:
+        st.warning(f"⚠️ Cek identitas lintas PNS/PPPK gagal: {str(e)}")
+        return
+    if df_ganda is None:
+        st.caption(f"🔗 Master {lawan} belum terdaftar (upload di halaman Gaji {lawan} atau proses Croscheck {lawan}) - "
+                   "cek identitas lintas PNS/PPPK dilewati")
+    elif df_ganda.empty:
+        info_lawan = info[lawan.lower()]
+        st.caption(f"🔗 Tidak ada NIP/NIK/NPWP yang juga terdaftar di Master {lawan} "
+                   f"({info_lawan['baris']} pegawai aktif, dari {info_lawan['sumber']})")
+    else:
+        st.warning(f"⚠️ **{len(df_ganda)} pegawai juga terdaftar di Master {lawan}** (NIP atau NIK/NPWP sama). "
+                   f"Periksa pegawai alih status agar tidak dipajaki dua kali.")
+        with st.expander("🔗 Daftar Identitas Ganda PNS/PPPK"):
+            st.dataframe(df_ganda, use_container_width=True, hide_index=True)
+            st.download_button(
+                label="📥 Download Identitas Ganda (CSV)",
+                data=df_ganda.to_csv(index=False).encode('utf-8'),
+                file_name="identitas_ganda_pns_pppk.csv",
+                mime="text/csv",
+                key=f"download_identitas_ganda_{populasi}"
+            )
@@ -0,0 +1,112 @@
+# kanonik_nama.py
+"""Kanonisasi nama pegawai untuk pencocokan.
+
+Gelar akademik/keagamaan (Dr., Drs., H., Hj., S.Pd, M.Si, ...) dibuang, tanda
+baca dan spasi dirapikan, huruf dikecilkan. Dari nama kanonik dibuat kunci
+token-terurut (untuk fuzzy scoring) dan kunci fonetik (untuk blocking murah).
+Hitung sekali per DataFrame lewat kolom_kanonik(), jangan per pasangan.
+"""
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+# ===== DAFTAR GELAR =====
+# Ditulis tanpa titik dan huruf kecil, dibandingkan setelah titik dibuang
+GELAR_DEPAN = {
+    'dr', 'drs', 'dra', 'drg', 'ir', 'h', 'hj', 'prof', 'ns', 'kh', 'apt', 'bd',
+}
+
+GELAR_BELAKANG = {
+    'spd', 'spdi', 'spdsd', 'msi', 'se', 'sh', 'mm', 'skom', 'amd', 'st', 'mpd',
+    'mpdi', 'ssos', 'skep', 'sag', 'mag', 'sip', 'sfarm', 'spsi', 'mkes', 'skm',
+    'ssi', 'mt', 'mh', 'sked', 'phd', 'mba', 'str', 'sst', 'ama', 'amk', 'amkep',
+    'mkom', 'mak', 'ak', 'ners', 'sgz', 'stp', 'sp', 'bsc', 'msc', 'mse', 'shi',
+    'sthi', 'sei', 'mhum', 'shum', 'ssn', 'sds', 'sikom', 'mikom', 'mkm', 'mkeb',
+    'skeb', 'sap', 'map', 'dipl', 'amdkeb', 'amdkep', 'stk', 'sth',
+}
+
+# Aturan penyederhanaan bunyi untuk ejaan lama/variasi nama Indonesia
+ATURAN_FONETIK = [
+    ('dj', 'j'), ('tj', 'c'), ('sj', 's'), ('nj', 'ny'), ('oe', 'u'),
+    ('ch', 'k'), ('kh', 'k'), ('ph', 'f'), ('th', 't'), ('dh', 'd'), ('ck', 'k'),
+    ('q', 'k'), ('x', 'ks'), ('v', 'f'), ('z', 's'), ('y', 'i'), ('w', 'u'),
+]
+
+PANJANG_FONETIK = 6
+
+_RE_BUKAN_HURUF = re.compile(r'[^0-9a-z]+')
+_RE_HURUF_GANDA = re.compile(r'(.)\1+')
+_VOKAL = set('aiueo')
+
+
+def _tanpa_titik(token):
+    return token.replace('.', '').replace(',', '').lower()
+
+
+@lru_cache(maxsize=200_000)
+def kanonik_nama(nama):
+    """Nama tanpa gelar, huruf kecil, tanpa tanda baca, satu spasi"""
+    if nama is None:
+        return ''
+    teks = str(nama).strip()
+    if not teks or teks.lower() == 'nan':
+        return ''
+
+    # Gelar belakang biasanya dipisah koma: "NAMA, S.Pd., M.Si"
+    depan, _, _ = teks.partition(',')
+    if depan.strip():
+        teks = depan
+
+    tokens = teks.split()
+    while tokens and _tanpa_titik(tokens[0]) in GELAR_DEPAN and len(tokens) > 1:
+        tokens.pop(0)
+    while tokens and _tanpa_titik(tokens[-1]) in GELAR_BELAKANG and len(tokens) > 1:
+        tokens.pop()
+
+    return _RE_BUKAN_HURUF.sub(' ', ' '.join(tokens).lower()).strip()
+
+
+def kunci_urut(kanonik):
+    """Token nama kanonik diurutkan (tahan terhadap urutan nama terbalik)"""
+    return ' '.join(sorted(kanonik.split()))
+
+
+def _fonetik_token(token):
+    if token.isdigit():
+        return token
+    for asal, ganti in ATURAN_FONETIK:
+        token = token.replace(asal, ganti)
+    # Huruf h di tengah sering hilang/ditambah (Muhammad/Muhamad/Mohamad)
+    token = token[:1] + token[1:].replace('h', '')
+    token = _RE_HURUF_GANDA.sub(r'\1', token)
+    # Huruf pertama dipertahankan, vokal setelahnya dibuang
+    kerangka = token[:1] + ''.join(c for c in token[1:] if c not in _VOKAL)
+    return _RE_HURUF_GANDA.sub(r'\1', kerangka)[:PANJANG_FONETIK]
+
+
+def kunci_fonetik(kanonik):
+    """Kunci fonetik nama kanonik (urutan token tidak berpengaruh)"""
+    return ' '.join(sorted(_fonetik_token(t) for t in kanonik.split()))
+
+
+@lru_cache(maxsize=200_000)
+def nama_urut(nama):
+    """Kanonik + token terurut untuk satu nama (dengan cache)"""
+    return kunci_urut(kanonik_nama(nama))
+
+
+def kolom_kanonik(series):
+    """Hitung kanonik, kunci urut, dan kunci fonetik untuk satu kolom nama.
+
+    Dihitung sekali per nilai unik lalu dipetakan balik, hasilnya DataFrame
+    dengan index yang sama seperti series (series asli tidak diubah).
+    """
+    nilai = series.fillna('').astype(str)
+    peta = {}
+    for teks in pd.unique(nilai):
+        kanonik = kanonik_nama(teks)
+        peta[teks] = (kanonik, kunci_urut(kanonik), kunci_fonetik(kanonik))
+
+    baris = [peta[teks] for teks in nilai.tolist()]
+    return pd.DataFrame(baris, index=series.index, columns=['kanonik', 'urut', 'fonetik'])
@@ -0,0 +1,264 @@
+# kueri_arsip.py
+"""Kueri analitik atas arsip bulanan (pyarrow.dataset).
+
+Semua hasil yang pernah diproses ada di arsip_bulanan sebagai Parquet
+berpartisi jenis/tahun/bulan. Modul ini membuka satu jenis sebagai
+pyarrow dataset (partisi hive: kolom tahun dan bulan ikut terbaca) sehingga
+pertanyaan lintas bulan dijawab tanpa membuka file Excel:
+
+  - filter pada tahun/bulan memangkas partisi (file lain tidak dibuka),
+    filter kolom lain didorong ke pembaca Parquet (statistik row group)
+  - hanya kolom yang diminta yang dibaca (proyeksi)
+
+Filter memakai format yang sama dengan pyarrow.parquet: list tuple
+(kolom, operator, nilai), mis. [('tahun', '=', 2025), ('KDKAWIN', '!=', 'K')].
+Tipe kolom yang berbeda antar bulan (mis. angka di satu bulan, teks di bulan
+lain) disatukan: angka campuran -> float64, selain itu -> teks.
+"""
+import os
+
+import pandas as pd
+
+from arsip_bulanan import JENIS_ARSIP, NAMA_BAGIAN
+from penyimpanan import direktori_data
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow opsional: tanpa pyarrow kueri tidak tersedia
+    pa = None
+
+# ===== KONFIGURASI =====
+KOLOM_PARTISI = ('tahun', 'bulan')
+OPERATOR = ('=', '!=', '<', '<=', '>', '>=', 'in', 'not in')
+
+# Jenis penghasilan -> (jenis gaji rujukan untuk kdsatker per NIP)
+RUJUKAN_SATKER = {
+    'makan_pns': 'gaji_pns',
+    'makan_pppk': 'gaji_pppk',
+    'lembur_pns': 'gaji_pns',
+}
+
+
+def tersedia():
+    """True jika pyarrow terpasang"""
+    return pa is not None
+
+
+def _folder(jenis):
+    if jenis not in JENIS_ARSIP:
+        raise ValueError(f"jenis harus salah satu dari {JENIS_ARSIP}")
+    return os.path.join(direktori_data("arsip"), f"jenis={jenis}")
+
+
+def _file_partisi(jenis):
+    folder = _folder(jenis)
+    hasil = []
+    for akar, _, files in os.walk(folder):
+        if NAMA_BAGIAN in files:
+            hasil.append(os.path.join(akar, NAMA_BAGIAN))
+    return sorted(hasil)
+
+
+def _satukan_skema(daftar_skema):
+    """Gabung skema semua partisi; tipe yang bentrok -> float64 (angka) atau teks"""
+    tipe = {}
+    urutan = []
+    for skema in daftar_skema:
+        for field in skema:
+            if field.name not in tipe:
+                tipe[field.name] = set()
+                urutan.append(field.name)
+            tipe[field.name].add(field.type)
+
+    fields = []
+    for nama in urutan:
+        jenis_tipe = {t for t in tipe[nama] if not pa.types.is_null(t)}
+        if len(jenis_tipe) == 1:
+            t = jenis_tipe.pop()
+        elif not jenis_tipe:
+            t = pa.null()
+        elif all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in jenis_tipe):
+            t = pa.float64()
+        else:
+            t = pa.string()
+        fields.append(pa.field(nama, t))
+    fields += [pa.field(nama, pa.int32()) for nama in KOLOM_PARTISI]
+    return pa.schema(fields)
+
+
+def dataset(jenis):
+    """pyarrow Dataset satu jenis arsip (None jika pyarrow tidak ada / arsip kosong)"""
+    if pa is None:
+        return None
+    files = _file_partisi(jenis)
+    if not files:
+        return None
+    skema = _satukan_skema(pq.read_schema(f).remove_metadata() for f in files)
+    partisi = ds.partitioning(pa.schema([pa.field(n, pa.int32()) for n in KOLOM_PARTISI]), flavor='hive')
+    return ds.dataset(files, schema=skema, format='parquet', partitioning=partisi,
+                      partition_base_dir=_folder(jenis))
+
+
+def kolom(jenis):
+    """Daftar kolom yang bisa dikueri untuk satu jenis (termasuk tahun, bulan)"""
+    data = dataset(jenis)
+    return [] if data is None else list(data.schema.names)
+
+
+def _sebagai_ekspresi(filter, skema):
+    """Filter DNF (list tuple) -> pyarrow Expression; nilai disesuaikan ke tipe kolom"""
+    if not filter:
+        return None
+    ekspresi = None
+    for nama, op, nilai in filter:
+        if nama not in skema.names:
+            raise ValueError(f"kolom '{nama}' tidak ada di arsip")
+        if op not in OPERATOR:
+            raise ValueError(f"operator '{op}' tidak didukung ({', '.join(OPERATOR)})")
+        tipe = skema.field(nama).type
+        if op in ('in', 'not in'):
+            nilai = pa.array([_nilai_tipe(v, tipe) for v in nilai], type=tipe)
+        else:
+            nilai = _nilai_tipe(nilai, tipe)
+        satu = pq.filters_to_expression([(nama, op, nilai)])
+        ekspresi = satu if ekspresi is None else ekspresi & satu
+    return ekspresi
+
+
+def _nilai_tipe(nilai, tipe):
+    """Nilai dari input (mis. teks dari form) -> tipe kolom"""
+    if pa.types.is_integer(tipe):
+        return int(float(nilai))
+    if pa.types.is_floating(tipe):
+        return float(nilai)
+    if pa.types.is_string(tipe) or pa.types.is_large_string(tipe):
+        return str(nilai)
+    return nilai
+
+
+def kueri(jenis, kolom=None, filter=None):
+    """Baca arsip satu jenis dengan proyeksi kolom dan filter -> DataFrame.
+
+    kolom  : daftar kolom yang dibaca (None = semua)
+    filter : list tuple (kolom, operator, nilai), digabung AND
+    """
+    data = dataset(jenis)
+    if data is None:
+        return pd.DataFrame(columns=kolom or [])
+    tabel = data.to_table(columns=kolom, filter=_sebagai_ekspresi(filter, data.schema))
+    return tabel.to_pandas()
+
+
+def periode_terakhir(jenis):
+    """(tahun, bulan) terakhir di arsip satu jenis, atau None"""
+    data = dataset(jenis)
+    if data is None:
+        return None
+    tabel = data.to_table(columns=list(KOLOM_PARTISI))
+    if tabel.num_rows == 0:
+        return None
+    indeks = pc.add(pc.multiply(tabel['tahun'], 100), tabel['bulan'])
+    terakhir = pc.max(indeks).as_py()
+    return divmod(terakhir, 100)
+
+
+def _filter_rentang(awal, akhir):
+    """Filter partisi untuk rentang (tahun, bulan) inklusif (perbandingan sederhana agar partisi terpangkas)"""
+    tahun, bulan = ds.field('tahun'), ds.field('bulan')
+    mulai = (tahun > awal[0]) | ((tahun == awal[0]) & (bulan >= awal[1]))
+    sampai = (tahun < akhir[0]) | ((tahun == akhir[0]) & (bulan <= akhir[1]))
+    return mulai & sampai
+
+
+# ===== PERTANYAAN SIAP PAKAI =====
+def perubahan_master(jenis='master_pns', kolom_ubah='KDKAWIN', jumlah_bulan=6, kolom_kunci='NIP'):
+    """Pegawai yang nilai kolom_ubah-nya berubah dalam jumlah_bulan terakhir arsip master.
+
+    Nilai awal dibandingkan dengan snapshot terakhir sebelum rentang (jika ada),
+    sehingga Masa Awal bisa jatuh sebelum rentang.
+    Return DataFrame: kunci, Nilai Awal, Nilai Akhir, Masa Awal, Masa Akhir,
+    Jumlah Nilai (banyak nilai berbeda dalam rentang).
+    """
+    data = dataset(jenis)
+    terakhir = periode_terakhir(jenis)
+    kolom_hasil = [kolom_kunci, 'Nilai Awal', 'Nilai Akhir', 'Masa Awal', 'Masa Akhir', 'Jumlah Nilai']
+    if data is None or terakhir is None:
+        return pd.DataFrame(columns=kolom_hasil)
+
+    indeks_akhir = terakhir[0] * 12 + terakhir[1] - 1 - (jumlah_bulan - 1)
+    awal = divmod(indeks_akhir, 12)
+    awal = (awal[0], awal[1] + 1)
+    kolom_baca = [kolom_kunci, kolom_ubah, 'tahun', 'bulan']
+    df = data.to_table(columns=kolom_baca, filter=_filter_rentang(awal, terakhir)).to_pandas()
+    if df.empty:
+        return pd.DataFrame(columns=kolom_hasil)
+
+    # Snapshot terakhir sebelum rentang jadi nilai pembanding per kunci, agar
+    # perubahan dari arsip lama ke bulan di dalam rentang tetap terlihat
+    tahun, bulan = ds.field('tahun'), ds.field('bulan')
+    sebelum = (tahun < awal[0]) | ((tahun == awal[0]) & (bulan < awal[1]))
+    df_lama = data.to_table(columns=kolom_baca, filter=sebelum).to_pandas()
+    if not df_lama.empty:
+        df_lama[kolom_kunci] = df_lama[kolom_kunci].astype(str).str.strip()
+        df_lama = df_lama.sort_values(['tahun', 'bulan'], kind='stable')
+        df_lama = df_lama[df_lama[kolom_kunci].isin(set(df[kolom_kunci].astype(str).str.strip()))]
+        df = pd.concat([df_lama.groupby(kolom_kunci, sort=False).tail(1), df], ignore_index=True)
+
+    df[kolom_kunci] = df[kolom_kunci].astype(str).str.strip()
+    df['nilai'] = df[kolom_ubah].astype(str).str.strip()
+    df['masa'] = df['tahun'].astype(str) + '-' + df['bulan'].astype(str).str.zfill(2)
+    df = df.sort_values(['tahun', 'bulan'], kind='stable')
+
+    ringkas = df.groupby(kolom_kunci).agg(
+        **{'Nilai Awal': ('nilai', 'first'), 'Nilai Akhir': ('nilai', 'last'),
+           'Masa Awal': ('masa', 'first'), 'Masa Akhir': ('masa', 'last'),
+           'Jumlah Nilai': ('nilai', 'nunique')}
+    )
+    berubah = ringkas[ringkas['Jumlah Nilai'] > 1].reset_index()
+    return berubah[kolom_hasil]
+
+
+def peta_satker(jenis_gaji, tahun=None):
+    """NIP -> kdsatker terakhir dari arsip gaji (Series)"""
+    filter = [('tahun', '=', tahun)] if tahun is not None else None
+    df = kueri(jenis_gaji, ['nip', 'kdsatker', 'tahun', 'bulan'], filter)
+    if df.empty:
+        return pd.Series(dtype=object)
+    df = df.sort_values(['tahun', 'bulan'], kind='stable')
+    return df.groupby('nip')['kdsatker'].last()
+
+
+def total_per_kuartal(jenis, kolom_nilai='pajak', kolom_kelompok='kdsatker', tahun=None):
+    """Total kolom_nilai per tahun, kuartal, dan kolom_kelompok.
+
+    Jika kolom_kelompok tidak ada di jenis itu (mis. kdsatker di makan),
+    nilainya diambil per NIP dari arsip gaji rujukan (RUJUKAN_SATKER).
+    """
+    data = dataset(jenis)
+    kolom_hasil = ['Tahun', 'Kuartal', kolom_kelompok, 'Baris', 'Total']
+    if data is None:
+        return pd.DataFrame(columns=kolom_hasil)
+
+    ada_kelompok = kolom_kelompok in data.schema.names
+    kolom_baca = [kolom_nilai, 'tahun', 'bulan'] + ([kolom_kelompok] if ada_kelompok else ['nip'])
+    filter = [('tahun', '=', tahun)] if tahun is not None else None
+    df = kueri(jenis, kolom_baca, filter)
+    if df.empty:
+        return pd.DataFrame(columns=kolom_hasil)
+
+    if not ada_kelompok:
+        if kolom_kelompok != 'kdsatker' or jenis not in RUJUKAN_SATKER:
+            raise ValueError(f"kolom '{kolom_kelompok}' tidak ada di arsip {jenis}")
+        peta = peta_satker(RUJUKAN_SATKER[jenis], tahun)
+        df[kolom_kelompok] = df['nip'].astype(str).str.strip().map(peta)
+    df[kolom_kelompok] = df[kolom_kelompok].fillna('(tidak diketahui)')
+    df['kuartal'] = (df['bulan'] - 1) // 3 + 1
+    df['nilai'] = pd.to_numeric(df[kolom_nilai], errors='coerce')
+
+    hasil = df.groupby(['tahun', 'kuartal', kolom_kelompok]).agg(
+        Baris=('nilai', 'size'), Total=('nilai', 'sum')
+    ).reset_index().rename(columns={'tahun': 'Tahun', 'kuartal': 'Kuartal'})
+    return hasil[kolom_hasil]
@@ -0,0 +1,197 @@
+# master_bersama.py
+"""Cache master read-only tingkat proses, dibagi ke semua sesi dan halaman.
+
+Dulu setiap operator (sesi) yang mengupload master bulan yang sama mem-parse
+dan menahan salinannya sendiri, dan halaman gaji/makan/lembur masing-masing
+membaca ulang file yang sama. Sekarang master dikunci dengan hash versi
+(hash isi file + parameter baca) dan disimpan sekali per proses:
+
+  - Setiap pemanggil menerima salinan dangkal (copy-on-write). Data kolom
+    dibagi; kolom yang diubah halaman (mis. NIP_clean) hanya ada di salinan
+    pemanggil, frame bersama tidak pernah ikut berubah.
+  - Versi master juga ditulis sebagai file Arrow IPC tanpa kompresi di
+    direktori data. File ini dibuka lewat memory map, jadi proses lain
+    (worker, restart server) memuat master tanpa parse Excel dan kolom
+    numerik berbagi halaman page cache yang sama.
+
+Memori master sekarang sebanding dengan jumlah versi master yang berbeda,
+bukan jumlah sesi x halaman. Tanpa copy-on-write (pandas lama) salinan
+yang diberikan adalah salinan penuh agar frame bersama tetap aman.
+"""
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import pandas as pd
+
+from cache_kolumnar import buat_kunci, frame_dari_arrow, hash_isi, path_sementara, tabel_arrow
+from pembaca_excel import baca_excel_lengkap
+from penyimpanan import direktori_data
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow opsional: tanpa pyarrow master hanya dibagi di memori
+    pa = None
+
+# ===== KONFIGURASI =====
+MAKS_MASTER = 8          # versi master yang ditahan di memori proses (LRU)
+MAKS_FILE_ARROW = 50     # file Arrow di direktori data (LRU)
+
+# kunci -> {'df': DataFrame bersama, 'sumber': 'excel'|'arrow', 'dipakai': ts}
+_MASTER = OrderedDict()
+# id(salinan) -> kunci, dihapus otomatis saat salinan di-garbage-collect
+_SALINAN = {}
+_LOCK = threading.Lock()
+
+
+def cow_aktif():
+    """True jika pandas memakai copy-on-write (opsi aktif atau pandas >= 3)"""
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    try:
+        return bool(pd.get_option('mode.copy_on_write'))
+    except (KeyError, pd.errors.OptionError):
+        return False
+
+
+def _isi(file):
+    """Bytes file upload tanpa mengubah posisi pointer"""
+    if isinstance(file, bytes):
+        return file
+    if hasattr(file, 'getvalue'):
+        return file.getvalue()
+    file.seek(0)
+    data = file.read()
+    file.seek(0)
+    return data
+
+
+def versi_master(file, sheet_name=0, dtype=None):
+    """Hash versi master: isi file + parameter baca"""
+    dtype_param = sorted((k, repr(v)) for k, v in dtype.items()) if isinstance(dtype, dict) else repr(dtype)
+    return buat_kunci(hash_isi(_isi(file)), 'master_bersama', sheet_name, dtype_param)
+
+
+def _path_arrow(kunci):
+    return os.path.join(direktori_data("master_bersama"), f"{kunci}.arrow")
+
+
+def _tulis_arrow(kunci, df):
+    """Tulis master sebagai Arrow IPC tanpa kompresi (bisa di-memory-map)"""
+    if pa is None:
+        return False
+    path = _path_arrow(kunci)
+    sementara = None
+    try:
+        sementara = path_sementara(path)
+        table = tabel_arrow(df)
+        with pa.OSFile(sementara, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(sementara, path)
+    except (pa.ArrowException, TypeError, ValueError, OSError):
+        if sementara and os.path.exists(sementara):
+            os.remove(sementara)
+        return False
+    _pangkas_arrow()
+    return True
+
+
+def _baca_arrow(kunci):
+    """Muat master dari file Arrow lewat memory map, atau None"""
+    if pa is None:
+        return None
+    path = _path_arrow(kunci)
+    if not os.path.exists(path):
+        return None
+    try:
+        with pa.memory_map(path, 'r') as sumber:
+            table = pa.ipc.open_file(sumber).read_all()
+        # split_blocks: kolom numerik tanpa nilai kosong tetap menunjuk ke memory map
+        df, _ = frame_dari_arrow(table, split_blocks=True)
+        os.utime(path)
+    except (pa.ArrowException, OSError, ValueError):
+        return None
+    return df
+
+
+def _pangkas_arrow():
+    folder = direktori_data("master_bersama")
+    try:
+        daftar = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith('.arrow')]
+        if len(daftar) <= MAKS_FILE_ARROW:
+            return
+        daftar.sort(key=os.path.getmtime)
+        for path in daftar[:len(daftar) - MAKS_FILE_ARROW]:
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def _beri_salinan(kunci, df):
+    """Salinan untuk pemanggil: dangkal jika copy-on-write aktif, penuh jika tidak"""
+    salinan = df.copy(deep=not cow_aktif())
+    salinan.attrs = dict(df.attrs)
+    _SALINAN[id(salinan)] = kunci
+    weakref.finalize(salinan, _SALINAN.pop, id(salinan), None)
+    return salinan
+
+
+def bagikan(kunci, buat):
+    """Frame bersama untuk kunci; jika belum ada di proses, df = buat().
+
+    buat() boleh mengembalikan None (gagal baca), hasilnya tidak disimpan.
+    Return salinan copy-on-write, atau None.
+    """
+    with _LOCK:
+        entri = _MASTER.get(kunci)
+        if entri is not None:
+            _MASTER.move_to_end(kunci)
+            entri['dipakai'] = time.time()
+            return _beri_salinan(kunci, entri['df'])
+
+    df = _baca_arrow(kunci)
+    sumber = 'arrow'
+    if df is None:
+        df = buat()
+        if df is None:
+            return None
+        sumber = 'excel'
+        _tulis_arrow(kunci, df)
+
+    with _LOCK:
+        # Sesi lain bisa selesai lebih dulu: pakai frame yang sudah terdaftar
+        entri = _MASTER.setdefault(kunci, {'df': df, 'sumber': sumber, 'dipakai': time.time()})
+        _MASTER.move_to_end(kunci)
+        while len(_MASTER) > MAKS_MASTER:
+            _MASTER.popitem(last=False)
+        return _beri_salinan(kunci, entri['df'])
+
+
+def ambil_master(file, sheet_name=0, dtype=None):
+    """Master dari file upload sebagai frame bersama (pengganti baca_excel_lengkap)"""
+    kunci = versi_master(file, sheet_name, dtype)
+    return bagikan(kunci, lambda: baca_excel_lengkap(file, sheet_name=sheet_name, dtype=dtype))
+
+
+def adalah_bersama(df):
+    """True jika df adalah salinan yang dibagikan cache master"""
+    return id(df) in _SALINAN
+
+
+def info_master():
+    """Ringkasan versi master di proses: versi, sumber, baris, MB, salinan aktif"""
+    with _LOCK:
+        daftar = list(_MASTER.items())
+        jumlah_salinan = {}
+        for kunci in list(_SALINAN.values()):
+            jumlah_salinan[kunci] = jumlah_salinan.get(kunci, 0) + 1
+    return [{
+        'Versi': kunci[:12],
+        'Sumber': entri['sumber'],
+        'Baris': len(entri['df']),
+        'Ukuran (MB)': round(float(entri['df'].memory_usage(deep=True).sum() / (1024 * 1024)), 2),
+        'Salinan aktif': jumlah_salinan.get(kunci, 0),
+    } for kunci, entri in daftar]
@@ -0,0 +1,146 @@
+# memo_identitas.py
+"""Memo persisten tautan identitas hasil fuzzy matching lintas bulan.
+
+Sebagian besar pegawai sama dari bulan ke bulan, jadi pasangan (Nama, NIP)
+yang sudah pernah dicocokkan disimpan di SQLite. Run croscheck berikutnya
+memakai keputusan lama dan fuzzy scoring hanya dijalankan untuk baris yang
+benar-benar baru atau berubah.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import time
+
+from penyimpanan import direktori_data
+
+# ===== KONFIGURASI =====
+ENV_MEMO_AKTIF = "FUSIONTAX_MEMO_IDENTITAS"   # isi "0" untuk mematikan memo
+TTL_HARI = 400                                # tautan tidak dipakai > TTL dihapus
+MAKS_ENTRI = 500_000                          # batas LRU jumlah tautan
+BATCH_SQL = 500                               # jumlah parameter per query IN (...)
+
+
+def memo_aktif():
+    """Cek apakah memo identitas diaktifkan"""
+    return os.environ.get(ENV_MEMO_AKTIF, "1").strip() not in ("0", "false", "False", "")
+
+
+def normalisasi_kunci(nilai):
+    """Normalisasi teks untuk kunci memo: trim, satu spasi, huruf kecil"""
+    if nilai is None:
+        return ''
+    return re.sub(r'\s+', ' ', str(nilai)).strip().lower()
+
+
+def buat_kunci(konteks, nama, nip):
+    """Hash kunci memo dari konteks pencocokan dan (Nama, NIP) ternormalisasi"""
+    teks = f"{konteks}|{normalisasi_kunci(nip)}|{normalisasi_kunci(nama)}"
+    return hashlib.sha1(teks.encode('utf-8')).hexdigest()
+
+
+class MemoIdentitas:
+    """Penyimpanan tautan (query -> kandidat) di SQLite dengan kebijakan LRU/TTL"""
+
+    def __init__(self, path=None, ttl_hari=TTL_HARI, maks_entri=MAKS_ENTRI):
+        self.path = path or os.path.join(direktori_data(), "memo_identitas.sqlite")
+        self.ttl_detik = ttl_hari * 24 * 3600
+        self.maks_entri = maks_entri
+        self._buat_tabel()
+
+    def _koneksi(self):
+        # Koneksi baru per operasi agar aman dipakai dari thread Streamlit mana pun
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _buat_tabel(self):
+        with self._koneksi() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tautan (
+                    kunci TEXT PRIMARY KEY,
+                    nama_cocok TEXT NOT NULL,
+                    nip_cocok TEXT NOT NULL,
+                    dibuat REAL NOT NULL,
+                    terakhir_dipakai REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tautan_lru ON tautan (terakhir_dipakai)")
+
+    def ambil_banyak(self, kunci_list):
+        """Ambil tautan untuk banyak kunci sekaligus -> {kunci: (nama, nip)}"""
+        hasil = {}
+        kunci_unik = list(dict.fromkeys(kunci_list))
+        if not kunci_unik:
+            return hasil
+
+        batas_ttl = time.time() - self.ttl_detik
+        with self._koneksi() as conn:
+            for i in range(0, len(kunci_unik), BATCH_SQL):
+                bagian = kunci_unik[i:i + BATCH_SQL]
+                placeholder = ",".join("?" * len(bagian))
+                rows = conn.execute(
+                    f"SELECT kunci, nama_cocok, nip_cocok FROM tautan "
+                    f"WHERE terakhir_dipakai >= ? AND kunci IN ({placeholder})",
+                    [batas_ttl] + bagian,
+                ).fetchall()
+                for kunci, nama, nip in rows:
+                    hasil[kunci] = (nama, nip)
+        return hasil
+
+    def tandai_dipakai(self, kunci_list):
+        """Perbarui waktu pakai (LRU) untuk tautan yang dipakai ulang"""
+        kunci_unik = list(dict.fromkeys(kunci_list))
+        if not kunci_unik:
+            return
+        sekarang = time.time()
+        with self._koneksi() as conn:
+            conn.executemany(
+                "UPDATE tautan SET terakhir_dipakai = ? WHERE kunci = ?",
+                [(sekarang, kunci) for kunci in kunci_unik],
+            )
+
+    def simpan_banyak(self, tautan):
+        """Simpan tautan baru: iterable (kunci, nama_cocok, nip_cocok)"""
+        sekarang = time.time()
+        data = [(kunci, nama, nip, sekarang, sekarang) for kunci, nama, nip in tautan]
+        if not data:
+            return
+        with self._koneksi() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO tautan "
+                "(kunci, nama_cocok, nip_cocok, dibuat, terakhir_dipakai) VALUES (?, ?, ?, ?, ?)",
+                data,
+            )
+        self.bersihkan()
+
+    def bersihkan(self):
+        """Hapus tautan kadaluarsa (TTL) dan yang paling lama tidak dipakai (LRU)"""
+        with self._koneksi() as conn:
+            conn.execute("DELETE FROM tautan WHERE terakhir_dipakai < ?", (time.time() - self.ttl_detik,))
+            jumlah = conn.execute("SELECT COUNT(*) FROM tautan").fetchone()[0]
+            if jumlah > self.maks_entri:
+                conn.execute(
+                    "DELETE FROM tautan WHERE kunci IN ("
+                    "SELECT kunci FROM tautan ORDER BY terakhir_dipakai ASC LIMIT ?)",
+                    (jumlah - self.maks_entri,),
+                )
+
+    def kosongkan(self):
+        """Hapus semua tautan (mis. setelah master dikoreksi besar-besaran)"""
+        with self._koneksi() as conn:
+            conn.execute("DELETE FROM tautan")
+
+
+_MEMO_DEFAULT = None
+
+
+def memo_default():
+    """Instance memo bersama untuk satu proses, atau None jika dimatikan/gagal dibuka"""
+    global _MEMO_DEFAULT
+    if not memo_aktif():
+        return None
+    if _MEMO_DEFAULT is None:
+        try:
+            _MEMO_DEFAULT = MemoIdentitas()
+        except (sqlite3.Error, OSError):
+            return None
+    return _MEMO_DEFAULT
@@ -0,0 +1,231 @@
+# pembaca_excel.py
+"""Pembacaan Excel terproyeksi: hanya kolom yang dipakai pipeline yang diparse.
+
+Setiap halaman upload mendeklarasikan kolom yang dibutuhkan (nama persis dan/atau
+kata kunci). Header dibaca dulu (baris pertama saja), lalu pd.read_excel dipanggil
+dengan usecols berisi kolom tersebut; kolom identitas (NIP/NIK/NPWP) langsung
+dibaca sebagai teks agar tidak berubah jadi float/notasi ilmiah. Daftar header
+lengkap disimpan di df.attrs['kolom_file'] untuk validasi, dan isi kolom lain
+baru dibaca jika operator meminta preview lengkap.
+
+preflight_excel() membaca beberapa baris pertama tiap sheet saja (openpyxl
+read-only / xlrd on-demand) untuk mengecek header dan memperkirakan jumlah
+baris, sehingga file yang salah ditolak sebelum parse penuh dimulai.
+
+Semua hasil baca (header, proyeksi, baca lengkap) disimpan di cache kolumnar
+(cache_kolumnar.py) dengan kunci hash isi file, jadi file .xls/.xlsx yang sama
+hanya di-decode sekali.
+"""
+import io
+import time
+
+import pandas as pd
+
+from cache_kolumnar import ambil_atau_buat, buat_kunci, hash_isi
+
+# ===== KONFIGURASI =====
+# Kolom identitas yang selalu dibaca sebagai teks (dibandingkan case insensitive)
+KOLOM_IDENTITAS = ['nip', 'npwp', 'nik', 'id penerima tku', 'id tku']
+
+
+def _putar_awal(file):
+    """Kembalikan pointer file upload ke awal (UploadedFile/BytesIO)"""
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+
+def _baca_cache(file, parameter, baca):
+    """Jalankan baca(BytesIO) sekali per (isi file, parameter); berikutnya dari cache"""
+    isi = _isi_file(file)
+    kunci = buat_kunci(hash_isi(isi), *parameter)
+    df, _ = ambil_atau_buat(kunci, lambda: baca(io.BytesIO(isi)))
+    return df
+
+
+def baca_header(file, sheet_name=0):
+    """Baca baris header saja -> list nama kolom asli"""
+    # xlrd tetap men-decode seluruh workbook walau nrows=0, jadi header ikut di-cache
+    df = _baca_cache(file, ('header', sheet_name),
+                     lambda isi: pd.read_excel(isi, sheet_name=sheet_name, nrows=0))
+    return df.columns.tolist()
+
+
+def pilih_kolom(header, kolom=(), kata_kunci=(), normalisasi=str.strip):
+    """Kolom header yang cocok dengan deklarasi pipeline (urutan file dipertahankan)"""
+    kolom_norm = {normalisasi(str(k)) for k in kolom}
+    kata_kunci = [k.lower() for k in kata_kunci]
+    terpilih = []
+    for col in header:
+        nama = normalisasi(str(col))
+        if nama in kolom_norm or any(k in nama.lower() for k in kata_kunci):
+            terpilih.append(col)
+    return terpilih
+
+
+def baca_excel_proyeksi(file, kolom=(), kata_kunci=(), kolom_teks=KOLOM_IDENTITAS,
+                        normalisasi=str.strip, sheet_name=0, dtype=None):
+    """Baca hanya kolom yang dideklarasikan pipeline.
+
+    kolom       : nama kolom persis (dibandingkan setelah normalisasi)
+    kata_kunci  : kolom yang namanya mengandung salah satu kata ini ikut dibaca
+    kolom_teks  : kolom identitas yang dibaca sebagai str sejak awal
+    dtype       : dtype tambahan per nama kolom (dibandingkan setelah normalisasi)
+    Return DataFrame; df.attrs['kolom_file'] berisi seluruh header file.
+    """
+    header = baca_header(file, sheet_name)
+    usecols = pilih_kolom(header, kolom, kata_kunci, normalisasi)
+
+    teks = {normalisasi(str(k)).lower() for k in kolom_teks}
+    dtype_tambahan = {normalisasi(str(k)): v for k, v in (dtype or {}).items()}
+    dtype_kolom = {}
+    for col in usecols:
+        nama = normalisasi(str(col))
+        if nama in dtype_tambahan:
+            dtype_kolom[col] = dtype_tambahan[nama]
+        elif nama.lower() in teks:
+            dtype_kolom[col] = str
+
+    if usecols:
+        parameter = ('proyeksi', sheet_name, usecols, sorted((k, repr(v)) for k, v in dtype_kolom.items()))
+        df = _baca_cache(file, parameter, lambda isi: pd.read_excel(
+            isi, sheet_name=sheet_name, usecols=usecols, dtype=dtype_kolom or None))
+    else:
+        # Tidak ada kolom yang dikenali: kembalikan frame kosong, validasi yang melapor
+        df = pd.DataFrame()
+
+    df.attrs['kolom_file'] = list(header)
+    df.attrs['proyeksi'] = len(usecols) < len(header)
+    return df
+
+
+def baca_excel_lengkap(file, sheet_name=0, dtype=None):
+    """Baca seluruh kolom (master, atau preview lengkap atas permintaan)"""
+    dtype_param = sorted((k, repr(v)) for k, v in dtype.items()) if isinstance(dtype, dict) else repr(dtype)
+    return _baca_cache(file, ('lengkap', sheet_name, dtype_param),
+                       lambda isi: pd.read_excel(isi, sheet_name=sheet_name, dtype=dtype))
+
+
+def kolom_file(df, normalisasi=str.strip):
+    """Header lengkap file asal (atau kolom df jika bukan hasil baca terproyeksi).
+
+    Nama dinormalisasi sama seperti di preflight_excel(), jadi validasi
+    header setelah parse penuh memberi hasil yang sama dengan preflight.
+    """
+    return [normalisasi(str(c)) for c in df.attrs.get('kolom_file', df.columns.tolist())]
+
+
+def kolom_tidak_dibaca(df):
+    """Kolom file yang dilewati oleh proyeksi"""
+    dibaca = {str(c).strip() for c in df.columns}
+    return [c for c in kolom_file(df) if c not in dibaca]
+
+
+# ===== PREFLIGHT HEADER =====
+def _isi_file(file):
+    """Bytes file upload/path tanpa mengubah posisi pointer"""
+    if isinstance(file, str):
+        with open(file, 'rb') as f:
+            return f.read()
+    if isinstance(file, bytes):
+        return file
+    _putar_awal(file)
+    data = file.read()
+    _putar_awal(file)
+    return data
+
+
+def _sheet_xlsx(data, baris_contoh):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        hasil = []
+        for ws in wb.worksheets:
+            baris = [list(r) for r in ws.iter_rows(max_row=baris_contoh, values_only=True)]
+            try:
+                # Diambil dari tag <dimension>, tanpa membaca seluruh baris
+                max_row = ws.max_row
+            except Exception:
+                max_row = None
+            hasil.append((ws.title, baris, max_row))
+        return hasil
+    finally:
+        wb.close()
+
+
+def _sheet_xls(data, baris_contoh):
+    import xlrd
+
+    book = xlrd.open_workbook(file_contents=data, on_demand=True)
+    try:
+        hasil = []
+        for i in range(book.nsheets):
+            sh = book.sheet_by_index(i)
+            baris = [sh.row_values(r) for r in range(min(baris_contoh, sh.nrows))]
+            hasil.append((sh.name, baris, sh.nrows))
+            book.unload_sheet(i)
+        return hasil
+    finally:
+        book.release_resources()
+
+
+def preflight_excel(file, wajib=(), dikenal=None, normalisasi=str.strip, baris_contoh=5):
+    """Cek header semua sheet tanpa parse penuh (hanya beberapa baris pertama).
+
+    wajib    : kolom yang harus ada di sheet pertama
+    dikenal  : daftar header standar; kolom di luar ini dilaporkan sebagai tambahan
+    Return dict: lolos, header, hilang, tambahan, estimasi_baris, sheet, durasi_ms, error.
+    """
+    mulai = time.perf_counter()
+    hasil = {
+        'lolos': False, 'header': [], 'hilang': [], 'tambahan': [],
+        'estimasi_baris': None, 'sheet': [], 'durasi_ms': 0.0, 'error': None,
+    }
+    try:
+        data = _isi_file(file)
+        if data[:4] == b'\xd0\xcf\x11\xe0':
+            sheets = _sheet_xls(data, baris_contoh)
+        else:
+            sheets = _sheet_xlsx(data, baris_contoh)
+    except Exception as e:
+        hasil['error'] = f"File tidak bisa dibuka sebagai Excel: {e}"
+        hasil['durasi_ms'] = (time.perf_counter() - mulai) * 1000
+        return hasil
+
+    for nama, baris, max_row in sheets:
+        header = [normalisasi(str(v)) for v in (baris[0] if baris else []) if v is not None and str(v).strip()]
+        estimasi = max(max_row - 1, 0) if max_row else None
+        hasil['sheet'].append({'nama': nama, 'header': header, 'estimasi_baris': estimasi})
+
+    if hasil['sheet']:
+        pertama = hasil['sheet'][0]
+        hasil['header'] = pertama['header']
+        hasil['estimasi_baris'] = pertama['estimasi_baris']
+
+    header_set = set(hasil['header'])
+    hasil['hilang'] = [normalisasi(k) for k in wajib if normalisasi(k) not in header_set]
+    if dikenal is not None:
+        dikenal_set = {normalisasi(k) for k in dikenal}
+        hasil['tambahan'] = [h for h in hasil['header'] if h not in dikenal_set]
+    hasil['lolos'] = bool(hasil['header']) and not hasil['hilang']
+    hasil['durasi_ms'] = (time.perf_counter() - mulai) * 1000
+    return hasil
+
+
+def pesan_preflight(hasil, label):
+    """Ringkasan preflight sebagai list (level, teks) untuk st.error/st.warning/st.info"""
+    pesan = []
+    if hasil['error']:
+        pesan.append(('error', f"❌ {label}: {hasil['error']}"))
+        return pesan
+    if not hasil['header']:
+        pesan.append(('error', f"❌ {label}: header tidak ditemukan di baris pertama sheet pertama"))
+    if hasil['hilang']:
+        pesan.append(('error', f"❌ Header wajib yang hilang di file {label}: {', '.join(hasil['hilang'])}"))
+    if hasil['tambahan']:
+        pesan.append(('warning', f"⚠️ Header tambahan di file {label} (akan diabaikan): {', '.join(hasil['tambahan'])}"))
+    estimasi = hasil['estimasi_baris']
+    teks_baris = f"±{estimasi} baris" if estimasi is not None else "jumlah baris belum diketahui"
+    pesan.append(('info', f"⏱️ Preflight {label}: {len(hasil['header'])} kolom, {teks_baris}, "
+                          f"{len(hasil['sheet'])} sheet ({hasil['durasi_ms']:.0f} ms)"))
+    return pesan
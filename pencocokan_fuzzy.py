@@ -0,0 +1,297 @@
+# pencocokan_fuzzy.py
+"""Fuzzy matching Nama/NIP bersama untuk halaman croscheck PNS & PPPK.
+
+Sisa pencocokan fuzzy (baris yang tidak bisa dicocokkan langsung) dipecah
+menjadi beberapa shard dan dikerjakan paralel di process pool. Daftar kandidat
+dikirim sekali ke tiap worker lewat initializer, hasil digabung sesuai urutan query
+sehingga identik dengan mode sekuensial. Tautan yang sudah pernah diputuskan
+bisa diambil dari memo persisten (lihat memo_identitas.py). Nama dibandingkan
+dalam bentuk kanonik (kanonik_nama.py) dan kunci fonetiknya dipakai sebagai blok:
+kandidat terbaik di blok dipakai tanpa scan penuh (lihat _cari_terbaik).
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import sqlite3
+
+import pandas as pd
+from fuzzywuzzy import fuzz
+
+from kanonik_nama import kolom_kanonik, kunci_fonetik, nama_urut
+from memo_identitas import buat_kunci
+from skema_kolom import resolve
+
+# ===== KONFIGURASI =====
+# Jumlah worker bisa diatur lewat environment, 0/1 = mode sekuensial
+ENV_WORKERS = "FUSIONTAX_FUZZY_WORKERS"
+
+# Di bawah jumlah query ini, overhead pool lebih mahal daripada hasilnya
+MIN_QUERY_PARALEL = 200
+
+# Jumlah shard per worker (lebih dari 1 agar beban lebih merata)
+SHARD_PER_WORKER = 4
+
+# Kandidat milik proses worker, diisi oleh initializer pool
+_KANDIDAT_WORKER = None
+
+
+def jumlah_worker(workers=None):
+    """Tentukan jumlah worker: argumen > environment > jumlah CPU"""
+    if workers is None:
+        nilai_env = os.environ.get(ENV_WORKERS, "").strip()
+        if nilai_env:
+            try:
+                workers = int(nilai_env)
+            except ValueError:
+                workers = None
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(int(workers), 1)
+
+
+def cari_kolom_nama_nip(df):
+    """Cari kolom Nama dan NIP secara fleksibel (kolom pertama yang cocok)"""
+    kolom = resolve(df, 'master')
+    return kolom['nama'], kolom['nip']
+
+
+def _normalisasi(nilai, lower=True):
+    """Samakan nilai query/kandidat sebelum dibandingkan"""
+    if not nilai:
+        return ''
+    teks = str(nilai)
+    return teks.lower() if lower else teks
+
+
+def _normalisasi_nama(nilai, lower=True):
+    """Nama dibandingkan dalam bentuk kanonik token-terurut (tanpa gelar)"""
+    if not nilai:
+        return ''
+    return nama_urut(str(nilai)) if lower else str(nilai)
+
+
+def _buat_blok(kunci_list):
+    """Indeks blocking: kunci -> daftar posisi kandidat (urut naik)"""
+    blok = {}
+    for pos, kunci in enumerate(kunci_list):
+        if kunci:
+            blok.setdefault(kunci, []).append(pos)
+    return blok
+
+
+def siapkan_kandidat(df, format_fn=None, nama_col=None, nip_col=None, lower=True):
+    """Siapkan indeks kandidat (nama, nip) dari DataFrame sekali saja.
+
+    Jika nama_col/nip_col tidak diberikan, kolom dicari otomatis.
+    Return None jika df kosong atau tidak ada kolom yang bisa dipakai.
+    """
+    if df is None or df.empty:
+        return None
+
+    if nama_col is None and nip_col is None:
+        nama_col, nip_col = cari_kolom_nama_nip(df)
+
+    if not nama_col and not nip_col:
+        return None
+
+    if format_fn is None:
+        format_fn = lambda x: '' if x is None else str(x).strip()
+
+    if nama_col and lower:
+        # Kanonisasi nama dihitung sekali per nilai unik untuk seluruh kandidat
+        kanonik = kolom_kanonik(pd.Series([format_fn(v) for v in df[nama_col].tolist()]))
+        nama_list = kanonik['urut'].tolist()
+        fonetik_list = kanonik['fonetik'].tolist()
+    elif nama_col:
+        nama_list = [_normalisasi(format_fn(v), lower) for v in df[nama_col].tolist()]
+        fonetik_list = [''] * len(df)
+    else:
+        nama_list = [''] * len(df)
+        fonetik_list = [''] * len(df)
+
+    if nip_col:
+        nip_list = [_normalisasi(format_fn(v), lower) for v in df[nip_col].tolist()]
+    else:
+        nip_list = [''] * len(df)
+
+    if nama_col and nip_col:
+        mode = 'gabungan'
+    elif nip_col:
+        mode = 'nip'
+    else:
+        mode = 'nama'
+
+    return {
+        'nama': nama_list,
+        'nip': nip_list,
+        'mode': mode,
+        'lower': lower,
+        'blok_fonetik': _buat_blok(fonetik_list),
+        'blok_nip': _buat_blok(nip_list),
+    }
+
+
+def _skor(nama, nip, nama_master, nip_master, mode):
+    """Skor gabungan satu pasangan (prioritas NIP lebih tinggi)"""
+    if mode != 'nip':
+        nama_score = fuzz.ratio(nama, nama_master) if nama and nama_master else 0
+    if mode != 'nama':
+        nip_score = fuzz.ratio(nip, nip_master) if nip and nip_master else 0
+
+    if mode == 'gabungan':
+        return (nip_score * 0.7) + (nama_score * 0.3)
+    if mode == 'nip':
+        return nip_score
+    return nama_score
+
+
+def _terbaik(nama, nip, kandidat, posisi, threshold):
+    """Posisi dengan skor tertinggi (>= threshold) di antara posisi (urut naik), atau None"""
+    mode = kandidat['mode']
+    daftar_nama = kandidat['nama']
+    daftar_nip = kandidat['nip']
+    best_pos = None
+    best_score = 0
+    for pos in posisi:
+        combined_score = _skor(nama, nip, daftar_nama[pos], daftar_nip[pos], mode)
+        if combined_score > best_score and combined_score >= threshold:
+            best_score = combined_score
+            best_pos = pos
+    return best_pos
+
+
+def _cari_terbaik(nama, nip, kandidat, threshold):
+    """Posisi kandidat dengan skor tertinggi (>= threshold), atau None.
+
+    Blocking: hanya kandidat dengan kunci fonetik nama atau NIP yang sama
+    yang di-scoring. Jika ada yang lolos threshold, kandidat terbaik di blok
+    itu dipakai; scan penuh hanya untuk query yang bloknya kosong atau tidak
+    ada yang lolos. Ini pendekatan: kandidat di luar blok dengan skor lebih
+    tinggi (mis. nama sama persis tapi NIP beda satu digit, sementara NIP
+    yang sama ada di blok dengan nama lain) tidak dipertimbangkan. Skor 100
+    selalu ada di blok, karena string identik berbagi kunci blok.
+    """
+    mode = kandidat['mode']
+    blok = set()
+    if nama and mode != 'nip':
+        blok.update(kandidat['blok_fonetik'].get(kunci_fonetik(nama), ()))
+    if nip and mode != 'nama':
+        blok.update(kandidat['blok_nip'].get(nip, ()))
+    if blok:
+        pos = _terbaik(nama, nip, kandidat, sorted(blok), threshold)
+        if pos is not None:
+            return pos
+    return _terbaik(nama, nip, kandidat, range(len(kandidat['nama'])), threshold)
+
+
+def _init_worker(kandidat):
+    """Initializer pool: simpan kandidat di memori worker"""
+    global _KANDIDAT_WORKER
+    _KANDIDAT_WORKER = kandidat
+
+
+def _proses_shard(args):
+    """Kerjakan satu shard query di worker"""
+    shard, threshold = args
+    return [_cari_terbaik(nama, nip, _KANDIDAT_WORKER, threshold) for nama, nip in shard]
+
+
+def _buat_shard(queries, workers):
+    """Pecah query menjadi shard berurutan (urutan dijaga untuk merge)"""
+    jumlah_shard = max(workers * SHARD_PER_WORKER, 1)
+    ukuran = max(-(-len(queries) // jumlah_shard), 1)
+    return [queries[i:i + ukuran] for i in range(0, len(queries), ukuran)]
+
+
+def _konteks_pool():
+    """Context spawn: server Streamlit multi-thread, fork di sana bisa deadlock"""
+    return multiprocessing.get_context('spawn')
+
+
+def _cocokkan_langsung(queries, kandidat, threshold, workers):
+    """Fuzzy scoring untuk query yang sudah dinormalisasi (paralel jika perlu)"""
+    workers = jumlah_worker(workers)
+    if workers <= 1 or len(queries) < MIN_QUERY_PARALEL:
+        return [_cari_terbaik(nama, nip, kandidat, threshold) for nama, nip in queries]
+
+    shards = _buat_shard(queries, workers)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(shards)),
+            mp_context=_konteks_pool(),
+            initializer=_init_worker,
+            initargs=(kandidat,),
+        ) as executor:
+            hasil = []
+            # executor.map menjaga urutan shard -> merge deterministik
+            for hasil_shard in executor.map(_proses_shard, [(shard, threshold) for shard in shards]):
+                hasil.extend(hasil_shard)
+            return hasil
+    except (OSError, RuntimeError):
+        # Pool tidak bisa dibuat (mis. lingkungan terbatas) - jalankan sekuensial
+        return [_cari_terbaik(nama, nip, kandidat, threshold) for nama, nip in queries]
+
+
+def _cocokkan_dengan_memo(queries, kandidat, threshold, workers, memo, konteks):
+    """Pakai tautan dari memo lintas bulan, fuzzy scoring hanya untuk sisanya"""
+    konteks_lengkap = f"{konteks}|{kandidat['mode']}|{threshold}|{kandidat.get('lower', True)}"
+    kunci_list = [buat_kunci(konteks_lengkap, nama, nip) for nama, nip in queries]
+
+    try:
+        tautan = memo.ambil_banyak(kunci_list)
+    except sqlite3.Error:
+        return _cocokkan_langsung(queries, kandidat, threshold, workers)
+
+    # Posisi pertama tiap (nama, nip) kandidat, sama seperti urutan scan fuzzy
+    posisi_kandidat = {}
+    for pos, pasangan in enumerate(zip(kandidat['nama'], kandidat['nip'])):
+        posisi_kandidat.setdefault(pasangan, pos)
+
+    hasil = [None] * len(queries)
+    kunci_dipakai = []
+    sisa = []
+    for i, kunci in enumerate(kunci_list):
+        pos = posisi_kandidat.get(tautan.get(kunci)) if kunci in tautan else None
+        if pos is not None:
+            hasil[i] = pos
+            kunci_dipakai.append(kunci)
+        else:
+            sisa.append(i)
+
+    hasil_sisa = _cocokkan_langsung([queries[i] for i in sisa], kandidat, threshold, workers)
+    tautan_baru = []
+    for i, pos in zip(sisa, hasil_sisa):
+        hasil[i] = pos
+        if pos is not None:
+            tautan_baru.append((kunci_list[i], kandidat['nama'][pos], kandidat['nip'][pos]))
+
+    try:
+        memo.tandai_dipakai(kunci_dipakai)
+        memo.simpan_banyak(tautan_baru)
+    except sqlite3.Error:
+        pass
+    return hasil
+
+
+def cocokkan_banyak(queries, kandidat, threshold=80, workers=None, memo=None, konteks='nama_nip'):
+    """Cocokkan banyak (nama, nip) sekaligus terhadap kandidat.
+
+    Return list posisi kandidat (atau None) dengan urutan sama seperti queries.
+    workers=1 memaksa mode sekuensial. Jika memo diberikan, tautan yang sudah
+    pernah diputuskan dipakai ulang dan hanya sisanya yang di-scoring;
+    konteks memisahkan tautan memo per pemakaian (mis. arah pencocokan).
+    """
+    if kandidat is None:
+        return [None] * len(queries)
+
+    lower = kandidat.get('lower', True)
+    queries = [(_normalisasi_nama(nama, lower), _normalisasi(nip, lower)) for nama, nip in queries]
+
+    if memo is not None:
+        return _cocokkan_dengan_memo(queries, kandidat, threshold, workers, memo, konteks)
+    return _cocokkan_langsung(queries, kandidat, threshold, workers)
+
+
+def cocokkan_satu(nama, nip, kandidat, threshold=80):
+    """Cocokkan satu (nama, nip) secara sekuensial"""
+    return cocokkan_banyak([(nama, nip)], kandidat, threshold=threshold, workers=1)[0]
@@ -0,0 +1,284 @@
+# pengelola_sesi.py
+"""Pengelola memori DataFrame di session_state dengan spill ke disk.
+
+Dipanggil sekali di awal setiap run (app.py) dengan nama halaman aktif:
+  1. Frame milik halaman aktif yang sebelumnya dipindah ke disk dimuat
+     kembali ke session_state, jadi kode halaman tetap membaca
+     st.session_state.<nama> seperti biasa.
+  2. Ukuran semua DataFrame di sesi dihitung. Jika melebihi batas, frame
+     yang paling lama tidak dipakai (dan bukan milik halaman aktif) ditulis
+     ke Parquet per sesi di direktori temp lalu diganti penanda FrameTumpah.
+  3. Sesi lain yang idle lebih dari IDLE_SPILL_DETIK hanya ditandai; state
+     sesi lain tidak pernah disentuh karena run-nya bisa sedang berjalan di
+     thread lain. Sesi bertanda merapikan dirinya sendiri di awal run
+     berikutnya: frame di luar halaman aktif dipindah ke disk, atau (jika
+     ditinggal lebih dari TIMEOUT_SESI_DETIK) dilepas beserta file spill-nya.
+     Folder spill sesi yang tidak pernah kembali dihapus setelah kedaluwarsa.
+"""
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from cache_kolumnar import baca_frame, tulis_frame
+from master_bersama import adalah_bersama
+
+# ===== KONFIGURASI =====
+ENV_BATAS_MB = "FUSIONTAX_BATAS_SESI_MB"   # batas memori frame per sesi
+BATAS_MB_DEFAULT = 256
+IDLE_SPILL_DETIK = 15 * 60                 # sesi idle: semua frame ke disk
+TIMEOUT_SESI_DETIK = 4 * 3600              # sesi ditinggal: dihapus
+KUNCI_META = '_pengelola_sesi'
+
+# Frame yang dibaca tiap halaman (dimuat kembali saat halaman dibuka).
+# Halaman yang tidak terdaftar memuat kembali semua frame agar aman.
+KUNCI_HALAMAN = {
+    'beranda': (),
+    'dashboard_pns': (),
+    'dashboard_pppk': (),
+    'croscheck_pns': ('df_hasil', 'df_master_existing', 'df_mentah', 'df_bpmp',
+                      'df_validation_bpmp', 'df_validation_master',
+                      'riwayat_validasi_bpmp', 'riwayat_validasi_master'),
+    'croscheck_pppk': ('df_hasil', 'df_master_existing', 'df_mentah', 'df_bpmp',
+                       'df_validation_bpmp', 'df_validation_master',
+                       'riwayat_validasi_bpmp', 'riwayat_validasi_master'),
+    'upload_pajak_gaji_pns': ('df_mentah', 'df_bpmp', 'df_master', 'df_hasil',
+                              'new_data_df', 'duplicate_nips_df'),
+    'upload_pajak_gaji_pppk': ('df_mentah_pppk', 'df_bpmp_pppk', 'df_master_pppk', 'df_hasil_pppk',
+                               'new_data_df_pppk', 'duplicate_nips_df_pppk'),
+    'upload_pajak_makan_pns': ('duplicate_nips_df', 'new_data_df', 'hasil_pajak_makan_pns',
+                               'bp21_rentang_makan_pns'),
+    'upload_pajak_makan_pppk': ('hasil_pajak_makan_pppk', 'bp21_rentang_makan_pppk'),
+    'upload_pajak_lembur_pns': ('duplicate_nips_df', 'new_data_df', 'hasil_pajak_lembur_pns',
+                                'rekap_lembur_pns', 'detail_lembur_pns'),
+    'rekap_1721a1': (),
+    'analisis_arsip': (),
+}
+
+# session_id -> {'terakhir': timestamp run terakhir, 'tanda': None/'tumpah'/'lepas'}
+_REGISTRY = {}
+_LOCK = threading.Lock()
+
+
+class FrameTumpah:
+    """Penanda di session_state untuk DataFrame yang dipindah ke disk"""
+    __slots__ = ('path', 'baris', 'ukuran_mb')
+
+    def __init__(self, path, baris, ukuran_mb):
+        self.path = path
+        self.baris = baris
+        self.ukuran_mb = ukuran_mb
+
+    def __repr__(self):
+        return f"FrameTumpah({self.baris} baris, {self.ukuran_mb:.1f} MB di disk)"
+
+
+def batas_mb():
+    """Batas memori frame per sesi (MB) dari environment atau default"""
+    try:
+        return float(os.environ.get(ENV_BATAS_MB, BATAS_MB_DEFAULT))
+    except ValueError:
+        return float(BATAS_MB_DEFAULT)
+
+
+def direktori_spill(session_id=None):
+    """Direktori temp spill (per sesi jika session_id diberikan)"""
+    path = os.path.join(tempfile.gettempdir(), "fusiontax_sesi")
+    if session_id:
+        path = os.path.join(path, re.sub(r'[^A-Za-z0-9_-]', '_', session_id))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _kunci_state(state):
+    """Daftar kunci state (proxy session_state, SafeSessionState, atau dict)"""
+    if hasattr(state, 'keys'):
+        return list(state.keys())
+    return list(getattr(state, 'filtered_state', {}).keys())
+
+
+def _meta(state, session_id=None):
+    if KUNCI_META not in _kunci_state(state):
+        state[KUNCI_META] = {'id': session_id or uuid.uuid4().hex, 'akses': {}}
+    return state[KUNCI_META]
+
+
+def _ukuran_mb(df):
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def frame_sesi(state):
+    """Nama -> DataFrame/FrameTumpah untuk semua frame di state"""
+    hasil = {}
+    for nama in _kunci_state(state):
+        if nama == KUNCI_META:
+            continue
+        nilai = state[nama]
+        if isinstance(nilai, (pd.DataFrame, FrameTumpah)):
+            hasil[nama] = nilai
+    return hasil
+
+
+def tumpahkan(state, nama):
+    """Pindahkan satu frame ke disk. Return True jika berhasil."""
+    df = state[nama]
+    if not isinstance(df, pd.DataFrame):
+        return False
+    meta = _meta(state)
+    path = os.path.join(direktori_spill(meta['id']), re.sub(r'[^A-Za-z0-9_-]', '_', nama) + ".parquet")
+    ukuran = _ukuran_mb(df)
+    if tulis_frame(path, df):
+        state[nama] = FrameTumpah(path, len(df), ukuran)
+        return True
+    # Frame yang tidak bisa jadi Parquet (kolom campuran) tetap pakai pickle
+    try:
+        df.to_pickle(path + ".pkl")
+    except (OSError, TypeError, ValueError):
+        return False
+    state[nama] = FrameTumpah(path + ".pkl", len(df), ukuran)
+    return True
+
+
+def muat_kembali(state, nama):
+    """Kembalikan frame dari disk ke state (None jika sudah dihapus)"""
+    nilai = state[nama]
+    if not isinstance(nilai, FrameTumpah):
+        return nilai
+    if nilai.path.endswith(".pkl"):
+        df = pd.read_pickle(nilai.path) if os.path.exists(nilai.path) else None
+    else:
+        df, _ = baca_frame(nilai.path)
+    state[nama] = df
+    _hapus_file(nilai.path)
+    return df
+
+
+def lepas(state, nama):
+    """Buang frame yang sudah tidak diperlukan (dan file spill-nya)"""
+    if nama not in _kunci_state(state):
+        return
+    nilai = state[nama]
+    if isinstance(nilai, FrameTumpah):
+        _hapus_file(nilai.path)
+    state[nama] = None
+    _meta(state)['akses'].pop(nama, None)
+
+
+def _hapus_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def tegakkan_batas(state, dilindungi=(), batas=None):
+    """Spill frame LRU (di luar dilindungi) sampai total memori <= batas MB"""
+    batas = batas_mb() if batas is None else batas
+    akses = _meta(state)['akses']
+    # Master bersama tidak dihitung: datanya milik cache proses, spill tidak membebaskan apa pun
+    di_memori = {nama: df for nama, df in frame_sesi(state).items()
+                 if isinstance(df, pd.DataFrame) and not adalah_bersama(df)}
+    ukuran = {nama: _ukuran_mb(df) for nama, df in di_memori.items()}
+    total = sum(ukuran.values())
+    if total <= batas:
+        return []
+
+    tumpah = []
+    for nama in sorted(di_memori, key=lambda n: akses.get(n, 0)):
+        if total <= batas:
+            break
+        if nama in dilindungi:
+            continue
+        if tumpahkan(state, nama):
+            total -= ukuran[nama]
+            tumpah.append(nama)
+    return tumpah
+
+
+def _tandai_sesi_lain(session_id_aktif, sekarang):
+    """Tandai sesi idle/ditinggal, lupakan sesi lama, bersihkan folder yatim"""
+    with _LOCK:
+        for session_id, info in list(_REGISTRY.items()):
+            if session_id == session_id_aktif:
+                continue
+            idle = sekarang - info['terakhir']
+            if idle > 2 * TIMEOUT_SESI_DETIK:
+                # Sesi tidak kembali: folder spill-nya jadi yatim (dihapus di bawah)
+                _REGISTRY.pop(session_id, None)
+            elif idle > TIMEOUT_SESI_DETIK:
+                info['tanda'] = 'lepas'
+            elif idle > IDLE_SPILL_DETIK and info['tanda'] is None:
+                info['tanda'] = 'tumpah'
+        terdaftar = {re.sub(r'[^A-Za-z0-9_-]', '_', sid) for sid in _REGISTRY}
+
+    # Folder spill sesi yang sudah tidak terdaftar (restart/ditinggal) dan kedaluwarsa
+    akar = direktori_spill()
+    for nama in os.listdir(akar):
+        path = os.path.join(akar, nama)
+        if nama in terdaftar or not os.path.isdir(path):
+            continue
+        try:
+            if sekarang - os.path.getmtime(path) > TIMEOUT_SESI_DETIK:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def _rapikan_diri(state, tanda, dipakai):
+    """Jalankan tanda dari sesi lain pada state sesi ini sendiri"""
+    if tanda == 'lepas':
+        for nama in frame_sesi(state):
+            lepas(state, nama)
+        shutil.rmtree(direktori_spill(_meta(state)['id']), ignore_errors=True)
+    elif tanda == 'tumpah':
+        tegakkan_batas(state, dilindungi=dipakai, batas=0)
+
+
+def kelola(state, halaman, session_id=None):
+    """Entry point per run: rapikan sesi ini jika ditandai, muat frame halaman
+    aktif, tegakkan batas, tandai sesi lain.
+
+    state      : st.session_state (proxy sesi aktif)
+    session_id : id sesi Streamlit (None = id acak disimpan di state)
+    """
+    sekarang = time.time()
+    meta = _meta(state, session_id)
+    kunci = KUNCI_HALAMAN.get(halaman)
+    dipakai = [n for n in frame_sesi(state) if kunci is None or n in kunci]
+
+    with _LOCK:
+        info = _REGISTRY.get(meta['id'])
+        tanda = info['tanda'] if info is not None else None
+        if info is None and meta['akses']:
+            # Sesi lama yang sudah dilupakan registry: anggap ditinggal
+            tanda = 'lepas' if sekarang - max(meta['akses'].values()) > TIMEOUT_SESI_DETIK else None
+        _REGISTRY[meta['id']] = {'terakhir': sekarang, 'tanda': None}
+    _rapikan_diri(state, tanda, dipakai)
+
+    dipakai = [n for n in dipakai if n in frame_sesi(state)]
+    for nama in dipakai:
+        muat_kembali(state, nama)
+        meta['akses'][nama] = sekarang
+
+    tumpah = tegakkan_batas(state, dilindungi=dipakai)
+    _tandai_sesi_lain(meta['id'], sekarang)
+    return tumpah
+
+
+def ringkasan(state):
+    """Status frame sesi: nama, lokasi (memori/disk/master bersama), baris, ukuran MB"""
+    laporan = []
+    for nama, nilai in frame_sesi(state).items():
+        if isinstance(nilai, FrameTumpah):
+            laporan.append({'Frame': nama, 'Lokasi': 'disk', 'Baris': nilai.baris,
+                            'Ukuran (MB)': round(float(nilai.ukuran_mb), 2)})
+        else:
+            lokasi = 'master bersama' if adalah_bersama(nilai) else 'memori'
+            laporan.append({'Frame': nama, 'Lokasi': lokasi, 'Baris': len(nilai),
+                            'Ukuran (MB)': round(float(_ukuran_mb(nilai)), 2)})
+    return laporan
@@ -0,0 +1,14 @@
+# penyimpanan.py
+"""Lokasi penyimpanan data lokal aplikasi (memo, cache, dan arsip hasil)."""
+import os
+
+# Direktori data bisa dipindah lewat environment, default di samping app.py
+ENV_DATA_DIR = "FUSIONTAX_DATA_DIR"
+DATA_DIR_DEFAULT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_fusiontax")
+
+
+def direktori_data(*sub):
+    """Path direktori data (dibuat jika belum ada)"""
+    path = os.path.join(os.environ.get(ENV_DATA_DIR, DATA_DIR_DEFAULT), *sub)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,134 @@
+import streamlit as st
+import pandas as pd
+import io
+from datetime import datetime
+from openpyxl import Workbook
+from openpyxl.styles import PatternFill, Font
+from openpyxl.utils import get_column_letter
+from rekap_tahunan import JENIS_PENGHASILAN, KOLOM_REKAP, cakupan, rekap_tahunan
+from arsip_bulanan import ArsipBulanan
+
+NAMA_JENIS = {
+    'gaji_pns': 'Gaji PNS',
+    'gaji_pppk': 'Gaji PPPK',
+    'makan_pns': 'Makan PNS',
+    'makan_pppk': 'Makan PPPK',
+    'lembur_pns': 'Lembur PNS',
+}
+
+
+def show():
+    # Tombol kembali ke dashboard asal
+    asal = st.session_state.get('asal_rekap_1721a1', 'dashboard_pns')
+    if st.button("← Kembali ke Dashboard " + ("PPPK" if asal == 'dashboard_pppk' else "PNS")):
+        st.session_state.current_page = asal
+        st.session_state.selected_menu = None
+        st.rerun()
+
+    st.title("📑 Rekap Tahunan 1721-A1")
+    st.markdown("---")
+
+    st.info("""
+    **ℹ️ SUMBER DATA:**
+    - Rekap disusun dari **arsip bulanan** yang tersimpan otomatis setiap kali
+      hasil BPMP Gaji (PNS/PPPK), BP21 Makan (PNS/PPPK), dan BP21 Lembur PNS diproses
+    - Pegawai dikelompokkan per **NIK** (atau NIP jika NIK kosong)
+    - Jika satu bulan dikoreksi, cukup proses ulang bulan itu di halaman asalnya;
+      hanya bulan tersebut yang dihitung ulang di rekap
+    """)
+
+    def excel_rekap(df, tahun):
+        """Rekap -> BytesIO Excel (NIK/NIP sebagai teks, nominal format ribuan)"""
+        output = io.BytesIO()
+        wb = Workbook()
+        ws = wb.active
+        ws.title = f"Rekap 1721-A1 {tahun}"
+
+        headers = list(df.columns)
+        for col_num, header in enumerate(headers, 1):
+            cell = ws.cell(row=1, column=col_num, value=header)
+            cell.font = Font(bold=True)
+            cell.fill = PatternFill(start_color="C6E0B4", end_color="C6E0B4", fill_type="solid")
+
+        kolom_nominal = [i + 1 for i, h in enumerate(headers) if h.startswith(('Bruto', 'PPh', 'Total'))]
+        for row_num, row_data in enumerate(df.itertuples(index=False), 2):
+            for col_num, cell_value in enumerate(row_data, 1):
+                cell = ws.cell(row=row_num, column=col_num, value=cell_value)
+                if col_num in kolom_nominal:
+                    cell.number_format = '#,##0'
+
+        for col_num, header in enumerate(headers, 1):
+            ws.column_dimensions[get_column_letter(col_num)].width = max(len(header) + 2, 14)
+
+        wb.save(output)
+        output.seek(0)
+        return output
+
+    # ===== BAGIAN 1: PILIH TAHUN =====
+    tahun_tersedia = sorted({t for jenis in JENIS_PENGHASILAN for t, _ in ArsipBulanan(jenis).periode()}, reverse=True)
+    if not tahun_tersedia:
+        st.warning("⚠️ Belum ada hasil bulanan di arsip. Proses data gaji/makan/lembur terlebih dahulu.")
+        return
+
+    tahun = st.selectbox("Tahun Pajak", tahun_tersedia, key="tahun_rekap_1721a1")
+    jenis_dipilih = st.multiselect(
+        "Jenis penghasilan",
+        list(JENIS_PENGHASILAN),
+        default=list(JENIS_PENGHASILAN),
+        format_func=lambda j: NAMA_JENIS[j],
+        key="jenis_rekap_1721a1"
+    )
+
+    # ===== BAGIAN 2: CAKUPAN MASA =====
+    st.subheader("🗓️ Cakupan Masa di Arsip")
+    matriks = cakupan(tahun, jenis_dipilih)
+    matriks.index = [NAMA_JENIS[j] for j in matriks.index]
+    st.caption("Jumlah baris tersimpan per jenis dan masa (0 = belum ada)")
+    st.dataframe(matriks, use_container_width=True)
+
+    if not jenis_dipilih:
+        st.warning("⚠️ Pilih minimal satu jenis penghasilan")
+        return
+
+    # ===== BAGIAN 3: REKAP =====
+    rekap, status = rekap_tahunan(tahun, jenis_dipilih)
+    if rekap.empty:
+        st.warning(f"⚠️ Tidak ada data tahun {tahun} untuk jenis yang dipilih")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Pegawai", len(rekap))
+    with col2:
+        st.metric("Total Bruto", f"Rp {rekap['Total Bruto'].sum():,.0f}")
+    with col3:
+        st.metric("Total PPh 21", f"Rp {rekap['Total PPh'].sum():,.0f}")
+
+    dihitung = sum(1 for s in status if s['Status'] == 'DIHITUNG')
+    st.caption(f"📦 {len(status)} partisi bulanan dibaca, {dihitung} dihitung ulang, "
+               f"{len(status) - dihitung} dari cache")
+    with st.expander("Detail partisi"):
+        st.dataframe(pd.DataFrame(status), hide_index=True, use_container_width=True)
+
+    st.subheader("📄 Rekap per Pegawai")
+    st.dataframe(rekap, hide_index=True, use_container_width=True)
+
+    # ===== BAGIAN 4: DOWNLOAD =====
+    waktu = datetime.now().strftime('%Y%m%d_%H%M%S')
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="📥 Download Excel",
+            data=excel_rekap(rekap[KOLOM_REKAP], tahun),
+            file_name=f"Rekap_1721A1_{tahun}_{waktu}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            use_container_width=True
+        )
+    with col2:
+        st.download_button(
+            label="📥 Download CSV",
+            data=rekap.to_csv(index=False).encode('utf-8'),
+            file_name=f"Rekap_1721A1_{tahun}_{waktu}.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
@@ -0,0 +1,173 @@
+# rekap_lembur.py
+"""Agregasi transaksi lembur harian menjadi satu baris per (nip, bln, thn).
+
+Data Mentah lembur bisa berisi satu baris per hari lembur. Dulu NIP yang
+berulang dianggap duplikat dan proses dihentikan, sehingga operator harus
+merekap manual di Excel. Sekarang baris harian digabung dengan satu groupby:
+  - kotor dan pajak dijumlah sebagai int64 sen (rupiah.parse_rupiah), jadi
+    totalnya eksak; grup yang berisi nilai tidak valid totalnya dikosongkan
+  - Tarif efektif = total pajak / total kotor x 100, dihitung spesifikasi
+    BP21 dari kolom hasil rekap
+  - kolom jam lembur dijumlah, jumlah record harian dicatat per grup
+  - kolom lain (nama, ID TKU, kode objek) diambil dari nilai pertama yang terisi
+Baris harian tetap disimpan sebagai detail audit dengan nomor baris Excel
+dan nomor grup rekapnya.
+
+agregasi_lembur() menerima daftar potongan DataFrame: satu frame (mode
+biasa) atau chunk dari aliran_chunk.SumberExcel (mode streaming). Setiap
+chunk direkap sendiri lalu rekap parsial digabung lagi; jumlah, hitungan
+dan nilai pertama bisa digabung bertahap, jadi hasilnya sama dengan rekap
+seluruh file sekaligus. Di mode streaming detail harian tidak digabung di
+memori: tiap chunk ditampung di disk (DetailLembur) dan nomor grupnya
+dipetakan ke baris rekap saat dibaca ulang untuk ditulis.
+"""
+import numpy as np
+import pandas as pd
+
+from aliran_chunk import TampunganChunk
+from rupiah import SATUAN_SEN, parse_rupiah
+
+# ===== KONFIGURASI =====
+KUNCI_REKAP = ['nip', 'bln', 'thn']
+KOLOM_UANG = ['kotor', 'pajak']
+KOLOM_JAM = ['jamlemburharikerja', 'jamlemburharilibur']
+KOLOM_JUMLAH_RECORD = 'jumlah_record'
+
+
+def _rekap_parsial(df, mulai_grup):
+    """Rekap satu potongan -> (rekap parsial, detail, jumlah tidak valid per kolom uang)"""
+    df = df.copy()
+    df.columns = df.columns.astype(str).str.strip()
+    df['nip'] = df['nip'].astype(str).str.strip()
+
+    min_count = {}      # kolom jumlah -> min_count (1: semua kosong tetap kosong)
+    tidak_valid_kolom = {}
+    for col in KOLOM_UANG:
+        if col not in df.columns:
+            continue
+        nilai, _, tidak_valid = parse_rupiah(df[col], SATUAN_SEN)
+        df[f'_{col}_sen'] = nilai
+        df[f'_{col}_salah'] = tidak_valid.astype(np.int64)
+        tidak_valid_kolom[col] = int(tidak_valid.sum())
+        min_count[f'_{col}_sen'] = 1
+        min_count[f'_{col}_salah'] = 0
+    for col in KOLOM_JAM:
+        if col in df.columns:
+            df[f'_{col}_jam'] = pd.to_numeric(df[col], errors='coerce')
+            min_count[f'_{col}_jam'] = 1
+    df['_record'] = 1
+    min_count['_record'] = 0
+
+    grup = df.groupby(KUNCI_REKAP, sort=False, dropna=False)
+    lain = [c for c in df.columns if c not in KUNCI_REKAP and not c.startswith('_')
+            and c not in KOLOM_UANG and c not in KOLOM_JAM]
+    parsial = grup[lain].first() if lain else grup.size().to_frame().iloc[:, :0]
+    for col, minimum in min_count.items():
+        parsial[col] = grup[col].sum(min_count=minimum)
+    parsial = parsial.reset_index()
+
+    detail = df[[c for c in df.columns if not c.startswith('_')]].copy()
+    detail.insert(0, 'Grup Rekap', grup.ngroup().to_numpy() + mulai_grup)
+    detail.insert(0, 'Baris Excel', df.index.to_numpy() + 2)   # baris 1 = header
+    return parsial, detail, tidak_valid_kolom
+
+
+def _ke_rupiah(total_sen):
+    """Total Int64 sen -> int64 jika semua bulat rupiah tanpa kosong, selain itu float"""
+    angka = total_sen.to_numpy(dtype=float, na_value=np.nan) / SATUAN_SEN
+    if np.isfinite(angka).all() and (angka % 1 == 0).all():
+        return angka.astype(np.int64)
+    return angka
+
+
+class DetailLembur(TampunganChunk):
+    """Detail harian per chunk di disk; Grup Rekap dipetakan saat dibaca"""
+
+    peta_grup = None    # nomor grup parsial -> posisi baris di rekap akhir
+
+    def chunk(self):
+        for df in super().chunk():
+            if self.peta_grup is not None:
+                df['Grup Rekap'] = self.peta_grup[df['Grup Rekap'].to_numpy()]
+            yield df
+
+
+def _atau_kosong(potongan):
+    """Potongan apa adanya; satu frame kosong berkolom wajib jika sumber tidak punya chunk"""
+    ada = False
+    for df in potongan:
+        ada = True
+        yield df
+    if not ada:
+        # Mis. file streaming yang hanya berisi header
+        yield pd.DataFrame(columns=KUNCI_REKAP + KOLOM_UANG)
+
+
+def agregasi_lembur(potongan, tampungan=None):
+    """Rekap baris lembur harian per (nip, bln, thn).
+
+    potongan  : iterable DataFrame Data Mentah (kolom nip, bln, thn, kotor,
+                pajak; kolom jam lembur opsional)
+    tampungan : DetailLembur opsional; jika diberikan detail harian ditulis ke
+                sana per chunk dan tampungan itu yang dikembalikan sebagai detail
+    Return (rekap, detail, laporan):
+      rekap   - satu baris per (nip, bln, thn) sesuai urutan kemunculan pertama,
+                kotor/pajak/jam berisi total dan kolom jumlah_record
+      detail  - baris harian asli + 'Baris Excel' dan 'Grup Rekap' (posisi baris di rekap)
+      laporan - list dict Kolom, Masalah, Jumlah Baris untuk nilai uang yang
+                tidak valid (total grupnya dikosongkan)
+    Sumber tanpa baris menghasilkan rekap dan detail kosong berkolom lengkap.
+    """
+    parsial = []
+    detail = []
+    tidak_valid = {}
+    kolom_file = None
+    mulai_grup = 0
+    for df in _atau_kosong(potongan):
+        if kolom_file is None:
+            kolom_file = df.attrs.get('kolom_file')
+        rekap_chunk, detail_chunk, salah = _rekap_parsial(df, mulai_grup)
+        mulai_grup += len(rekap_chunk)
+        parsial.append(rekap_chunk)
+        if tampungan is not None:
+            tampungan.simpan(detail_chunk)
+        else:
+            detail.append(detail_chunk)
+        for col, jumlah in salah.items():
+            tidak_valid[col] = tidak_valid.get(col, 0) + jumlah
+
+    gabungan = pd.concat(parsial, ignore_index=True)
+    kolom_jumlah = [c for c in gabungan.columns if c.startswith('_')]
+    lain = [c for c in gabungan.columns if c not in KUNCI_REKAP and c not in kolom_jumlah]
+
+    # Rekap parsial digabung lagi (grup yang terpotong antar chunk)
+    grup = gabungan.groupby(KUNCI_REKAP, sort=False, dropna=False)
+    rekap = grup[lain].first() if lain else grup.size().to_frame().iloc[:, :0]
+    for col in kolom_jumlah:
+        rekap[col] = grup[col].sum(min_count=0 if col.endswith(('_salah', '_record')) else 1)
+    # Nomor grup parsial -> posisi baris di rekap akhir
+    peta_grup = grup.ngroup().to_numpy()
+    if tampungan is not None:
+        tampungan.peta_grup = peta_grup
+        detail = tampungan
+    else:
+        detail = pd.concat(detail, ignore_index=True)
+        detail['Grup Rekap'] = peta_grup[detail['Grup Rekap'].to_numpy()]
+    rekap = rekap.reset_index()
+
+    for col in KOLOM_UANG:
+        if f'_{col}_sen' in rekap.columns:
+            # Grup dengan nilai tidak valid: total dikosongkan, bukan dijumlah sebagian
+            total = rekap.pop(f'_{col}_sen').mask(rekap.pop(f'_{col}_salah') > 0)
+            rekap[col] = _ke_rupiah(total)
+    for col in KOLOM_JAM:
+        if f'_{col}_jam' in rekap.columns:
+            rekap[col] = rekap.pop(f'_{col}_jam')
+    rekap[KOLOM_JUMLAH_RECORD] = rekap.pop('_record').astype(np.int64)
+    if kolom_file is None:
+        kolom_file = (tampungan.kolom or [])[2:] if tampungan is not None else detail.columns[2:]
+    rekap.attrs['kolom_file'] = list(kolom_file)
+
+    laporan = [{'Kolom': col, 'Masalah': 'nilai bukan nominal rupiah (total grup dikosongkan)', 'Jumlah Baris': jumlah}
+               for col, jumlah in tidak_valid.items() if jumlah]
+    return rekap, detail, laporan
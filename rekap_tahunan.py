@@ -0,0 +1,220 @@
+# rekap_tahunan.py
+"""Rekap tahunan 1721-A1: total penghasilan dan PPh 21 per pegawai setahun.
+
+Sumbernya arsip bulanan (arsip_bulanan) semua jenis penghasilan - BPMP gaji
+PNS/PPPK, BP21 makan PNS/PPPK, BP21 lembur PNS - jadi akhir tahun tidak perlu
+menjalankan ulang process_data_to_bpmp / builder BP21 dan menggabung
+spreadsheet manual.
+
+Setiap partisi (jenis, tahun, bulan) diringkas menjadi subtotal per pegawai
+(kunci = NIK, atau NIP jika NIK kosong) dengan membaca kolom yang diperlukan
+saja. Subtotal di-cache di cache_kolumnar dengan kunci hash isi partisi,
+sehingga saat satu bulan dikoreksi (partisi ditulis ulang, hash berubah)
+hanya bulan itu yang dibaca ulang. Rekap setahun = satu groupby atas
+gabungan subtotal.
+"""
+import numpy as np
+import pandas as pd
+
+import cache_kolumnar
+from arsip_bulanan import ArsipBulanan, arsipkan, pecah_periode
+from rupiah import SATUAN_SEN, parse_rupiah
+from ter_pph21 import hitung_ter
+
+# ===== KONFIGURASI =====
+VERSI_REKAP = 2                   # naikkan jika cara meringkas partisi berubah
+KELOMPOK = ('gaji', 'makan', 'lembur')
+KOLOM_BUKU_GAJI = ['nip', 'kdsatker', 'bruto', 'pph']
+KOLOM_BUKU_LEMBUR = ['nip', 'kotor', 'pajak']
+
+# jenis -> (kelompok, kolom NIK, kolom status PTKP, kolom bruto, kolom PPh)
+SUMBER = {
+    'gaji_pns': ('gaji', 'NPWP/NIK/TIN', 'Status', 'bruto', 'pph'),
+    'gaji_pppk': ('gaji', 'NPWP/NIK/TIN', 'Status', 'bruto', 'pph'),
+    'makan_pns': ('makan', 'NPWP', 'Status PTKP', 'kotor', 'pajak'),
+    'makan_pppk': ('makan', 'NPWP', 'Status PTKP', 'kotor', 'pajak'),
+    'lembur_pns': ('lembur', 'NPWP', 'Status PTKP', 'kotor', 'pajak'),
+}
+JENIS_PENGHASILAN = tuple(SUMBER)
+
+KOLOM_REKAP = (['NIK', 'NIP', 'Status PTKP', 'Masa Awal', 'Masa Akhir', 'Jumlah Masa']
+               + [f"{label} {k.capitalize()}" for k in KELOMPOK for label in ('Bruto', 'PPh')]
+               + ['Total Bruto', 'Total PPh'])
+
+
+def _rupiah(series):
+    """Kolom uang -> float rupiah (tidak valid = NaN)"""
+    nilai, _, _ = parse_rupiah(series, SATUAN_SEN)
+    return nilai.to_numpy(dtype=float, na_value=np.nan) / SATUAN_SEN
+
+
+def _teks_id(series):
+    """NIK/NIP -> teks tanpa desimal/spasi; kosong = ''"""
+    if pd.api.types.is_numeric_dtype(series):
+        angka = pd.to_numeric(series, errors='coerce')
+        return angka.map(lambda x: '' if pd.isna(x) else f"{x:.0f}").astype(object)
+    teks = series.astype(object).where(series.notna(), '').astype(str).str.strip()
+    teks = teks.str.replace(r'\.0+$', '', regex=True)
+    return teks.where(~teks.isin(['nan', 'None', '<NA>']), '')
+
+
+def _ringkas_nominal(kolom_bruto, kolom_pph):
+    def ringkas(df_buku):
+        return {
+            'nip_unik': int(df_buku['nip'].nunique()),
+            'total_bruto': float(np.nansum(df_buku[kolom_bruto].to_numpy(dtype=float))),
+            'total_pph': float(np.nansum(df_buku[kolom_pph].to_numpy(dtype=float))),
+        }
+    return ringkas
+
+
+# ===== ARSIP DARI HALAMAN =====
+def arsip_gaji(jenis, df_hasil, df_mentah, df_master, sumber=''):
+    """Arsipkan hasil process_data_to_bpmp per Masa/Tahun Pajak.
+
+    NIP dan kdsatker diambil dari Data Mentah: baris hasil = baris mentah
+    yang NIP-nya ada di Data Master, dengan urutan yang sama. PPh dihitung
+    dengan TER.
+    Return status per bulan (lihat arsipkan).
+    """
+    nip_master = set(df_master['NIP'].astype(str).str.strip())
+    nip = df_mentah['nip'].astype(str).str.strip()
+    cocok = nip.isin(nip_master).to_numpy()
+    if 'kdsatker' in df_mentah.columns:
+        satker = _teks_id(df_mentah['kdsatker']).to_numpy(dtype=object)[cocok]
+    else:
+        satker = np.full(int(cocok.sum()), '', dtype=object)
+    nip = nip.to_numpy(dtype=object)[cocok]
+    if len(nip) != len(df_hasil):
+        nip = np.full(len(df_hasil), '', dtype=object)
+        satker = nip
+
+    ter = hitung_ter(df_hasil['Status'], df_hasil['Penghasilan Kotor'], df_hasil['Tahun Pajak'])
+    buku = pd.DataFrame({
+        'nip': nip,
+        'kdsatker': satker,
+        'bruto': _rupiah(df_hasil['Penghasilan Kotor']),
+        'pph': ter['pph'].to_numpy(dtype=float),
+    })
+    buku = pd.concat([buku, df_hasil.reset_index(drop=True)], axis=1)
+    periode, _ = pecah_periode(buku, 'Masa Pajak', 'Tahun Pajak')
+    return arsipkan(ArsipBulanan(jenis), buku, KOLOM_BUKU_GAJI, periode, sumber,
+                    _ringkas_nominal('bruto', 'pph'))
+
+
+def arsip_lembur(df_result, df_merged, sumber=''):
+    """Arsipkan BP21 lembur PNS per Masa/Tahun Pajak (df_merged sejajar baris df_result)"""
+    buku = pd.DataFrame({
+        'nip': df_merged['nip'].astype(str).str.strip().to_numpy(),
+        'kotor': _rupiah(df_merged['kotor']),
+        'pajak': _rupiah(df_merged['pajak']),
+    })
+    buku = pd.concat([buku, df_result.reset_index(drop=True)], axis=1)
+    periode, _ = pecah_periode(buku, 'Masa Pajak', 'Tahun Pajak')
+    return arsipkan(ArsipBulanan('lembur_pns'), buku, KOLOM_BUKU_LEMBUR, periode, sumber,
+                    _ringkas_nominal('kotor', 'pajak'))
+
+
+# ===== SUBTOTAL PER PARTISI =====
+def _subtotal(arsip, tahun, bulan):
+    """Subtotal per pegawai untuk satu partisi (hanya kolom yang diperlukan dibaca)"""
+    kelompok, kol_nik, kol_status, kol_bruto, kol_pph = SUMBER[arsip.jenis]
+    kolom = ['nip', kol_nik, kol_status, kol_bruto, kol_pph]
+    df = arsip.muat_buku(tahun, bulan, kolom)
+    if df is None or df.empty:
+        return pd.DataFrame(columns=['kunci', 'nik', 'nip', 'status', 'kelompok', 'bulan', 'bruto', 'pph'])
+
+    bruto = pd.to_numeric(df[kol_bruto], errors='coerce').fillna(0.0)
+    pph = pd.to_numeric(df[kol_pph], errors='coerce').fillna(0.0)
+    nik = _teks_id(df[kol_nik])
+    nip = _teks_id(df['nip'])
+    status = df[kol_status].astype(object).where(df[kol_status].notna(), '').astype(str).str.strip()
+
+    baris = pd.DataFrame({
+        'kunci': nik.where(nik != '', 'NIP:' + nip),
+        'nik': nik,
+        'nip': nip,
+        'status': status,
+        'bruto': bruto.to_numpy(dtype=float),
+        'pph': pph.to_numpy(dtype=float),
+    })
+    # Pegawai bisa punya lebih dari satu baris sebulan (rapel): jumlahkan, ambil identitas terakhir
+    hasil = baris.groupby('kunci', sort=False).agg(
+        nik=('nik', 'last'), nip=('nip', 'last'), status=('status', 'last'),
+        bruto=('bruto', 'sum'), pph=('pph', 'sum'),
+    ).reset_index()
+    hasil.insert(4, 'kelompok', kelompok)
+    hasil.insert(5, 'bulan', int(bulan))
+    return hasil
+
+
+def subtotal_partisi(arsip, tahun, bulan):
+    """Subtotal partisi dari cache (kunci hash isi partisi) -> (df, dari_cache) atau (None, False)"""
+    meta = arsip.meta(tahun, bulan)
+    if meta is None:
+        return None, False
+    kunci = cache_kolumnar.buat_kunci(meta.get('hash', ''), 'rekap_tahunan', VERSI_REKAP,
+                                      arsip.jenis, int(tahun), int(bulan))
+    return cache_kolumnar.ambil_atau_buat(kunci, lambda: _subtotal(arsip, tahun, bulan))
+
+
+# ===== REKAP SETAHUN =====
+def cakupan(tahun, jenis=JENIS_PENGHASILAN):
+    """Matriks jenis x bulan: jumlah baris tersimpan per partisi (0 = belum ada)"""
+    data = {}
+    for nama in jenis:
+        arsip = ArsipBulanan(nama)
+        baris = dict.fromkeys(range(1, 13), 0)
+        for t, b in arsip.periode(tahun):
+            meta = arsip.meta(t, b)
+            baris[b] = int(meta.get('baris', 0)) if meta else 0
+        data[nama] = baris
+    return pd.DataFrame.from_dict(data, orient='index', columns=range(1, 13))
+
+
+def rekap_tahunan(tahun, jenis=JENIS_PENGHASILAN):
+    """Rekap 1721-A1 satu tahun pajak dari arsip bulanan.
+
+    Return (rekap, status):
+      rekap  - satu baris per pegawai (kolom KOLOM_REKAP), urut NIK/NIP
+      status - list dict per partisi: Jenis, Bulan, Pegawai,
+               Status (DARI CACHE / DIHITUNG / TIDAK TERBACA)
+    """
+    bagian = []
+    status = []
+    for nama in jenis:
+        arsip = ArsipBulanan(nama)
+        for t, b in arsip.periode(tahun):
+            df, dari_cache = subtotal_partisi(arsip, t, b)
+            if df is None:
+                status.append({'Jenis': nama, 'Bulan': b, 'Pegawai': 0, 'Status': 'TIDAK TERBACA'})
+                continue
+            bagian.append(df)
+            status.append({'Jenis': nama, 'Bulan': b, 'Pegawai': len(df),
+                           'Status': 'DARI CACHE' if dari_cache else 'DIHITUNG'})
+
+    bagian = [df for df in bagian if not df.empty]
+    if not bagian:
+        return pd.DataFrame(columns=KOLOM_REKAP), status
+
+    semua = pd.concat(bagian, ignore_index=True).sort_values('bulan', kind='stable')
+    # Identitas dan status PTKP: nilai tidak kosong terakhir dalam tahun
+    identitas = semua[['kunci', 'nik', 'nip', 'status']].replace('', np.nan).groupby('kunci').last()
+    masa = semua.groupby('kunci')['bulan'].agg(['min', 'max', 'nunique'])
+    nominal = semua.pivot_table(index='kunci', columns='kelompok', values=['bruto', 'pph'],
+                                aggfunc='sum', fill_value=0.0)
+
+    rekap = pd.DataFrame(index=identitas.index)
+    rekap['NIK'] = identitas['nik'].fillna('')
+    rekap['NIP'] = identitas['nip'].fillna('')
+    rekap['Status PTKP'] = identitas['status'].fillna('')
+    rekap['Masa Awal'] = masa['min']
+    rekap['Masa Akhir'] = masa['max']
+    rekap['Jumlah Masa'] = masa['nunique']
+    for k in KELOMPOK:
+        for label, nilai in (('Bruto', 'bruto'), ('PPh', 'pph')):
+            kolom = (nilai, k)
+            rekap[f"{label} {k.capitalize()}"] = nominal[kolom].round(0) if kolom in nominal.columns else 0.0
+    rekap['Total Bruto'] = rekap[[f"Bruto {k.capitalize()}" for k in KELOMPOK]].sum(axis=1)
+    rekap['Total PPh'] = rekap[[f"PPh {k.capitalize()}" for k in KELOMPOK]].sum(axis=1)
+    return rekap.sort_index().reset_index(drop=True)[KOLOM_REKAP], status
@@ -0,0 +1,119 @@
+# rekonsiliasi.py
+"""Rekonsiliasi cepat Data Mentah vs Data BPMP dengan total kontrol per periode.
+
+Hampir setiap bulan file BPMP hasil process_data_to_bpmp cocok sempurna
+dengan Data Mentah, tapi tab validasi tetap membandingkan baris per baris.
+Sebelum itu kedua sisi sekarang diringkas per (masa, tahun):
+    jumlah baris, total Penghasilan Kotor, dan digest multiset baris
+    (hash NPWP + nilai kotor + status kawin, dijumlah sehingga tidak
+    bergantung urutan baris).
+Periode yang total kontrol dan digest-nya sama di kedua sisi dinyatakan
+COCOK dan tidak perlu divalidasi per baris; validasi per baris hanya untuk
+periode yang berbeda.
+
+Aturan normalisasi sama dengan validasi per baris (bulan/tahun sebagai
+angka, gaji kotor sebagai int64 sen dari rupiah.parse_rupiah, status kawin
+strip/upper), jadi periode COCOK pasti menghasilkan SESUAI di semua kolom.
+Total kotor dijumlah sebagai bilangan bulat sehingga perbandingannya eksak.
+Baris yang tidak lengkap (kolom kosong, gaji tidak terbaca, NPWP ganda)
+membuat periodenya selalu divalidasi per baris.
+"""
+import numpy as np
+import pandas as pd
+
+from rupiah import SATUAN_SEN
+
+# ===== KONFIGURASI =====
+KOLOM_TEKS = ('masa', 'tahun', 'npwp', 'status')
+_MASK_32 = np.uint64(0xFFFFFFFF)
+
+
+def kunci_periode(teks):
+    """'01' -> '1' (dibandingkan sebagai angka), teks lain apa adanya"""
+    return str(int(teks)) if teks.isdigit() else teks
+
+
+def _siapkan(sisi):
+    """Normalisasi satu sisi dan tandai baris yang lengkap"""
+    df = pd.DataFrame({
+        'masa': sisi['masa'].map(kunci_periode),
+        'tahun': sisi['tahun'].map(kunci_periode),
+        'npwp': sisi['npwp'],
+        'kotor': sisi['kotor'].astype('Int64'),
+        'status': sisi['status'].str.strip().str.upper(),
+    }, index=sisi.index)
+    kosong = (sisi[list(KOLOM_TEKS)] == '').any(axis=1)
+    df['lengkap'] = (sisi['lengkap'].astype(bool) & ~kosong & df['kotor'].notna()
+                     & ~sisi['npwp'].duplicated(keep=False))
+    return df
+
+
+def _ringkas_partisi(df):
+    """Total kontrol per (masa, tahun): jumlah, total kotor, lengkap, digest"""
+    h = pd.util.hash_pandas_object(df[['npwp', 'kotor', 'status']], index=False).to_numpy()
+    df = df.assign(
+        _lo=(h & _MASK_32).astype(np.int64),
+        _hi=(h >> np.uint64(32)).astype(np.int64),
+    )
+    grup = df.groupby(['masa', 'tahun'], sort=False)
+    ringkas = grup.agg(
+        jumlah=('npwp', 'size'),
+        total_kotor=('kotor', 'sum'),
+        lengkap=('lengkap', 'all'),
+        _lo=('_lo', 'sum'),
+        _hi=('_hi', 'sum'),
+    )
+    ringkas['digest'] = [f"{hi:x}-{lo:x}" for hi, lo in zip(ringkas.pop('_hi'), ringkas.pop('_lo'))]
+    return ringkas
+
+
+def rekonsiliasi(mentah, bpmp):
+    """Bandingkan total kontrol per (masa, tahun).
+
+    mentah, bpmp : DataFrame dengan kolom teks masa, tahun, npwp, status
+                   (sudah diformat seperti di validasi per baris), kotor
+                   (Int64 sen hasil parse_rupiah), dan lengkap (bool).
+    Return (tabel, baris_cocok):
+      tabel       - satu baris per periode dengan total kedua sisi dan Status
+                    COCOK / BERBEDA / DATA TIDAK LENGKAP / HANYA DI MENTAH / HANYA DI BPMP
+      baris_cocok - Series bool per baris mentah, True jika periodenya COCOK
+    """
+    sisi_mentah = _siapkan(mentah)
+    sisi_bpmp = _siapkan(bpmp)
+    tabel = _ringkas_partisi(sisi_mentah).join(
+        _ringkas_partisi(sisi_bpmp), how='outer', lsuffix='_mentah', rsuffix='_bpmp',
+    )
+
+    ada_mentah = tabel['jumlah_mentah'].notna()
+    ada_bpmp = tabel['jumlah_bpmp'].notna()
+    sama = (
+        tabel['jumlah_mentah'].eq(tabel['jumlah_bpmp'])
+        & tabel['total_kotor_mentah'].eq(tabel['total_kotor_bpmp']).fillna(False).astype(bool)
+        & tabel['digest_mentah'].eq(tabel['digest_bpmp'])
+    )
+    lengkap = tabel['lengkap_mentah'].eq(True) & tabel['lengkap_bpmp'].eq(True)
+    status = np.select(
+        [~ada_bpmp, ~ada_mentah, sama & lengkap, sama],
+        ['HANYA DI MENTAH', 'HANYA DI BPMP', 'COCOK', 'DATA TIDAK LENGKAP'],
+        default='BERBEDA',
+    )
+
+    tabel = pd.DataFrame({
+        'Masa': tabel.index.get_level_values('masa'),
+        'Tahun': tabel.index.get_level_values('tahun'),
+        'Baris Mentah': tabel['jumlah_mentah'].fillna(0).astype(int).to_numpy(),
+        'Baris BPMP': tabel['jumlah_bpmp'].fillna(0).astype(int).to_numpy(),
+        'Total Kotor Mentah': tabel['total_kotor_mentah'].fillna(0).to_numpy() / SATUAN_SEN,
+        'Total Kotor BPMP': tabel['total_kotor_bpmp'].fillna(0).to_numpy() / SATUAN_SEN,
+        'Digest Mentah': tabel['digest_mentah'].fillna('-').str[:12].to_numpy(),
+        'Digest BPMP': tabel['digest_bpmp'].fillna('-').str[:12].to_numpy(),
+        'Status': status,
+    })
+
+    periode_cocok = set(zip(tabel.loc[tabel['Status'] == 'COCOK', 'Masa'],
+                            tabel.loc[tabel['Status'] == 'COCOK', 'Tahun']))
+    baris_cocok = pd.Series(
+        [kunci in periode_cocok for kunci in zip(sisi_mentah['masa'], sisi_mentah['tahun'])],
+        index=mentah.index, dtype=bool,
+    )
+    return tabel, baris_cocok
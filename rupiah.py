@@ -0,0 +1,185 @@
+# rupiah.py
+"""Kolom uang sebagai bilangan bulat rupiah (fixed point), diparse per kolom.
+
+Nominal gaji/makan/lembur datang sebagai campuran float Excel dan teks
+("1.234.567", "1.234.567,50", "Rp 1,234,567.50", "(25.000)"). Dulu setiap
+halaman mem-parse sendiri per baris dengan float() dan toleransi. Modul ini
+mem-parse satu kolom sekaligus ke int64 rupiah (atau int64 sen) dengan mask
+error yang eksplisit, jadi penjumlahan dan perbandingan eksak tanpa drift
+float dan kolom hasilnya jauh lebih kecil dari kolom object berisi teks.
+
+Aturan pemisah untuk teks:
+  - titik dan koma sama-sama ada : yang terakhir adalah desimal
+  - hanya koma, satu kali        : koma desimal (format Indonesia, "2,5"),
+                                   kecuali pola ribuan "25,000" (1-3 digit , 3 digit,
+                                   tidak diawali 0)
+  - hanya titik, satu kali       : desimal ("1500.5", hasil str(float)),
+                                   kecuali pola ribuan "1.500" (idem)
+  - pemisah yang sama berulang   : pemisah ribuan
+Negatif ditulis "-1.000" atau "(1.000)". "Rp" dan spasi diabaikan; teks
+kosong dan "-" (format akuntansi) dianggap kosong. Pecahan di bawah satuan
+dibulatkan setengah menjauhi nol.
+"""
+import numpy as np
+import pandas as pd
+
+# ===== KONFIGURASI =====
+SATUAN_RUPIAH = 1
+SATUAN_SEN = 100
+TOLERANSI_RUPIAH = 1      # selisih pembulatan yang masih dianggap sama (validasi)
+MAKS_DIGIT = 15           # di atas ini dianggap tidak valid (bukan nominal rupiah)
+
+
+def _digit_satuan(satuan):
+    if satuan not in (SATUAN_RUPIAH, SATUAN_SEN):
+        raise ValueError("satuan harus SATUAN_RUPIAH atau SATUAN_SEN")
+    return len(str(satuan)) - 1
+
+
+def _dari_angka(angka, satuan):
+    """Array float -> (int64, tidak_valid)"""
+    angka = np.asarray(angka, dtype=float)
+    skala = np.abs(angka) * satuan
+    tidak_valid = ~np.isfinite(angka) | (skala >= 10.0 ** MAKS_DIGIT)
+    bulat = np.floor(np.where(tidak_valid, 0, skala) + 0.5)
+    nilai = np.where(angka < 0, -bulat, bulat).astype(np.int64)
+    return nilai, tidak_valid
+
+
+def _dari_teks(teks, satuan):
+    """Series str -> (int64, kosong, tidak_valid) sebagai array"""
+    digit = _digit_satuan(satuan)
+    t = teks.str.strip().str.replace(r'(?i)^rp\.?', '', regex=True).str.replace(r'\s', '', regex=True)
+    kosong = (t == '') | (t == '-')
+
+    negatif = t.str.startswith('-') | (t.str.startswith('(') & t.str.endswith(')'))
+    t = t.str.replace(r'^[-+(]|\)$', '', regex=True)
+
+    n_titik = t.str.count(r'\.')
+    n_koma = t.str.count(',')
+    pos_titik = t.str.rfind('.')
+    pos_koma = t.str.rfind(',')
+    # Satu pemisah diikuti tepat tiga digit dibaca ribuan, apa pun pemisahnya
+    # ("0,125" tetap desimal: grup ribuan tidak diawali nol)
+    ribuan_titik = t.str.fullmatch(r'[1-9]\d{0,2}\.\d{3}')
+    ribuan_koma = t.str.fullmatch(r'[1-9]\d{0,2},\d{3}')
+    desimal_koma = (n_koma == 1) & (
+        ((n_titik == 0) & ~ribuan_koma) | ((n_titik > 0) & (pos_koma > pos_titik))
+    )
+    desimal_titik = (n_titik == 1) & (
+        ((n_koma == 0) & ~ribuan_titik) | ((n_koma > 0) & (pos_titik > pos_koma))
+    )
+
+    bulat = t.copy()
+    pecahan = pd.Series('', index=t.index, dtype=object)
+    for mask, pemisah in ((desimal_koma, ','), (desimal_titik, '.')):
+        if mask.any():
+            bagian = t[mask].str.rpartition(pemisah)
+            bulat[mask] = bagian[0]
+            pecahan[mask] = bagian[2]
+    bulat = bulat.str.replace(r'[.,]', '', regex=True)
+
+    valid = (
+        ~kosong
+        & bulat.str.fullmatch(r'\d*') & pecahan.str.fullmatch(r'\d*')
+        & ((bulat != '') | (pecahan != ''))
+        & (bulat.str.len() <= MAKS_DIGIT)
+    )
+    nilai = np.zeros(len(t), dtype=np.int64)
+    if valid.any():
+        b = bulat[valid].where(bulat[valid] != '', '0').astype(np.int64).to_numpy()
+        p = pecahan[valid].str.ljust(digit + 1, '0')
+        utama = p.str[:digit].astype(np.int64).to_numpy() if digit else 0
+        naik = (p.str[digit] >= '5').to_numpy().astype(np.int64)
+        besar = b * satuan + utama + naik
+        nilai[valid.to_numpy()] = np.where(negatif[valid].to_numpy(), -besar, besar)
+    return nilai, kosong.to_numpy(), (~valid & ~kosong).to_numpy()
+
+
+def parse_rupiah(series, satuan=SATUAN_RUPIAH):
+    """Parse satu kolom uang ke bilangan bulat dalam satuan (rupiah atau sen).
+
+    Return (nilai, kosong, tidak_valid):
+      nilai       - Series Int64 (kosong/tidak valid = <NA>)
+      kosong      - Series bool, sel kosong/NaN/"-"
+      tidak_valid - Series bool, sel berisi yang bukan nominal
+    Index sama dengan series asal.
+    """
+    series = pd.Series(series)
+    _digit_satuan(satuan)
+    n = len(series)
+    nilai = np.zeros(n, dtype=np.int64)
+    kosong = series.isna().to_numpy(dtype=bool).copy()
+    tidak_valid = np.zeros(n, dtype=bool)
+
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        angka = series.to_numpy(dtype=float, na_value=np.nan)
+        ada = ~kosong
+        nilai[ada], tidak_valid[ada] = _dari_angka(angka[ada], satuan)
+    else:
+        objek = series.to_numpy(dtype=object)
+        adalah_teks = np.fromiter((isinstance(v, str) for v in objek), dtype=bool, count=n)
+        adalah_angka = ~adalah_teks & ~kosong
+        if adalah_teks.any():
+            teks = pd.Series(objek[adalah_teks], dtype=object)
+            nilai[adalah_teks], kosong[adalah_teks], tidak_valid[adalah_teks] = _dari_teks(teks, satuan)
+        if adalah_angka.any():
+            angka = pd.to_numeric(pd.Series(objek[adalah_angka]), errors='coerce').to_numpy(dtype=float)
+            nilai[adalah_angka], tidak_valid[adalah_angka] = _dari_angka(angka, satuan)
+
+    hilang = kosong | tidak_valid
+    return (
+        pd.Series(pd.arrays.IntegerArray(nilai, hilang), index=series.index),
+        pd.Series(kosong, index=series.index),
+        pd.Series(tidak_valid, index=series.index),
+    )
+
+
+def ke_angka(nilai, satuan=SATUAN_RUPIAH):
+    """Int64 satuan -> angka rupiah: Int64 jika semua bulat rupiah, selain itu float"""
+    if satuan == SATUAN_RUPIAH:
+        return nilai
+    ada = nilai.notna()
+    if (nilai[ada] % satuan == 0).all():
+        return nilai // satuan
+    return pd.Series(nilai.to_numpy(dtype=float, na_value=np.nan) / satuan, index=nilai.index)
+
+
+def ringkasan_error(kosong, tidak_valid, label):
+    """Pesan (level, teks) ringkas untuk sel kosong/tidak valid di satu kolom uang"""
+    pesan = []
+    if tidak_valid.any():
+        pesan.append(('warning', f"⚠️ {label}: {int(tidak_valid.sum())} nilai bukan nominal rupiah"))
+    if kosong.any():
+        pesan.append(('info', f"ℹ️ {label}: {int(kosong.sum())} sel kosong"))
+    return pesan
+
+
+def jumlah_komponen(df, komponen):
+    """Jumlah per baris beberapa kolom uang (mis. komponen gaji) sekaligus.
+
+    Setiap komponen diparse per kolom ke sen, lalu matriks baris x komponen
+    dijumlah dengan np.nansum: kolom yang tidak ada, sel kosong, dan nilai
+    tidak valid dianggap 0. Return (total, laporan, baris_kurang):
+      total        - Series angka rupiah (lihat ke_angka), index sama dengan df
+      laporan      - list dict per komponen bermasalah: Komponen, Masalah, Jumlah Baris
+      baris_kurang - Series bool, baris dengan minimal satu komponen dianggap 0
+    """
+    matriks = np.full((len(df), len(komponen)), np.nan)
+    laporan = []
+    for j, col in enumerate(komponen):
+        if col not in df.columns:
+            laporan.append({'Komponen': col, 'Masalah': 'kolom tidak ditemukan', 'Jumlah Baris': len(df)})
+            continue
+        nilai, kosong, tidak_valid = parse_rupiah(df[col], SATUAN_SEN)
+        matriks[:, j] = nilai.to_numpy(dtype=float, na_value=np.nan)
+        if tidak_valid.any():
+            laporan.append({'Komponen': col, 'Masalah': 'nilai tidak valid', 'Jumlah Baris': int(tidak_valid.sum())})
+        if kosong.any():
+            laporan.append({'Komponen': col, 'Masalah': 'kosong', 'Jumlah Baris': int(kosong.sum())})
+
+    # Nilai sen < 2**53, jadi penjumlahan float64 tetap eksak
+    total_sen = np.nansum(matriks, axis=1).astype(np.int64)
+    total = ke_angka(pd.Series(total_sen, index=df.index, dtype='Int64'), SATUAN_SEN)
+    baris_kurang = pd.Series(np.isnan(matriks).any(axis=1), index=df.index)
+    return total, laporan, baris_kurang
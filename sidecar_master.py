@@ -0,0 +1,151 @@
+# sidecar_master.py
+"""Salinan data bertipe (Arrow) yang ditanam di dalam file master XLSX.
+
+Master yang diexport bulan ini diupload lagi sebagai Master Existing bulan
+depan. Parse sel openpyxl lambat dan NIP/NIK/rekening harus dipulihkan dari
+float Excel dengan heuristik. Karena itu file export ikut membawa salinan
+DataFrame sebagai Arrow IPC terkompresi (part tambahan di paket XLSX, di
+luar sheet). Saat diupload ulang salinan ini dibaca langsung.
+
+Checksum XML sheet + shared strings disimpan di metadata salinan. Jika sheet
+sudah diedit manual (atau disimpan ulang oleh Excel) checksum tidak cocok
+dan pembaca kembali ke parse sel biasa.
+"""
+import hashlib
+import io
+import json
+import zipfile
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow opsional: tanpa pyarrow file diexport tanpa salinan
+    pa = None
+
+# ===== KONFIGURASI =====
+PART_SIDECAR = "customXml/fusiontax_master.arrow"
+TIPE_KONTEN = "application/vnd.apache.arrow.file"
+PART_CHECKSUM = ("xl/worksheets/sheet1.xml", "xl/sharedStrings.xml")
+VERSI_SIDECAR = 1
+KUNCI_META = b'fusiontax'
+
+
+def _isi(file):
+    if isinstance(file, bytes):
+        return file
+    if hasattr(file, 'getvalue'):
+        return file.getvalue()
+    file.seek(0)
+    data = file.read()
+    file.seek(0)
+    return data
+
+
+def _checksum_sheet(zf):
+    """SHA-256 isi sheet pertama dan shared strings (nilai sel yang tampil)"""
+    h = hashlib.sha256()
+    nama_part = set(zf.namelist())
+    for part in PART_CHECKSUM:
+        if part in nama_part:
+            h.update(part.encode('utf-8'))
+            h.update(zf.read(part))
+    return h.hexdigest()
+
+
+def _teks_angka(nilai):
+    """Angka di kolom campuran ditulis seperti format_nilai_asli (tanpa .0)"""
+    if isinstance(nilai, float) and nilai.is_integer():
+        return str(int(nilai))
+    return str(nilai)
+
+
+def _siapkan_arrow(df):
+    """DataFrame -> pa.Table; kolom object campuran angka/teks disimpan sebagai teks"""
+    df = df.reset_index(drop=True)
+    df.columns = [str(c) for c in df.columns]
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        tipe = {type(v) for v in df[col].dropna()}
+        if len(tipe) > 1:
+            df[col] = df[col].map(lambda v: v if v is None or v != v else _teks_angka(v))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _tambah_tipe_konten(xml):
+    """Daftarkan ekstensi .arrow di [Content_Types].xml agar paket tetap valid"""
+    teks = xml.decode('utf-8')
+    if 'Extension="arrow"' in teks:
+        return xml
+    default = f'<Default Extension="arrow" ContentType="{TIPE_KONTEN}"/>'
+    return teks.replace('</Types>', default + '</Types>', 1).encode('utf-8')
+
+
+def tanam_sidecar(xlsx, df):
+    """Tambahkan salinan Arrow df ke file XLSX hasil export.
+
+    xlsx : BytesIO/bytes hasil ExcelWriter. Return BytesIO baru; jika salinan
+    tidak bisa dibuat, file asli dikembalikan apa adanya.
+    """
+    data = _isi(xlsx)
+    if pa is None:
+        return io.BytesIO(data)
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as zf_asal:
+            table = _siapkan_arrow(df)
+            meta = {'versi': VERSI_SIDECAR, 'checksum': _checksum_sheet(zf_asal), 'baris': table.num_rows}
+            metadata = dict(table.schema.metadata or {})
+            metadata[KUNCI_META] = json.dumps(meta).encode('utf-8')
+            table = table.replace_schema_metadata(metadata)
+
+            arrow = io.BytesIO()
+            opsi = pa.ipc.IpcWriteOptions(compression='zstd')
+            with pa.ipc.new_file(arrow, table.schema, options=opsi) as writer:
+                writer.write_table(table)
+
+            output = io.BytesIO()
+            with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf_baru:
+                for item in zf_asal.infolist():
+                    if item.filename == PART_SIDECAR:
+                        continue
+                    isi_part = zf_asal.read(item.filename)
+                    if item.filename == '[Content_Types].xml':
+                        isi_part = _tambah_tipe_konten(isi_part)
+                    zf_baru.writestr(item, isi_part)
+                # Arrow sudah terkompresi zstd, disimpan tanpa deflate
+                zf_baru.writestr(PART_SIDECAR, arrow.getvalue(), compress_type=zipfile.ZIP_STORED)
+    except (zipfile.BadZipFile, pa.ArrowException, TypeError, ValueError, KeyError):
+        return io.BytesIO(data)
+
+    output.seek(0)
+    return output
+
+
+def baca_sidecar(file):
+    """Baca salinan Arrow dari XLSX upload.
+
+    Return (df, status) dengan status:
+      'cocok'     - salinan ada dan sheet belum diubah, df terisi
+      'diubah'    - salinan ada tapi checksum sheet berbeda (diedit manual)
+      'tidak_ada' - bukan export aplikasi ini / pyarrow tidak tersedia
+      'rusak'     - salinan tidak bisa dibaca
+    """
+    if pa is None:
+        return None, 'tidak_ada'
+    data = _isi(file)
+    if not data.startswith(b'PK'):
+        return None, 'tidak_ada'
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            if PART_SIDECAR not in zf.namelist():
+                return None, 'tidak_ada'
+            checksum = _checksum_sheet(zf)
+            table = pa.ipc.open_file(pa.BufferReader(zf.read(PART_SIDECAR))).read_all()
+    except (zipfile.BadZipFile, pa.ArrowException, OSError):
+        return None, 'rusak'
+
+    meta = json.loads((table.schema.metadata or {}).get(KUNCI_META, b'{}'))
+    if meta.get('versi') != VERSI_SIDECAR:
+        return None, 'rusak'
+    if meta.get('checksum') != checksum:
+        return None, 'diubah'
+    return table.to_pandas(), 'cocok'
@@ -0,0 +1,172 @@
+# skema_kolom.py
+"""Resolver skema kolom dengan cache per signature header.
+
+Pencarian kolom berdasarkan kata kunci (NPWP/NIK/TIN, Posisi, Nama, dst.)
+dilakukan sekali per layout file: signature header (tuple nama kolom) +
+nama skema dipetakan ke dict field logis -> nama kolom asli, disimpan di
+cache proses sehingga dipakai ulang antar rerun Streamlit dan antar file
+dengan layout yang sama. Loop per baris cukup membaca hasil resolve.
+
+Aturan satu field (semua perbandingan case insensitive):
+    'salah_satu': kolom mengandung salah satu kata ini
+    'semua':      kolom mengandung semua kata ini
+    'kecuali':    kolom tidak boleh mengandung kata ini
+    'tanpa_spasi': spasi di nama kolom dibuang sebelum dicek
+    'terakhir':   ambil kolom cocok terakhir (default: pertama)
+"""
+from functools import lru_cache
+
+# ===== DEFINISI SKEMA =====
+SKEMA = {
+    # File BPMP (hasil upload pajak gaji / CoreTax)
+    'bpmp': {
+        'nik': {'salah_satu': ['NPWP', 'NIK', 'TIN']},
+        'posisi': {'salah_satu': ['POSISI']},
+        'nama': {'salah_satu': ['NAMA', 'PEGAWAI']},
+        'masa_pajak': {'semua': ['masa', 'pajak']},
+        'tahun_pajak': {'semua': ['tahun', 'pajak']},
+        'penghasilan_kotor': {'semua': ['penghasilan', 'kotor']},
+        'status': {'salah_satu': ['status'], 'kecuali': ['pegawai']},
+    },
+    # Data mentah gaji (kolom perbandingan tambahan)
+    'mentah': {
+        'bulan': {'salah_satu': ['bulan']},
+        'tahun': {'salah_satu': ['tahun'], 'kecuali': ['bulan']},
+        'gaji_kotor': {'salah_satu': ['gajikotor'], 'tanpa_spasi': True},
+        'kdkawin': {'salah_satu': ['kdkawin']},
+    },
+    # Master pegawai
+    'master': {
+        'nama': {'salah_satu': ['NAMA']},
+        'nip': {'salah_satu': ['NIP']},
+        'nik': {'salah_satu': ['NIK'], 'kecuali': ['PENERIMA']},
+        'keterangan': {'salah_satu': ['KETERANGAN']},
+        'npwp': {'salah_satu': ['NPWP']},
+        'nip_terakhir': {'salah_satu': ['NIP'], 'terakhir': True},
+        'nik_terakhir': {'salah_satu': ['NIK'], 'kecuali': ['PENERIMA'], 'terakhir': True},
+        'aktif': {'semua': ['AKTIF', 'TIDAK']},
+    },
+    # Varian lama di croscheck PPPK: NIK tanpa pengecualian PENERIMA
+    'master_pppk': {
+        'nip_terakhir': {'salah_satu': ['NIP'], 'terakhir': True},
+        'nik': {'salah_satu': ['NIK']},
+        'nik_terakhir': {'salah_satu': ['NIK'], 'terakhir': True},
+    },
+}
+
+
+def signature_header(df_or_columns):
+    """Signature layout file: tuple nama kolom (urutan dipertahankan)"""
+    columns = getattr(df_or_columns, 'columns', df_or_columns)
+    return tuple(str(col) for col in columns)
+
+
+def _cocok(nama_kolom, aturan):
+    teks = nama_kolom.lower()
+    if aturan.get('tanpa_spasi'):
+        teks = teks.replace(' ', '')
+    salah_satu = aturan.get('salah_satu')
+    if salah_satu and not any(k.lower() in teks for k in salah_satu):
+        return False
+    if not all(k.lower() in teks for k in aturan.get('semua', ())):
+        return False
+    if any(k.lower() in teks for k in aturan.get('kecuali', ())):
+        return False
+    return True
+
+
+def _kandidat(signature, aturan):
+    """Semua posisi kolom yang memenuhi aturan"""
+    return [i for i, nama in enumerate(signature) if _cocok(nama, aturan)]
+
+
+@lru_cache(maxsize=512)
+def _resolve_cache(signature, nama_skema):
+    hasil = {}
+    for field, aturan in SKEMA[nama_skema].items():
+        posisi = _kandidat(signature, aturan)
+        if not posisi:
+            hasil[field] = None
+        else:
+            hasil[field] = posisi[-1] if aturan.get('terakhir') else posisi[0]
+    return hasil
+
+
+def resolve(df_or_columns, nama_skema):
+    """Field logis -> nama kolom asli (None jika tidak ada) untuk satu skema"""
+    columns = list(getattr(df_or_columns, 'columns', df_or_columns))
+    posisi = _resolve_cache(signature_header(columns), nama_skema)
+    return {field: (columns[i] if i is not None else None) for field, i in posisi.items()}
+
+
+@lru_cache(maxsize=1024)
+def _cari_cache(signature, kata_kunci):
+    for i, nama in enumerate(signature):
+        nama_lower = nama.lower()
+        for keyword in kata_kunci:
+            if keyword in nama_lower:
+                return i
+    return None
+
+
+def cari_kolom(df_or_columns, kata_kunci):
+    """Kolom pertama yang mengandung salah satu kata kunci (dengan cache)"""
+    columns = list(getattr(df_or_columns, 'columns', df_or_columns))
+    i = _cari_cache(signature_header(columns), tuple(k.lower() for k in kata_kunci))
+    return columns[i] if i is not None else None
+
+
+@lru_cache(maxsize=512)
+def _petakan_cache(signature, nama_list):
+    hasil = {}
+    for nama in nama_list:
+        hasil[nama] = next((i for i, kol in enumerate(signature) if nama.upper() in kol.upper()), None)
+    return hasil
+
+
+def petakan_nama(df_or_columns, nama_list):
+    """Nama kolom standar -> kolom pertama yang mengandung nama tsb (dengan cache)"""
+    columns = list(getattr(df_or_columns, 'columns', df_or_columns))
+    posisi = _petakan_cache(signature_header(columns), tuple(nama_list))
+    return {nama: (columns[i] if i is not None else None) for nama, i in posisi.items()}
+
+
+def jelaskan(df_or_columns, nama_skema):
+    """Laporan pemetaan: field, kolom terpilih, kandidat lain, dan aturannya"""
+    columns = list(getattr(df_or_columns, 'columns', df_or_columns))
+    signature = signature_header(columns)
+    terpilih = resolve(columns, nama_skema)
+    laporan = []
+    for field, aturan in SKEMA[nama_skema].items():
+        kandidat = [columns[i] for i in _kandidat(signature, aturan)]
+        laporan.append({
+            'Field': field,
+            'Kolom Terpilih': terpilih[field] if terpilih[field] is not None else '-',
+            'Kandidat Lain': ', '.join(str(c) for c in kandidat if c != terpilih[field]),
+            'Aturan': _teks_aturan(aturan),
+        })
+    return laporan
+
+
+def _teks_aturan(aturan):
+    bagian = []
+    if aturan.get('salah_satu'):
+        bagian.append("salah satu: " + '/'.join(aturan['salah_satu']))
+    if aturan.get('semua'):
+        bagian.append("semua: " + '+'.join(aturan['semua']))
+    if aturan.get('kecuali'):
+        bagian.append("kecuali: " + '/'.join(aturan['kecuali']))
+    if aturan.get('tanpa_spasi'):
+        bagian.append("abaikan spasi")
+    if aturan.get('terakhir'):
+        bagian.append("kolom terakhir")
+    return '; '.join(bagian)
+
+
+def info_cache():
+    """Statistik cache resolver (hits/misses) untuk debugging"""
+    return {
+        'skema': _resolve_cache.cache_info(),
+        'kata_kunci': _cari_cache.cache_info(),
+        'nama': _petakan_cache.cache_info(),
+    }
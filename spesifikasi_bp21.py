@@ -0,0 +1,288 @@
+# spesifikasi_bp21.py
+"""Spesifikasi deklaratif kolom BP21 dan compiler-nya.
+
+Setiap kolom output BP21 ditulis sebagai satu entri spesifikasi: sumber
+(kolom tetap, kata kunci, konstanta, peta kode, atau rasio), nilai default,
+dan daftar transformasi. kompilasi() me-resolve kolom sumber sekali saja,
+jalankan() membangun seluruh kolom dalam satu pass vektor. Jenis penghasilan
+baru cukup menambah fungsi spek_*() tanpa menyalin modul upload.
+
+Format entri:
+    {'kolom': nama output,
+     'sumber': nama kolom | 'kata_kunci': [..] | 'konstan': nilai
+       | 'peta': {kode: nilai} (+ 'sumber'/'kata_kunci', 'peta_default')
+       | 'rasio': (pembilang, penyebut, pengali, desimal),
+     'isi_na': nilai pengganti NaN sebelum transformasi,
+     'ubah': [nama transformasi di TRANSFORMASI],
+     'default': nilai jika sumber tidak ditemukan,
+     'kosong_jika_semua_na': True -> pakai default jika kolom ada tapi kosong semua}
+"""
+import numpy as np
+import pandas as pd
+
+from rupiah import SATUAN_SEN, ke_angka, parse_rupiah
+from skema_kolom import cari_kolom
+
+# ===== KONSTANTA BP21 =====
+HEADERS_BP21 = [
+    "Masa Pajak", "Tahun Pajak", "NPWP", "ID TKU Penerima Penghasilan", "Status PTKP",
+    "Fasilitas", "Kode Objek Pajak", "Penghasilan", "Deemed", "Tarif",
+    "Jenis Dok. Referensi", "Nomor Dok. Referensi", "Tanggal Dok. Referensi",
+    "ID TKU Pemotong", "Tanggal Pemotongan"
+]
+
+ID_TKU_PEMOTONG_DEFAULT = "0001658723701000000000"
+
+# Tarif pajak makan berdasarkan KODE OBJEK PAJAK
+TARIF_KODE_OBJEK = {
+    '21-402-02': 5.0,
+    '21-402-03': 15.0,
+    '21-402-04': 0.0,
+}
+
+KATA_KUNCI_KODE_OBJEK = ['kode objek pajak', 'kode_objek_pajak', 'objek pajak']
+
+KATA_KUNCI_ID_TKU = ['id penerima tku', 'id_penerima_tku', 'id tku', 'id penerima', 'tku']
+
+KATA_KUNCI_NOMOR_REF = [
+    'nomor dok. referensi', 'nomor dok referensi', 'nomor referensi', 'nomor dokumen',
+    'no dok referensi', 'nomor sp2d', 'no sp2d', 'sp2d', 'nomor dok', 'referensi'
+]
+
+KATA_KUNCI_TANGGAL_REF = [
+    'tanggal dok. referensi', 'tanggal dok referensi', 'tanggal referensi', 'tanggal dokumen',
+    'tgl dok referensi', 'tanggal sp2d', 'tgl sp2d', 'tanggal dok', 'tgl referensi'
+]
+
+KATA_KUNCI_TANGGAL_POTONG = [
+    'tanggal pemotongan', 'tgl pemotongan', 'tanggal potong', 'tgl potong', 'tanggal invoice',
+    'tgl invoice', 'invoice date', 'tanggal transaksi', 'tgl transaksi'
+]
+
+
+def find_column_by_keywords(df_or_columns, keywords_list):
+    """Mencari kolom berdasarkan daftar kata kunci (case insensitive)"""
+    return cari_kolom(df_or_columns, keywords_list)
+
+
+# ===== TRANSFORMASI VEKTOR =====
+def _tanggal_mdy(s):
+    """Tanggal -> format bulan/tanggal/tahun tanpa leading zero (8/4/2025)"""
+    dates = pd.to_datetime(s, errors='coerce')
+    teks = (dates.dt.month.astype('Int64').astype(str) + '/' +
+            dates.dt.day.astype('Int64').astype(str) + '/' +
+            dates.dt.year.astype('Int64').astype(str))
+    return teks.where(dates.notna(), '')
+
+
+def _bulat_jika_utuh(s):
+    """Angka bulat ditulis tanpa desimal (1000000.0 -> 1000000)"""
+    nilai = s.astype(float)
+    utuh = (nilai % 1 == 0) & nilai.notna()
+    hasil = nilai.astype(object)
+    hasil[utuh] = nilai[utuh].astype(np.int64).astype(object)
+    return hasil
+
+
+def _rupiah(s):
+    """Nominal uang (angka Excel atau teks format Indonesia) -> rupiah Int64/float"""
+    nilai, kosong, tidak_valid = parse_rupiah(s, SATUAN_SEN)
+    if tidak_valid.any():
+        # Ditangkap jalankan(): kolom dikembalikan sebagai teks asli agar terlihat
+        raise ValueError(f"{int(tidak_valid.sum())} nilai bukan nominal rupiah")
+    if kosong.any():
+        # Sel kosong tetap NaN float seperti astype(float); <NA> tidak bisa ditulis openpyxl
+        return pd.Series(nilai.to_numpy(dtype=float, na_value=np.nan) / SATUAN_SEN, index=s.index)
+    return ke_angka(nilai, SATUAN_SEN)
+
+
+TRANSFORMASI = {
+    'teks': lambda s: s.astype(str),
+    'strip': lambda s: s.astype(str).str.strip(),
+    'tanpa_nol_depan': lambda s: s.astype(str).str.lstrip('0'),
+    # NIK dari Excel sering terbaca float: hapus ".0", NaN jadi kosong
+    'hapus_desimal': lambda s: s.astype(str).str.replace('.0', '', regex=False).where(s.notna(), ''),
+    'potong_desimal': lambda s: s.astype(str).str.split('.').str[0].str.strip(),
+    'angka': lambda s: s.astype(float),
+    'rupiah': _rupiah,
+    'tanggal_mdy': _tanggal_mdy,
+    'bulat_jika_utuh': _bulat_jika_utuh,
+}
+
+
+# ===== COMPILER =====
+def kompilasi(spesifikasi, df):
+    """Resolve sumber setiap kolom sekali -> (rencana, laporan).
+
+    laporan berisi dict per kolom: kolom, sumber (nama kolom atau None), cara,
+    dicari (True jika sumber dicari lewat kata kunci).
+    """
+    kolom_tersedia = list(df.columns)
+    rencana = []
+    laporan = []
+
+    for entri in spesifikasi:
+        kolom_sumber = None
+        if 'sumber' in entri:
+            kolom_sumber = entri['sumber'] if entri['sumber'] in kolom_tersedia else None
+        elif 'kata_kunci' in entri:
+            kolom_sumber = find_column_by_keywords(kolom_tersedia, entri['kata_kunci'])
+        if kolom_sumber is not None and entri.get('kosong_jika_semua_na') and df[kolom_sumber].isna().all():
+            kolom_sumber = None
+
+        if 'konstan' in entri:
+            cara = 'konstan'
+        elif 'rasio' in entri:
+            cara = 'rasio'
+        elif 'peta' in entri:
+            cara = 'peta'
+        else:
+            cara = 'kolom'
+
+        rencana.append((entri, kolom_sumber, cara))
+        laporan.append({
+            'kolom': entri['kolom'],
+            'sumber': kolom_sumber,
+            'cara': cara,
+            'dicari': 'kata_kunci' in entri,
+        })
+
+    return rencana, laporan
+
+
+def _terapkan_ubah(series, daftar_ubah):
+    for nama in daftar_ubah:
+        series = TRANSFORMASI[nama](series)
+    return series
+
+
+def jalankan(rencana, df, paksa_teks=(), gagal=None):
+    """Bangun DataFrame BP21 dari rencana hasil kompilasi dalam satu pass.
+
+    paksa_teks : kolom output yang langsung dipakai sebagai teks asli
+                 (mode streaming: transformasinya gagal di chunk lain)
+    gagal      : set yang diisi nama kolom output yang transformasinya gagal
+    """
+    data = {}
+    index = df.index
+    n = len(df)
+
+    for entri, kolom_sumber, cara in rencana:
+        kolom = entri['kolom']
+
+        if cara == 'konstan':
+            data[kolom] = pd.Series([entri['konstan']] * n, index=index, dtype=object)
+            continue
+
+        if cara == 'rasio':
+            pembilang, penyebut, pengali, desimal = entri['rasio']
+            atas = pd.to_numeric(df[pembilang], errors='coerce')
+            bawah = pd.to_numeric(df[penyebut], errors='coerce')
+            # Hindari pembagian dengan nol
+            with np.errstate(divide='ignore', invalid='ignore'):
+                nilai = np.round(atas / bawah * pengali, desimal)
+            data[kolom] = nilai.where(bawah != 0, 0)
+            continue
+
+        if kolom_sumber is None:
+            default = entri.get('default', entri.get('peta_default', ''))
+            data[kolom] = pd.Series([default] * n, index=index, dtype=object)
+            continue
+
+        series = df[kolom_sumber]
+        if 'isi_na' in entri:
+            series = series.fillna(entri['isi_na'])
+
+        if cara == 'peta':
+            kode = series.astype(str).str.strip()
+            series = kode.map(entri['peta']).fillna(entri.get('peta_default', '')).astype(float)
+
+        if kolom in paksa_teks:
+            data[kolom] = series.astype(str)
+            continue
+        try:
+            data[kolom] = _terapkan_ubah(series, entri.get('ubah', []))
+        except (ValueError, TypeError):
+            # Transformasi gagal (mis. format tanggal tidak dikenal) -> pakai teks asli
+            data[kolom] = series.astype(str)
+            if gagal is not None:
+                gagal.add(kolom)
+
+    return pd.DataFrame(data, index=index).reset_index(drop=True)
+
+
+def bangun_bp21(spesifikasi, df):
+    """Kompilasi + jalankan sekaligus -> (df_result, laporan)"""
+    rencana, laporan = kompilasi(spesifikasi, df)
+    return jalankan(rencana, df), laporan
+
+
+# ===== SPESIFIKASI PER JENIS PENGHASILAN =====
+def spek_makan_pns(kode_pajak_col):
+    """BP21 uang makan PNS (Tarif dari KODE OBJEK PAJAK di Data Master)"""
+    return [
+        {'kolom': 'Masa Pajak', 'sumber': 'bln', 'ubah': ['tanpa_nol_depan']},
+        {'kolom': 'Tahun Pajak', 'sumber': 'thn', 'ubah': ['teks']},
+        {'kolom': 'NPWP', 'sumber': 'NIK', 'ubah': ['hapus_desimal']},
+        {'kolom': 'ID TKU Penerima Penghasilan',
+         'kata_kunci': KATA_KUNCI_ID_TKU,
+         'ubah': ['teks'], 'default': ''},
+        {'kolom': 'Status PTKP', 'sumber': 'STATUS', 'ubah': ['teks']},
+        {'kolom': 'Fasilitas', 'konstan': 'DTP'},
+        {'kolom': 'Kode Objek Pajak', 'sumber': kode_pajak_col, 'ubah': ['teks']},
+        {'kolom': 'Penghasilan', 'sumber': 'kotor', 'ubah': ['rupiah']},
+        {'kolom': 'Deemed', 'konstan': '100'},
+        {'kolom': 'Tarif', 'sumber': kode_pajak_col, 'peta': TARIF_KODE_OBJEK, 'peta_default': 0.0},
+        {'kolom': 'Jenis Dok. Referensi', 'konstan': 'CommercialInvoice'},
+        {'kolom': 'Nomor Dok. Referensi', 'kata_kunci': KATA_KUNCI_NOMOR_REF,
+         'ubah': ['teks'], 'default': '', 'kosong_jika_semua_na': True},
+        {'kolom': 'Tanggal Dok. Referensi', 'kata_kunci': KATA_KUNCI_TANGGAL_REF,
+         'ubah': ['tanggal_mdy'], 'default': '', 'kosong_jika_semua_na': True},
+        {'kolom': 'ID TKU Pemotong', 'konstan': ID_TKU_PEMOTONG_DEFAULT},
+        {'kolom': 'Tanggal Pemotongan', 'kata_kunci': KATA_KUNCI_TANGGAL_POTONG,
+         'ubah': ['tanggal_mdy'], 'default': '', 'kosong_jika_semua_na': True},
+    ]
+
+
+def spek_makan_pppk(masa_pajak, tahun_pajak):
+    """BP21 uang makan PPPK (masa/tahun dipilih di form, kolom referensi manual)"""
+    return [
+        {'kolom': 'Masa Pajak', 'konstan': masa_pajak},
+        {'kolom': 'Tahun Pajak', 'konstan': tahun_pajak},
+        {'kolom': 'NPWP', 'sumber': 'NIK', 'isi_na': '', 'ubah': ['potong_desimal']},
+        {'kolom': 'ID TKU Penerima Penghasilan', 'sumber': 'ID PENERIMA TKU', 'isi_na': '', 'ubah': ['strip']},
+        {'kolom': 'Status PTKP', 'sumber': 'STATUS', 'isi_na': 'TK', 'ubah': ['strip']},
+        {'kolom': 'Fasilitas', 'konstan': 'DTP'},
+        {'kolom': 'Kode Objek Pajak', 'sumber': 'KODE OBJEK PAJAK', 'isi_na': '', 'ubah': ['strip']},
+        {'kolom': 'Penghasilan', 'sumber': 'NILAI KOTOR', 'isi_na': 0, 'ubah': ['rupiah']},
+        {'kolom': 'Deemed', 'konstan': 100},
+        {'kolom': 'Tarif', 'sumber': 'KODE OBJEK PAJAK', 'peta': TARIF_KODE_OBJEK, 'peta_default': 0.0},
+        {'kolom': 'Jenis Dok. Referensi', 'konstan': 'CommercialInvoice'},
+        {'kolom': 'Nomor Dok. Referensi', 'konstan': ''},     # Diisi manual dari SP2D
+        {'kolom': 'Tanggal Dok. Referensi', 'konstan': ''},   # Diisi manual dari SP2D
+        {'kolom': 'ID TKU Pemotong', 'sumber': 'ID TKU', 'isi_na': '', 'ubah': ['strip']},
+        {'kolom': 'Tanggal Pemotongan', 'konstan': ''},       # Diisi manual dari Invoice
+    ]
+
+
+def spek_lembur_pns():
+    """BP21 lembur PNS (Tarif = pajak / kotor x 100)"""
+    return [
+        {'kolom': 'Masa Pajak', 'sumber': 'bln', 'ubah': ['tanpa_nol_depan']},
+        {'kolom': 'Tahun Pajak', 'sumber': 'thn', 'ubah': ['teks']},
+        {'kolom': 'NPWP', 'sumber': 'NIK', 'ubah': ['hapus_desimal']},
+        {'kolom': 'ID TKU Penerima Penghasilan', 'kata_kunci': ['id penerima tku', 'id_penerima_tku'],
+         'ubah': ['teks'], 'default': ''},
+        {'kolom': 'Status PTKP', 'sumber': 'STATUS', 'ubah': ['teks']},
+        {'kolom': 'Fasilitas', 'konstan': 'DTP'},
+        {'kolom': 'Kode Objek Pajak', 'kata_kunci': ['kode objek pajak', 'kode_objek_pajak'],
+         'ubah': ['teks'], 'default': ''},
+        {'kolom': 'Penghasilan', 'sumber': 'kotor', 'ubah': ['rupiah']},
+        {'kolom': 'Deemed', 'konstan': '100'},
+        {'kolom': 'Tarif', 'rasio': ('pajak', 'kotor', 100, 2)},
+        {'kolom': 'Jenis Dok. Referensi', 'konstan': 'CommercialInvoice'},
+        {'kolom': 'Nomor Dok. Referensi', 'konstan': ''},
+        {'kolom': 'Tanggal Dok. Referensi', 'konstan': ''},
+        {'kolom': 'ID TKU Pemotong', 'konstan': ID_TKU_PEMOTONG_DEFAULT},
+        {'kolom': 'Tanggal Pemotongan', 'konstan': ''},
+    ]
@@ -0,0 +1,192 @@
+# ter_pph21.py
+"""Perhitungan Tarif Efektif Rata-rata (TER) PPh 21 bulanan secara vektor.
+
+STATUS PTKP dipetakan ke kategori TER A/B/C, lalu bracket penghasilan bruto
+bulanan dicari dengan np.searchsorted di atas tabel batas atas yang terurut.
+Tabel disimpan per versi tahun pajak sehingga perubahan tarif cukup dengan
+menambah versi baru di TABEL_TER.
+"""
+import numpy as np
+import pandas as pd
+
+from rupiah import SATUAN_SEN, parse_rupiah
+
+# ===== PEMETAAN STATUS PTKP -> KATEGORI TER (PP 58/2023) =====
+KATEGORI_STATUS = {
+    'TK/0': 'A', 'TK/1': 'A', 'K/0': 'A',
+    'TK/2': 'B', 'TK/3': 'B', 'K/1': 'B', 'K/2': 'B',
+    'K/3': 'C',
+}
+
+KOLOM_TER = {'A': 'TER A', 'B': 'TER B', 'C': 'TER C'}
+
+# ===== TABEL TER BULANAN =====
+# Format: (batas_atas_inklusif, tarif_persen). Baris terakhir tanpa batas (None).
+TABEL_TER = {
+    2024: {
+        'A': [
+            (5_400_000, 0), (5_650_000, 0.25), (5_950_000, 0.5), (6_300_000, 0.75),
+            (6_750_000, 1), (7_500_000, 1.25), (8_550_000, 1.5), (9_650_000, 1.75),
+            (10_050_000, 2), (10_350_000, 2.25), (10_700_000, 2.5), (11_050_000, 3),
+            (11_600_000, 3.5), (12_500_000, 4), (13_750_000, 5), (15_100_000, 6),
+            (16_950_000, 7), (19_750_000, 8), (24_150_000, 9), (26_450_000, 10),
+            (28_000_000, 11), (30_050_000, 12), (32_400_000, 13), (35_400_000, 14),
+            (39_100_000, 15), (43_850_000, 16), (47_800_000, 17), (51_400_000, 18),
+            (56_300_000, 19), (62_200_000, 20), (68_600_000, 21), (77_500_000, 22),
+            (89_000_000, 23), (103_000_000, 24), (125_000_000, 25), (157_000_000, 26),
+            (206_000_000, 27), (337_000_000, 28), (454_000_000, 29), (550_000_000, 30),
+            (695_000_000, 31), (910_000_000, 32), (1_400_000_000, 33), (None, 34),
+        ],
+        'B': [
+            (6_200_000, 0), (6_500_000, 0.25), (6_850_000, 0.5), (7_300_000, 0.75),
+            (9_200_000, 1), (10_750_000, 1.5), (11_250_000, 2), (11_600_000, 2.5),
+            (12_600_000, 3), (13_600_000, 4), (14_950_000, 5), (16_400_000, 6),
+            (18_450_000, 7), (21_850_000, 8), (26_000_000, 9), (27_700_000, 10),
+            (29_350_000, 11), (31_450_000, 12), (33_950_000, 13), (37_100_000, 14),
+            (41_100_000, 15), (45_800_000, 16), (49_500_000, 17), (53_800_000, 18),
+            (58_500_000, 19), (64_000_000, 20), (71_000_000, 21), (80_000_000, 22),
+            (93_000_000, 23), (109_000_000, 24), (129_000_000, 25), (163_000_000, 26),
+            (211_000_000, 27), (374_000_000, 28), (459_000_000, 29), (555_000_000, 30),
+            (704_000_000, 31), (957_000_000, 32), (1_405_000_000, 33), (None, 34),
+        ],
+        'C': [
+            (6_600_000, 0), (6_950_000, 0.25), (7_350_000, 0.5), (7_800_000, 0.75),
+            (8_850_000, 1), (9_800_000, 1.25), (10_950_000, 1.5), (11_200_000, 1.75),
+            (12_050_000, 2), (12_950_000, 3), (14_150_000, 4), (15_550_000, 5),
+            (17_050_000, 6), (19_500_000, 7), (22_700_000, 8), (26_600_000, 9),
+            (28_100_000, 10), (30_100_000, 11), (32_600_000, 12), (35_400_000, 13),
+            (38_900_000, 14), (43_000_000, 15), (47_400_000, 16), (51_200_000, 17),
+            (55_800_000, 18), (60_400_000, 19), (66_700_000, 20), (74_500_000, 21),
+            (83_200_000, 22), (95_600_000, 23), (110_000_000, 24), (134_000_000, 25),
+            (169_000_000, 26), (221_000_000, 27), (390_000_000, 28), (463_000_000, 29),
+            (561_000_000, 30), (709_000_000, 31), (965_000_000, 32), (1_419_000_000, 33),
+            (None, 34),
+        ],
+    },
+}
+
+_CACHE_ARRAY = {}
+
+
+def versi_tabel(tahun):
+    """Versi tabel yang berlaku untuk tahun pajak (versi terakhir <= tahun).
+
+    None untuk tahun sebelum versi tertua: TER belum berlaku sehingga tarif
+    tidak boleh dikarang dari tabel lain.
+    """
+    versi_tersedia = sorted(TABEL_TER)
+    try:
+        tahun = int(tahun)
+    except (TypeError, ValueError):
+        return versi_tersedia[-1]
+    berlaku = [v for v in versi_tersedia if v <= tahun]
+    return berlaku[-1] if berlaku else None
+
+
+def tanpa_tabel(tahun):
+    """Mask baris yang tahun pajaknya belum punya tabel TER"""
+    return np.array([versi_tabel(t) is None for t in np.asarray(tahun)], dtype=bool)
+
+
+def _array_tabel(versi, kategori):
+    """(batas_atas, tarif) sebagai numpy array, dibuat sekali per versi/kategori"""
+    kunci = (versi, kategori)
+    if kunci not in _CACHE_ARRAY:
+        baris = TABEL_TER[versi][kategori]
+        batas = np.array([b for b, _ in baris if b is not None], dtype=np.int64)
+        tarif = np.array([t for _, t in baris], dtype=np.float64)
+        _CACHE_ARRAY[kunci] = (batas, tarif)
+    return _CACHE_ARRAY[kunci]
+
+
+def normalisasi_status(status):
+    """Samakan penulisan STATUS PTKP: 'k1', 'K / 1', 'tk-0' -> 'K/1', 'TK/0'"""
+    teks = status.astype(str).str.upper().str.replace(r'[\s\-_]', '', regex=True)
+    teks = teks.str.replace(r'^(TK|K)/?(\d)$', r'\1/\2', regex=True)
+    return teks
+
+
+def kategori_ter(status):
+    """Series STATUS -> Series kategori 'A'/'B'/'C' (NaN jika tidak dikenal)"""
+    return normalisasi_status(status).map(KATEGORI_STATUS)
+
+
+def tarif_kategori(bruto, kategori, tahun):
+    """Tarif (%) untuk satu kategori atas array bruto, tahun per baris"""
+    bruto = np.asarray(bruto, dtype=np.float64)
+    tahun = np.asarray(tahun)
+    hasil = np.full(len(bruto), np.nan)
+
+    # Tahun tanpa tabel (-1) dibiarkan NaN: belum dihitung, bukan tarif 0
+    versi_baris = np.array([versi_tabel(t) or -1 for t in tahun], dtype=np.int64)
+    for versi in np.unique(versi_baris[versi_baris >= 0]):
+        mask = versi_baris == versi
+        batas, tarif = _array_tabel(int(versi), kategori)
+        # Batas atas inklusif -> side='left' (bruto == batas masuk bracket tersebut)
+        posisi = np.searchsorted(batas, np.ceil(bruto[mask]), side='left')
+        hasil[mask] = tarif[posisi]
+
+    hasil[np.isnan(bruto)] = np.nan
+    return hasil
+
+
+def hitung_ter(status, bruto, tahun):
+    """Hitung kategori, tarif TER A/B/C, tarif efektif, dan PPh terpotong.
+
+    Semua argumen berupa Series/array sepanjang sama. Return DataFrame dengan
+    kolom: kategori, TER A, TER B, TER C, tarif, pph.
+    """
+    status = pd.Series(status).reset_index(drop=True)
+    # Nominal teks format Indonesia ("5.250.000") ikut terbaca, tidak jadi NaN
+    bruto_sen, _, _ = parse_rupiah(pd.Series(bruto).reset_index(drop=True), SATUAN_SEN)
+    bruto = pd.Series(bruto_sen.to_numpy(dtype=float, na_value=np.nan) / SATUAN_SEN)
+    tahun = pd.Series(tahun).reset_index(drop=True)
+    if len(tahun) != len(bruto):
+        tahun = pd.Series([tahun.iloc[0] if len(tahun) else None] * len(bruto))
+
+    hasil = pd.DataFrame({'kategori': kategori_ter(status)})
+    for kategori, kolom in KOLOM_TER.items():
+        hasil[kolom] = tarif_kategori(bruto.to_numpy(), kategori, tahun.to_numpy())
+
+    # Tarif efektif = tarif pada kolom kategori milik pegawai
+    tarif = np.full(len(hasil), np.nan)
+    for kategori, kolom in KOLOM_TER.items():
+        mask = (hasil['kategori'] == kategori).to_numpy()
+        tarif[mask] = hasil[kolom].to_numpy()[mask]
+    hasil['tarif'] = tarif
+
+    # PPh dipotong dibulatkan ke bawah ke rupiah penuh
+    hasil['pph'] = np.floor(bruto.to_numpy() * tarif / 100)
+    return hasil
+
+
+def isi_tarif_ter(df_bpmp, kolom_status='Status', kolom_bruto='Penghasilan Kotor', kolom_tahun='Tahun Pajak'):
+    """Isi kolom Tarif, TER A, TER B, TER C pada DataFrame format BPMP.
+
+    Return salinan DataFrame; baris dengan STATUS/penghasilan tidak valid atau
+    tahun pajak sebelum TER berlaku dibiarkan kosong agar tetap terlihat saat dicek.
+    """
+    df = df_bpmp.copy()
+    if df.empty or kolom_status not in df.columns or kolom_bruto not in df.columns:
+        return df
+
+    tahun = df[kolom_tahun] if kolom_tahun in df.columns else pd.Series([None] * len(df))
+    hasil = hitung_ter(df[kolom_status], df[kolom_bruto], tahun)
+    hasil.index = df.index
+
+    def sebagai_kolom(nilai):
+        return nilai.astype(object).where(nilai.notna(), '')
+
+    df['Tarif'] = sebagai_kolom(hasil['tarif'])
+    for kolom in KOLOM_TER.values():
+        df[kolom] = sebagai_kolom(hasil[kolom])
+    return df
+
+
+def total_pph_ter(df_bpmp, kolom_status='Status', kolom_bruto='Penghasilan Kotor', kolom_tahun='Tahun Pajak'):
+    """Total PPh 21 terpotong (TER) untuk seluruh baris BPMP"""
+    if df_bpmp is None or df_bpmp.empty:
+        return 0
+    tahun = df_bpmp[kolom_tahun] if kolom_tahun in df_bpmp.columns else pd.Series([None] * len(df_bpmp))
+    hasil = hitung_ter(df_bpmp[kolom_status], df_bpmp[kolom_bruto], tahun)
+    return float(np.nansum(hasil['pph'].to_numpy()))
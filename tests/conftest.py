@@ -0,0 +1,15 @@
+# tests/conftest.py
+"""Modul aplikasi berada di root repo (flat); data tes ditulis ke direktori temp."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def direktori_data_tes(tmp_path, monkeypatch):
+    """Cache, memo, dan arsip setiap tes terpisah dari data_fusiontax asli"""
+    monkeypatch.setenv("FUSIONTAX_DATA_DIR", str(tmp_path / "data"))
+    return tmp_path / "data"
@@ -0,0 +1,97 @@
+import pandas as pd
+import pytest
+
+import alur_tahap
+from alur_tahap import Alur
+
+
+@pytest.fixture(autouse=True)
+def hasil_kosong():
+    alur_tahap._HASIL.clear()
+    alur_tahap._UKURAN.clear()
+    yield
+    alur_tahap._HASIL.clear()
+    alur_tahap._UKURAN.clear()
+
+
+def alur_hitung(nama, **kw):
+    panggilan = []
+
+    def ganda(df):
+        panggilan.append('ganda')
+        return df.assign(x=df['x'] * 2)
+
+    def jumlah(df, lain):
+        panggilan.append('jumlah')
+        return int(df['x'].sum() + lain['y'].sum())
+
+    alur = Alur(nama)
+    alur.tambah('ganda', ganda, ['a'], **kw)
+    alur.tambah('jumlah', jumlah, ['ganda', 'b'])
+    return alur, panggilan
+
+
+def test_hasil_dipakai_ulang_dan_hanya_hilir_yang_dihitung():
+    alur, panggilan = alur_hitung('uji_ulang')
+    a = pd.DataFrame({'x': [1, 2]})
+    hasil, _ = alur.jalankan({'a': a, 'b': pd.DataFrame({'y': [1]})}, ['jumlah'])
+    assert hasil['jumlah'] == 7
+
+    hasil, laporan = alur.jalankan({'a': a, 'b': pd.DataFrame({'y': [1]})}, ['jumlah'])
+    assert hasil['jumlah'] == 7
+    assert [b['Status'] for b in laporan] == ['DIPAKAI ULANG']
+
+    # Hanya b berubah: 'ganda' dipakai ulang, 'jumlah' dihitung
+    hasil, laporan = alur.jalankan({'a': a, 'b': pd.DataFrame({'y': [5]})}, ['jumlah'])
+    assert hasil['jumlah'] == 11
+    assert panggilan == ['ganda', 'jumlah', 'jumlah']
+
+
+def test_hasil_untuk_pemanggil_adalah_salinan():
+    alur, _ = alur_hitung('uji_salinan')
+    a = pd.DataFrame({'x': [1, 2]})
+    hasil, _ = alur.jalankan({'a': a}, ['ganda'])
+    hasil['ganda'].loc[0, 'x'] = 100
+    hasil, _ = alur.jalankan({'a': a}, ['ganda'])
+    assert hasil['ganda']['x'].tolist() == [2, 4]
+
+
+def test_hasil_gagal_tidak_disimpan():
+    panggilan = []
+
+    def proses(df):
+        panggilan.append(1)
+        pesan = [('warning', 'NIP tidak ditemukan')]
+        return (None, 0, pesan) if df.empty else (df, len(df), pesan)
+
+    alur = Alur('uji_gagal')
+    alur.tambah('proses', proses, ['a'], simpan_jika=lambda hasil: hasil[0] is not None)
+    kosong = pd.DataFrame({'x': []})
+    for _ in range(2):
+        (hasil, _, pesan), = alur.jalankan({'a': kosong}, ['proses'])[0].values()
+        assert hasil is None
+    assert len(panggilan) == 2
+
+    isi = pd.DataFrame({'x': [1]})
+    alur.jalankan({'a': isi}, ['proses'])
+    hasil, laporan = alur.jalankan({'a': isi}, ['proses'])
+    assert laporan[0]['Status'] == 'DIPAKAI ULANG'
+    # Pesan tahap ikut tersimpan di hasil, jadi bisa ditampilkan ulang
+    assert hasil['proses'][2] == [('warning', 'NIP tidak ditemukan')]
+    assert len(panggilan) == 3
+
+
+def test_memori_dibatasi_ukuran(monkeypatch):
+    df = pd.DataFrame({'x': range(100_000)})       # ~0.76 MB
+    monkeypatch.setenv(alur_tahap.ENV_BATAS_MB, '2')
+    alur = Alur('uji_batas').tambah('salin', lambda d, i: d.assign(i=i), ['a', 'i'])
+    for i in range(4):
+        alur.jalankan({'a': df, 'i': i}, ['salin'])
+    assert len(alur_tahap._HASIL) == 1
+    assert sum(alur_tahap._UKURAN.values()) <= 2
+
+    # Hasil yang lebih besar dari seluruh batas tidak ditahan di memori
+    monkeypatch.setenv(alur_tahap.ENV_BATAS_MB, '0.5')
+    alur.jalankan({'a': df, 'i': 9}, ['salin'])
+    assert len(alur_tahap._HASIL) == 1
+    assert sum(alur_tahap._UKURAN.values()) <= 2
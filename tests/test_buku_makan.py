@@ -0,0 +1,142 @@
+import pandas as pd
+import pytest
+
+from arsip_bulanan import HashInput, hash_input
+from buku_makan import BukuMakan, CatatanBulanan, kolom_input, proses_bulanan
+from spesifikasi_bp21 import jalankan, kompilasi, spek_makan_pns
+
+
+def data_rapel():
+    return pd.DataFrame({
+        'nip': ['198001', '198002', '198001', '198002', '198003'],
+        'kotor': ['1.000.000', 750000, '1,500,000', 500000, 250000],
+        'jmlhari': [20, 15, 22, 10, 5],
+        'bln': [7, 7, 8, 8, 8],
+        'thn': [2025] * 5,
+        'NIK': ['3201000000000001', '3201000000000002', '3201000000000001',
+                '3201000000000002', '3201000000000003'],
+        'STATUS': ['K/1', 'TK/0', 'K/1', 'TK/0', 'K/0'],
+        'KODE OBJEK PAJAK': ['21-402-02', '21-402-03', '21-402-02', '21-402-03', '21-402-04'],
+    })
+
+
+def test_hash_input_bertahap_sama_dengan_sekali_jalan():
+    df = data_rapel()
+    bertahap = HashInput(df.columns, 'param').tambah(df.iloc[:2]).tambah(df.iloc[2:])
+    assert bertahap.hexdigest() == hash_input(df, df.columns, 'param')
+    assert hash_input(df.iloc[::-1], df.columns, 'param') != hash_input(df, df.columns, 'param')
+
+
+def test_streaming_mencatat_bulan_sama_dengan_batch():
+    pytest.importorskip('pyarrow')
+    df = data_rapel()
+    spesifikasi = spek_makan_pns('KODE OBJEK PAJAK')
+    buku = BukuMakan('makan_pns')
+
+    _, status = proses_bulanan(buku, df, spesifikasi, 'nip', 'kotor', 'jmlhari')
+    assert [s['Status'] for s in status] == ['BARU', 'BARU']
+    disimpan = {p: buku.muat_buku(*p) for p in buku.periode()}
+
+    rencana, laporan = kompilasi(spesifikasi, df)
+    catatan = CatatanBulanan(buku, spesifikasi, kolom_input(rencana, laporan, 'nip', 'kotor', 'jmlhari'),
+                             'nip', 'kotor', 'jmlhari')
+    for awal, akhir in ((0, 3), (3, 5)):
+        chunk = df.iloc[awal:akhir].reset_index(drop=True)
+        catatan.tambah(jalankan(rencana, chunk), chunk)
+    status = catatan.selesai()
+    assert [(s['Bulan'], s['Baris'], s['Status']) for s in status] == [(7, 2, 'TETAP'), (8, 3, 'TETAP')]
+
+    # Bulan 8 berubah di chunk streaming -> hanya bulan itu yang ditulis ulang
+    df.loc[4, 'kotor'] = 300000
+    catatan = CatatanBulanan(buku, spesifikasi, kolom_input(rencana, laporan, 'nip', 'kotor', 'jmlhari'),
+                             'nip', 'kotor', 'jmlhari')
+    catatan.tambah(jalankan(rencana, df), df)
+    status = catatan.selesai()
+    assert [s['Status'] for s in status] == ['TETAP', 'DIHITUNG ULANG']
+    pd.testing.assert_frame_equal(buku.muat_buku(2025, 7), disimpan[(2025, 7)])
+    assert buku.muat_buku(2025, 8)['kotor'].tolist() == [1500000.0, 500000.0, 300000.0]
+
+
+def data_campuran():
+    """Bulan 7: kotor lengkap (Int64), referensi kosong. Bulan 8: ada kotor kosong, referensi terisi."""
+    df = data_rapel()
+    df['kotor'] = [1000000, 750000, 1500000, None, 250000]
+    df['nomor sp2d'] = [None, None, 'SP-01', 'SP-02', None]
+    df['tanggal sp2d'] = [None, None, '2025-08-05', '2025-08-05', None]
+    return df
+
+
+def test_hasil_sama_dengan_tanpa_buku_untuk_bulan_campuran():
+    df = data_campuran()
+    spesifikasi = spek_makan_pns('KODE OBJEK PAJAK')
+    batch = jalankan(kompilasi(spesifikasi, df)[0], df)
+    buku = BukuMakan('makan_pns')
+
+    for _ in range(2):
+        hasil, status = proses_bulanan(buku, df, spesifikasi, 'nip', 'kotor', 'jmlhari')
+        pd.testing.assert_frame_equal(hasil, batch)
+    # Tanpa pyarrow buku tidak ditulis, hasil tetap sama
+    assert [s['Status'] for s in status] in (['TETAP', 'TETAP'], ['TIDAK DISIMPAN', 'TIDAK DISIMPAN'])
+    # Bulan 7 mengikuti keputusan kolom seluruh file, bukan default '' per bulan
+    assert hasil['Nomor Dok. Referensi'].tolist()[:2] == batch['Nomor Dok. Referensi'].tolist()[:2]
+    assert hasil['Penghasilan'].dtype == 'float64'
+
+
+def test_rentang_bulan_dtype_disatukan():
+    pytest.importorskip('pyarrow')
+    df = data_campuran()
+    spesifikasi = spek_makan_pns('KODE OBJEK PAJAK')
+    buku = BukuMakan('makan_pns')
+    # Tiap bulan diupload terpisah: bulan 7 Penghasilan Int64, bulan 8 float64
+    for bulan in (7, 8):
+        sub = df[df['bln'] == bulan].reset_index(drop=True)
+        proses_bulanan(buku, sub, spesifikasi, 'nip', 'kotor', 'jmlhari')
+    assert str(buku.muat(2025, 7)['Penghasilan'].dtype) == 'Int64'
+
+    rentang = buku.bp21_rentang((2025, 7), (2025, 8))
+    assert len(rentang) == 5
+    assert rentang['Penghasilan'].dtype == 'float64'
+    assert not any(v is pd.NA for v in rentang.to_numpy().ravel())
+
+
+def test_hanya_bulan_berubah_yang_dihitung(monkeypatch):
+    pytest.importorskip('pyarrow')
+    import buku_makan
+
+    baris_dihitung = []
+    jalankan_asli = buku_makan.jalankan
+    monkeypatch.setattr(buku_makan, 'jalankan',
+                        lambda rencana, df, **kw: baris_dihitung.append(len(df)) or jalankan_asli(rencana, df, **kw))
+    df = data_campuran()
+    spesifikasi = spek_makan_pns('KODE OBJEK PAJAK')
+    buku = BukuMakan('makan_pns')
+    proses_bulanan(buku, df, spesifikasi, 'nip', 'kotor', 'jmlhari')
+    assert baris_dihitung == [2, 3]
+
+    baris_dihitung.clear()
+    df.loc[4, 'kotor'] = 300000
+    hasil, status = proses_bulanan(buku, df, spesifikasi, 'nip', 'kotor', 'jmlhari')
+    assert baris_dihitung == [3]
+    assert [s['Status'] for s in status] == ['TETAP', 'DIHITUNG ULANG']
+    pd.testing.assert_frame_equal(hasil, jalankan_asli(kompilasi(spesifikasi, df)[0], df))
+
+
+def test_kolom_teks_seluruh_file_menghitung_ulang_bulan_tersimpan():
+    pytest.importorskip('pyarrow')
+    df = data_rapel()
+    spesifikasi = spek_makan_pns('KODE OBJEK PAJAK')
+    buku = BukuMakan('makan_pns')
+    proses_bulanan(buku, df, spesifikasi, 'nip', 'kotor', 'jmlhari')
+
+    # Nilai tidak valid di bulan 8 -> Penghasilan jatuh ke teks di seluruh file,
+    # jadi bulan 7 yang tersimpan sebagai angka ikut dihitung ulang
+    df.loc[4, 'kotor'] = 'dua ratus ribu'
+    hasil, status = proses_bulanan(buku, df, spesifikasi, 'nip', 'kotor', 'jmlhari')
+    batch = jalankan(kompilasi(spesifikasi, df)[0], df)
+    pd.testing.assert_frame_equal(hasil, batch)
+    assert [s['Status'] for s in status] == ['DIHITUNG ULANG', 'DIHITUNG ULANG']
+    assert buku.meta(2025, 7)['gagal'] == [] and buku.meta(2025, 8)['gagal'] == ['Penghasilan']
+
+    hasil, status = proses_bulanan(buku, df, spesifikasi, 'nip', 'kotor', 'jmlhari')
+    pd.testing.assert_frame_equal(hasil, batch)
+    assert [s['Status'] for s in status] == ['TETAP', 'TETAP']
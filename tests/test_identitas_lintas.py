@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+
+import identitas_lintas
+from identitas_lintas import cek_lintas, daftarkan, kunci_identitas, normalisasi, tabrakan
+
+
+@pytest.fixture(autouse=True)
+def terdaftar_kosong():
+    identitas_lintas._TERDAFTAR.clear()
+    identitas_lintas._HASIL.clear()
+    yield
+    identitas_lintas._TERDAFTAR.clear()
+    identitas_lintas._HASIL.clear()
+
+
+def master(nip, nik, nama, **kolom):
+    return pd.DataFrame({'NIP': nip, 'Nama': nama, 'NIK': nik, **kolom})
+
+
+def test_normalisasi():
+    series = pd.Series(['19800101 200003 1 001', '3201.0', None, '0000', ' 12-34 '], dtype=object)
+    assert normalisasi(series).tolist() == ['198001012000031001', '3201', '', '', '1234']
+    assert normalisasi(pd.Series([3201.0, float('nan')])).tolist() == ['3201', '']
+
+
+def test_tabrakan_nip_dan_nik_npwp():
+    pns = kunci_identitas(master(['1', '2', '3'], ['11', '12', '13'], ['A', 'B', 'C'],
+                                 NPWP=['', '', '99']))
+    pppk = kunci_identitas(master(['2', '7', '8'], ['17', '99', '13'], ['B', 'X', 'C']), 'pppk')
+    hasil = tabrakan(pns, pppk)
+    assert hasil[['Cocok Pada', 'Nilai', 'NIP PNS', 'NIP PPPK', 'Baris PNS', 'Baris PPPK']].values.tolist() == [
+        ['NIP', '2', '2', '2', 3, 2],
+        ['NPWP/NIK', '99', '3', '7', 4, 3],
+        ['NIK', '13', '3', '8', 4, 4],
+    ]
+
+    # Satu pasangan yang cocok di beberapa kolom digabung jadi satu baris
+    pppk = kunci_identitas(master(['3'], ['13'], ['C']), 'pppk')
+    assert tabrakan(pns, pppk)[['Cocok Pada', 'Nilai']].values.tolist() == [['NIP, NIK', '3, 13']]
+
+
+def test_pegawai_tidak_aktif_tidak_didaftarkan():
+    df = master(['1', '2'], ['11', '12'], ['A', 'B'], **{'AKTIF/TIDAK': ['AKTIF', ' tidak ']})
+    kunci = kunci_identitas(df)
+    assert kunci['NIP'].tolist() == ['1']
+    assert kunci['Baris'].tolist() == [2]
+
+
+def test_nik_pppk_memakai_skema_master_pppk():
+    # Master PPPK hanya punya kolom "NIK PENERIMA"; skema master PNS mengecualikannya
+    df = pd.DataFrame({'NIP': ['5'], 'Nama': ['A'], 'NIK PENERIMA': ['3201']})
+    assert kunci_identitas(df)['NIK'].tolist() == ['']
+    assert kunci_identitas(df, 'pppk')['NIK'].tolist() == ['3201']
+
+
+def test_cek_lintas_membaca_master_terdaftar():
+    daftarkan('pns', master(['1', '2'], ['11', '12'], ['A', 'B']), 'gaji_pns')
+    assert cek_lintas()[0] is None
+    daftarkan('pppk', master(['2', '9'], ['19', '18'], ['B', 'Z'],
+                             **{'AKTIF/TIDAK': ['TIDAK', 'AKTIF']}), 'gaji_pppk')
+    hasil, info = cek_lintas()
+    assert hasil.empty and info['pppk']['baris'] == 1
+
+    # Master tersimpan di disk: proses lain melihat versi yang sama
+    identitas_lintas._TERDAFTAR.clear()
+    daftarkan('pppk', master(['2'], ['19'], ['B']), 'croscheck_pppk')
+    hasil, _ = cek_lintas()
+    assert hasil['NIP PNS'].tolist() == ['2']
@@ -0,0 +1,22 @@
+import pandas as pd
+import pytest
+
+from arsip_bulanan import ArsipBulanan, arsipkan_utuh
+from kueri_arsip import perubahan_master, tersedia
+
+pytestmark = pytest.mark.skipif(not tersedia(), reason="pyarrow tidak terpasang")
+
+
+def test_perubahan_master_dibandingkan_dengan_snapshot_sebelum_rentang():
+    arsip = ArsipBulanan('master_pns')
+    arsipkan_utuh(arsip, pd.DataFrame({'NIP': ['1', '2'], 'KDKAWIN': ['TK', 'K']}), [(2025, 1)])
+    arsipkan_utuh(arsip, pd.DataFrame({'NIP': ['1', '2'], 'KDKAWIN': ['K', 'K']}), [(2025, 7)])
+
+    # Rentang 6 bulan terakhir = 2025-02..2025-07; hanya 2025-07 di dalamnya
+    hasil = perubahan_master('master_pns', 'KDKAWIN', 6)
+    assert hasil.to_dict('records') == [{
+        'NIP': '1', 'Nilai Awal': 'TK', 'Nilai Akhir': 'K',
+        'Masa Awal': '2025-01', 'Masa Akhir': '2025-07', 'Jumlah Nilai': 2,
+    }]
+    # Rentang 1 bulan pun tetap membandingkan dengan snapshot 2025-01
+    assert perubahan_master('master_pns', 'KDKAWIN', 1)['NIP'].tolist() == ['1']
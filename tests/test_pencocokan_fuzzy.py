@@ -0,0 +1,36 @@
+import pandas as pd
+
+import pencocokan_fuzzy
+from pencocokan_fuzzy import cocokkan_banyak, siapkan_kandidat
+
+
+def kandidat():
+    return siapkan_kandidat(pd.DataFrame({
+        'Nama': ['BUDI SANTOSO', 'SITI AMINAH', 'AHMAD FAUZI', 'DEWI LESTARI'],
+        'NIP': ['198001012000031001', '198502022010012002', '199003032015031003', '198704042012122004'],
+    }))
+
+
+def test_cocok_persis_dan_mirip():
+    hasil = cocokkan_banyak([
+        ('Budi Santoso', '198001012000031001'),
+        ('Siti Aminah, S.Pd.', '198502022010012002'),
+        ('AHMAD FAUZY', '199003032015031008'),
+        ('ORANG LAIN', '111111111111111111'),
+    ], kandidat(), threshold=80, workers=1)
+    assert hasil == [0, 1, 2, None]
+
+
+def test_blok_yang_lolos_tidak_scan_penuh(monkeypatch):
+    dicek = []
+    terbaik_asli = pencocokan_fuzzy._terbaik
+    monkeypatch.setattr(pencocokan_fuzzy, '_terbaik',
+                        lambda nama, nip, k, posisi, t: dicek.append(len(posisi)) or terbaik_asli(nama, nip, k, posisi, t))
+    # NIP sama (di blok), nama sedikit beda -> tidak skor 100, tetap diambil dari blok
+    assert cocokkan_banyak([('DEWI LESTARY', '198704042012122004')], kandidat(), workers=1) == [3]
+    assert dicek == [1]
+
+    # Tidak ada kandidat di blok -> scan penuh
+    dicek.clear()
+    assert cocokkan_banyak([('ZULKIFLI', '198704042012122005')], kandidat(), threshold=60, workers=1) == [3]
+    assert dicek == [4]
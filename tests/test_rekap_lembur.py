@@ -0,0 +1,54 @@
+import pandas as pd
+
+from rekap_lembur import KOLOM_JUMLAH_RECORD, DetailLembur, agregasi_lembur
+
+
+def data_harian():
+    return pd.DataFrame({
+        'nip': ['1001', '1002', '1001', '1003', '1002', '1001'],
+        'kotor': ['100.000', 50000, '100,000', 75000, 'abc', 25000],
+        'pajak': [5000, 2500, 5000, 3750, 2500, 1250],
+        'bln': [8, 8, 8, 8, 8, 9],
+        'thn': [2025] * 6,
+        'nmpeg': [None, 'B', 'A', 'C', 'B', 'A'],
+        'jamlemburharikerja': [2, 3, 1, None, 4, 2],
+    })
+
+
+def test_rekap_per_nip_bulan():
+    rekap, detail, laporan = agregasi_lembur([data_harian()])
+    assert rekap[['nip', 'bln']].values.tolist() == [['1001', 8], ['1002', 8], ['1003', 8], ['1001', 9]]
+    assert rekap[KOLOM_JUMLAH_RECORD].tolist() == [2, 2, 1, 1]
+    assert rekap['pajak'].tolist() == [10000, 5000, 3750, 1250]
+    # Grup dengan kotor tidak valid dikosongkan, bukan dijumlah sebagian
+    assert rekap['kotor'].isna().tolist() == [False, True, False, False]
+    assert rekap['kotor'][0] == 200000
+    assert rekap['nmpeg'].tolist() == ['A', 'B', 'C', 'A']
+    assert rekap['jamlemburharikerja'].tolist()[:2] == [3, 7]
+    assert laporan == [{'Kolom': 'kotor', 'Masalah': 'nilai bukan nominal rupiah (total grup dikosongkan)',
+                        'Jumlah Baris': 1}]
+    assert detail['Baris Excel'].tolist() == [2, 3, 4, 5, 6, 7]
+    assert detail['Grup Rekap'].tolist() == [0, 1, 0, 2, 1, 3]
+
+
+def test_rekap_per_chunk_sama_dengan_sekali_jalan():
+    df = data_harian()
+    rekap, detail, _ = agregasi_lembur([df])
+
+    tampungan = DetailLembur()
+    try:
+        rekap_chunk, detail_chunk, _ = agregasi_lembur([df.iloc[:2], df.iloc[2:5], df.iloc[5:]], tampungan)
+        assert detail_chunk is tampungan
+        detail_gabung = pd.concat(tampungan.chunk(), ignore_index=True)
+    finally:
+        tampungan.tutup()
+
+    pd.testing.assert_frame_equal(rekap_chunk, rekap)
+    assert rekap_chunk.attrs['kolom_file'] == rekap.attrs['kolom_file']
+    pd.testing.assert_frame_equal(detail_gabung, detail)
+
+
+def test_sumber_tanpa_chunk_menghasilkan_rekap_kosong():
+    rekap, detail, laporan = agregasi_lembur(iter([]))
+    assert rekap.empty and detail.empty and laporan == []
+    assert {'nip', 'bln', 'thn', 'kotor', 'pajak', KOLOM_JUMLAH_RECORD} <= set(rekap.columns)
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rupiah import SATUAN_SEN, jumlah_komponen, ke_angka, parse_rupiah
+
+
+def nilai_list(series, satuan=1):
+    nilai, _, _ = parse_rupiah(pd.Series(series, dtype=object), satuan)
+    return [None if pd.isna(v) else int(v) for v in nilai]
+
+
+@pytest.mark.parametrize("teks, harapan", [
+    ("1.234.567", 1234567),
+    ("1,234,567", 1234567),
+    ("1.234.567,50", 1234568),
+    ("Rp 1,234,567.49", 1234567),
+    ("(25.000)", -25000),
+    ("-1.000", -1000),
+    # satu pemisah + tepat tiga digit: ribuan, baik titik maupun koma
+    ("1.500", 1500),
+    ("1,500", 1500),
+    ("25,000", 25000),
+    ("25.000", 25000),
+    # satu pemisah selain pola ribuan: desimal
+    ("2,5", 3),
+    ("1,50", 2),
+    ("1500.5", 1501),
+    ("1234,567", 1235),
+    ("0.125", 0),
+    ("0,500", 1),
+])
+def test_parse_teks(teks, harapan):
+    assert nilai_list([teks]) == [harapan]
+
+
+def test_parse_sen_koma_desimal_dan_ribuan():
+    assert nilai_list(["2,5", "1,50", "1,500", "0,125"], SATUAN_SEN) == [250, 150, 150000, 13]
+
+
+def test_kosong_dan_tidak_valid():
+    nilai, kosong, tidak_valid = parse_rupiah(pd.Series(["", "-", None, "abc", "12x"], dtype=object))
+    assert kosong.tolist() == [True, True, True, False, False]
+    assert tidak_valid.tolist() == [False, False, False, True, True]
+    assert nilai.isna().all()
+
+
+def test_kolom_campuran_angka_dan_teks():
+    series = pd.Series([1500.0, "2.500", 7, np.nan], dtype=object)
+    assert nilai_list(series) == [1500, 2500, 7, None]
+
+
+def test_ke_angka_dan_jumlah_komponen():
+    df = pd.DataFrame({'gjpokok': ["1.000.000", "2,5"], 'tjistri': [100000, None]})
+    total, laporan, kurang = jumlah_komponen(df, ['gjpokok', 'tjistri', 'tjanak'])
+    assert total.tolist() == [1100000.0, 2.5]
+    assert kurang.tolist() == [True, True]
+    assert {r['Komponen'] for r in laporan} == {'tjistri', 'tjanak'}
+    assert ke_angka(pd.Series([500, 1000], dtype='Int64'), SATUAN_SEN).tolist() == [5, 10]
@@ -0,0 +1,22 @@
+import pandas as pd
+
+from ter_pph21 import isi_tarif_ter, total_pph_ter, versi_tabel
+
+
+def test_tahun_sebelum_ter_tidak_punya_tabel():
+    assert versi_tabel(2023) is None
+    assert versi_tabel(2024) == 2024
+    assert versi_tabel(2026) == 2024
+
+
+def test_baris_sebelum_ter_dibiarkan_kosong():
+    df = pd.DataFrame({
+        'Status': ['TK/0', 'TK/0', 'K/3'],
+        'Penghasilan Kotor': [10_000_000, 10_000_000, 7_000_000],
+        'Tahun Pajak': [2023, 2025, 2025],
+    })
+    hasil = isi_tarif_ter(df)
+    assert hasil['Tarif'].tolist() == ['', 2.0, 0.5]
+    assert hasil['TER A'].tolist()[0] == ''
+    # Baris 2023 tidak ikut dijumlah sebagai PPh
+    assert total_pph_ter(df) == 200_000 + 35_000
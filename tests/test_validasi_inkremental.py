@@ -0,0 +1,79 @@
+import pandas as pd
+
+from validasi_inkremental import (gabung, hash_baris, hash_pembanding, konteks,
+                                  rencana_ulang, simpan_riwayat)
+
+KONTEKS = konteks('npwp', 1)
+
+
+def validasi(mentah, rujukan):
+    """Validasi sederhana: nama rujukan per NPWP ('' jika tidak ditemukan)"""
+    nama = dict(zip(rujukan['npwp'], rujukan['nama']))
+    return pd.DataFrame({
+        'No': mentah.index + 1,
+        'NPWP': mentah['npwp'],
+        'Nama Rujukan': mentah['npwp'].map(nama).fillna(''),
+    }, index=mentah.index)
+
+
+def jalankan(mentah, rujukan, riwayat):
+    hash_baru = hash_baris(mentah)
+    kunci = mentah['npwp'].astype(str)
+    pembanding = hash_pembanding(rujukan, 'npwp')
+    ulang, lama = rencana_ulang(riwayat, KONTEKS, hash_baru, kunci, pembanding)
+    hasil = gabung(validasi(mentah[ulang], rujukan), lama)
+    eksak = kunci.isin(rujukan['npwp'])
+    riwayat = simpan_riwayat(hasil, hash_baru, kunci, eksak, KONTEKS, pembanding)
+    return hasil, ulang, riwayat
+
+
+def data():
+    mentah = pd.DataFrame({'npwp': ['1', '2', '3', '4'], 'gaji': [10, 20, 30, 40]})
+    rujukan = pd.DataFrame({'npwp': ['1', '2', '3'], 'nama': ['A', 'B', 'C']})
+    return mentah, rujukan
+
+
+def test_run_pertama_dan_tanpa_perubahan():
+    mentah, rujukan = data()
+    hasil, ulang, riwayat = jalankan(mentah, rujukan, None)
+    assert ulang.all()
+    hasil2, ulang2, _ = jalankan(mentah, rujukan, riwayat)
+    assert not ulang2.any()
+    pd.testing.assert_frame_equal(hasil2, hasil, check_dtype=False)
+
+
+def test_hanya_baris_berubah_yang_diulang_dan_nomor_bergeser():
+    mentah, rujukan = data()
+    _, _, riwayat = jalankan(mentah, rujukan, None)
+
+    ubah = mentah.copy()
+    ubah.loc[1, 'gaji'] = 25
+    _, ulang, _ = jalankan(ubah, rujukan, riwayat)
+    assert ulang.tolist() == [False, True, False, False]
+
+    # Baris pertama dihapus: sisanya memakai hasil lama, nomor disesuaikan
+    geser = mentah.iloc[1:].reset_index(drop=True)
+    hasil, ulang, _ = jalankan(geser, rujukan, riwayat)
+    assert not ulang.any()
+    assert hasil['No'].tolist() == [1, 2, 3]
+    assert hasil['Nama Rujukan'].tolist() == ['B', 'C', '']
+
+
+def test_pembanding_berubah_mengulang_kunci_itu_dan_hasil_tidak_eksak():
+    mentah, rujukan = data()
+    _, _, riwayat = jalankan(mentah, rujukan, None)
+
+    rujukan2 = rujukan.copy()
+    rujukan2.loc[0, 'nama'] = 'A BARU'
+    hasil, ulang, _ = jalankan(mentah, rujukan2, riwayat)
+    # NPWP 1 berubah di rujukan; NPWP 4 tidak ditemukan, jadi ikut diulang
+    assert ulang.tolist() == [True, False, False, True]
+    assert hasil['Nama Rujukan'].tolist() == ['A BARU', 'B', 'C', '']
+
+
+def test_konteks_berbeda_mengulang_semua():
+    mentah, rujukan = data()
+    _, _, riwayat = jalankan(mentah, rujukan, None)
+    ulang, lama = rencana_ulang(riwayat, konteks('npwp', 2), hash_baris(mentah),
+                                mentah['npwp'], hash_pembanding(rujukan, 'npwp'))
+    assert ulang.all() and lama is None
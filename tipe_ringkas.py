@@ -0,0 +1,135 @@
+# tipe_ringkas.py
+"""Kebijakan dtype ringkas untuk DataFrame penggajian yang disimpan di session_state.
+
+Hasil parse croscheck semuanya kolom object berisi string Python; satu sesi
+bisa menahan enam frame seperti itu. Sebelum disimpan, kolom diringkas:
+    identitas (NIP/NIK/NPWP/ID TKU/rekening) -> string[pyarrow]
+    kode berkardinalitas rendah (daftar tetap) -> category
+    nominal rupiah (komponen gaji)            -> int64
+Konversi hanya dilakukan jika lossless: semua nilai string tanpa kosong
+(None/NaN), dan untuk rupiah str(int) harus sama persis dengan teks asal.
+Jadi kode tab yang membaca per baris (format_nilai_asli, .str, ==) tetap
+menghasilkan nilai yang sama. Kolom lain dibiarkan apa adanya.
+"""
+import re
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    DTYPE_IDENTITAS = pd.StringDtype('pyarrow')
+except ImportError:  # pyarrow opsional: pakai string bawaan pandas
+    DTYPE_IDENTITAS = pd.StringDtype()
+
+# ===== KONFIGURASI =====
+# Nama kolom dibandingkan case insensitive setelah strip
+KOLOM_IDENTITAS = [
+    'nip', 'nik', 'npwp', 'npwp/nik/tin', 'id penerima tku', 'id tku', 'rekening', 'nogaji',
+]
+# Hanya kode dari file input. Kolom hasil yang diisi/dihitung halaman
+# (STATUS, AKTIF/TIDAK, Status_Color, PNS/PPPK) tetap object: value_counts
+# pada category ikut menampilkan kategori berjumlah nol.
+KOLOM_KATEGORI = [
+    'nm_bank', 'kdbankspan', 'nmbankspan', 'kdgol', 'kode objek pajak',
+    'kdkawin', 'status pegawai', 'posisi',
+    'masa pajak', 'tahun pajak', 'bulan', 'tahun', 'kdsatker', 'kdanak', 'kdsubanak',
+    'kdjns', 'kdduduk', 'kdpos', 'kdnegara', 'kdkppn', 'tipesup', 'kdjab', 'kdgapok',
+]
+KOLOM_RUPIAH = [
+    'gjpokok', 'tjistri', 'tjanak', 'tjupns', 'tjstruk', 'tjfungs', 'tjdaerah', 'tjpencil',
+    'tjlain', 'tjkompen', 'pembul', 'tjberas', 'tjpph', 'potpfkbul', 'potpfk2', 'gajikotor',
+    'potpfk10', 'potpph', 'potswrum', 'potkelbtj', 'potlain', 'pottabrum', 'bersih', 'bpjs',
+    'bpjs2', 'penghasilan kotor',
+]
+
+# Bilangan bulat tanpa nol di depan: str(int(teks)) == teks
+_POLA_BULAT = re.compile(r'^-?(0|[1-9]\d*)$')
+
+_IDENTITAS = set(KOLOM_IDENTITAS)
+_KATEGORI = set(KOLOM_KATEGORI)
+_RUPIAH = set(KOLOM_RUPIAH)
+
+
+def aktifkan_copy_on_write():
+    """Aktifkan Copy-on-Write pandas (bawaan di pandas 3, opsi di pandas 2.x)"""
+    try:
+        pd.set_option('mode.copy_on_write', True)
+    except (KeyError, ValueError, pd.errors.OptionError):
+        pass
+
+
+def _semua_teks(series):
+    """True jika semua nilai str dan tidak ada yang kosong (None/NaN)"""
+    if series.dtype != object or series.isna().any():
+        return False
+    return all(isinstance(v, str) for v in series.to_numpy())
+
+
+def _jadi_rupiah(series):
+    """Series teks bilangan bulat -> int64, atau None jika tidak lossless"""
+    nilai = series.to_numpy()
+    if not all(_POLA_BULAT.match(v) for v in nilai):
+        return None
+    try:
+        return series.astype('int64')
+    except (OverflowError, ValueError):
+        return None
+
+
+def ringkas(df):
+    """Salinan df dengan dtype ringkas sesuai kebijakan (None dikembalikan None)"""
+    if df is None or df.empty:
+        return df
+    kolom_baru = {}
+    for col in df.columns:
+        series = df[col]
+        if not _semua_teks(series):
+            continue
+        nama = str(col).strip().lower()
+        if nama in _IDENTITAS:
+            kolom_baru[col] = series.astype(DTYPE_IDENTITAS)
+        elif nama in _RUPIAH:
+            rupiah = _jadi_rupiah(series)
+            if rupiah is not None:
+                kolom_baru[col] = rupiah
+        elif nama in _KATEGORI:
+            kolom_baru[col] = series.astype('category')
+    if not kolom_baru:
+        return df
+    # Salinan dangkal: kolom yang tidak diringkas tetap berbagi data dengan df asal
+    hasil = df.copy(deep=False)
+    for col, series in kolom_baru.items():
+        hasil[col] = series
+    hasil.attrs = dict(df.attrs)
+    return hasil
+
+
+def ukuran_mb(df):
+    """Memori DataFrame (deep) dalam MB"""
+    if df is None:
+        return 0.0
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def laporan_memori(sebelum, sesudah):
+    """Baris laporan per frame: {'Frame', 'Sebelum (MB)', 'Sesudah (MB)', 'Hemat (%)'}"""
+    laporan = []
+    for nama, df_awal in sebelum.items():
+        awal = ukuran_mb(df_awal)
+        akhir = ukuran_mb(sesudah.get(nama))
+        laporan.append({
+            'Frame': nama,
+            'Baris': 0 if df_awal is None else len(df_awal),
+            'Sebelum (MB)': round(float(awal), 2),
+            'Sesudah (MB)': round(float(akhir), 2),
+            'Hemat (%)': round(float(1 - akhir / awal) * 100, 1) if awal else 0.0,
+        })
+    return laporan
+
+
+def simpan_ringkas(state, **frames):
+    """Ringkas frame lalu simpan ke state (session_state/dict). Return laporan memori."""
+    sesudah = {nama: ringkas(df) for nama, df in frames.items()}
+    for nama, df in sesudah.items():
+        state[nama] = df
+    return laporan_memori(frames, sesudah)
@@ -5,6 +5,18 @@ from datetime import datetime
 from openpyxl import Workbook
 from openpyxl.styles import PatternFill, Font
 from openpyxl.utils import get_column_letter
+from ter_pph21 import isi_tarif_ter, tanpa_tabel, total_pph_ter
+from pembaca_excel import (
+    baca_excel_proyeksi, baca_excel_lengkap, kolom_file, kolom_tidak_dibaca,
+    preflight_excel, pesan_preflight,
+)
+from master_bersama import ambil_master
+from rupiah import jumlah_komponen
+from pengelola_sesi import lepas
+from rekap_tahunan import arsip_gaji
+from arsip_bulanan import ArsipBulanan, arsipkan_utuh
+from alur_tahap import Alur
+import identitas_lintas
 
 # Header definitions
 HEADERS_MENTAH = [
@@ -43,9 +55,13 @@ GAJI_COMPONENTS = [
 # Kolom wajib untuk data mentah
 REQUIRED_MENTAH = ["nip", "bulan", "tahun"]
 
+# Kolom data mentah yang dipakai pipeline (hanya kolom ini yang diparse)
+KOLOM_PIPELINE_MENTAH = REQUIRED_MENTAH + ["nmpeg", "npwp", "kdkawin", "GajiKotor", "gajikotor"] + GAJI_COMPONENTS
+
 def validate_headers(df, expected_headers, file_type):
     """Validasi header file yang diupload"""
-    df_headers = df.columns.tolist()
+    # Header lengkap file (bukan hanya kolom yang diparse)
+    df_headers = kolom_file(df)
     
     # Untuk data master, cek kolom wajib saja
     if file_type == "Data Master":
@@ -78,11 +94,7 @@ def validate_headers(df, expected_headers, file_type):
                 st.warning(f"⚠️ Beberapa komponen gaji tidak ditemukan: {', '.join(missing_components)}")
                 st.info("Sistem akan menganggap nilai 0 untuk komponen yang tidak ditemukan.")
         
-        # Cek header tambahan
-        extra = [h for h in df_headers if h not in expected_headers]
-        if extra:
-            st.warning(f"⚠️ Header tambahan di file {file_type} (akan diabaikan): {', '.join(extra)}")
-        
+        # Header tambahan sudah dilaporkan saat preflight
         return True
     
     # Untuk data lain, validasi seperti biasa
@@ -119,45 +131,37 @@ def check_new_data(df_mentah, df_master):
     
     return new_data
 
-def calculate_gaji_kotor(row):
-    """Hitung gaji kotor jika kolom gajikotor tidak ada"""
-    total = 0
-    missing_columns = []
-    
-    for col in GAJI_COMPONENTS:
-        if col in row and pd.notna(row[col]):
-            try:
-                total += float(row[col])
-            except (ValueError, TypeError):
-                missing_columns.append(f"{col} (nilai tidak valid)")
-        else:
-            missing_columns.append(col)
-    
-    if missing_columns:
-        st.warning(f"⚠️ Kolom {', '.join(missing_columns)} tidak ditemukan atau nilainya tidak valid untuk perhitungan gaji. Dianggap 0.")
-    
-    return total
-
 def process_data_to_bpmp(df_mentah, df_master):
-    """Proses data mentah dan master menjadi format BPMP"""
+    """Proses data mentah dan master menjadi format BPMP.
+
+    Return (df_hasil atau None, berhasil, gagal, pesan). pesan = list
+    (level, isi) untuk tampilkan_pesan(): ikut tersimpan di alur tahap
+    sehingga tetap tampil saat hasilnya dipakai ulang.
+    """
+    pesan = []
     try:
         # List untuk menyimpan hasil
         hasil_bpmp = []
         
         # Counter untuk tracking
-        total_mentah = len(df_mentah)
         berhasil = 0
         gagal = 0
         
-        # Progress bar
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
         # Informasi perhitungan gaji
         gunakan_perhitungan_sistem = False
         if 'GajiKotor' not in df_mentah.columns and 'gajikotor' not in df_mentah.columns:
             gunakan_perhitungan_sistem = True
-            st.info("ℹ️ Menggunakan perhitungan sistem untuk Penghasilan Kotor")
+            pesan.append(('info', "ℹ️ Menggunakan perhitungan sistem untuk Penghasilan Kotor"))
+        
+        # Penghasilan Kotor sistem dihitung sekali per kolom untuk baris tanpa gajikotor
+        kolom_kotor = [col for col in ('gajikotor', 'GajiKotor') if col in df_mentah.columns]
+        tanpa_kotor = df_mentah[kolom_kotor].isna().all(axis=1) if kolom_kotor else pd.Series(True, index=df_mentah.index)
+        gaji_sistem = pd.Series(0, index=df_mentah.index)
+        if tanpa_kotor.any():
+            gaji_sistem, laporan_komponen, baris_kurang = jumlah_komponen(df_mentah[tanpa_kotor], GAJI_COMPONENTS)
+            if laporan_komponen:
+                pesan.append(('warning', f"⚠️ {int(baris_kurang.sum())} baris memiliki komponen gaji yang tidak ditemukan atau nilainya tidak valid. Dianggap 0."))
+                pesan.append(('dataframe', pd.DataFrame(laporan_komponen)))
         
         # Loop setiap baris di data mentah
         for idx, row_mentah in df_mentah.iterrows():
@@ -178,7 +182,7 @@ def process_data_to_bpmp(df_mentah, df_master):
                     gaji_kotor = row_mentah['GajiKotor']
                 else:
                     # Hitung otomatis dari komponen gaji
-                    gaji_kotor = calculate_gaji_kotor(row_mentah)
+                    gaji_kotor = gaji_sistem[idx]
                 
                 # DIUBAH: Buat dictionary untuk baris BPMP sesuai urutan baru
                 bpmp_row = {
@@ -205,42 +209,43 @@ def process_data_to_bpmp(df_mentah, df_master):
             else:
                 gagal += 1
                 if gagal <= 10:
-                    st.warning(f"⚠️ NIP {nip_mentah} tidak ditemukan di data master (baris {idx+1})")
-            
-            # Update progress
-            progress = (idx + 1) / total_mentah
-            progress_bar.progress(progress)
-            status_text.text(f"Memproses: {idx+1}/{total_mentah} | Berhasil: {berhasil} | Gagal: {gagal}")
+                    pesan.append(('warning', f"⚠️ NIP {nip_mentah} tidak ditemukan di data master (baris {idx+1})"))
         
         if gagal > 10:
-            st.warning(f"⚠️ ... dan {gagal - 10} NIP lainnya tidak ditemukan")
-        
-        progress_bar.empty()
-        status_text.empty()
+            pesan.append(('warning', f"⚠️ ... dan {gagal - 10} NIP lainnya tidak ditemukan"))
         
         # Convert ke DataFrame dengan urutan kolom yang benar
         if hasil_bpmp:
             # DIUBAH: Pastikan DataFrame dibuat dengan urutan HEADERS_BPMP
             df_hasil = pd.DataFrame(hasil_bpmp, columns=HEADERS_BPMP)
             
+            # Isi Tarif dan TER A/B/C dari tabel TER sesuai STATUS dan tahun pajak
+            df_hasil = isi_tarif_ter(df_hasil)
+            belum_ter = int(tanpa_tabel(df_hasil['Tahun Pajak']).sum())
+            if belum_ter:
+                pesan.append(('warning', f"⚠️ {belum_ter} baris bertahun pajak sebelum TER berlaku: Tarif/TER dibiarkan kosong (tidak dihitung)"))
+            
             # Tampilkan informasi tentang perhitungan gaji
             if gunakan_perhitungan_sistem:
-                st.success(f"✅ Penghasilan Kotor dihitung otomatis dari {len(GAJI_COMPONENTS)} komponen gaji")
+                pesan.append(('success', f"✅ Penghasilan Kotor dihitung otomatis dari {len(GAJI_COMPONENTS)} komponen gaji"))
             
-            return df_hasil, berhasil, gagal
+            return df_hasil, berhasil, gagal, pesan
         else:
-            return None, 0, gagal
+            return None, 0, gagal, pesan
             
     except Exception as e:
-        st.error(f"❌ Error saat memproses data: {str(e)}")
+        pesan.append(('error', f"❌ Error saat memproses data: {str(e)}"))
         import traceback
-        st.error(traceback.format_exc())
-        return None, 0, 0
+        pesan.append(('error', traceback.format_exc()))
+        return None, 0, 0, pesan
 
 def convert_df_to_excel(df):
     """Convert DataFrame ke Excel dengan styling warna sesuai permintaan"""
     output = BytesIO()
     
+    # Pastikan Tarif dan TER A/B/C terisi sebelum ditulis
+    df = isi_tarif_ter(df)
+    
     # Buat workbook dan worksheet
     wb = Workbook()
     ws = wb.active
@@ -309,6 +314,25 @@ def convert_df_to_excel(df):
     output.seek(0)
     return output
 
+def tampilkan_pesan(pesan):
+    """Tampilkan pesan (level, isi) dari process_data_to_bpmp"""
+    for level, isi in pesan:
+        if level == 'dataframe':
+            st.dataframe(isi, hide_index=True, use_container_width=True)
+        else:
+            getattr(st, level)(isi)
+
+def ekspor_excel(df):
+    """Bytes file Excel BPMP berwarna (tahap ekspor)"""
+    return convert_df_to_excel(df).getvalue()
+
+# Alur tahap: hasil proses dikunci isi Data Mentah + Master, file Excel dikunci
+# isi hasil (lihat alur_tahap.py). File yang tidak berubah tidak diproses ulang.
+ALUR = Alur('upload_gaji_pns')
+ALUR.tambah('bpmp', process_data_to_bpmp, ['mentah', 'master'], versi=2,
+            simpan_jika=lambda hasil: hasil[0] is not None)
+ALUR.tambah('excel', ekspor_excel, ['hasil'])
+
 def create_template_mentah():
     """Membuat template Excel untuk data mentah"""
     output = BytesIO()
@@ -483,10 +507,10 @@ def show():
            8. Sertifikat/Fasilitas → default "DTP"
            9. Kode Objek Pajak → default "21-100-01"
            10. Penghasilan Kotor → dari 'gajikotor' atau hasil perhitungan sistem
-           11. Tarif → kosong (berisi rumus di aplikasi BPMP)
+           11. Tarif → dihitung sistem dari tabel TER sesuai STATUS (rumus di aplikasi BPMP)
            12. ID TKU → default "0001658723701000000000" (untuk semua data)
            13. Tgl Pemotongan → kosong
-           14-16. TER A, TER B, TER C → kosong (berisi rumus di aplikasi BPMP)
+           14-16. TER A, TER B, TER C → tarif TER kategori A/B/C, dihitung sistem (rumus di aplikasi BPMP)
            ```
         
         6. **🎨 KODE WARNA DI HASIL DOWNLOAD**:
@@ -496,7 +520,7 @@ def show():
            
            **ISI DATA:**
            - **Hijau Muda (Soft Green)**: Kolom 1-10 + ID TKU (data hasil sistem)
-           - **Merah Muda (Light Red)**: Kolom 11-16 (berisi rumus di aplikasi BPMP)
+           - **Merah Muda (Light Red)**: Kolom 11-16 (rumus di aplikasi BPMP, terisi hasil hitung TER sistem)
            
            **⚠️ PERHATIAN KHUSUS:**
            - Kolom berwarna merah/muda mengandung **RUMUS/FORMULA** di aplikasi BPMP
@@ -641,12 +665,22 @@ def show():
     
     if uploaded_mentah:
         try:
-            # Hanya membaca file Excel (xlsx, xls)
-            df = pd.read_excel(uploaded_mentah)
+            # Preflight header (beberapa baris pertama saja) sebelum parse penuh
+            preflight = preflight_excel(uploaded_mentah, wajib=REQUIRED_MENTAH, dikenal=HEADERS_MENTAH)
+            for level, teks in pesan_preflight(preflight, "Data Mentah"):
+                getattr(st, level)(teks)
+            
+            # Hanya kolom yang dipakai pipeline yang diparse (NIP/NPWP sebagai teks)
+            df = baca_excel_proyeksi(uploaded_mentah, kolom=KOLOM_PIPELINE_MENTAH) if preflight['lolos'] else None
+            if df is not None:
+                # Nama kolom dirapikan sama seperti header yang dicek preflight
+                df = df.rename(columns=lambda c: str(c).strip())
             
-            if validate_headers(df, HEADERS_MENTAH, "Data Mentah"):
+            if df is not None and validate_headers(df, HEADERS_MENTAH, "Data Mentah"):
                 # Cek duplikat NIP
                 duplicates = check_duplicate_nips(df)
+                # Hasil deteksi lama dilepas dari sesi; diisi lagi hanya jika masih ada
+                lepas(st.session_state, 'duplicate_nips_df')
                 if not duplicates.empty:
                     st.session_state.duplicate_nips_df = duplicates
                     st.error(f"❌ Ditemukan {len(duplicates)} NIP duplikat di Data Mentah!")
@@ -695,8 +729,12 @@ def show():
                             st.warning("⚠️ Tidak ditemukan komponen gaji untuk perhitungan. Hasil Penghasilan Kotor akan 0.")
                     
                     with st.expander("👁️ Preview Data Mentah"):
-                        # Tampilkan semua data
-                        st.dataframe(df, use_container_width=True)
+                        # Kolom lain baru dibaca jika diminta
+                        dilewati = kolom_tidak_dibaca(df)
+                        if dilewati and st.checkbox(f"Tampilkan semua kolom file ({len(dilewati)} kolom tidak dipakai proses)", key="preview_lengkap_mentah"):
+                            st.dataframe(baca_excel_lengkap(uploaded_mentah), use_container_width=True)
+                        else:
+                            st.dataframe(df, use_container_width=True)
                         st.caption(f"Menampilkan semua {len(df)} baris data")
             else:
                 st.session_state.df_mentah = None
@@ -736,13 +774,21 @@ def show():
     
     if uploaded_master:
         try:
+            # Preflight header sebelum parse penuh
+            preflight = preflight_excel(uploaded_master, wajib=REQUIRED_MASTER)
+            for level, teks in pesan_preflight(preflight, "Data Master"):
+                getattr(st, level)(teks)
+            
             # Hanya membaca file Excel (xlsx, xls)
-            df = pd.read_excel(uploaded_master)
+            df = ambil_master(uploaded_master) if preflight['lolos'] else None
+            if df is not None:
+                df = df.rename(columns=lambda c: str(c).strip())
             
-            if validate_headers(df, HEADERS_MASTER, "Data Master"):
+            if df is not None and validate_headers(df, HEADERS_MASTER, "Data Master"):
                 st.session_state.df_master = df
                 st.success(f"✅ File '{uploaded_master.name}' berhasil diupload!")
                 st.info(f"📊 Total pegawai: {len(df)} orang")
+                identitas_lintas.tampilkan_identitas_lintas('pns', df, 'upload_pajak_gaji_pns')
                 
                 with st.expander("👁️ Preview Data Master"):
                     # Tampilkan semua data
@@ -764,6 +810,8 @@ def show():
         # Cek data baru (NIP di mentah tapi tidak di master)
         new_data = check_new_data(st.session_state.df_mentah, st.session_state.df_master)
         
+        # Hasil deteksi lama dilepas dari sesi; diisi lagi hanya jika masih ada
+        lepas(st.session_state, 'new_data_df')
         if not new_data.empty:
             st.session_state.new_data_df = new_data
             st.warning(f"⚠️ Ditemukan {len(new_data)} data baru di Data Mentah yang tidak ada di Data Master!")
@@ -901,19 +949,38 @@ def show():
           2. Jika tidak, dihitung otomatis dari 15 komponen gaji
         - Hanya data dengan NIP yang match di kedua file yang akan diproses
         - **ID TKU akan otomatis diisi dengan: 0001658723701000000000** (untuk semua data)
-        - Progress bar akan menunjukkan status pemrosesan
+        - Indikator proses tampil selama data diproses; hasil yang sama dipakai ulang tanpa diproses lagi
         """)
         
         if st.button("🚀 **PROSES DATA KE FORMAT BPMP**", type="primary", use_container_width=True):
             with st.spinner("⏳ Memproses data..."):
-                df_hasil, berhasil, gagal = process_data_to_bpmp(
-                    st.session_state.df_mentah,
-                    st.session_state.df_master
+                hasil_alur, laporan = ALUR.jalankan(
+                    {'mentah': st.session_state.df_mentah, 'master': st.session_state.df_master},
+                    ['bpmp']
                 )
+                df_hasil, berhasil, gagal, pesan = hasil_alur['bpmp']
+                if laporan[0]['Status'] != 'DIHITUNG':
+                    st.caption("🧩 Data Mentah dan Master sama dengan proses sebelumnya - hasil dipakai ulang")
+                tampilkan_pesan(pesan)
                 
                 if df_hasil is not None:
                     st.session_state.df_hasil = df_hasil
                     
+                    # Simpan ke arsip bulanan (bahan rekap tahunan 1721-A1)
+                    try:
+                        status_arsip = arsip_gaji('gaji_pns', df_hasil, st.session_state.df_mentah,
+                                                  st.session_state.df_master)
+                        # Versi Data Master yang dipakai ikut disimpan di masa yang sama
+                        arsipkan_utuh(ArsipBulanan('master_pns'), st.session_state.df_master,
+                                      [(s['Tahun'], s['Bulan']) for s in status_arsip])
+                        if any(s['Status'] == 'TIDAK DISIMPAN' for s in status_arsip):
+                            st.warning("⚠️ Sebagian masa tidak tersimpan ke arsip bulanan (pyarrow tidak tersedia?)")
+                        elif status_arsip:
+                            masa = ", ".join(f"{s['Bulan']}/{s['Tahun']} ({s['Status']})" for s in status_arsip)
+                            st.caption(f"🗄️ Tersimpan di arsip bulanan untuk rekap tahunan: {masa}")
+                    except Exception as e:
+                        st.warning(f"⚠️ Hasil tidak tersimpan ke arsip bulanan: {str(e)}")
+                    
                     st.success("✅ Proses selesai!")
                     
                     # Tampilkan statistik hasil
@@ -948,7 +1015,7 @@ def show():
                     
                     **Isi Data:**
                     - **Hijau Muda (#C6EFCE)**: Kolom 1-10 + ID TKU (data hasil sistem)
-                    - **Merah Muda (#FF9999)**: Tarif, TER A, TER B, TER C (berisi rumus)
+                    - **Merah Muda (#FF9999)**: Tarif, TER A, TER B, TER C (rumus BPMP, terisi hasil hitung TER sistem)
                     
                     **⚠️ Ingat: Jangan salin kolom merah muda ke aplikasi BPMP!**
                     """)
@@ -989,7 +1056,8 @@ def show():
         """)
         
         # Generate Excel file
-        excel_file = convert_df_to_excel(df_hasil)
+        hasil_ekspor, _ = ALUR.jalankan({'hasil': df_hasil}, ['excel'])
+        excel_file = hasil_ekspor['excel']
         filename = f"Data_BPMP_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
         
         # Tombol download
@@ -1029,14 +1097,15 @@ def show():
             8. **Sertifikat/Fasilitas** → "DTP" (default)
             9. **Kode Objek Pajak** → "21-100-01" (default)
             10. **Penghasilan Kotor** → dari `gajikotor` atau hasil perhitungan sistem
-            11. **Tarif** → kosong (rumus di aplikasi BPMP)
+            11. **Tarif** → hasil hitung TER sistem sesuai STATUS (rumus di aplikasi BPMP)
             12. **ID TKU** → **default "0001658723701000000000"** (untuk semua data)
             13. **Tgl Pemotongan** → kosong (diisi manual)
-            14-16. **TER A, B, C** → kosong (rumus di aplikasi BPMP)
+            14-16. **TER A, B, C** → tarif TER tiap kategori, hasil hitung sistem (rumus di aplikasi BPMP)
             
             ### **📊 STATISTIK DATA:**
             - **Total baris:** {jumlah_data}
             - **Total penghasilan kotor:** Rp {df_hasil['Penghasilan Kotor'].sum():,.0f}
+            - **Total PPh 21 (TER):** Rp {total_pph_ter(df_hasil):,.0f}
             - **Rata-rata penghasilan:** Rp {df_hasil['Penghasilan Kotor'].mean():,.0f}
             - **Status unik:** {df_hasil['Status'].nunique()} jenis
             - **ID TKU:** Sama untuk semua data (0001658723701000000000)
@@ -6,11 +6,18 @@ from openpyxl import Workbook
 from openpyxl.styles import PatternFill, Font
 from openpyxl.utils import get_column_letter
 
-def check_duplicate_nips(df_mentah):
-    """Cek NIP duplikat di data mentah dan return baris yang duplikat"""
-    df_mentah['nip_clean'] = df_mentah['nip'].astype(str).str.strip()
-    duplicates = df_mentah[df_mentah.duplicated('nip_clean', keep=False)]
-    return duplicates
+from spesifikasi_bp21 import bangun_bp21, spek_lembur_pns, ID_TKU_PEMOTONG_DEFAULT
+from pembaca_excel import (
+    baca_excel_proyeksi, kolom_file, preflight_excel, pesan_preflight,
+)
+from master_bersama import ambil_master
+from pengelola_sesi import lepas
+from cache_kolumnar import hash_isi
+from aliran_chunk import SumberExcel, perlu_streaming, tulis_xlsx, UKURAN_CHUNK
+from rekap_lembur import agregasi_lembur, DetailLembur, KOLOM_JAM, KOLOM_JUMLAH_RECORD
+from rekap_tahunan import arsip_lembur
+
+MAKS_BARIS_EXCEL = 1_048_576 - 1    # batas baris worksheet Excel tanpa header
 
 def check_new_data(df_mentah, df_master):
     """Cek NIP yang ada di data mentah tapi tidak ada di data master"""
@@ -102,7 +109,7 @@ def show():
         
         6. **VALIDASI DATA**:
            - NIP di Data Mentah harus ada di Data Master
-           - **NIP duplikat** di data mentah akan ditandai merah dan harus diperbaiki
+           - **Record lembur harian** (NIP berulang di bulan yang sama) otomatis direkap: kotor, pajak, dan jam lembur dijumlah
            - **Data baru** (NIP tidak ada di master) akan ditandai hijau dan harus ditambahkan ke master
            - Sistem hanya memproses data yang memiliki kecocokan NIP
            - Data tidak match akan ditampilkan di bagian akhir
@@ -162,7 +169,7 @@ def show():
     
     **1. PROSES JOIN DATA:**
     - Sistem menggunakan **INNER JOIN** berdasarkan NIP
-    - **NIP duplikat** di data mentah akan ditandai merah dan harus diperbaiki
+    - **NIP berulang** (record lembur harian) direkap per NIP, bulan, dan tahun sebelum join
     - **Data baru** (NIP tidak ada di master) akan ditandai hijau dan harus ditambahkan ke master
     - Data tanpa match akan ditampilkan terpisah untuk tindak lanjut
     
@@ -231,7 +238,7 @@ def show():
         with st.expander("ℹ️ Detail Kolom Data Mentah", expanded=False):
             st.markdown("""
             **Kolom WAJIB ada:**
-            - `nip` : Nomor Induk Pegawai (kunci join, TIDAK BOLEH DUPLIKAT)
+            - `nip` : Nomor Induk Pegawai (kunci join, boleh berulang untuk record harian)
             - `kotor` : Nilai penghasilan kotor lembur
             - `pajak` : Nilai PPh (untuk menghitung tarif)
             - `bln` : Bulan (1-12, tanpa leading zero)
@@ -287,16 +294,53 @@ def show():
         )
     
     st.markdown("---")
-    
+
+    def tulis_detail(detail):
+        """Detail harian (DetailLembur) -> file audit; CSV jika melebihi batas baris Excel"""
+        if detail.jumlah < MAKS_BARIS_EXCEL:
+            fill_header = PatternFill(start_color="C6E0B4", end_color="C6E0B4", fill_type="solid")
+            return {
+                'data': tulis_xlsx(detail, "Detail Lembur Harian",
+                                   lambda kolom: (Font(bold=True), fill_header), lambda kolom, nilai: None),
+                'ekstensi': 'xlsx',
+                'mime': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            }
+        output = BytesIO()
+        for i, df in enumerate(detail.chunk()):
+            output.write(df.to_csv(index=False, header=(i == 0)).encode('utf-8'))
+        return {'data': output.getvalue(), 'ekstensi': 'csv', 'mime': "text/csv"}
+
     # ========== PROSES DATA ==========
     if uploaded_file_raw is not None and uploaded_file_master is not None:
         try:
-            # Baca kedua file
-            df_raw = pd.read_excel(uploaded_file_raw)
-            df_master = pd.read_excel(uploaded_file_master)
+            # Preflight header kedua file sebelum parse penuh
+            preflight_ok = True
+            for file_cek, wajib, label in [
+                (uploaded_file_raw, ['nip', 'kotor', 'pajak', 'bln', 'thn'], "Data Mentah"),
+                (uploaded_file_master, ['NIP', 'NIK', 'STATUS'], "Data Master"),
+            ]:
+                preflight = preflight_excel(file_cek, wajib=wajib)
+                for level, teks in pesan_preflight(preflight, label):
+                    getattr(st, level)(teks)
+                preflight_ok = preflight_ok and preflight['lolos']
+                if file_cek is uploaded_file_raw:
+                    estimasi_mentah = preflight['estimasi_baris']
+            
+            if not preflight_ok:
+                st.warning("💡 **Solusi**: Pastikan semua kolom wajib ada dan penulisannya benar")
+                st.stop()
+            
+            # Data Mentah lembur bisa berisi satu baris per hari lembur: dibaca
+            # (per chunk untuk file sangat besar) lalu direkap per (nip, bln, thn)
+            mode_streaming = st.checkbox(
+                "⚡ Mode streaming (file sangat besar)",
+                value=perlu_streaming(estimasi_mentah),
+                key="streaming_lembur_pns",
+                help=f"Data Mentah dibaca per {UKURAN_CHUNK:,} baris dan langsung direkap, tanpa memuat seluruh file. Hasil sama dengan mode biasa."
+            )
+            df_master = ambil_master(uploaded_file_master)
             
             # BERSIHKAN NAMA KOLOM (hapus spasi di awal/akhir)
-            df_raw.columns = df_raw.columns.str.strip()
             df_master.columns = df_master.columns.str.strip()
             
             st.success(f"✅ Data mentah berhasil diupload: {uploaded_file_raw.name}")
@@ -305,15 +349,55 @@ def show():
             # ========== VALIDASI AWAL ==========
             st.subheader("🔍 Validasi Data dan Deteksi Data Baru")
             
-            # Validasi kolom wajib di Data Mentah
-            required_raw = ['nip', 'kotor', 'pajak', 'bln', 'thn']
-            missing_raw = [col for col in required_raw if col not in df_raw.columns]
+            # Rekap disimpan per isi file dan mode; dibaca ulang hanya jika salah satunya berubah
+            kunci_rekap = (hash_isi(uploaded_file_raw.getvalue()), mode_streaming)
+            if (st.session_state.get('kunci_rekap_lembur_pns') != kunci_rekap
+                    or not isinstance(st.session_state.get('rekap_lembur_pns'), pd.DataFrame)):
+                kolom_lembur = ['nip', 'kotor', 'pajak', 'bln', 'thn', 'nmpeg', 'nama', 'tgl'] + KOLOM_JAM
+                kata_kunci_lembur = ['id penerima tku', 'id_penerima_tku', 'kode objek pajak', 'kode_objek_pajak']
+                if mode_streaming:
+                    sumber = SumberExcel(uploaded_file_raw, kolom=kolom_lembur, kata_kunci=kata_kunci_lembur)
+                    kolom_terbaca = [str(col).strip() for col in sumber.kolom]
+                    potongan = (df for df, _ in sumber.chunk())
+                else:
+                    df_harian = baca_excel_proyeksi(uploaded_file_raw, kolom=kolom_lembur, kata_kunci=kata_kunci_lembur)
+                    kolom_terbaca = list(df_harian.columns.astype(str).str.strip())
+                    potongan = [df_harian]
+                
+                # Validasi kolom wajib di Data Mentah
+                required_raw = ['nip', 'kotor', 'pajak', 'bln', 'thn']
+                missing_raw = [col for col in required_raw if col not in kolom_terbaca]
+                
+                if missing_raw:
+                    st.error(f"❌ **ERROR**: Kolom berikut tidak ditemukan di Data Mentah:")
+                    for col in missing_raw:
+                        st.write(f"   - **{col}**")
+                    st.warning("💡 **Solusi**: Pastikan semua kolom wajib ada dan penulisannya benar")
+                    st.stop()
+                
+                for nama in ('rekap_lembur_pns', 'detail_lembur_pns'):
+                    lepas(st.session_state, nama)
+                st.session_state.pop('detail_xlsx_lembur_pns', None)
+                with st.spinner("🔄 Merekap transaksi lembur harian per NIP, bulan, dan tahun..."):
+                    if mode_streaming:
+                        # Detail harian tidak disimpan di sesi: langsung ditulis ke file audit
+                        tampungan = DetailLembur()
+                        try:
+                            rekap, detail, laporan = agregasi_lembur(potongan, tampungan)
+                            st.session_state.detail_xlsx_lembur_pns = tulis_detail(detail)
+                        finally:
+                            tampungan.tutup()
+                    else:
+                        rekap, detail, laporan = agregasi_lembur(potongan)
+                        st.session_state.detail_lembur_pns = detail
+                st.session_state.rekap_lembur_pns = rekap
+                st.session_state.laporan_rekap_lembur_pns = laporan
+                st.session_state.kunci_rekap_lembur_pns = kunci_rekap
             
-            if missing_raw:
-                st.error(f"❌ **ERROR**: Kolom berikut tidak ditemukan di Data Mentah:")
-                for col in missing_raw:
-                    st.write(f"   - **{col}**")
-                st.warning("💡 **Solusi**: Pastikan semua kolom wajib ada dan penulisannya benar")
+            df_raw = st.session_state.rekap_lembur_pns.copy()
+            laporan_rekap = st.session_state.laporan_rekap_lembur_pns
+            if df_raw.empty:
+                st.error("❌ **ERROR**: Data Mentah kosong (tidak ada baris lembur di bawah header)")
                 st.stop()
             
             # Validasi kolom wajib di Data Master
@@ -327,41 +411,27 @@ def show():
                 st.warning("💡 **Solusi**: Pastikan NIP, NIK, dan STATUS ada di Data Master")
                 st.stop()
             
-            # ========== CEK NIP DUPLIKAT DI DATA MENTAH ==========
-            duplicates = check_duplicate_nips(df_raw)
-            if not duplicates.empty:
-                st.session_state.duplicate_nips_df = duplicates
-                st.error(f"❌ Ditemukan {len(duplicates)} NIP duplikat di Data Mentah!")
-                
-                # Tampilkan baris duplikat dengan warna merah
-                st.warning("**Baris dengan NIP duplikat (ditandai merah):**")
-                
-                # Buat DataFrame dengan styling untuk duplikat
-                def highlight_duplicates(df_original, duplicates_df):
-                    # Buat salinan untuk styling
-                    styled_df = df_original.copy()
-                    
-                    # Tandai baris duplikat
-                    mask = styled_df['nip_clean'].isin(duplicates_df['nip_clean'].unique())
-                    
-                    # Buat list warna
-                    colors = ['background-color: #ffcccc' if mask.iloc[i] else '' 
-                             for i in range(len(styled_df))]
-                    
-                    return styled_df.style.apply(lambda x: colors, axis=0)
-                
-                styled_duplicates = highlight_duplicates(df_raw.head(50), duplicates)
-                st.dataframe(styled_duplicates, use_container_width=True)
-                
-                if len(df_raw) > 50:
-                    st.info(f"Menampilkan 50 baris pertama dari total {len(df_raw)} baris")
-                
-                st.error("**PERBAIKI NIP DUPLIKAT SEBELUM MELANJUTKAN!**")
-                st.stop()
+            # ========== REKAP LEMBUR HARIAN PER (NIP, BLN, THN) ==========
+            # NIP yang berulang bukan lagi error: record harian dijumlah per bulan
+            lepas(st.session_state, 'duplicate_nips_df')
+            jumlah_record = int(df_raw[KOLOM_JUMLAH_RECORD].sum())
+            if len(df_raw) < jumlah_record:
+                st.info(f"ℹ️ {jumlah_record} record lembur direkap menjadi {len(df_raw)} baris per NIP, bulan, dan tahun "
+                        f"(kotor, pajak, dan jam lembur dijumlah; Tarif dihitung dari total)")
+                with st.expander("🔎 NIP dengan lebih dari satu record lembur"):
+                    digabung = df_raw[df_raw[KOLOM_JUMLAH_RECORD] > 1]
+                    st.dataframe(digabung.head(50), use_container_width=True)
+                    if len(digabung) > 50:
+                        st.info(f"Menampilkan 50 baris pertama dari total {len(digabung)} baris hasil rekap")
+            if laporan_rekap:
+                st.warning("⚠️ Ada nilai kotor/pajak yang bukan nominal rupiah. Total bulan yang memuatnya dikosongkan:")
+                st.dataframe(pd.DataFrame(laporan_rekap), hide_index=True, use_container_width=True)
             
             # ========== CEK DATA BARU (NIP DI MENTAH TAPI TIDAK DI MASTER) ==========
             new_data = check_new_data(df_raw, df_master)
             
+            # Hasil deteksi lama dilepas dari sesi; diisi lagi hanya jika masih ada
+            lepas(st.session_state, 'new_data_df')
             if not new_data.empty:
                 st.session_state.new_data_df = new_data
                 st.warning(f"⚠️ Ditemukan {len(new_data)} data baru di Data Mentah yang tidak ada di Data Master!")
@@ -417,9 +487,9 @@ def show():
             col1, col2 = st.columns(2)
             with col1:
                 with st.expander(f"📄 Data Mentah ({len(df_raw)} baris)"):
-                    st.write(f"**Kolom yang terdeteksi ({len(df_raw.columns)}):**")
+                    st.write(f"**Kolom yang terdeteksi ({len(kolom_file(df_raw))}, diparse {len(df_raw.columns)}):**")
                     cols_per_row = 3
-                    cols = list(df_raw.columns)
+                    cols = kolom_file(df_raw)
                     for i in range(0, len(cols), cols_per_row):
                         row_cols = cols[i:i+cols_per_row]
                         col_text = " | ".join([f"`{col}`" for col in row_cols])
@@ -475,81 +545,24 @@ def show():
                         )
                         
                         # ========== BUAT DATA HASIL BP 21 ==========
-                        df_result = pd.DataFrame()
-                        
-                        # 1. Masa Pajak: ambil dari bln (tanpa leading zero)
-                        df_result['Masa Pajak'] = df_merged['bln'].astype(str).str.lstrip('0')
-                        
-                        # 2. Tahun Pajak: ambil dari thn
-                        df_result['Tahun Pajak'] = df_merged['thn'].astype(str)
-                        
-                        # 3. NPWP: ambil dari NIK (data master) - hilangkan .0
-                        df_result['NPWP'] = df_merged['NIK'].apply(lambda x: str(x).replace('.0', '') if pd.notna(x) else '')
-                        
-                        # 4. ID TKU Penerima Penghasilan: cari kolom yang cocok
-                        id_tku_col = None
-                        for col in df_merged.columns:
-                            if 'ID PENERIMA TKU' in col.upper() or 'ID_PENERIMA_TKU' in col.upper():
-                                id_tku_col = col
-                                break
+                        # Semua kolom dibangun dari spesifikasi deklaratif dalam satu pass vektor
+                        df_result, laporan_kolom = bangun_bp21(spek_lembur_pns(), df_merged)
+                        sumber_kolom = {item['kolom']: item['sumber'] for item in laporan_kolom}
                         
+                        id_tku_col = sumber_kolom['ID TKU Penerima Penghasilan']
                         if id_tku_col:
-                            df_result['ID TKU Penerima Penghasilan'] = df_merged[id_tku_col].astype(str)
                             st.success(f"✅ Kolom ID TKU Penerima ditemukan: {id_tku_col}")
                         else:
-                            df_result['ID TKU Penerima Penghasilan'] = ''
                             st.warning("⚠️ Kolom 'ID PENERIMA TKU' tidak ditemukan, diisi dengan nilai kosong")
                         
-                        # 5. Status PTKP: ambil dari STATUS
-                        df_result['Status PTKP'] = df_merged['STATUS'].astype(str)
-                        
-                        # 6. Fasilitas: default "DTP"
-                        df_result['Fasilitas'] = 'DTP'
-                        
-                        # 7. Kode Objek Pajak: cari kolom yang cocok
-                        kode_pajak_col = None
-                        for col in df_merged.columns:
-                            if 'KODE OBJEK PAJAK' in col.upper() or 'KODE_OBJEK_PAJAK' in col.upper():
-                                kode_pajak_col = col
-                                break
-                        
+                        kode_pajak_col = sumber_kolom['Kode Objek Pajak']
                         if kode_pajak_col:
-                            df_result['Kode Objek Pajak'] = df_merged[kode_pajak_col].astype(str)
                             st.success(f"✅ Kolom Kode Objek Pajak ditemukan: {kode_pajak_col}")
                         else:
-                            df_result['Kode Objek Pajak'] = ''
                             st.warning("⚠️ Kolom 'KODE OBJEK PAJAK' tidak ditemukan, diisi dengan nilai kosong")
                         
-                        # 8. Penghasilan: ambil dari kotor
-                        df_result['Penghasilan'] = df_merged['kotor'].astype(float)
-                        
-                        # 9. Deemed: default "100"
-                        df_result['Deemed'] = '100'
-                        
-                        # 10. Tarif: hitung otomatis (pajak / kotor) × 100
-                        # Hindari pembagian dengan nol
-                        df_result['Tarif'] = df_merged.apply(
-                            lambda row: round((row['pajak'] / row['kotor'] * 100), 2) if row['kotor'] != 0 else 0,
-                            axis=1
-                        )
-                        
                         st.info("📊 **Mode Perhitungan**: Tarif dihitung otomatis = (pajak / kotor) × 100")
-                        
-                        # 11. Jenis Dok. Referensi: default "CommercialInvoice"
-                        df_result['Jenis Dok. Referensi'] = 'CommercialInvoice'
-                        
-                        # 12. Nomor Dok. Referensi: kosong (diisi manual) - WARNA ORANYE
-                        df_result['Nomor Dok. Referensi'] = ''
-                        
-                        # 13. Tanggal Dok. Referensi: kosong (diisi manual) - WARNA ORANYE
-                        df_result['Tanggal Dok. Referensi'] = ''
-                        
-                        # 14. ID TKU Pemotong: DEFAULT "0001658723701000000000"
-                        df_result['ID TKU Pemotong'] = '0001658723701000000000'
-                        st.success("✅ ID TKU Pemotong diisi dengan nilai default: 0001658723701000000000")
-                        
-                        # 15. Tanggal Pemotongan: kosong (diisi manual) - WARNA ORANYE
-                        df_result['Tanggal Pemotongan'] = ''
+                        st.success(f"✅ ID TKU Pemotong diisi dengan nilai default: {ID_TKU_PEMOTONG_DEFAULT}")
                         
                         # Hitung statistik
                         processed_count = len(df_result)
@@ -677,6 +690,17 @@ def show():
                         st.session_state.jumlah_data_lembur_pns = processed_count
                         st.session_state.tidak_match_lembur_pns = not_matched
                         
+                        # Simpan ke arsip bulanan (bahan rekap tahunan 1721-A1)
+                        try:
+                            status_arsip = arsip_lembur(df_result, df_merged)
+                            if any(s['Status'] == 'TIDAK DISIMPAN' for s in status_arsip):
+                                st.warning("⚠️ Sebagian masa tidak tersimpan ke arsip bulanan (pyarrow tidak tersedia?)")
+                            elif status_arsip:
+                                masa = ", ".join(f"{s['Bulan']}/{s['Tahun']} ({s['Status']})" for s in status_arsip)
+                                st.caption(f"🗄️ Tersimpan di arsip bulanan untuk rekap tahunan: {masa}")
+                        except Exception as e:
+                            st.warning(f"⚠️ Hasil tidak tersimpan ke arsip bulanan: {str(e)}")
+                        
                         st.balloons()
                         st.success("🎉 **Data BP 21 untuk lembur siap untuk didownload dengan format warna!**")
                         
@@ -772,6 +796,28 @@ def show():
                         type="primary",
                         help="File Excel dengan format warna: Hijau untuk data sistem, Oranye untuk data manual"
                     )
+                with col2:
+                    # Record lembur harian asli untuk audit rekap (Grup Rekap = baris ke- di hasil rekap)
+                    df_detail = st.session_state.get('detail_lembur_pns')
+                    detail_xlsx = st.session_state.get('detail_xlsx_lembur_pns')
+                    if detail_xlsx is not None:
+                        st.download_button(
+                            label="📥 Download Detail Lembur Harian (Audit)",
+                            data=detail_xlsx['data'],
+                            file_name=f"detail_lembur_harian_pns_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.{detail_xlsx['ekstensi']}",
+                            mime=detail_xlsx['mime'],
+                            use_container_width=True,
+                            help="Record lembur per hari beserta nomor baris Excel dan grup rekapnya"
+                        )
+                    elif isinstance(df_detail, pd.DataFrame):
+                        st.download_button(
+                            label="📥 Download Detail Lembur Harian (Audit)",
+                            data=df_detail.to_csv(index=False).encode('utf-8'),
+                            file_name=f"detail_lembur_harian_pns_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                            mime="text/csv",
+                            use_container_width=True,
+                            help="Record lembur per hari beserta nomor baris Excel dan grup rekapnya"
+                        )
                 
                 # Informasi tambahan
                 with st.expander("ℹ️ Informasi Format File yang Didownload", expanded=False):
@@ -819,6 +865,10 @@ def show():
                         del st.session_state.new_data_df
                     if 'duplicate_nips_df' in st.session_state:
                         del st.session_state.duplicate_nips_df
+                    for nama in ('rekap_lembur_pns', 'detail_lembur_pns', 'detail_xlsx_lembur_pns',
+                                 'laporan_rekap_lembur_pns', 'kunci_rekap_lembur_pns'):
+                        if nama in st.session_state:
+                            del st.session_state[nama]
                     st.rerun()
         
         except Exception as e:
@@ -834,7 +884,7 @@ def show():
     st.markdown("---")
     st.caption("""
     🔧 **Dukungan Teknis**: 
-    - **NIP duplikat**: Pastikan tidak ada NIP yang sama di Data Mentah
+    - **Record harian**: Baris dengan NIP, bln, dan thn yang sama dijumlah menjadi satu baris BP21; detailnya bisa didownload untuk audit
     - **Data baru**: NIP yang tidak ada di Data Master akan ditandai hijau dan harus ditambahkan melalui Croscheck PNS
     - Pastikan format NIP konsisten di kedua file
     - Untuk lembur, pastikan Kode Objek Pajak sesuai dengan ketentuan lembur
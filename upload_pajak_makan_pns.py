@@ -7,19 +7,36 @@ from openpyxl import Workbook
 from openpyxl.styles import PatternFill, Font
 from openpyxl.utils import get_column_letter
 
-def find_column_by_keywords(df, keywords_list):
-    """Mencari kolom berdasarkan daftar kata kunci (case insensitive)"""
-    for col in df.columns:
-        col_lower = str(col).lower()
-        for keyword in keywords_list:
-            if keyword in col_lower:
-                return col
-    return None
+from spesifikasi_bp21 import (
+    kompilasi, spek_makan_pns, find_column_by_keywords,
+    KATA_KUNCI_KODE_OBJEK, KATA_KUNCI_ID_TKU, KATA_KUNCI_NOMOR_REF,
+    KATA_KUNCI_TANGGAL_REF, KATA_KUNCI_TANGGAL_POTONG,
+    TARIF_KODE_OBJEK, ID_TKU_PEMOTONG_DEFAULT,
+)
+from pembaca_excel import (
+    baca_excel_proyeksi, kolom_file, preflight_excel, pesan_preflight,
+)
+from master_bersama import ambil_master, versi_master
+from pengelola_sesi import lepas
+from cache_kolumnar import hash_isi
+from aliran_chunk import (
+    SumberExcel, IndeksNip, profil_mentah, proses_bp21, tulis_xlsx,
+    perlu_streaming, UKURAN_CHUNK, MAKS_CONTOH,
+)
+from buku_makan import BukuMakan, CatatanBulanan, kolom_input, proses_bulanan
 
 def check_duplicate_nips(df_mentah):
-    """Cek NIP duplikat di data mentah dan return baris yang duplikat"""
+    """Cek NIP duplikat dalam bulan yang sama dan return baris yang duplikat.
+
+    File rapel boleh berisi NIP yang sama untuk bulan yang berbeda.
+    """
     df_mentah['nip_clean'] = df_mentah['nip'].astype(str).str.strip()
-    duplicates = df_mentah[df_mentah.duplicated('nip_clean', keep=False)]
+    kunci = pd.DataFrame({
+        'nip': df_mentah['nip_clean'],
+        'bln': pd.to_numeric(df_mentah['bln'], errors='coerce'),
+        'thn': pd.to_numeric(df_mentah['thn'], errors='coerce'),
+    })
+    duplicates = df_mentah[kunci.duplicated(keep=False)]
     return duplicates
 
 def check_new_data(df_mentah, df_master):
@@ -368,15 +385,347 @@ def show():
     
     st.markdown("---")
     
+    # ========== BUKU MAKAN MULTI-BULAN ==========
+    buku = BukuMakan('makan_pns')
+
+    def excel_bp21(hasil_final, judul):
+        """BP21 -> BytesIO Excel dengan format warna (hijau sistem, oranye manual)"""
+        output = BytesIO()
+
+        # Buat workbook
+        wb = Workbook()
+        ws = wb.active
+        ws.title = judul
+
+        # Tulis header
+        headers = list(hasil_final.columns)
+        for col_num, header in enumerate(headers, 1):
+            cell = ws.cell(row=1, column=col_num, value=header)
+            cell.font = Font(bold=True)
+            cell.fill = PatternFill(start_color="C6E0B4", end_color="C6E0B4", fill_type="solid")
+
+        # Tulis data
+        for row_num, row_data in enumerate(hasil_final.values, 2):
+            for col_num, cell_value in enumerate(row_data, 1):
+                ws.cell(row=row_num, column=col_num, value=cell_value)
+
+        # Tentukan kolom untuk warna
+        # Kolom yang diwarnai oranye (harus diisi manual)
+        orange_columns = ['Nomor Dok. Referensi', 'Tanggal Dok. Referensi', 'Tanggal Pemotongan']
+
+        # Cari indeks kolom orange
+        orange_indices = []
+        for col_name in orange_columns:
+            if col_name in headers:
+                orange_indices.append(headers.index(col_name) + 1)  # +1 karena openpyxl mulai dari 1
+
+        # Terapkan warna untuk semua sel data (baris 2 ke atas)
+        for row in ws.iter_rows(min_row=2, max_row=len(hasil_final) + 1, 
+                               min_col=1, max_col=len(headers)):
+            for cell in row:
+                # Jika kolom ini termasuk orange columns, cek apakah kosong
+                if cell.column in orange_indices:
+                    # Jika sel kosong atau hanya berisi spasi, beri warna oranye
+                    if cell.value is None or str(cell.value).strip() == '':
+                        cell.fill = PatternFill(start_color="FFD580", end_color="FFD580", fill_type="solid")
+                    else:
+                        # Jika sudah ada isi, beri warna hijau muda
+                        cell.fill = PatternFill(start_color="E6FFE6", end_color="E6FFE6", fill_type="solid")
+                else:
+                    # Untuk kolom lainnya, beri warna hijau muda
+                    cell.fill = PatternFill(start_color="E6FFE6", end_color="E6FFE6", fill_type="solid")
+
+        # Auto-size columns
+        for column in ws.columns:
+            max_length = 0
+            column_letter = get_column_letter(column[0].column)
+            for cell in column:
+                try:
+                    if len(str(cell.value)) > max_length:
+                        max_length = len(str(cell.value))
+                except:
+                    pass
+            adjusted_width = min(max_length + 2, 50)
+            ws.column_dimensions[column_letter].width = adjusted_width
+
+        # Simpan workbook ke BytesIO
+        wb.save(output)
+        output.seek(0)
+        return output
+
+    def tampilkan_status_buku(status_buku):
+        """Ringkasan bulan yang ditulis ke buku makan vs yang sudah tersimpan"""
+        status_df = pd.DataFrame(status_buku)
+        dihitung = int(status_df['Status'].isin(['BARU', 'DIHITUNG ULANG']).sum())
+        tetap = int((status_df['Status'] == 'TETAP').sum())
+        st.info(f"📚 **Buku Makan:** {len(status_df)} bulan di file ini — {dihitung} disimpan (baru/berubah), "
+                f"{tetap} sudah tersimpan (input tidak berubah)")
+        if (status_df['Status'] == 'TIDAK DISIMPAN').any():
+            st.warning("⚠️ Sebagian baris tidak masuk buku makan (bln/thn tidak terbaca atau penyimpanan tidak tersedia)")
+        with st.expander("📋 Status per bulan", expanded=False):
+            st.dataframe(status_df, use_container_width=True, hide_index=True)
+
+    def tampilkan_buku_makan():
+        """Daftar bulan tersimpan dan BP21 gabungan untuk rentang bulan"""
+        daftar = buku.daftar()
+        with st.expander(f"📚 Buku Makan Multi-Bulan ({len(daftar)} bulan tersimpan)", expanded=False):
+            st.caption("Setiap bulan yang diproses otomatis disimpan. File rapel berisi beberapa bulan: "
+                       "hanya bulan yang datanya berubah yang dihitung ulang.")
+            if daftar.empty:
+                st.info("ℹ️ Belum ada bulan yang tersimpan. Proses Data Mentah untuk mengisi buku.")
+                return
+            st.dataframe(daftar, use_container_width=True, hide_index=True)
+
+            periode = list(zip(daftar['Tahun'], daftar['Bulan']))
+            label = lambda i: f"{periode[i][1]:02d}/{periode[i][0]}"
+            col1, col2 = st.columns(2)
+            with col1:
+                awal = st.selectbox("Dari bulan", range(len(periode)), format_func=label, key="buku_awal_makan_pns")
+            with col2:
+                akhir = st.selectbox("Sampai bulan", range(len(periode)), index=len(periode) - 1,
+                                     format_func=label, key="buku_akhir_makan_pns")
+
+            if st.button("📦 Gabungkan BP21 Rentang Bulan", use_container_width=True, key="buku_gabung_makan_pns"):
+                if awal > akhir:
+                    st.error("❌ Bulan awal harus sebelum bulan akhir")
+                else:
+                    st.session_state.bp21_rentang_makan_pns = buku.bp21_rentang(periode[awal], periode[akhir])
+                    st.session_state.label_rentang_makan_pns = f"{label(awal)} - {label(akhir)}"
+
+            if 'bp21_rentang_makan_pns' in st.session_state:
+                hasil_rentang = st.session_state.bp21_rentang_makan_pns
+                label_rentang = st.session_state.get('label_rentang_makan_pns', '')
+                st.success(f"✅ BP21 {label_rentang}: {len(hasil_rentang)} baris dari buku makan")
+                st.download_button(
+                    label="📥 Download BP21 Rentang (Excel dengan Format Warna)",
+                    data=excel_bp21(hasil_rentang, "BP21_Pajak_Makan_PNS"),
+                    file_name=f"BP21_Pajak_Makan_PNS_{label_rentang.replace('/', '').replace(' ', '')}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True,
+                    key="buku_download_makan_pns",
+                )
+
+    tampilkan_buku_makan()
+    st.markdown("---")
+
+    # ========== MODE STREAMING (DATA MENTAH SANGAT BESAR) ==========
+    def proses_streaming(file_mentah, file_master):
+        """Alur per chunk: memori sebanding ukuran chunk + master, hasil sama dengan mode biasa"""
+        sumber = SumberExcel(
+            file_mentah,
+            kolom=['nip', 'kotor', 'bln', 'thn', 'jmlhari', 'nmpeg', 'nama'],
+            kata_kunci=KATA_KUNCI_ID_TKU + KATA_KUNCI_KODE_OBJEK + KATA_KUNCI_NOMOR_REF
+            + KATA_KUNCI_TANGGAL_REF + KATA_KUNCI_TANGGAL_POTONG,
+        )
+        df_master = ambil_master(file_master)
+        df_master.columns = df_master.columns.str.strip()
+        kolom_mentah = [str(col).strip() for col in sumber.kolom]
+
+        st.success(f"✅ Data mentah siap diproses per {UKURAN_CHUNK:,} baris: {file_mentah.name}")
+        st.success(f"✅ Data master berhasil diupload: {file_master.name}")
+        st.subheader("🔍 Validasi Data dan Deteksi Data Baru")
+
+        missing_raw = [col for col in ['nip', 'kotor', 'bln', 'thn'] if col not in kolom_mentah]
+        if missing_raw:
+            st.error(f"❌ **ERROR**: Kolom berikut tidak ditemukan di Data Mentah: {', '.join(missing_raw)}")
+            st.stop()
+        missing_master = [col for col in ['NIP', 'NIK', 'STATUS'] if col not in df_master.columns]
+        if missing_master:
+            st.error(f"❌ **ERROR**: Kolom berikut tidak ditemukan di Data Master: {', '.join(missing_master)}")
+            st.stop()
+        kode_pajak_col = find_column_by_keywords(df_master, KATA_KUNCI_KODE_OBJEK)
+        if not kode_pajak_col:
+            st.error("❌ **ERROR**: Kolom 'KODE OBJEK PAJAK' tidak ditemukan di Data Master")
+            st.stop()
+
+        df_master['NIP'] = df_master['NIP'].astype(str).str.strip()
+        indeks = IndeksNip(df_master)
+        spesifikasi = spek_makan_pns(kode_pajak_col)
+
+        def siapkan(df):
+            df.columns = df.columns.astype(str).str.strip()
+            df['nip'] = df['nip'].astype(str).str.strip()
+            return df
+
+        # Profil (dtype, duplikat, data baru) disimpan per pasangan file
+        kunci = (hash_isi(sumber.data), versi_master(file_master))
+        cache = st.session_state.get('profil_streaming_makan_pns')
+        if cache is None or cache['kunci'] != kunci:
+            with st.spinner("🔍 Memeriksa Data Mentah per chunk..."):
+                cache = {'kunci': kunci, 'profil': profil_mentah(sumber, indeks, siapkan, spesifikasi,
+                                                                   kolom_periode=('bln', 'thn'))}
+            st.session_state.profil_streaming_makan_pns = cache
+            st.session_state.pop('hasil_streaming_makan_pns', None)
+        profil = cache['profil']
+        jumlah_baris = profil['jumlah_baris']
+        contoh = profil['contoh']
+        lepas(st.session_state, 'duplicate_nips_df')
+        lepas(st.session_state, 'new_data_df')
+
+        if profil['jumlah_duplikat']:
+            st.error(f"❌ Ditemukan {profil['jumlah_duplikat']} NIP duplikat dalam bulan yang sama di Data Mentah!")
+            st.warning("**Baris dengan NIP duplikat (ditandai merah):**")
+            mask = profil['duplikat_contoh']
+            colors = ['background-color: #ffcccc' if m else '' for m in mask]
+            st.dataframe(contoh.style.apply(lambda x: colors, axis=0), use_container_width=True)
+            st.info(f"Menampilkan {len(contoh)} baris pertama dari total {jumlah_baris} baris")
+            st.error("**PERBAIKI NIP DUPLIKAT SEBELUM MELANJUTKAN!**")
+            st.stop()
+
+        if profil['jumlah_baru']:
+            st.warning(f"⚠️ Ditemukan {profil['jumlah_baru']} data baru di Data Mentah yang tidak ada di Data Master!")
+            st.info(f"**Data baru (maksimal {MAKS_CONTOH} baris pertama - perlu ditambahkan ke Data Master):**")
+            st.dataframe(profil['baris_baru'], use_container_width=True)
+            st.error("**DATA BARU HARUS DITAMBAHKAN KE DATA MASTER SEBELUM MELANJUTKAN!**")
+            if st.button("➕ Tambahkan Data Baru ke Master (Croscheck PNS)", type="primary", use_container_width=True):
+                st.session_state.current_page = 'croscheck_pns'
+                st.session_state.selected_menu = 'croscheck'
+                st.rerun()
+            st.stop()
+
+        st.success("✅ Tidak ditemukan data baru. Semua NIP di Data Mentah ada di Data Master.")
+        col1, col2 = st.columns(2)
+        with col1:
+            with st.expander(f"📄 Data Mentah ({jumlah_baris} baris)"):
+                st.write(f"**Kolom yang terdeteksi ({len(sumber.header)}, diparse {len(sumber.kolom)}):**")
+                st.write(" | ".join([f"`{col}`" for col in sumber.header]))
+                st.dataframe(contoh.head(3))
+        with col2:
+            with st.expander(f"📄 Data Master ({len(df_master)} baris)"):
+                st.write(f"**Kolom yang terdeteksi ({len(df_master.columns)}):**")
+                st.write(" | ".join([f"`{col}`" for col in df_master.columns]))
+                st.dataframe(df_master.head(3))
+
+        st.markdown("---")
+        if st.button("🔄 **PROSES DATA & GENERATE BP 21**", use_container_width=True, type="primary",
+                     key="proses_streaming_makan_pns"):
+            statistik = {'penghasilan': 0.0, 'tarif_total': 0.0, 'tarif': pd.Series(dtype=float)}
+
+            # Bulan di file dicatat ke buku makan seperti mode biasa
+            catatan = CatatanBulanan(
+                buku, spesifikasi,
+                kolom_input(profil['rencana'], profil['laporan_kolom'], 'nip', 'kotor', 'jmlhari'),
+                kolom_nip='nip', kolom_kotor='kotor', kolom_jmlhari='jmlhari', sumber=file_mentah.name,
+                paksa_teks=profil['paksa_teks'],
+            )
+
+            def amati(hasil, df_gabung):
+                statistik['penghasilan'] += pd.to_numeric(hasil['Penghasilan'], errors='coerce').sum()
+                statistik['tarif_total'] += hasil['Tarif'].sum()
+                statistik['tarif'] = statistik['tarif'].add(hasil['Tarif'].value_counts(), fill_value=0)
+                catatan.tambah(hasil, df_gabung)
+
+            with st.spinner(f"🔄 Memproses {jumlah_baris:,} baris per {UKURAN_CHUNK:,} baris..."):
+                try:
+                    tampungan = proses_bp21(sumber, indeks, siapkan, profil, amati)
+                except Exception:
+                    catatan.tutup()
+                    raise
+                status_buku = catatan.selesai()
+                try:
+                    orange_columns = ['Nomor Dok. Referensi', 'Tanggal Dok. Referensi', 'Tanggal Pemotongan']
+                    fill_hijau = PatternFill(start_color="E6FFE6", end_color="E6FFE6", fill_type="solid")
+                    fill_oranye = PatternFill(start_color="FFD580", end_color="FFD580", fill_type="solid")
+                    fill_header = PatternFill(start_color="C6E0B4", end_color="C6E0B4", fill_type="solid")
+
+                    def gaya_sel(kolom, nilai):
+                        if kolom in orange_columns and (nilai is None or str(nilai).strip() == ''):
+                            return fill_oranye
+                        return fill_hijau
+
+                    xlsx = tulis_xlsx(tampungan, "BP21_Pajak_Makan_PNS",
+                                      lambda kolom: (Font(bold=True), fill_header), gaya_sel)
+                    preview = tampungan.head(10)
+                finally:
+                    tampungan.tutup()
+
+            st.session_state.hasil_streaming_makan_pns = {
+                'xlsx': xlsx,
+                'preview': preview,
+                'jumlah': tampungan.jumlah,
+                'tidak_match': jumlah_baris - tampungan.jumlah,
+                'penghasilan': statistik['penghasilan'],
+                'rata_tarif': statistik['tarif_total'] / tampungan.jumlah if tampungan.jumlah else 0.0,
+                'tarif': statistik['tarif'],
+                'status_buku': status_buku,
+            }
+
+        hasil = st.session_state.get('hasil_streaming_makan_pns')
+        if hasil is not None:
+            st.markdown("---")
+            st.subheader("📊 Ringkasan Hasil Proses")
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Data Mentah", jumlah_baris)
+            with col2:
+                st.metric("NIP Unik", profil['nip_unik'])
+            with col3:
+                st.metric("✅ Match & Diproses", hasil['jumlah'])
+            with col4:
+                st.metric("❌ Tidak Match", hasil['tidak_match'])
+
+            kode_mapping = {tarif: kode for kode, tarif in TARIF_KODE_OBJEK.items()}
+            st.info(f"""
+            **📈 Statistik Hasil:**
+            - **Total Penghasilan:** Rp {hasil['penghasilan']:,.0f}
+            - **Rata-rata Tarif:** {hasil['rata_tarif']:.2f}%
+            """)
+            for tarif, count in hasil['tarif'].items():
+                st.info(f"  • {kode_mapping.get(tarif, 'Tidak dikenali')} (Tarif {tarif:.0f}%): {int(count)} baris")
+
+            if hasil.get('status_buku'):
+                tampilkan_status_buku(hasil['status_buku'])
+
+            st.subheader("📄 Preview Hasil (10 baris pertama)")
+            st.dataframe(hasil['preview'])
+            st.download_button(
+                label="📥 **Download Hasil (Excel dengan Format Warna)**",
+                data=hasil['xlsx'],
+                file_name=f"BP21_Pajak_Makan_PNS_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                use_container_width=True,
+                type="primary",
+            )
+
     # ========== PROSES DATA ==========
     if uploaded_file_raw is not None and uploaded_file_master is not None:
         try:
-            # Baca kedua file
-            df_raw = pd.read_excel(uploaded_file_raw)
-            df_master = pd.read_excel(uploaded_file_master)
+            # Preflight header kedua file sebelum parse penuh
+            preflight_ok = True
+            for file_cek, wajib, label in [
+                (uploaded_file_raw, ['nip', 'kotor', 'bln', 'thn'], "Data Mentah"),
+                (uploaded_file_master, ['NIP', 'NIK', 'STATUS'], "Data Master"),
+            ]:
+                preflight = preflight_excel(file_cek, wajib=wajib)
+                for level, teks in pesan_preflight(preflight, label):
+                    getattr(st, level)(teks)
+                preflight_ok = preflight_ok and preflight['lolos']
+                if file_cek is uploaded_file_raw:
+                    estimasi_mentah = preflight['estimasi_baris']
+            
+            if not preflight_ok:
+                st.warning("💡 **Solusi**: Pastikan semua kolom wajib ada dan penulisannya benar")
+                st.stop()
+            
+            # File mentah sangat besar: proses per chunk tanpa memuat seluruh file
+            if st.checkbox("⚡ Mode streaming (file sangat besar)",
+                           value=perlu_streaming(estimasi_mentah),
+                           key="streaming_makan_pns",
+                           help=f"Data Mentah dibaca dan diproses per {UKURAN_CHUNK:,} baris, hasil ditulis langsung ke Excel. Hasil sama dengan mode biasa."):
+                proses_streaming(uploaded_file_raw, uploaded_file_master)
+                st.stop()
+            
+            # Baca kedua file (data mentah: hanya kolom yang dipakai proses)
+            df_raw = baca_excel_proyeksi(
+                uploaded_file_raw,
+                kolom=['nip', 'kotor', 'bln', 'thn', 'nmpeg', 'nama', 'jmlhari'],
+                kata_kunci=KATA_KUNCI_ID_TKU + KATA_KUNCI_KODE_OBJEK + KATA_KUNCI_NOMOR_REF
+                + KATA_KUNCI_TANGGAL_REF + KATA_KUNCI_TANGGAL_POTONG,
+            )
+            df_master = ambil_master(uploaded_file_master)
             
             # BERSIHKAN NAMA KOLOM (hapus spasi di awal/akhir)
-            df_raw.columns = df_raw.columns.str.strip()
+            df_raw.columns = df_raw.columns.astype(str).str.strip()
             df_master.columns = df_master.columns.str.strip()
             
             st.success(f"✅ Data mentah berhasil diupload: {uploaded_file_raw.name}")
@@ -408,8 +757,7 @@ def show():
                 st.stop()
             
             # Cari kolom KODE OBJEK PAJAK di Data Master
-            kode_pajak_keywords = ['kode objek pajak', 'kode_objek_pajak', 'objek pajak']
-            kode_pajak_col = find_column_by_keywords(df_master, kode_pajak_keywords)
+            kode_pajak_col = find_column_by_keywords(df_master, KATA_KUNCI_KODE_OBJEK)
             
             if not kode_pajak_col:
                 st.error("❌ **ERROR**: Kolom 'KODE OBJEK PAJAK' tidak ditemukan di Data Master")
@@ -418,9 +766,11 @@ def show():
             
             # ========== CEK NIP DUPLIKAT DI DATA MENTAH ==========
             duplicates = check_duplicate_nips(df_raw)
+            # Hasil deteksi lama dilepas dari sesi; diisi lagi hanya jika masih ada
+            lepas(st.session_state, 'duplicate_nips_df')
             if not duplicates.empty:
                 st.session_state.duplicate_nips_df = duplicates
-                st.error(f"❌ Ditemukan {len(duplicates)} NIP duplikat di Data Mentah!")
+                st.error(f"❌ Ditemukan {len(duplicates)} NIP duplikat dalam bulan yang sama di Data Mentah!")
                 
                 # Tampilkan baris duplikat dengan warna merah
                 st.warning("**Baris dengan NIP duplikat (ditandai merah):**")
@@ -430,10 +780,8 @@ def show():
                     # Buat salinan untuk styling
                     styled_df = df_original.copy()
                     
-                    # Tandai baris duplikat
-                    mask = styled_df['nip'].astype(str).str.strip().isin(
-                        duplicates_df['nip_clean'].unique()
-                    )
+                    # Tandai baris duplikat (NIP yang sama di bulan lain tidak ikut ditandai)
+                    mask = pd.Series(styled_df.index.isin(duplicates_df.index), index=styled_df.index)
                     
                     # Buat list warna
                     colors = ['background-color: #ffcccc' if mask.iloc[i] else '' 
@@ -453,6 +801,8 @@ def show():
             # ========== CEK DATA BARU (NIP DI MENTAH TAPI TIDAK DI MASTER) ==========
             new_data = check_new_data(df_raw, df_master)
             
+            # Hasil deteksi lama dilepas dari sesi; diisi lagi hanya jika masih ada
+            lepas(st.session_state, 'new_data_df')
             if not new_data.empty:
                 st.session_state.new_data_df = new_data
                 st.warning(f"⚠️ Ditemukan {len(new_data)} data baru di Data Mentah yang tidak ada di Data Master!")
@@ -510,9 +860,9 @@ def show():
             col1, col2 = st.columns(2)
             with col1:
                 with st.expander(f"📄 Data Mentah ({len(df_raw)} baris)"):
-                    st.write(f"**Kolom yang terdeteksi ({len(df_raw.columns)}):**")
+                    st.write(f"**Kolom yang terdeteksi ({len(kolom_file(df_raw))}, diparse {len(df_raw.columns)}):**")
                     cols_per_row = 3
-                    cols = list(df_raw.columns)
+                    cols = kolom_file(df_raw)
                     for i in range(0, len(cols), cols_per_row):
                         row_cols = cols[i:i+cols_per_row]
                         col_text = " | ".join([f"`{col}`" for col in row_cols])
@@ -568,188 +918,58 @@ def show():
                         )
                         
                         # ========== BUAT DATA HASIL BP 21 ==========
-                        df_result = pd.DataFrame()
-                        
-                        # 1. Masa Pajak: ambil dari bln (tanpa leading zero)
-                        df_result['Masa Pajak'] = df_merged['bln'].astype(str).str.lstrip('0')
-                        
-                        # 2. Tahun Pajak: ambil dari thn
-                        df_result['Tahun Pajak'] = df_merged['thn'].astype(str)
-                        
-                        # 3. NPWP: ambil dari NIK (data master) - hilangkan .0
-                        df_result['NPWP'] = df_merged['NIK'].apply(lambda x: str(x).replace('.0', '') if pd.notna(x) else '')
-                        
-                        # 4. ID TKU Penerima Penghasilan: cari kolom yang cocok
-                        id_tku_keywords = ['id penerima tku', 'id_penerima_tku', 'id tku', 'id penerima', 'tku']
-                        id_tku_col = find_column_by_keywords(df_merged, id_tku_keywords)
-                        
+                        # Kolom dibangun dari spesifikasi deklaratif dalam satu pass; bulan yang
+                        # inputnya sama dengan yang tersimpan di buku makan tidak ditulis ulang
+                        spek = spek_makan_pns(kode_pajak_col)
+                        _, laporan_kolom = kompilasi(spek, df_merged)
+                        sumber_kolom = {item['kolom']: item['sumber'] for item in laporan_kolom}
+                        df_result, status_buku = proses_bulanan(
+                            buku, df_merged, spek,
+                            kolom_nip='nip', kolom_kotor='kotor', kolom_jmlhari='jmlhari',
+                            sumber=uploaded_file_raw.name,
+                        )
+                        tampilkan_status_buku(status_buku)
+
+                        id_tku_col = sumber_kolom['ID TKU Penerima Penghasilan']
                         if id_tku_col:
-                            df_result['ID TKU Penerima Penghasilan'] = df_merged[id_tku_col].astype(str)
                             st.success(f"✅ Kolom ID TKU ditemukan: {id_tku_col}")
                         else:
-                            df_result['ID TKU Penerima Penghasilan'] = ''
                             st.warning("⚠️ Kolom 'ID PENERIMA TKU' tidak ditemukan, diisi dengan nilai kosong")
-                        
-                        # 5. Status PTKP: ambil dari STATUS
-                        df_result['Status PTKP'] = df_merged['STATUS'].astype(str)
-                        
-                        # 6. Fasilitas: default "DTP"
-                        df_result['Fasilitas'] = 'DTP'
-                        
-                        # 7. Kode Objek Pajak: dari Data Master
-                        df_result['Kode Objek Pajak'] = df_merged[kode_pajak_col].astype(str)
+
                         st.success(f"✅ Kolom Kode Objek Pajak ditemukan: {kode_pajak_col}")
-                        
-                        # 8. Penghasilan: ambil dari kotor
-                        df_result['Penghasilan'] = df_merged['kotor'].astype(float)
-                        
-                        # 9. Deemed: default "100"
-                        df_result['Deemed'] = '100'
-                        
-                        # 10. Tarif: LOGIKA BARU BERDASARKAN KODE OBJEK PAJAK
-                        def get_tarif_from_kode(kode):
-                            """Mendapatkan tarif berdasarkan kode objek pajak"""
-                            kode = str(kode).strip()
-                            if kode == '21-402-02':
-                                return 5.0
-                            elif kode == '21-402-03':
-                                return 15.0
-                            elif kode == '21-402-04':
-                                return 0.0
-                            else:
-                                # Jika kode tidak dikenali, default ke 0
-                                return 0.0
-                        
-                        # Terapkan fungsi ke setiap baris
-                        df_result['Tarif'] = df_merged[kode_pajak_col].apply(get_tarif_from_kode)
-                        
-                        # Hitung statistik tarif
+
+                        # Statistik tarif berdasarkan KODE OBJEK PAJAK
+                        kode_mapping = {tarif: kode for kode, tarif in TARIF_KODE_OBJEK.items()}
+                        st.info("📊 **Mode Perhitungan BARU**: Tarif diambil dari KODE OBJEK PAJAK")
                         tarif_counts = df_result['Tarif'].value_counts()
-                        tarif_info = []
                         for tarif, count in tarif_counts.items():
-                            kode_mapping = {
-                                5.0: '21-402-02',
-                                15.0: '21-402-03',
-                                0.0: '21-402-04'
-                            }
                             kode = kode_mapping.get(tarif, f'Tidak dikenali (tarif {tarif})')
-                            tarif_info.append(f"  • Tarif {tarif:.0f}% ({kode}): {count} baris")
-                        
-                        st.info("📊 **Mode Perhitungan BARU**: Tarif diambil dari KODE OBJEK PAJAK")
-                        for info in tarif_info:
-                            st.info(info)
-                        
-                        # 11. Jenis Dok. Referensi: default "CommercialInvoice"
-                        df_result['Jenis Dok. Referensi'] = 'CommercialInvoice'
-                        
-                        # 12. Nomor Dok. Referensi: Cari kolom dengan berbagai variasi nama
-                        nomor_ref_keywords = [
-                            'nomor dok. referensi', 
-                            'nomor dok referensi',
-                            'nomor referensi',
-                            'nomor dokumen',
-                            'no dok referensi',
-                            'nomor sp2d',
-                            'no sp2d',
-                            'sp2d',
-                            'nomor dok',
-                            'referensi'
-                        ]
-                        nomor_ref_col = find_column_by_keywords(df_merged, nomor_ref_keywords)
-                        
-                        if nomor_ref_col and not df_merged[nomor_ref_col].isna().all():
-                            # Debug info
-                            st.info(f"🔍 Ditemukan kolom '{nomor_ref_col}' untuk Nomor Dok. Referensi")
-                            st.info(f"📋 Sample data dari kolom ini: {df_merged[nomor_ref_col].head(3).tolist()}")
-                            
-                            df_result['Nomor Dok. Referensi'] = df_merged[nomor_ref_col].astype(str)
-                            st.success(f"✅ Kolom Nomor Dok. Referensi ditemukan: {nomor_ref_col}")
-                        else:
-                            df_result['Nomor Dok. Referensi'] = ''
-                            st.warning("⚠️ Kolom Nomor Dok. Referensi tidak ditemukan atau kosong, diisi dengan nilai kosong (warna oranye)")
-                        
-                        # 13. Tanggal Dok. Referensi: Cari kolom dengan berbagai variasi nama
-                        tanggal_ref_keywords = [
-                            'tanggal dok. referensi',
-                            'tanggal dok referensi',
-                            'tanggal referensi',
-                            'tanggal dokumen',
-                            'tgl dok referensi',
-                            'tanggal sp2d',
-                            'tgl sp2d',
-                            'tanggal dok',
-                            'tgl referensi'
-                        ]
-                        tanggal_ref_col = find_column_by_keywords(df_merged, tanggal_ref_keywords)
-                        
-                        if tanggal_ref_col and not df_merged[tanggal_ref_col].isna().all():
-                            # Debug info
-                            st.info(f"🔍 Ditemukan kolom '{tanggal_ref_col}' untuk Tanggal Dok. Referensi")
-                            st.info(f"📋 Sample data dari kolom ini: {df_merged[tanggal_ref_col].head(3).tolist()}")
-                            
-                            # Konversi ke format bulan/tanggal/tahun (8/4/2025)
-                            try:
-                                # Coba parse tanggal dengan berbagai format
-                                dates = pd.to_datetime(df_merged[tanggal_ref_col], errors='coerce')
-                                # Format ke bulan/tanggal/tahun (tanpa leading zero)
-                                df_result['Tanggal Dok. Referensi'] = dates.apply(
-                                    lambda x: f"{x.month}/{x.day}/{x.year}" if pd.notna(x) else ''
-                                )
-                                st.success(f"✅ Kolom Tanggal Dok. Referensi ditemukan: {tanggal_ref_col}")
-                                st.info(f"📅 Format tanggal: bulan/tanggal/tahun (contoh: 8/4/2025)")
-                            except Exception as e:
-                                st.warning(f"⚠️ Gagal mengonversi format tanggal di kolom {tanggal_ref_col}. Menggunakan format asli: {str(e)}")
-                                df_result['Tanggal Dok. Referensi'] = df_merged[tanggal_ref_col].astype(str)
-                        else:
-                            df_result['Tanggal Dok. Referensi'] = ''
-                            st.warning("⚠️ Kolom Tanggal Dok. Referensi tidak ditemukan atau kosong, diisi dengan nilai kosong (warna oranye)")
-                        
-                        # 14. ID TKU Pemotong: DEFAULT "0001658723701000000000"
-                        df_result['ID TKU Pemotong'] = '0001658723701000000000'
-                        st.success("✅ ID TKU Pemotong diatur default: 0001658723701000000000")
-                        
-                        # 15. Tanggal Pemotongan: Cari kolom dengan berbagai variasi nama
-                        tanggal_potong_keywords = [
-                            'tanggal pemotongan',
-                            'tgl pemotongan',
-                            'tanggal potong',
-                            'tgl potong',
-                            'tanggal invoice',
-                            'tgl invoice',
-                            'invoice date',
-                            'tanggal transaksi',
-                            'tgl transaksi'
-                        ]
-                        tanggal_pemotongan_col = find_column_by_keywords(df_merged, tanggal_potong_keywords)
-                        
-                        if tanggal_pemotongan_col and not df_merged[tanggal_pemotongan_col].isna().all():
-                            # Debug info
-                            st.info(f"🔍 Ditemukan kolom '{tanggal_pemotongan_col}' untuk Tanggal Pemotongan")
-                            st.info(f"📋 Sample data dari kolom ini: {df_merged[tanggal_pemotongan_col].head(3).tolist()}")
-                            
-                            # Konversi ke format bulan/tanggal/tahun (8/4/2025)
-                            try:
-                                # Coba parse tanggal dengan berbagai format
-                                dates = pd.to_datetime(df_merged[tanggal_pemotongan_col], errors='coerce')
-                                # Format ke bulan/tanggal/tahun (tanpa leading zero)
-                                df_result['Tanggal Pemotongan'] = dates.apply(
-                                    lambda x: f"{x.month}/{x.day}/{x.year}" if pd.notna(x) else ''
-                                )
-                                st.success(f"✅ Kolom Tanggal Pemotongan ditemukan: {tanggal_pemotongan_col}")
-                                st.info(f"📅 Format tanggal: bulan/tanggal/tahun (contoh: 8/4/2025)")
-                            except Exception as e:
-                                st.warning(f"⚠️ Gagal mengonversi format tanggal di kolom {tanggal_pemotongan_col}. Menggunakan format asli: {str(e)}")
-                                df_result['Tanggal Pemotongan'] = df_merged[tanggal_pemotongan_col].astype(str)
-                        else:
-                            df_result['Tanggal Pemotongan'] = ''
-                            st.warning("⚠️ Kolom Tanggal Pemotongan tidak ditemukan atau kosong, diisi dengan nilai kosong (warna oranye)")
-                        
+                            st.info(f"  • Tarif {tarif:.0f}% ({kode}): {count} baris")
+
+                        # Kolom referensi & tanggal yang dideteksi otomatis
+                        for nama_kolom in ['Nomor Dok. Referensi', 'Tanggal Dok. Referensi', 'Tanggal Pemotongan']:
+                            kolom_sumber = sumber_kolom[nama_kolom]
+                            if kolom_sumber:
+                                st.info(f"🔍 Ditemukan kolom '{kolom_sumber}' untuk {nama_kolom}")
+                                st.info(f"📋 Sample data dari kolom ini: {df_merged[kolom_sumber].head(3).tolist()}")
+                                st.success(f"✅ Kolom {nama_kolom} ditemukan: {kolom_sumber}")
+                                if nama_kolom.startswith('Tanggal'):
+                                    st.info(f"📅 Format tanggal: bulan/tanggal/tahun (contoh: 8/4/2025)")
+                            else:
+                                st.warning(f"⚠️ Kolom {nama_kolom} tidak ditemukan atau kosong, diisi dengan nilai kosong (warna oranye)")
+
+                        st.success(f"✅ ID TKU Pemotong diatur default: {ID_TKU_PEMOTONG_DEFAULT}")
+
+                        nomor_ref_col = sumber_kolom['Nomor Dok. Referensi']
+                        tanggal_ref_col = sumber_kolom['Tanggal Dok. Referensi']
+                        tanggal_pemotongan_col = sumber_kolom['Tanggal Pemotongan']
+
                         # Tampilkan informasi kolom yang ditemukan
                         st.info("📊 **Deteksi Kolom Otomatis:**")
                         st.info(f"  • Nomor Dok. Referensi: {nomor_ref_col if nomor_ref_col else 'Tidak ditemukan'}")
                         st.info(f"  • Tanggal Dok. Referensi: {tanggal_ref_col if tanggal_ref_col else 'Tidak ditemukan'}")
                         st.info(f"  • Tanggal Pemotongan: {tanggal_pemotongan_col if tanggal_pemotongan_col else 'Tidak ditemukan'}")
-                        
+
                         # Hitung statistik
                         processed_count = len(df_result)
                         master_matched = processed_count  # Semua data adalah yang match karena inner join
@@ -914,68 +1134,10 @@ def show():
                     st.warning(f"⚠️ **Data tidak match:** {tidak_match} baris (tidak termasuk dalam file)")
                 
                 # Buat file Excel dengan format warna menggunakan openpyxl
-                output = BytesIO()
-                
-                # Buat workbook
-                wb = Workbook()
-                ws = wb.active
-                ws.title = "BP21_Pajak_Makan_PNS"
-                
-                # Tulis header
+                output = excel_bp21(hasil_final, "BP21_Pajak_Makan_PNS")
                 headers = list(hasil_final.columns)
-                for col_num, header in enumerate(headers, 1):
-                    cell = ws.cell(row=1, column=col_num, value=header)
-                    cell.font = Font(bold=True)
-                    cell.fill = PatternFill(start_color="C6E0B4", end_color="C6E0B4", fill_type="solid")
-                
-                # Tulis data
-                for row_num, row_data in enumerate(hasil_final.values, 2):
-                    for col_num, cell_value in enumerate(row_data, 1):
-                        ws.cell(row=row_num, column=col_num, value=cell_value)
-                
-                # Tentukan kolom untuk warna
-                # Kolom yang diwarnai oranye (harus diisi manual)
                 orange_columns = ['Nomor Dok. Referensi', 'Tanggal Dok. Referensi', 'Tanggal Pemotongan']
                 
-                # Cari indeks kolom orange
-                orange_indices = []
-                for col_name in orange_columns:
-                    if col_name in headers:
-                        orange_indices.append(headers.index(col_name) + 1)  # +1 karena openpyxl mulai dari 1
-                
-                # Terapkan warna untuk semua sel data (baris 2 ke atas)
-                for row in ws.iter_rows(min_row=2, max_row=len(hasil_final) + 1, 
-                                       min_col=1, max_col=len(headers)):
-                    for cell in row:
-                        # Jika kolom ini termasuk orange columns, cek apakah kosong
-                        if cell.column in orange_indices:
-                            # Jika sel kosong atau hanya berisi spasi, beri warna oranye
-                            if cell.value is None or str(cell.value).strip() == '':
-                                cell.fill = PatternFill(start_color="FFD580", end_color="FFD580", fill_type="solid")
-                            else:
-                                # Jika sudah ada isi, beri warna hijau muda
-                                cell.fill = PatternFill(start_color="E6FFE6", end_color="E6FFE6", fill_type="solid")
-                        else:
-                            # Untuk kolom lainnya, beri warna hijau muda
-                            cell.fill = PatternFill(start_color="E6FFE6", end_color="E6FFE6", fill_type="solid")
-                
-                # Auto-size columns
-                for column in ws.columns:
-                    max_length = 0
-                    column_letter = get_column_letter(column[0].column)
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    ws.column_dimensions[column_letter].width = adjusted_width
-                
-                # Simpan workbook ke BytesIO
-                wb.save(output)
-                output.seek(0)
-                
                 # Tombol download dengan format warna
                 col1, col2 = st.columns(2)
                 with col1:
@@ -1058,7 +1220,7 @@ def show():
     st.markdown("---")
     st.caption("""
     🔧 **Dukungan Teknis**: 
-    - **NIP duplikat**: Pastikan tidak ada NIP yang sama di Data Mentah
+    - **NIP duplikat**: Pastikan tidak ada NIP yang sama dalam satu bulan di Data Mentah (file rapel boleh berisi beberapa bulan)
     - **Data baru**: NIP yang tidak ada di Data Master akan ditandai hijau dan harus ditambahkan
     - **Format file**: Hanya mendukung format Excel (.xlsx, .xls)
     - Untuk perhitungan tarif: Sistem menggunakan KODE OBJEK PAJAK dari Data Master
@@ -7,6 +7,13 @@ from openpyxl.styles import PatternFill, Font
 from openpyxl.utils import get_column_letter
 import numpy as np
 
+from spesifikasi_bp21 import spek_makan_pppk
+from pembaca_excel import (
+    baca_excel_proyeksi, kolom_file, preflight_excel, pesan_preflight,
+)
+from master_bersama import ambil_master
+from buku_makan import BukuMakan, proses_bulanan
+
 def check_duplicate_nips(df, column_name='NIP'):
     """Cek NIP duplikat di dataframe dan return baris yang duplikat"""
     # Konversi ke string dan strip whitespace
@@ -225,6 +232,127 @@ def show():
     
     st.markdown("---")
     
+    # ========== BUKU MAKAN MULTI-BULAN ==========
+    buku = BukuMakan('makan_pppk')
+
+    def excel_bp21(hasil_final, judul):
+        """BP21 -> BytesIO Excel dengan format warna (hijau sistem, oranye manual)"""
+        output = io.BytesIO()
+
+        # Buat workbook
+        wb = Workbook()
+        ws = wb.active
+        ws.title = judul
+
+        # Tulis header
+        headers = list(hasil_final.columns)
+        for col_num, header in enumerate(headers, 1):
+            cell = ws.cell(row=1, column=col_num, value=header)
+            cell.font = Font(bold=True)
+            cell.fill = PatternFill(start_color="C6E0B4", end_color="C6E0B4", fill_type="solid")
+
+        # Tulis data
+        for row_num, row_data in enumerate(hasil_final.values, 2):
+            for col_num, cell_value in enumerate(row_data, 1):
+                # Format NPWP sebagai teks (mencegah notasi ilmiah untuk NIK panjang)
+                if col_num == headers.index('NPWP') + 1:
+                    ws.cell(row=row_num, column=col_num, value=str(cell_value))
+                else:
+                    ws.cell(row=row_num, column=col_num, value=cell_value)
+
+        # Tentukan kolom untuk warna
+        green_columns = headers[:headers.index('Jenis Dok. Referensi') + 1]  # Sampai 'Jenis Dok. Referensi'
+        orange_columns = ['Nomor Dok. Referensi', 'Tanggal Dok. Referensi', 'Tanggal Pemotongan']
+
+        # Cari indeks kolom orange
+        orange_indices = []
+        for col_name in orange_columns:
+            if col_name in headers:
+                orange_indices.append(headers.index(col_name) + 1)  # +1 karena openpyxl mulai dari 1
+
+        # Terapkan warna hijau untuk semua sel data (baris 2 ke atas)
+        for row in ws.iter_rows(min_row=2, max_row=len(hasil_final) + 1, 
+                               min_col=1, max_col=len(headers)):
+            for cell in row:
+                # Jika kolom ini termasuk orange columns, beri warna orange
+                if cell.column in orange_indices:
+                    cell.fill = PatternFill(start_color="FFD580", end_color="FFD580", fill_type="solid")
+                else:
+                    # Untuk kolom lainnya, beri warna hijau muda
+                    cell.fill = PatternFill(start_color="E6FFE6", end_color="E6FFE6", fill_type="solid")
+
+        # Format angka
+        # Format Penghasilan tanpa desimal untuk angka bulat
+        for row in ws.iter_rows(min_row=2, max_row=len(hasil_final) + 1):
+            # Kolom Penghasilan (indeks 7 jika mulai dari 0)
+            penghasilan_cell = row[7]
+            if penghasilan_cell.value:
+                if float(penghasilan_cell.value) == int(float(penghasilan_cell.value)):
+                    penghasilan_cell.value = int(float(penghasilan_cell.value))
+                penghasilan_cell.number_format = '#,##0'
+
+        # Auto-size columns
+        for column in ws.columns:
+            max_length = 0
+            column_letter = get_column_letter(column[0].column)
+            for cell in column:
+                try:
+                    cell_value = str(cell.value) if cell.value is not None else ""
+                    if len(cell_value) > max_length:
+                        max_length = len(cell_value)
+                except:
+                    pass
+            adjusted_width = min(max_length + 2, 50)
+            ws.column_dimensions[column_letter].width = adjusted_width
+
+        # Simpan workbook ke BytesIO
+        wb.save(output)
+        output.seek(0)
+        return output
+
+    def tampilkan_buku_makan():
+        """Daftar masa tersimpan dan BP21 gabungan untuk rentang masa (rapel)"""
+        daftar = buku.daftar()
+        with st.expander(f"📚 Buku Makan Multi-Bulan ({len(daftar)} masa tersimpan)", expanded=False):
+            st.caption("Setiap masa yang diproses otomatis disimpan. Upload ulang masa yang sama hanya "
+                       "dihitung ulang jika datanya berubah; BP21 beberapa masa bisa digabung tanpa upload ulang.")
+            if daftar.empty:
+                st.info("ℹ️ Belum ada masa yang tersimpan. Proses Data Mentah untuk mengisi buku.")
+                return
+            st.dataframe(daftar, use_container_width=True, hide_index=True)
+
+            periode = list(zip(daftar['Tahun'], daftar['Bulan']))
+            label = lambda i: f"{periode[i][1]:02d}/{periode[i][0]}"
+            col1, col2 = st.columns(2)
+            with col1:
+                awal = st.selectbox("Dari masa", range(len(periode)), format_func=label, key="buku_awal_makan_pppk")
+            with col2:
+                akhir = st.selectbox("Sampai masa", range(len(periode)), index=len(periode) - 1,
+                                     format_func=label, key="buku_akhir_makan_pppk")
+
+            if st.button("📦 Gabungkan BP21 Rentang Masa", use_container_width=True, key="buku_gabung_makan_pppk"):
+                if awal > akhir:
+                    st.error("❌ Masa awal harus sebelum masa akhir")
+                else:
+                    st.session_state.bp21_rentang_makan_pppk = buku.bp21_rentang(periode[awal], periode[akhir])
+                    st.session_state.label_rentang_makan_pppk = f"{label(awal)} - {label(akhir)}"
+
+            if 'bp21_rentang_makan_pppk' in st.session_state:
+                hasil_rentang = st.session_state.bp21_rentang_makan_pppk
+                label_rentang = st.session_state.get('label_rentang_makan_pppk', '')
+                st.success(f"✅ BP21 {label_rentang}: {len(hasil_rentang)} baris dari buku makan")
+                st.download_button(
+                    label="📥 Download BP21 Rentang (Excel dengan Format Warna)",
+                    data=excel_bp21(hasil_rentang, "Pajak Makan PPPK"),
+                    file_name=f"Hasil_Pajak_Makan_PPPK_{label_rentang.replace('/', '').replace(' ', '')}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True,
+                    key="buku_download_makan_pppk",
+                )
+
+    tampilkan_buku_makan()
+    st.markdown("---")
+
     # ========== PROSES DATA ==========
     if uploaded_mentah is not None and uploaded_master is not None:
         try:
@@ -239,8 +367,29 @@ def show():
                 'ID TKU': str
             }
             
-            df_mentah = pd.read_excel(uploaded_mentah)
-            df_master = pd.read_excel(uploaded_master, dtype=dtype_master)
+            # Preflight header kedua file sebelum parse penuh
+            upper = lambda c: c.strip().upper()
+            preflight_ok = True
+            for file_cek, wajib, label in [
+                (uploaded_mentah, ['NIP', 'NILAI KOTOR', 'STATUS KAWIN'], "Data Mentah"),
+                (uploaded_master, ['NIP', 'NIK', 'ID PENERIMA TKU', 'STATUS', 'KODE OBJEK PAJAK', 'ID TKU'], "Data Master"),
+            ]:
+                preflight = preflight_excel(file_cek, wajib=wajib, normalisasi=upper)
+                for level, teks in pesan_preflight(preflight, label):
+                    getattr(st, level)(teks)
+                preflight_ok = preflight_ok and preflight['lolos']
+            
+            if not preflight_ok:
+                st.warning("💡 **Solusi**: Pastikan semua header wajib ada dan penulisannya benar.")
+                st.stop()
+            
+            # Data mentah: hanya kolom yang dipakai proses (nama dibandingkan dalam huruf besar)
+            df_mentah = baca_excel_proyeksi(
+                uploaded_mentah,
+                kolom=['NIP', 'NAMA', 'NILAI KOTOR', 'STATUS KAWIN', 'JMLHARI'],
+                normalisasi=upper,
+            )
+            df_master = ambil_master(uploaded_master, dtype=dtype_master)
             
             # Normalisasi nama kolom
             df_mentah.columns = df_mentah.columns.astype(str).str.strip().str.upper()
@@ -261,7 +410,7 @@ def show():
             with col1:
                 with st.expander(f"📄 Data Mentah ({len(df_mentah)} baris)"):
                     st.write(f"**Kolom yang terdeteksi:**")
-                    for col in df_mentah.columns:
+                    for col in kolom_file(df_mentah):
                         st.write(f"  • {col}")
                     st.dataframe(df_mentah.head(3))
             
@@ -531,44 +680,19 @@ def show():
                                 st.write(f"  • Tarif {tarif}%: {jumlah} pegawai ({persentase:.1f}%)")
                         
                         # ========== BUAT DATA HASIL ==========
-                        n_rows = len(df_merged)
-                        
-                        # Pastikan NIK bersih dari .0
-                        nik_clean = []
-                        for nik in df_merged['NIK'].fillna('').tolist():
-                            if pd.isna(nik):
-                                nik_clean.append('')
-                            else:
-                                # Konversi ke string dan hapus .0 jika ada
-                                nik_str = str(nik)
-                                if '.' in nik_str:
-                                    nik_str = nik_str.split('.')[0]
-                                nik_clean.append(nik_str.strip())
-                        
-                        # Hanya kolom yang diperlukan untuk hasil download
-                        data_hasil = {
-                            'Masa Pajak': [masa_pajak] * n_rows,
-                            'Tahun Pajak': [tahun_pajak] * n_rows,
-                            'NPWP': nik_clean,
-                            'ID TKU Penerima Penghasilan': df_merged['ID PENERIMA TKU'].fillna('').astype(str).str.strip().tolist(),
-                            'Status PTKP': df_merged['STATUS'].fillna('TK').astype(str).str.strip().tolist(),
-                            'Fasilitas': ['DTP'] * n_rows,
-                            'Kode Objek Pajak': df_merged['KODE OBJEK PAJAK'].fillna('').astype(str).str.strip().tolist(),
-                            'Penghasilan': df_merged['NILAI KOTOR'].fillna(0).astype(float).tolist(),
-                            'Deemed': [100] * n_rows,
-                            'Tarif': df_merged['TARIF_CALC'].fillna(0).astype(float).tolist(),
-                            'Jenis Dok. Referensi': ['CommercialInvoice'] * n_rows,
-                            'Nomor Dok. Referensi': [''] * n_rows,  # Akan diisi manual dari SP2D
-                            'Tanggal Dok. Referensi': [''] * n_rows,  # Akan diisi manual dari SP2D
-                            'ID TKU Pemotong': df_merged['ID TKU'].fillna('').astype(str).str.strip().tolist(),
-                            'Tanggal Pemotongan': [''] * n_rows  # Akan diisi manual dari Invoice
-                        }
-                        
-                        # Buat DataFrame
-                        hasil = pd.DataFrame(data_hasil)
-                        
-                        # Format Penghasilan tanpa desimal jika angka bulat
-                        hasil['Penghasilan'] = hasil['Penghasilan'].apply(lambda x: int(x) if x == int(x) else x)
+                        # Kolom BP21 dibangun dari spesifikasi deklaratif dalam satu pass vektor;
+                        # jika input bulan ini sama dengan yang tersimpan di buku makan, buku tidak ditulis ulang
+                        hasil, status_buku = proses_bulanan(
+                            buku, df_merged, spek_makan_pppk(masa_pajak, tahun_pajak),
+                            kolom_nip='NIP', kolom_kotor='NILAI KOTOR', kolom_jmlhari='JMLHARI',
+                            periode=(tahun_pajak, masa_pajak), sumber=uploaded_mentah.name,
+                        )
+                        if status_buku[0]['Status'] == 'TETAP':
+                            st.info(f"📚 **Buku Makan:** input {masa_pajak:02d}/{tahun_pajak} sama dengan yang tersimpan di buku, tidak ditulis ulang")
+                        elif status_buku[0]['Status'] == 'TIDAK DISIMPAN':
+                            st.warning("⚠️ Hasil tidak bisa disimpan ke buku makan (penyimpanan tidak tersedia)")
+                        else:
+                            st.info(f"📚 **Buku Makan:** masa {masa_pajak:02d}/{tahun_pajak} disimpan ({status_buku[0]['Status'].lower()})")
                         
                         # ========== TAMPILKAN HASIL ==========
                         st.success(f"✅ **Data berhasil diproses!** Total: {len(hasil)} baris")
@@ -696,77 +820,7 @@ def show():
                 st.info(f"🔢 **Sumber tarif:** KODE OBJEK PAJAK dari Data Master")
                 
                 # Buat file Excel dengan format warna menggunakan openpyxl
-                output = io.BytesIO()
-                
-                # Buat workbook
-                wb = Workbook()
-                ws = wb.active
-                ws.title = "Pajak Makan PPPK"
-                
-                # Tulis header
-                headers = list(hasil_final.columns)
-                for col_num, header in enumerate(headers, 1):
-                    cell = ws.cell(row=1, column=col_num, value=header)
-                    cell.font = Font(bold=True)
-                    cell.fill = PatternFill(start_color="C6E0B4", end_color="C6E0B4", fill_type="solid")
-                
-                # Tulis data
-                for row_num, row_data in enumerate(hasil_final.values, 2):
-                    for col_num, cell_value in enumerate(row_data, 1):
-                        # Format NPWP sebagai teks (mencegah notasi ilmiah untuk NIK panjang)
-                        if col_num == headers.index('NPWP') + 1:
-                            ws.cell(row=row_num, column=col_num, value=str(cell_value))
-                        else:
-                            ws.cell(row=row_num, column=col_num, value=cell_value)
-                
-                # Tentukan kolom untuk warna
-                green_columns = headers[:headers.index('Jenis Dok. Referensi') + 1]  # Sampai 'Jenis Dok. Referensi'
-                orange_columns = ['Nomor Dok. Referensi', 'Tanggal Dok. Referensi', 'Tanggal Pemotongan']
-                
-                # Cari indeks kolom orange
-                orange_indices = []
-                for col_name in orange_columns:
-                    if col_name in headers:
-                        orange_indices.append(headers.index(col_name) + 1)  # +1 karena openpyxl mulai dari 1
-                
-                # Terapkan warna hijau untuk semua sel data (baris 2 ke atas)
-                for row in ws.iter_rows(min_row=2, max_row=len(hasil_final) + 1, 
-                                       min_col=1, max_col=len(headers)):
-                    for cell in row:
-                        # Jika kolom ini termasuk orange columns, beri warna orange
-                        if cell.column in orange_indices:
-                            cell.fill = PatternFill(start_color="FFD580", end_color="FFD580", fill_type="solid")
-                        else:
-                            # Untuk kolom lainnya, beri warna hijau muda
-                            cell.fill = PatternFill(start_color="E6FFE6", end_color="E6FFE6", fill_type="solid")
-                
-                # Format angka
-                # Format Penghasilan tanpa desimal untuk angka bulat
-                for row in ws.iter_rows(min_row=2, max_row=len(hasil_final) + 1):
-                    # Kolom Penghasilan (indeks 7 jika mulai dari 0)
-                    penghasilan_cell = row[7]
-                    if penghasilan_cell.value:
-                        if float(penghasilan_cell.value) == int(float(penghasilan_cell.value)):
-                            penghasilan_cell.value = int(float(penghasilan_cell.value))
-                        penghasilan_cell.number_format = '#,##0'
-                
-                # Auto-size columns
-                for column in ws.columns:
-                    max_length = 0
-                    column_letter = get_column_letter(column[0].column)
-                    for cell in column:
-                        try:
-                            cell_value = str(cell.value) if cell.value is not None else ""
-                            if len(cell_value) > max_length:
-                                max_length = len(cell_value)
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    ws.column_dimensions[column_letter].width = adjusted_width
-                
-                # Simpan workbook ke BytesIO
-                wb.save(output)
-                output.seek(0)
+                output = excel_bp21(hasil_final, "Pajak Makan PPPK")
                 
                 # Tombol download
                 col1, col2 = st.columns(2)
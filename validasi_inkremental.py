@@ -0,0 +1,140 @@
+# validasi_inkremental.py
+"""Validasi ulang inkremental: hanya baris yang berubah yang diperiksa lagi.
+
+Setelah operator memperbaiki beberapa baris Data Mentah (atau BPMP/Master)
+dan menjalankan croscheck lagi, validasi per baris dulu diulang untuk semua
+baris, termasuk pencocokan fuzzy NPWP dan pencarian NIP di Master. Sekarang
+hasil validasi per baris disimpan bersama hash isi barisnya (riwayat) dan
+hash baris pembanding per kunci. Pada run berikutnya sebuah baris divalidasi
+ulang hanya jika:
+
+  - hash isinya belum ada di riwayat (baris baru / baris yang diperbaiki)
+  - kuncinya (mis. NPWP) sama dengan kunci baris yang berubah atau hilang
+  - baris pembanding dengan kunci itu berubah, bertambah, atau hilang
+  - hasil lamanya tidak eksak (fuzzy / tidak ditemukan) dan himpunan
+    pembanding berubah, karena pasangan fuzzy bisa bergeser
+  - konteks validasi (kolom yang terpakai, versi aturan) berbeda -> semua
+
+Baris lain memakai hasil lamanya; nomor baris disesuaikan dengan posisi baru.
+"""
+import pandas as pd
+
+from cache_kolumnar import buat_kunci
+
+KOLOM_HASH = '_hash'
+KOLOM_KUNCI = '_kunci'
+KOLOM_EKSAK = '_eksak'
+KOLOM_INTERNAL = [KOLOM_HASH, KOLOM_KUNCI, KOLOM_EKSAK]
+
+
+def hash_baris(df):
+    """Hash isi per baris (tanpa indeks) -> Series uint64 sejajar df"""
+    if df.empty:
+        return pd.Series(dtype='uint64', index=df.index)
+    return pd.util.hash_pandas_object(df.astype(str), index=False)
+
+
+def hash_pembanding(df, kolom_kunci, keep='last'):
+    """Kunci -> hash baris pembanding yang dipakai untuk kunci itu (Series).
+
+    keep mengikuti cara halaman memilih baris jika kunci ganda: 'last' untuk
+    mapping dict (baris terakhir menimpa), 'first' untuk pencarian yang
+    berhenti di kecocokan pertama. Kunci kosong diabaikan.
+    """
+    kunci = df[kolom_kunci].astype(str)
+    ada = kunci != ''
+    hasil = pd.Series(hash_baris(df)[ada].to_numpy(), index=kunci[ada].to_numpy())
+    return hasil[~hasil.index.duplicated(keep=keep)]
+
+
+def konteks(*bagian):
+    """Kunci konteks validasi (kolom terpakai, versi aturan, dsb.)"""
+    return buat_kunci('validasi_inkremental', *bagian)
+
+
+def rencana_ulang(riwayat, kunci_konteks, hash_baru, kunci_baru, pembanding):
+    """Tentukan baris yang harus divalidasi ulang.
+
+    riwayat       : DataFrame dari simpan_riwayat() run sebelumnya, atau None
+    kunci_konteks : hasil konteks(); jika berbeda dari riwayat, semua diulang
+    hash_baru     : hash_baris() baris yang akan divalidasi
+    kunci_baru    : kunci pencocokan tiap baris (teks), sejajar hash_baru
+    pembanding    : hash_pembanding() sisi rujukan (BPMP/Master)
+    Return (ulang, lama): ulang = Series bool sejajar hash_baru; lama = hasil
+    lama untuk baris yang tidak diulang (indeks = indeks baris sekarang).
+    """
+    semua = pd.Series(True, index=hash_baru.index)
+    if (riwayat is None or riwayat.empty or KOLOM_HASH not in riwayat.columns
+            or riwayat.attrs.get('konteks') != kunci_konteks):
+        return semua, None
+
+    lama = riwayat.drop_duplicates(KOLOM_HASH, keep='last').set_index(KOLOM_HASH)
+    ada = hash_baru.isin(lama.index)
+
+    # Kunci pembanding yang berubah, bertambah, atau hilang
+    pembanding_lama = riwayat.attrs.get('pembanding', {})
+    pembanding_baru = dict(zip(pembanding.index, pembanding.astype(str)))
+    berubah = {
+        k for k in pembanding_lama.keys() | pembanding_baru.keys()
+        if pembanding_lama.get(k) != pembanding_baru.get(k)
+    }
+    ulang = ~ada | kunci_baru.isin(berubah)
+
+    # Baris yang berbagi kunci dengan baris yang berubah atau hilang ikut diulang
+    hilang = ~lama.index.isin(hash_baru.to_numpy())
+    kunci_ulang = set(kunci_baru[ulang]) | set(lama.loc[hilang, KOLOM_KUNCI])
+    kunci_ulang.discard('')
+    ulang |= kunci_baru.isin(kunci_ulang)
+
+    # Hasil fuzzy / tidak ditemukan bergantung pada seluruh himpunan pembanding
+    if berubah:
+        eksak = lama[KOLOM_EKSAK].reindex(hash_baru.to_numpy()).fillna(False)
+        ulang |= ~pd.Series(eksak.to_numpy(dtype=bool), index=hash_baru.index)
+
+    dipakai = hash_baru[~ulang]
+    hasil_lama = lama.reindex(dipakai.to_numpy()).drop(columns=[KOLOM_KUNCI, KOLOM_EKSAK])
+    hasil_lama.index = dipakai.index
+    return ulang, hasil_lama
+
+
+def gabung(hasil_baru, hasil_lama, kolom_nomor='No'):
+    """Hasil baris yang divalidasi ulang + hasil lama, urut indeks baris.
+
+    Kolom nomor diisi ulang dari indeks (indeks + 1) karena posisi baris
+    lama bisa bergeser jika ada baris yang ditambah atau dihapus.
+    """
+    if hasil_lama is None or hasil_lama.empty:
+        gabungan = hasil_baru
+    elif hasil_baru.empty:
+        gabungan = hasil_lama
+    else:
+        gabungan = pd.concat([hasil_baru, hasil_lama[hasil_baru.columns]]).sort_index(kind='stable')
+    gabungan = gabungan.copy()
+    if kolom_nomor in gabungan.columns:
+        gabungan[kolom_nomor] = gabungan.index + 1
+    return gabungan
+
+
+def simpan_riwayat(hasil, hash_baru, kunci_baru, eksak, kunci_konteks, pembanding):
+    """Riwayat untuk run berikutnya: hasil per baris + hash, kunci, dan flag eksak.
+
+    hasil, hash_baru, kunci_baru, dan eksak harus sejajar (indeks sama).
+    eksak = True jika hasil baris hanya bergantung pada pembanding dengan
+    kuncinya sendiri (cocok eksak, atau kunci kosong).
+    """
+    riwayat = hasil.copy()
+    riwayat[KOLOM_HASH] = hash_baru.reindex(hasil.index).to_numpy()
+    riwayat[KOLOM_KUNCI] = kunci_baru.reindex(hasil.index).astype(str).to_numpy()
+    riwayat[KOLOM_EKSAK] = eksak.reindex(hasil.index).astype(bool).to_numpy()
+    riwayat = riwayat.reset_index(drop=True)
+    riwayat.attrs = {
+        'konteks': kunci_konteks,
+        'pembanding': dict(zip(pembanding.index, pembanding.astype(str))),
+    }
+    return riwayat
+
+
+def ringkas(ulang):
+    """Teks singkat: berapa baris divalidasi ulang dan berapa dipakai ulang"""
+    jumlah_ulang = int(ulang.sum())
+    return f"{jumlah_ulang} baris divalidasi ulang, {len(ulang) - jumlah_ulang} baris memakai hasil sebelumnya"